@@ -1,3 +1,26 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import TokenApi
+
+
+# I token si creano con il comando crea_token, che mostra il token in chiaro una sola volta
+@admin.register(TokenApi)
+class TokenApiAdmin(admin.ModelAdmin):
+    list_display = ['nome', 'prefisso', 'utente', 'scope', 'scadenza', 'revocato_il', 'ultimo_uso']
+    list_filter = ['revocato_il']
+    list_select_related = ['utente']
+    search_fields = ['nome', 'prefisso', 'utente__username']
+    readonly_fields = ['utente', 'prefisso', 'impronta', 'ultimo_uso', 'data_creazione', 'revocato_il']
+    actions = ['revoca']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Revoca i token selezionati')
+    def revoca(self, request, queryset):
+        # Un salvataggio per token, così i segnali lo tolgono dalla cache del processo
+        revocati = 0
+        for token in queryset.filter(revocato_il__isnull=True):
+            token.revoca()
+            revocati += 1
+        self.message_user(request, f'{revocati} token revocati.')
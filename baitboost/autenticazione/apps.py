@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AutenticazioneConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'autenticazione'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from autenticazione.models import TokenApi
+
+
+class Command(BaseCommand):
+    """Crea un token API per un utente e lo stampa: il token in chiaro non viene salvato"""
+    help = 'Crea un token per le API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Utente a cui appartiene il token')
+        parser.add_argument('--nome', required=True, help='Uso del token')
+        parser.add_argument('--scope', nargs='+', choices=[scope for scope, _ in TokenApi.SCOPE],
+                            default=[TokenApi.SCOPE_LETTURA], help='Scope concessi (default: lettura)')
+        parser.add_argument('--giorni', type=int, default=settings.TOKEN_DURATA_GIORNI,
+                            help='Giorni di validità, 0 per un token senza scadenza')
+
+    def handle(self, *args, **options):
+        try:
+            utente = get_user_model().objects.get(username=options['username'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"Utente {options['username']} inesistente")
+        scadenza = timezone.now() + timedelta(days=options['giorni']) if options['giorni'] else None
+        token, chiave = TokenApi.crea(utente, options['nome'], options['scope'], scadenza)
+        self.stdout.write(self.style.SUCCESS(f'Token {token.prefisso} creato, scadenza: {scadenza or "nessuna"}'))
+        self.stdout.write(chiave)
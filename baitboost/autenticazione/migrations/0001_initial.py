@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenApi',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(help_text="Uso del token (es. 'sincronizzazione magazzino')", max_length=100)),
+                ('prefisso', models.CharField(max_length=16, unique=True)),
+                ('impronta', models.CharField(max_length=64)),
+                ('scope', models.JSONField(default=list, help_text='Elenco degli scope concessi')),
+                ('scadenza', models.DateTimeField(blank=True, null=True)),
+                ('revocato_il', models.DateTimeField(blank=True, null=True)),
+                ('ultimo_uso', models.DateTimeField(blank=True, null=True)),
+                ('data_creazione', models.DateTimeField(auto_now_add=True)),
+                ('utente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='token_api', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Token API',
+                'verbose_name_plural': 'Token API',
+                'ordering': ['-data_creazione'],
+            },
+        ),
+    ]
@@ -1,3 +1,69 @@
+import hashlib
+import secrets
+
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+
+def impronta_segreto(segreto):
+    """SHA-256 del segreto: i token sono casuali a 256 bit, non serve un hash lento come per le password"""
+    return hashlib.sha256(segreto.encode()).hexdigest()
+
+
+class TokenApi(models.Model):
+    """
+    Token di accesso alle API per strumenti di amministrazione e integrazioni.
+
+    Il token completo (``bb_<prefisso>_<segreto>``) viene mostrato una sola volta alla
+    creazione; nel database restano il prefisso, usato per la ricerca, e l'impronta del segreto.
+    """
+    SCOPE_LETTURA = 'lettura'
+    SCOPE_SCRITTURA = 'scrittura'
+    SCOPE = [
+        (SCOPE_LETTURA, 'Lettura'),
+        (SCOPE_SCRITTURA, 'Scrittura'),
+    ]
+
+    utente = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='token_api')
+    nome = models.CharField(max_length=100, help_text="Uso del token (es. 'sincronizzazione magazzino')")
+    prefisso = models.CharField(max_length=16, unique=True)
+    impronta = models.CharField(max_length=64)
+    scope = models.JSONField(default=list, help_text='Elenco degli scope concessi')
+    scadenza = models.DateTimeField(blank=True, null=True)
+    revocato_il = models.DateTimeField(blank=True, null=True)
+    ultimo_uso = models.DateTimeField(blank=True, null=True)
+    data_creazione = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Token API'
+        verbose_name_plural = 'Token API'
+        ordering = ['-data_creazione']
+
+    def __str__(self):
+        return f"{self.nome} ({self.prefisso})"
+
+    @classmethod
+    def crea(cls, utente, nome, scope, scadenza=None):
+        """
+        Crea un token e restituisce (istanza, token in chiaro).
+        Il token in chiaro non è più recuperabile dopo questa chiamata.
+        """
+        prefisso = secrets.token_hex(6)
+        segreto = secrets.token_urlsafe(32)
+        token = cls.objects.create(
+            utente=utente, nome=nome, prefisso=prefisso, impronta=impronta_segreto(segreto),
+            scope=list(scope), scadenza=scadenza,
+        )
+        return token, f'bb_{prefisso}_{segreto}'
+
+    @property
+    def is_valido(self):
+        return self.revocato_il is None and (self.scadenza is None or self.scadenza > timezone.now())
+
+    def ha_scope(self, scope):
+        return scope in self.scope
 
-# Create your models here.
+    def revoca(self):
+        self.revocato_il = timezone.now()
+        self.save(update_fields=['revocato_il'])
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import TokenApi
+from .tokens import cache_token
+
+
+@receiver(post_save, sender=TokenApi)
+@receiver(post_delete, sender=TokenApi)
+def rimuovi_token_dalla_cache(sender, instance, **kwargs):
+    """Revoche e modifiche valgono subito nel processo corrente"""
+    cache_token.rimuovi_token(instance.pk)
@@ -0,0 +1,104 @@
+"""
+Autenticazione delle API con token.
+
+Con ``BasicAuthentication`` ogni richiesta ricalcola l'hash PBKDF2 della password
+(centinaia di millisecondi di CPU). I token sono invece verificati con uno SHA-256
+e l'esito resta in una cache del processo per TOKEN_CACHE_SECONDI: una richiesta
+con un token già visto costa una lettura di dizionario.
+
+La revoca ha effetto subito nel processo che la esegue e entro TOKEN_CACHE_SECONDI
+negli altri worker; la scadenza è controllata a ogni richiesta.
+"""
+import hmac
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+from .models import TokenApi, impronta_segreto
+
+PAROLA_CHIAVE = 'Bearer'
+METODI_LETTURA = ('GET', 'HEAD', 'OPTIONS')
+
+
+class CacheToken:
+    """Token verificati di recente, indicizzati dalla stringa presentata dal client"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._voci = {}
+
+    def leggi(self, chiave):
+        voce = self._voci.get(chiave)
+        if voce is None or voce[0] < time.monotonic():
+            return None
+        return voce[1]
+
+    def salva(self, chiave, token):
+        with self._lock:
+            if len(self._voci) >= settings.TOKEN_CACHE_MASSIMO:
+                # Cache piena (es. scansione con token inventati): si riparte da vuota
+                self._voci.clear()
+            self._voci[chiave] = (time.monotonic() + settings.TOKEN_CACHE_SECONDI, token)
+
+    def rimuovi_token(self, id_token):
+        with self._lock:
+            self._voci = {chiave: voce for chiave, voce in self._voci.items() if voce[1].pk != id_token}
+
+
+cache_token = CacheToken()
+
+
+def _verifica(chiave):
+    """Cerca il token per prefisso e confronta l'impronta del segreto; None se non valido"""
+    try:
+        _, prefisso, segreto = chiave.split('_', 2)
+    except ValueError:
+        return None
+    token = TokenApi.objects.select_related('utente').filter(prefisso=prefisso).first()
+    if token is None or not hmac.compare_digest(token.impronta, impronta_segreto(segreto)):
+        return None
+    # ultimo_uso si aggiorna solo quando il token entra in cache, non a ogni richiesta
+    adesso = timezone.now()
+    if token.ultimo_uso is None or adesso - token.ultimo_uso > timedelta(hours=1):
+        TokenApi.objects.filter(pk=token.pk).update(ultimo_uso=adesso)
+    return token
+
+
+class TokenApiAuthentication(BaseAuthentication):
+    """
+    Autenticazione con header ``Authorization: Bearer bb_<prefisso>_<segreto>``.
+    ``request.auth`` è il TokenApi: le letture richiedono lo scope ``lettura``, le altre
+    richieste lo scope ``scrittura``.
+    """
+
+    def authenticate(self, request):
+        parti = get_authorization_header(request).split()
+        if not parti or parti[0].decode(errors='replace') != PAROLA_CHIAVE:
+            return None
+        if len(parti) != 2:
+            raise exceptions.AuthenticationFailed('Header Authorization non valido')
+        chiave = parti[1].decode(errors='replace')
+
+        token = cache_token.leggi(chiave)
+        if token is None:
+            token = _verifica(chiave)
+            if token is None:
+                raise exceptions.AuthenticationFailed('Token non valido')
+            cache_token.salva(chiave, token)
+
+        if not token.is_valido:
+            raise exceptions.AuthenticationFailed('Token scaduto o revocato')
+        if not token.utente.is_active:
+            raise exceptions.AuthenticationFailed('Utente disattivato')
+        scope = TokenApi.SCOPE_LETTURA if request.method in METODI_LETTURA else TokenApi.SCOPE_SCRITTURA
+        if not token.ha_scope(scope):
+            raise exceptions.PermissionDenied(f'Il token non ha lo scope {scope}')
+        return token.utente, token
+
+    def authenticate_header(self, request):
+        return PAROLA_CHIAVE
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'baitboost.settings')
 
 application = get_asgi_application()
+
+# Prepara gli indici in memoria prima di servire la prima richiesta
+from prodotti.warmup import riscalda_worker  # noqa: E402
+
+riscalda_worker()
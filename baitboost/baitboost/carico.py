@@ -0,0 +1,203 @@
+"""
+Protezione dal sovraccarico: limitazione per client e scarto adattivo delle richieste costose.
+
+Ogni richiesta ha un costo che dipende dai parametri usati (la ricerca globale e
+i filtri calcolati in Python costano molto più di una lettura per slug).
+``TokenBucketThrottle`` scala il costo da un token bucket per client salvato
+nella cache condivisa e risponde 429 quando i token finiscono.
+``LoadSheddingMiddleware`` misura il tempo passato in coda prima del worker
+(header ``X-Request-Start`` del proxy) e la latenza media delle query: oltre le
+soglie configurate rifiuta con 503 solo le richieste costose, mentre le rotte
+economiche e servite dalla cache continuano a rispondere.
+"""
+import os
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import OperationalError, connections
+from django.http import JsonResponse
+from rest_framework.throttling import BaseThrottle
+
+# Costo aggiuntivo dei parametri che rendono una lista costosa
+COSTO_PARAMETRI = {
+    'query': 5,          # ricerca globale su più campi testuali e join
+    'search': 5,         # SearchFilter su descrizioni
+    'potenza_min': 10,   # CannaFilter: confronto fatto in Python su tutte le canne
+    'potenza_max': 10,
+}
+COSTO_BASE = 1
+
+ISTRUZIONI_SCRITTURA = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def costo_richiesta(request, view=None):
+    """Costo in token della richiesta; le viste possono dichiarare un ``costo_base`` diverso"""
+    costo = getattr(view, 'costo_base', COSTO_BASE)
+    for parametro, extra in COSTO_PARAMETRI.items():
+        if request.GET.get(parametro):
+            costo += extra
+    return costo
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket per client (utente autenticato o IP) salvato nella cache condivisa.
+    Lo staff non è limitato. Lettura e scrittura del bucket non sono atomiche:
+    con richieste perfettamente simultanee un client può ottenere qualche token in più.
+    """
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def _parametri(self, request):
+        if request.user and request.user.is_authenticated:
+            return settings.THROTTLE_BUCKET['utenti'], f'utente-{request.user.pk}'
+        return settings.THROTTLE_BUCKET['anonimi'], self.get_ident(request)
+
+    def allow_request(self, request, view):
+        if request.user and request.user.is_staff:
+            return True
+        parametri, ident = self._parametri(request)
+        capacita, ricarica = parametri['capacita'], parametri['ricarica_al_secondo']
+        scope = getattr(view, 'throttle_scope', None) or 'api'
+        chiave = self.cache_format % {'scope': scope, 'ident': ident}
+        costo = costo_richiesta(request, view)
+
+        adesso = time.time()
+        token, ultimo = cache.get(chiave, (capacita, adesso))
+        token = min(capacita, token + (adesso - ultimo) * ricarica)
+        permesso = token >= costo
+        if permesso:
+            token -= costo
+        self._attesa = None if permesso else (costo - token) / ricarica
+        # Il bucket torna pieno dopo capacita / ricarica secondi, poi la chiave è inutile
+        cache.set(chiave, (token, adesso), int(capacita / ricarica) + 1)
+        return permesso
+
+    def wait(self):
+        return self._attesa
+
+
+class _LatenzaDatabase:
+    """
+    Media mobile esponenziale della durata delle query nel processo corrente, più i
+    contatori usati dal test di carico: le scritture che aspettano il lock del database
+    (busy timeout di SQLite, lock di riga di PostgreSQL) ne allungano la durata.
+    Senza nuove query la media decade con il tempo (emivita CARICO_EMIVITA_LATENZA_SECONDI).
+    """
+
+    def __init__(self, peso=0.1):
+        self.peso = peso
+        self._media_ms = 0.0
+        self._ultima_query = time.monotonic()
+        self.query = 0
+        self.scritture = 0
+        self.tempo_scritture_ms = 0.0
+        self.errori_lock = 0
+        self._lock = threading.Lock()
+
+    def _media_attuale(self, adesso):
+        trascorso = adesso - self._ultima_query
+        return self._media_ms * 0.5 ** (trascorso / settings.CARICO_EMIVITA_LATENZA_SECONDI)
+
+    @property
+    def media_ms(self):
+        # Reason: un worker che scarta tutte le richieste costose non esegue query e non
+        # registrerebbe più campioni: senza decadimento resterebbe sovraccarico per sempre
+        return self._media_attuale(time.monotonic())
+
+    def registra(self, durata_ms, scrittura=False, errore_lock=False):
+        with self._lock:
+            adesso = time.monotonic()
+            media = self._media_attuale(adesso)
+            self._media_ms = media + self.peso * (durata_ms - media)
+            self._ultima_query = adesso
+            self.query += 1
+            if scrittura:
+                self.scritture += 1
+                self.tempo_scritture_ms += durata_ms
+            if errore_lock:
+                self.errori_lock += 1
+
+    def __call__(self, execute, sql, params, many, context):
+        inizio = time.perf_counter()
+        errore_lock = False
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as errore:
+            errore_lock = 'locked' in str(errore)
+            raise
+        finally:
+            self.registra(
+                (time.perf_counter() - inizio) * 1000,
+                scrittura=sql.lstrip()[:6].upper() in ISTRUZIONI_SCRITTURA,
+                errore_lock=errore_lock,
+            )
+
+
+latenza_database = _LatenzaDatabase()
+
+
+def tempo_in_coda_ms(request):
+    """
+    Millisecondi trascorsi da quando il proxy ha ricevuto la richiesta.
+    Accetta ``X-Request-Start`` nei formati ``t=<secondi>`` (nginx) o in ms/µs (altri proxy).
+    """
+    valore = request.META.get('HTTP_X_REQUEST_START', '')
+    if not valore:
+        return 0.0
+    try:
+        inizio = float(valore.removeprefix('t='))
+    except ValueError:
+        return 0.0
+    adesso = time.time()
+    # Riconosce l'unità dall'ordine di grandezza del timestamp
+    if inizio > adesso * 10000:
+        inizio /= 1000000
+    elif inizio > adesso * 10:
+        inizio /= 1000
+    return max(0.0, (adesso - inizio) * 1000)
+
+
+def stato_carico():
+    """Indicatori di carico e contatori delle query del processo corrente"""
+    return {
+        'processo': os.getpid(),
+        'latenza_database_ms': round(latenza_database.media_ms, 2),
+        'soglia_database_ms': settings.CARICO_SOGLIA_DATABASE_MS,
+        'soglia_coda_ms': settings.CARICO_SOGLIA_CODA_MS,
+        'query': latenza_database.query,
+        'scritture': latenza_database.scritture,
+        'tempo_scritture_ms': round(latenza_database.tempo_scritture_ms, 1),
+        'errori_lock': latenza_database.errori_lock,
+    }
+
+
+class LoadSheddingMiddleware:
+    """
+    Rifiuta con 503 le richieste costose quando il servizio è sovraccarico.
+    Va messo in cima alla catena, così una richiesta scartata non apre sessioni né query.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _sovraccarico(self, request):
+        return (
+            tempo_in_coda_ms(request) > settings.CARICO_SOGLIA_CODA_MS
+            or latenza_database.media_ms > settings.CARICO_SOGLIA_DATABASE_MS
+        )
+
+    def __call__(self, request):
+        costosa = costo_richiesta(request) >= settings.CARICO_COSTO_SCARTABILE
+        if costosa and self._sovraccarico(request):
+            risposta = JsonResponse(
+                {'errore': 'Servizio sovraccarico, riprovare tra poco'}, status=503
+            )
+            risposta['Retry-After'] = str(settings.CARICO_RETRY_AFTER)
+            return risposta
+        with ExitStack() as stack:
+            for connessione in connections.all():
+                stack.enter_context(connessione.execute_wrapper(latenza_database))
+            return self.get_response(request)
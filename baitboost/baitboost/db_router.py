@@ -0,0 +1,122 @@
+"""
+Instradamento delle query tra database primario e repliche in sola lettura.
+
+Le letture vengono mandate a una replica solo quando la vista lo abilita
+esplicitamente (vedi ``ReplicaReadMixin`` in ``prodotti.views``): tutto il resto,
+scritture e transazioni comprese, resta sul database ``default``.
+Dopo una scrittura l'utente resta "agganciato" al primario per
+``REPLICA_STICKY_SECONDS`` secondi, così rilegge subito le proprie modifiche
+anche se le repliche sono in ritardo. L'aggancio viaggia in un cookie e non
+nella cache: la richiesta successiva può arrivare a un altro worker, che con
+la cache in memoria per processo non vedrebbe il segno lasciato dal primo.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Alias della replica scelta per la richiesta corrente (None = primario)
+_replica_corrente = ContextVar('replica_corrente', default=None)
+
+METODI_SICURI = ('GET', 'HEAD', 'OPTIONS')
+
+# Cookie con l'istante (timestamp Unix) fino al quale si legge dal primario
+COOKIE_PRIMARIO = 'bb_primario'
+
+
+def get_repliche():
+    """Restituisce gli alias delle repliche configurate"""
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def segna_scrittura(response):
+    """Aggancia al primario le letture successive del client per la finestra configurata"""
+    durata = getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+    response.set_cookie(
+        COOKIE_PRIMARIO, str(int(time.time() + durata)), max_age=durata,
+        secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax',
+    )
+
+
+def deve_leggere_dal_primario(request):
+    """True se il client ha scritto da poco e deve rileggere dal primario"""
+    # Reason: il cookie non è firmato perché falsificarlo fa solo leggere dal primario;
+    # la scadenza nel valore vale anche per i client che ignorano max_age
+    try:
+        return float(request.COOKIES.get(COOKIE_PRIMARIO, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def attiva_letture_replica():
+    """Sceglie una replica per le letture successive e restituisce il token per ripristinare"""
+    repliche = get_repliche()
+    return _replica_corrente.set(random.choice(repliche) if repliche else None)
+
+
+def ripristina_letture(token):
+    """Annulla l'effetto di ``attiva_letture_replica``"""
+    _replica_corrente.reset(token)
+
+
+@contextmanager
+def letture_su_replica():
+    """Abilita le letture su una replica per il blocco di codice corrente"""
+    token = attiva_letture_replica()
+    try:
+        yield
+    finally:
+        ripristina_letture(token)
+
+
+class ReplicaRouter:
+    """
+    Router che manda le letture abilitate alle repliche e tutto il resto al primario
+    """
+
+    def db_for_read(self, model, **hints):
+        replica = _replica_corrente.get()
+        if replica is None:
+            return DEFAULT_DB_ALIAS
+        # Dentro una transazione si legge sempre dal primario
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primario e repliche contengono gli stessi dati
+        pool = {DEFAULT_DB_ALIAS, *get_repliche()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Le repliche ricevono lo schema dal primario, non dalle migrazioni
+        if db in get_repliche():
+            return False
+        return None
+
+
+class ReplicaStickyMiddleware:
+    """
+    Dopo una richiesta di scrittura andata a buon fine aggancia l'utente al primario.
+    Vale sia per le API DRF (che propagano l'utente autenticato) sia per l'admin.
+    I client delle API devono conservare i cookie per rileggere subito le proprie modifiche.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        user = getattr(request, 'user', None)
+        if (request.method not in METODI_SICURI and response.status_code < 400
+                and user is not None and user.is_authenticated):
+            segna_scrittura(response)
+        return response
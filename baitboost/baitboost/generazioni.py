@@ -0,0 +1,69 @@
+"""
+Invalidazione tra processi dei dati tenuti in memoria dai worker.
+
+Chi modifica i dati incrementa un contatore di generazione nella cache di Django;
+ogni processo lo legge al massimo una volta ogni ``intervallo`` secondi e ricarica
+i propri dati quando è cambiato. La cache di default senza Redis
+(``LocMemCache``) è però privata del processo: gli incrementi degli altri worker
+non arrivano mai. Per questo i dati vengono comunque ricaricati quando sono più
+vecchi di ``eta_massima`` secondi, qualunque sia il contatore: con una cache
+condivisa l'invalidazione è immediata, senza resta un ritardo massimo garantito.
+"""
+import time
+
+from django.core.cache import cache
+
+
+class GenerazioneCondivisa:
+    """
+    Stato di validità di un dato in memoria rispetto al contatore condiviso.
+
+    Args:
+        chiave (str): chiave del contatore nella cache.
+        intervallo (callable): secondi tra due letture del contatore.
+        eta_massima (callable): secondi dopo i quali il dato va ricaricato comunque.
+            Sono funzioni (es. lette dai settings) perché i test possono cambiarli.
+    """
+
+    def __init__(self, chiave, intervallo, eta_massima):
+        self.chiave = chiave
+        self._intervallo = intervallo
+        self._eta_massima = eta_massima
+        self._generazione = None
+        self._caricato_il = None
+        self._controllato_il = 0.0
+
+    def leggi(self):
+        """Valore corrente del contatore; se manca (mai scritto o espulso) ne parte uno nuovo"""
+        generazione = cache.get(self.chiave)
+        if generazione is None:
+            cache.add(self.chiave, time.time_ns(), None)
+            generazione = cache.get(self.chiave)
+        return generazione
+
+    def caricato(self, generazione):
+        """Registra che il dato è stato appena caricato alla generazione indicata"""
+        self._generazione = generazione
+        self._caricato_il = self._controllato_il = time.monotonic()
+
+    def da_ricaricare(self):
+        """True se il dato non è mai stato caricato, è troppo vecchio o il contatore è cambiato"""
+        if self._caricato_il is None:
+            return True
+        adesso = time.monotonic()
+        if adesso - self._caricato_il >= self._eta_massima():
+            return True
+        if adesso - self._controllato_il < self._intervallo():
+            return False
+        if self.leggi() != self._generazione:
+            return True
+        self._controllato_il = adesso
+        return False
+
+    def invalida(self):
+        """Segnala a tutti i processi che il dato è cambiato; il processo corrente ricontrolla subito"""
+        try:
+            cache.incr(self.chiave)
+        except ValueError:
+            cache.set(self.chiave, time.time_ns(), None)
+        self._controllato_il = 0.0
@@ -0,0 +1,72 @@
+"""
+Percorso leggero per le letture anonime delle API pubbliche.
+
+Una GET anonima su /api/ non usa sessione, CSRF, utente autenticato né messaggi,
+ma passerebbe comunque dai relativi middleware. ``PercorsoLeggeroMiddleware``
+riconosce queste richieste (metodo sicuro, prefisso in PERCORSO_LEGGERO_PREFISSI,
+nessun header Authorization e nessun cookie di sessione) e le marca; le versioni
+dei middleware di Django definite qui le lasciano passare senza lavoro.
+L'admin, le scritture e le richieste con credenziali usano lo stack completo.
+"""
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.middleware.csrf import CsrfViewMiddleware
+
+METODI_LEGGERI = ('GET', 'HEAD', 'OPTIONS')
+
+
+def richiesta_leggera(request):
+    """True se la richiesta può saltare sessione, CSRF, autenticazione e messaggi"""
+    return (
+        request.method in METODI_LEGGERI
+        and request.path_info.startswith(settings.PERCORSO_LEGGERO_PREFISSI)
+        and 'HTTP_AUTHORIZATION' not in request.META
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+    )
+
+
+class PercorsoLeggeroMiddleware:
+    """Marca le richieste leggere; va prima dei middleware di sessione e autenticazione"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.percorso_leggero = richiesta_leggera(request)
+        if request.percorso_leggero:
+            # Le viste che leggono request.user trovano comunque un utente anonimo
+            request.user = AnonymousUser()
+        return self.get_response(request)
+
+
+class SaltaSuPercorsoLeggero:
+    """Mixin per i middleware di Django: nessuna elaborazione sulle richieste leggere"""
+
+    def __call__(self, request):
+        if getattr(request, 'percorso_leggero', False):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class SessionMiddlewareLeggero(SaltaSuPercorsoLeggero, SessionMiddleware):
+    pass
+
+
+class CsrfViewMiddlewareLeggero(SaltaSuPercorsoLeggero, CsrfViewMiddleware):
+
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        # process_view è chiamato dal gestore delle richieste, non da __call__
+        if getattr(request, 'percorso_leggero', False):
+            return None
+        return super().process_view(request, callback, callback_args, callback_kwargs)
+
+
+class AuthenticationMiddlewareLeggero(SaltaSuPercorsoLeggero, AuthenticationMiddleware):
+    pass
+
+
+class MessageMiddlewareLeggero(SaltaSuPercorsoLeggero, MessageMiddleware):
+    pass
@@ -0,0 +1,213 @@
+"""
+Distribuzione dei file media anche in produzione.
+
+``serve_media`` risolve il percorso sotto MEDIA_ROOT, controlla l'accesso ai file
+privati (prefissi in MEDIA_PRIVATI, es. le parti dei caricamenti in corso) e
+risponde alle richieste condizionali con 304 senza aprire il file. L'invio vero
+e proprio dipende da MEDIA_INVIO:
+
+- ``x-accel-redirect`` / ``x-sendfile``: la risposta è vuota e il proxy (nginx,
+  Apache, lighttpd) invia il file, gestendo da sé le richieste Range;
+- vuoto: il file viene inviato da Django con ``FileResponse``, che i server WSGI
+  con ``wsgi.file_wrapper`` (es. gunicorn) trasmettono con sendfile senza copiarlo
+  in memoria; le richieste Range con un solo intervallo ricevono 206.
+
+I nomi dello storage indirizzato per contenuto (vedi baitboost/storage.py) non
+cambiano mai contenuto: sono serviti con cache di un anno ``immutable``.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation, ValidationError
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+from rest_framework import exceptions
+
+from .storage import CARTELLA_CONTENUTI
+
+# contenuti/ab/cd/<sha256>.<ext>: l'impronta nel nome fa anche da ETag forte
+NOME_CONTENUTO = re.compile(
+    rf'^{CARTELLA_CONTENUTI}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/(?P<impronta>[0-9a-f]{{64}})(\.[0-9a-z]+)?$'
+)
+INTERVALLO = re.compile(r'^bytes=(?P<inizio>\d*)-(?P<fine>\d*)$')
+
+CACHE_IMMUTABILE = 'public, max-age=31536000, immutable'
+CACHE_PRIVATA = 'private, no-store'
+
+INVIO_ACCEL = 'x-accel-redirect'
+INVIO_SENDFILE = 'x-sendfile'
+
+
+class _Intervallo:
+    """
+    File aperto già posizionato all'inizio dell'intervallo, che restituisce al massimo
+    ``lunghezza`` byte. Espone ``fileno`` per il sendfile del server WSGI (che invia
+    Content-Length byte dalla posizione corrente) e non ``tell``/``seek``, così
+    ``FileResponse`` non ricalcola la lunghezza sul file intero.
+    """
+
+    def __init__(self, file, lunghezza):
+        self._file = file
+        self._rimanenti = lunghezza
+        self.name = file.name
+
+    def read(self, dimensione=-1):
+        if dimensione < 0 or dimensione > self._rimanenti:
+            dimensione = self._rimanenti
+        blocco = self._file.read(dimensione) if dimensione else b''
+        self._rimanenti -= len(blocco)
+        return blocco
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def close(self):
+        self._file.close()
+
+
+def _intervallo_richiesto(request, dimensione, etag, ultima_modifica):
+    """
+    Intervallo (inizio, fine inclusa) di un header Range con un solo intervallo.
+
+    Returns:
+        tuple | None: None se la richiesta va servita per intero (nessun Range, più
+        intervalli, If-Range non corrispondente). Un intervallo oltre la fine del file
+        restituisce (dimensione, dimensione), da servire con 416.
+    """
+    corrispondenza = INTERVALLO.match(request.META.get('HTTP_RANGE', '').replace(' ', ''))
+    if corrispondenza is None:
+        return None
+    se_intervallo = request.META.get('HTTP_IF_RANGE')
+    if se_intervallo and se_intervallo != etag and parse_http_date_safe(se_intervallo) != ultima_modifica:
+        return None
+
+    inizio, fine = corrispondenza['inizio'], corrispondenza['fine']
+    if not inizio:
+        # bytes=-N: gli ultimi N byte
+        if not fine or int(fine) == 0:
+            return dimensione, dimensione
+        return max(0, dimensione - int(fine)), dimensione - 1
+    inizio = int(inizio)
+    fine = min(int(fine), dimensione - 1) if fine else dimensione - 1
+    if inizio >= dimensione:
+        return dimensione, dimensione
+    if fine < inizio:
+        return None
+    return inizio, fine
+
+
+def _utente(request):
+    """Utente della sessione o del token API; None se le credenziali non sono valide"""
+    if 'HTTP_AUTHORIZATION' in request.META:
+        from autenticazione.tokens import TokenApiAuthentication
+        try:
+            risultato = TokenApiAuthentication().authenticate(request)
+        except exceptions.APIException:
+            return None
+        if risultato is not None:
+            return risultato[0]
+    return getattr(request, 'user', None)
+
+
+def accesso_consentito(request, percorso):
+    """
+    I file sotto MEDIA_PRIVATI sono visibili allo staff e, per le parti dei caricamenti
+    (``caricamenti/<id>/...``), all'utente che ha avviato il caricamento.
+    """
+    if not percorso.startswith(tuple(settings.MEDIA_PRIVATI)):
+        return True
+    utente = _utente(request)
+    if utente is None or not utente.is_authenticated:
+        return False
+    if utente.is_staff:
+        return True
+    from prodotti.caricamenti import CARTELLA_PARTI
+    from prodotti.models import CaricamentoImmagine
+    cartella, _, resto = percorso.partition('/')
+    id_caricamento = resto.split('/', 1)[0]
+    if cartella != CARTELLA_PARTI or not id_caricamento:
+        return False
+    try:
+        return CaricamentoImmagine.objects.filter(pk=id_caricamento, utente=utente).exists()
+    except ValidationError:
+        # Id che non è un UUID
+        return False
+
+
+def _intestazioni_cache(risposta, percorso, privato, etag, ultima_modifica):
+    risposta.headers['ETag'] = etag
+    risposta.headers['Last-Modified'] = http_date(ultima_modifica)
+    if privato:
+        risposta.headers['Cache-Control'] = CACHE_PRIVATA
+    elif NOME_CONTENUTO.match(percorso):
+        risposta.headers['Cache-Control'] = CACHE_IMMUTABILE
+    else:
+        risposta.headers['Cache-Control'] = f'public, max-age={settings.MEDIA_MAX_AGE}'
+    return risposta
+
+
+@require_safe
+def serve_media(request, percorso):
+    """Serve un file sotto MEDIA_ROOT (vedi la docstring del modulo)"""
+    try:
+        percorso_completo = safe_join(settings.MEDIA_ROOT, percorso)
+    except SuspiciousFileOperation:
+        raise Http404('File inesistente')
+    percorso = os.path.relpath(percorso_completo, settings.MEDIA_ROOT).replace(os.sep, '/')
+    try:
+        stat = os.stat(percorso_completo)
+    except OSError:
+        raise Http404('File inesistente')
+    if not os.path.isfile(percorso_completo):
+        raise Http404('File inesistente')
+
+    privato = percorso.startswith(tuple(settings.MEDIA_PRIVATI))
+    if privato and not accesso_consentito(request, percorso):
+        # Reason: 404 e non 403, per non rivelare quali caricamenti esistono
+        raise Http404('File inesistente')
+
+    dimensione = stat.st_size
+    ultima_modifica = int(stat.st_mtime)
+    contenuto = NOME_CONTENUTO.match(percorso)
+    etag = f'"{contenuto["impronta"]}"' if contenuto else f'"{ultima_modifica:x}-{dimensione:x}"'
+
+    non_modificato = get_conditional_response(request, etag=etag, last_modified=ultima_modifica)
+    if non_modificato is not None:
+        return _intestazioni_cache(non_modificato, percorso, privato, etag, ultima_modifica)
+
+    tipo = mimetypes.guess_type(percorso_completo)[0] or 'application/octet-stream'
+
+    if settings.MEDIA_INVIO in (INVIO_ACCEL, INVIO_SENDFILE):
+        risposta = HttpResponse(content_type=tipo)
+        if settings.MEDIA_INVIO == INVIO_ACCEL:
+            risposta.headers['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFISSO + quote(percorso)
+        else:
+            risposta.headers['X-Sendfile'] = percorso_completo
+        return _intestazioni_cache(risposta, percorso, privato, etag, ultima_modifica)
+
+    intervallo = _intervallo_richiesto(request, dimensione, etag, ultima_modifica)
+    if intervallo is not None and intervallo[0] >= dimensione:
+        risposta = HttpResponse(status=416)
+        risposta.headers['Content-Range'] = f'bytes */{dimensione}'
+        return risposta
+
+    inizio, fine = intervallo or (0, dimensione - 1)
+    lunghezza = fine - inizio + 1 if dimensione else 0
+    if request.method == 'HEAD':
+        risposta = HttpResponse(content_type=tipo)
+    else:
+        file = open(percorso_completo, 'rb')
+        file.seek(inizio)
+        risposta = FileResponse(_Intervallo(file, lunghezza), content_type=tipo)
+    risposta.headers['Content-Length'] = str(lunghezza)
+    risposta.headers['Accept-Ranges'] = 'bytes'
+    if intervallo is not None:
+        risposta.status_code = 206
+        risposta.headers['Content-Range'] = f'bytes {inizio}-{fine}/{dimensione}'
+    return _intestazioni_cache(risposta, percorso, privato, etag, ultima_modifica)
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from .sqlite_profile import opzioni_produzione
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -49,19 +52,28 @@ INSTALLED_APPS = [
     'carrello',
     'checkout',
     'utenti',
+    'coda',
 ]
 
+# Sessione, CSRF, autenticazione e messaggi sono le versioni di baitboost/leggero.py:
+# le letture anonime delle API pubbliche li attraversano senza elaborazione
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'baitboost.carico.LoadSheddingMiddleware',
+    'baitboost.leggero.PercorsoLeggeroMiddleware',
+    'baitboost.leggero.SessionMiddlewareLeggero',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'baitboost.leggero.CsrfViewMiddlewareLeggero',
+    'baitboost.leggero.AuthenticationMiddlewareLeggero',
+    'baitboost.db_router.ReplicaStickyMiddleware',
+    'baitboost.leggero.MessageMiddlewareLeggero',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Prefissi delle rotte pubbliche in sola lettura servite dal percorso leggero
+PERCORSO_LEGGERO_PREFISSI = ('/api/', '/media/')
+
 ROOT_URLCONF = 'baitboost.urls'
 
 TEMPLATES = [
@@ -92,6 +104,45 @@ DATABASES = {
     }
 }
 
+# Profilo SQLite di produzione (WAL, PRAGMA di connessione, transazioni IMMEDIATE)
+# per le installazioni piccole su un solo nodo: BAITBOOST_SQLITE_PROFILE=produzione
+SQLITE_PROFILO_PRODUZIONE = os.environ.get('BAITBOOST_SQLITE_PROFILE') == 'produzione'
+if SQLITE_PROFILO_PRODUZIONE:
+    DATABASES['default']['OPTIONS'] = opzioni_produzione()
+
+# Repliche in sola lettura per il catalogo.
+# In locale si possono simulare con più file SQLite impostando BAITBOOST_SQLITE_REPLICAS=<numero>
+# e copiando il primario con `python manage.py sincronizza_repliche`.
+for _indice in range(1, int(os.environ.get('BAITBOOST_SQLITE_REPLICAS', '0')) + 1):
+    DATABASES[f'replica_{_indice}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'db_replica_{_indice}.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+    if SQLITE_PROFILO_PRODUZIONE:
+        DATABASES[f'replica_{_indice}']['OPTIONS'] = opzioni_produzione()
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['baitboost.db_router.ReplicaRouter']
+
+# Secondi in cui un utente che ha appena scritto legge solo dal primario
+REPLICA_STICKY_SECONDS = 5
+
+# Cache condivisa tra i worker se è configurato Redis, altrimenti in memoria per processo
+if os.environ.get('BAITBOOST_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['BAITBOOST_REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -138,6 +189,30 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Invio dei media in produzione (vedi baitboost/media.py): 'x-accel-redirect' (nginx, location
+# interna MEDIA_ACCEL_PREFISSO che punta a MEDIA_ROOT), 'x-sendfile' (Apache/lighttpd)
+# o vuoto per l'invio da Django con il sendfile del server WSGI
+MEDIA_INVIO = os.environ.get('BAITBOOST_MEDIA_INVIO', '')
+MEDIA_ACCEL_PREFISSO = '/media-interni/'
+# Secondi di cache dei media con nome non derivato dal contenuto (questi sono immutabili)
+MEDIA_MAX_AGE = 3600
+# Prefissi dei media visibili solo allo staff e al proprietario (parti dei caricamenti in corso)
+MEDIA_PRIVATI = ('caricamenti/',)
+
+# Le immagini dei modelli usano lo storage indirizzato per contenuto (vedi baitboost/storage.py);
+# con django-storages: BAITBOOST_STORAGE_CONTENUTI=baitboost.storage.ContenutoIndirizzatoS3Storage
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'contenuti': {
+        'BACKEND': os.environ.get('BAITBOOST_STORAGE_CONTENUTI', 'baitboost.storage.ContenutoIndirizzatoStorage'),
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 # Configurazione DRF
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
@@ -145,7 +220,7 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
+        'autenticazione.tokens.TokenApiAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -154,8 +229,111 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 12,
+    'DEFAULT_THROTTLE_CLASSES': [
+        'baitboost.carico.TokenBucketThrottle',
+    ],
+    # Proxy fidati davanti all'applicazione: i client anonimi del throttling sono identificati
+    # dall'indirizzo che l'ultimo di essi aggiunge a X-Forwarded-For. Con 0 (default) l'header
+    # è ignorato e vale REMOTE_ADDR, altrimenti chiunque sceglierebbe il proprio bucket
+    'NUM_PROXIES': int(os.environ.get('BAITBOOST_NUM_PROXIES', '0')),
+}
+
+# Token bucket per client (vedi baitboost/carico.py): token massimi e token recuperati al secondo.
+# Una richiesta semplice costa 1 token, ricerca globale e filtri calcolati in Python di più
+THROTTLE_BUCKET = {
+    'anonimi': {'capacita': 60, 'ricarica_al_secondo': 1.0},
+    'utenti': {'capacita': 120, 'ricarica_al_secondo': 2.0},
 }
 
+# Scarto delle richieste costose sotto carico: soglie di attesa in coda e di latenza media
+# delle query, costo minimo delle richieste scartabili e Retry-After delle risposte 503
+CARICO_SOGLIA_CODA_MS = 500
+CARICO_SOGLIA_DATABASE_MS = 200
+CARICO_COSTO_SCARTABILE = 5
+CARICO_RETRY_AFTER = 10
+# Emivita della latenza media delle query quando il worker non ne esegue (es. mentre scarta)
+CARICO_EMIVITA_LATENZA_SECONDI = 10
+
+# Secondi dopo i quali l'indice di autocompletamento viene ricostruito in background
+AUTOCOMPLETE_TTL = 300
+
+# Sitemap: URL pubblico del sito, cartella degli shard generati e secondi tra due verifiche
+SITEMAP_URL_BASE = os.environ.get('BAITBOOST_SITEMAP_URL_BASE', 'http://localhost:8000')
+SITEMAP_ROOT = BASE_DIR / 'sitemap'
+# Percorsi delle pagine del negozio (non dell'API) scritti nella sitemap, {slug} viene sostituito
+SITEMAP_PERCORSO_PRODOTTO = os.environ.get('BAITBOOST_SITEMAP_PERCORSO_PRODOTTO', '/prodotti/{slug}/')
+SITEMAP_PERCORSO_CATEGORIA = os.environ.get('BAITBOOST_SITEMAP_PERCORSO_CATEGORIA', '/categorie/{slug}/')
+SITEMAP_TTL = 600
+
+# Snapshot della homepage: durata massima in cache e attesa prima di una ricostruzione.
+# La ricostruzione dopo una modifica gira sulla coda dei compiti: senza Redis lo snapshot
+# ricostruito resta nella cache del worker della coda e i processi web lo aggiornano entro HOME_TTL
+HOME_TTL = 300
+HOME_RITARDO_SECONDI = 2
+
+# Ogni quanti secondi un worker controlla se categorie e brand in cache sono cambiati, e dopo
+# quanti secondi li ricarica comunque: senza Redis la cache è per processo e le modifiche
+# fatte da un altro worker arrivano solo con questa scadenza (vedi baitboost/generazioni.py)
+RIFERIMENTI_CONTROLLO_SECONDI = 1
+RIFERIMENTI_ETA_MASSIMA_SECONDI = 60
+
+# Token API (vedi autenticazione/tokens.py): durata della verifica in cache,
+# voci massime della cache per processo e validità di default dei nuovi token
+TOKEN_CACHE_SECONDI = 60
+TOKEN_CACHE_MASSIMO = 10000
+TOKEN_DURATA_GIORNI = 90
+
+# Coda dei compiti in background (comando esegui_compiti)
+COMPITI_CONCORRENZA = 4
+COMPITI_INTERVALLO_POLLING = 1
+# Un compito in esecuzione da più di questi secondi è considerato interrotto
+COMPITI_TIMEOUT_SECONDI = 600
+COMPITI_INTERVALLO_MANUTENZIONE = 60
+COMPITI_INTERVALLO_METRICHE = 60
+COMPITI_CONSERVAZIONE_GIORNI = 7
+
+# Attesa prima di notificare i ribassi, per raccogliere le variazioni in un solo compito
+RIBASSI_RITARDO_SECONDI = 60
+
+# Storico prezzi (vedi prodotti/prezzi.py): giorni del prezzo minimo mostrato con gli
+# sconti e attesa prima della compattazione accodata dalle variazioni
+PREZZO_MINIMO_GIORNI = 30
+STORICO_PREZZI_COMPATTAZIONE_SECONDI = 3600
+
+# Conteggio delle visite (vedi prodotti/popolarita.py): secondi e prodotti distinti
+# dopo i quali un worker scrive i conteggi in memoria, giorni di visite conservati
+VISITE_INTERVALLO_SECONDI = 30
+VISITE_MASSIMO_BUFFER = 1000
+VISITE_CONSERVAZIONE_GIORNI = 90
+
+# Popolarità: giorni di visite considerati, giorni dopo i quali una visita vale la metà,
+# peso di un clic rispetto a una visualizzazione e attesa prima del ricalcolo
+POPOLARITA_FINESTRA_GIORNI = 60
+POPOLARITA_EMIVITA_GIORNI = 7
+POPOLARITA_PESO_CLIC = 3
+POPOLARITA_RITARDO_SECONDI = 300
+
+# Promozioni (vedi carrello/promozioni.py): ogni quanti secondi un worker controlla se
+# le regole sono cambiate, dopo quanti secondi ricompila comunque (modifiche fatte da un
+# altro worker senza cache condivisa) e righe massime di un carrello da prezzare
+PROMOZIONI_CONTROLLO_SECONDI = 5
+PROMOZIONI_ETA_MASSIMA_SECONDI = 60
+CARRELLO_MASSIMO_RIGHE = 100
+
+# Feed delle modifiche: le modifiche più recenti di questi secondi compaiono alla richiesta successiva
+FEED_MARGINE_SECONDI = 2
+# Giorni di conservazione delle tracce delle eliminazioni e attesa prima della pulizia
+# accodata da un'eliminazione: un cursore più vecchio riceve ricarica=True e il client
+# deve rileggere il catalogo completo, perché alcune eliminazioni non sono più nel feed
+FEED_ELIMINAZIONI_CONSERVAZIONE_GIORNI = 30
+FEED_ELIMINAZIONI_PULIZIA_SECONDI = 3600
+
+# Caricamento a parti delle immagini: dimensione massima di una parte e del file,
+# ore dopo le quali un caricamento fermo viene annullato
+CARICAMENTI_DIMENSIONE_PARTE = 5 * 1024 * 1024
+CARICAMENTI_DIMENSIONE_MASSIMA = 50 * 1024 * 1024
+CARICAMENTI_SCADENZA_ORE = 24
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = DEBUG  # In development allow all origins
 CORS_ALLOWED_ORIGINS = [
@@ -0,0 +1,47 @@
+"""
+Profilo di produzione per le installazioni piccole che restano su SQLite.
+
+Con il journal di default (DELETE) una scrittura blocca tutte le letture e le
+transazioni "deferred" che passano da lettura a scrittura falliscono subito con
+"database is locked". Il profilo attiva il WAL (letture e scritture concorrenti),
+un busy timeout e le transazioni IMMEDIATE, che prendono il lock di scrittura
+all'inizio della transazione invece che a metà.
+"""
+
+# PRAGMA applicati a ogni nuova connessione
+PRAGMA_PRODUZIONE = {
+    'journal_mode': 'WAL',
+    # Con il WAL NORMAL è sicuro contro la corruzione e molto più veloce di FULL
+    'synchronous': 'NORMAL',
+    # 256 MB di file mappato in memoria per le letture
+    'mmap_size': 268435456,
+    # Valore negativo = dimensione in KiB (64 MB di cache per connessione)
+    'cache_size': -64000,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
+# Secondi di attesa del driver sqlite3 prima di rinunciare a un lock
+TIMEOUT_SECONDI = 5
+
+
+def init_command(pragma=None):
+    """Restituisce i PRAGMA nel formato atteso da OPTIONS['init_command']"""
+    pragma = PRAGMA_PRODUZIONE if pragma is None else pragma
+    return ';'.join(f'PRAGMA {nome}={valore}' for nome, valore in pragma.items())
+
+
+def opzioni_produzione():
+    """Restituisce le OPTIONS da usare in DATABASES per il profilo di produzione"""
+    return {
+        'init_command': init_command(),
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': TIMEOUT_SECONDI,
+    }
+
+
+def applica_pragma(connessione, pragma=None):
+    """Applica i PRAGMA a una connessione sqlite3 aperta fuori da Django"""
+    pragma = PRAGMA_PRODUZIONE if pragma is None else pragma
+    for nome, valore in pragma.items():
+        connessione.execute(f'PRAGMA {nome}={valore}')
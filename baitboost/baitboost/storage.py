@@ -0,0 +1,92 @@
+"""
+Storage dei media indirizzato per contenuto.
+
+Il nome di ogni file è lo SHA-256 del contenuto (``contenuti/ab/cd/<hash>.<ext>``):
+la stessa foto caricata per più prodotti occupa spazio una sola volta e il suo
+URL non cambia mai, quindi i client possono metterlo in cache senza scadenza.
+I riferimenti dei modelli ai file sono contati in ``prodotti.BlobMedia`` e i
+file non più usati vengono eliminati dal comando ``pulisci_media``.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage, storages
+
+CARTELLA_CONTENUTI = 'contenuti'
+
+# Oltre questa dimensione i file non riavvolgibili vengono appoggiati su disco durante l'hash
+DIMENSIONE_SPOOL = 8 * 1024 * 1024
+
+
+def nome_da_hash(impronta, nome_originale):
+    estensione = os.path.splitext(nome_originale)[1].lower()
+    return f'{CARTELLA_CONTENUTI}/{impronta[:2]}/{impronta[2:4]}/{impronta}{estensione}'
+
+
+class ContenutoIndirizzatoMixin:
+    """
+    Mixin per qualsiasi storage Django: salva i file con il nome derivato dal contenuto
+    e non riscrive un file già presente.
+    """
+
+    def _prepara(self, content):
+        """
+        Calcola lo SHA-256 del contenuto.
+
+        Returns:
+            tuple: (impronta esadecimale, file da salvare riavvolto all'inizio).
+        """
+        impronta = hashlib.sha256()
+        if content.seekable():
+            for blocco in content.chunks():
+                impronta.update(blocco)
+            content.seek(0)
+            return impronta.hexdigest(), content
+        # Reason: un flusso non riavvolgibile (es. l'assemblaggio dei caricamenti a parti)
+        # si legge una volta sola, la copia temporanea resta in memoria solo se piccola
+        copia = tempfile.SpooledTemporaryFile(max_size=DIMENSIONE_SPOOL)
+        for blocco in content.chunks():
+            impronta.update(blocco)
+            copia.write(blocco)
+        copia.seek(0)
+        return impronta.hexdigest(), File(copia, name=content.name)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        impronta, sorgente = self._prepara(content)
+        nome = nome_da_hash(impronta, name)
+        if not self.exists(nome):
+            salvato = super().save(nome, sorgente, max_length=max_length)
+            # Due salvataggi paralleli dello stesso contenuto: lo storage ha
+            # creato una copia con un suffisso, che è superflua
+            if salvato != nome:
+                self.delete(salvato)
+        from prodotti.media import registra_blob
+        # Reason: lo storage non conosce il modello che salva il file, il blob va sul
+        # database del router e i segnali lo registrano anche su quello del modello
+        registra_blob(nome, content.size)
+        return nome
+
+
+class ContenutoIndirizzatoStorage(ContenutoIndirizzatoMixin, FileSystemStorage):
+    """Storage indirizzato per contenuto sul filesystem locale (MEDIA_ROOT)"""
+
+
+try:
+    from storages.backends.s3 import S3Storage
+except ImportError:  # django-storages/boto3 non installati
+    S3Storage = None
+
+if S3Storage is not None:
+    class ContenutoIndirizzatoS3Storage(ContenutoIndirizzatoMixin, S3Storage):
+        """Storage indirizzato per contenuto su S3 tramite django-storages"""
+
+
+def storage_contenuti():
+    """Storage usato dai campi immagine dei modelli, configurato in STORAGES['contenuti']"""
+    return storages['contenuti']
@@ -14,16 +14,24 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
-from django.conf.urls.static import static
+
+from .media import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('prodotti.urls')),  # Include le URLs dei prodotti
+    path('', include('utenti.urls')),  # Include le URLs degli utenti (wishlist)
+    path('', include('carrello.urls')),  # Include le URLs del carrello (prezzi e promozioni)
 ]
 
-# Configurazione per servire i file media durante lo sviluppo
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# File media serviti anche in produzione (range, cache, invio delegato al proxy: vedi baitboost/media.py).
+# Con uno storage remoto (es. S3) MEDIA_URL è un URL assoluto e i file non passano da qui
+if settings.MEDIA_URL.startswith('/'):
+    urlpatterns += [
+        re_path(rf'^{re.escape(settings.MEDIA_URL.lstrip("/"))}(?P<percorso>.+)$', serve_media, name='media'),
+    ]
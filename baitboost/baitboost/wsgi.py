@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'baitboost.settings')
 
 application = get_wsgi_application()
+
+# Prepara gli indici in memoria prima di servire la prima richiesta
+from prodotti.warmup import riscalda_worker  # noqa: E402
+
+riscalda_worker()
@@ -1,3 +1,25 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Promozione
+
+
+@admin.register(Promozione)
+class PromozioneAdmin(admin.ModelAdmin):
+    list_display = [
+        'nome', 'codice_coupon', 'tipo_sconto', 'valore', 'brand', 'categoria', 'tipo_prodotto',
+        'attiva', 'data_inizio', 'data_fine'
+    ]
+    list_filter = ['attiva', 'tipo_sconto', 'tipo_prodotto']
+    list_select_related = ['brand', 'categoria']
+    search_fields = ['nome', 'codice_coupon']
+    readonly_fields = ['data_creazione', 'data_aggiornamento']
+    fieldsets = (
+        (None, {'fields': ('nome', 'codice_coupon', 'attiva')}),
+        ('Sconto', {'fields': ('tipo_sconto', 'valore')}),
+        ('Prodotti coinvolti', {
+            'fields': ('brand', 'categoria', 'tipo_prodotto', 'specifiche'),
+            'description': 'I criteri indicati devono valere tutti; nessun criterio = tutto il catalogo',
+        }),
+        ('Validità', {'fields': ('data_inizio', 'data_fine')}),
+        ('Date', {'fields': ('data_creazione', 'data_aggiornamento'), 'classes': ('collapse',)}),
+    )
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CarrelloConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'carrello'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,145 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from carrello.models import Promozione
+from carrello.promozioni import IndicePromozioni, Regola
+from prodotti.models import Categoria, Mulinello, Canna, Esca, SchedaProdotto
+
+# Valori delle specifiche usati nelle regole e nei prodotti sintetici
+VALORI_SPECIFICHE = {
+    SchedaProdotto.TIPO_MULINELLO: ('tipo_mulinello', Mulinello._meta.get_field('tipo_mulinello').choices),
+    SchedaProdotto.TIPO_CANNA: ('tipo_canna', Canna._meta.get_field('tipo_canna').choices),
+    SchedaProdotto.TIPO_ESCA: ('tipo_esca', Esca._meta.get_field('tipo_esca').choices),
+}
+TIPI = [SchedaProdotto.TIPO_PRODOTTO, *VALORI_SPECIFICHE]
+
+
+class Command(BaseCommand):
+    """
+    Misura compilazione e valutazione delle promozioni con migliaia di regole attive,
+    confrontando l'indice per brand, categoria e sottotipo con la valutazione di tutte
+    le regole su ogni riga. Regole, categorie e prodotti sono sintetici e non salvati:
+    il comando non scrive nel database e non misura la query delle schede.
+    """
+    help = 'Confronta il motore delle promozioni indicizzato con la valutazione di tutte le regole'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--regole', type=int, default=5000, help='Promozioni attive')
+        parser.add_argument('--brand', type=int, default=300, help='Brand distinti')
+        parser.add_argument('--categorie', type=int, default=120, help='Categorie distinte (in un albero)')
+        parser.add_argument('--righe', type=int, default=50, help='Righe per carrello')
+        parser.add_argument('--carrelli', type=int, default=200, help='Carrelli prezzati per misura')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        casuale = random.Random(options['seed'])
+        categorie = self._categorie(options['categorie'], casuale)
+        regole = [self._promozione(i, options, casuale) for i in range(options['regole'])]
+
+        inizio = time.perf_counter()
+        indice = IndicePromozioni(regole, categorie, timezone.now())
+        compilazione = (time.perf_counter() - inizio) * 1000
+        self.stdout.write(
+            f'{indice.regole} regole compilate in {compilazione:.1f} ms, '
+            f'{len(indice.per_chiave)} chiavi, {len(indice.coupon)} coupon'
+        )
+
+        carrelli = [
+            [self._scheda(options, casuale) for _ in range(options['righe'])]
+            for _ in range(options['carrelli'])
+        ]
+        discendenti = IndicePromozioni._discendenti(categorie)
+        tutte = [
+            Regola(regola, frozenset(discendenti[regola.categoria_id]) if regola.categoria_id else None)
+            for regola in regole if not regola.codice_coupon
+        ]
+
+        indicizzato, risultati_indice = self._misura(carrelli, lambda scheda, prezzo: indice.migliore(scheda, prezzo))
+        completo, risultati_completi = self._misura(carrelli, lambda scheda, prezzo: self._tutte(tutte, scheda, prezzo))
+        if [sconto for _, sconto in risultati_indice] != [sconto for _, sconto in risultati_completi]:
+            self.stderr.write(self.style.ERROR('I due metodi danno sconti diversi'))
+
+        righe = options['righe']
+        candidate = statistics.mean(len(indice.candidate(scheda)) for carrello in carrelli for scheda in carrello)
+        self.stdout.write(
+            f'Carrello da {righe} righe: indice {indicizzato:.0f} µs '
+            f'({candidate:.1f} regole candidate per riga), tutte le regole {completo:.0f} µs '
+            f'({completo / indicizzato:.0f}x)'
+        )
+
+    def _categorie(self, numero, casuale):
+        categorie = {}
+        for pk in range(1, numero + 1):
+            # Le prime dieci sono radici, le altre figlie di una categoria precedente
+            parent_id = casuale.randint(1, pk - 1) if pk > 10 else None
+            categorie[pk] = Categoria(pk=pk, nome=f'Categoria {pk}', parent_id=parent_id)
+        return categorie
+
+    def _promozione(self, numero, options, casuale):
+        """Regole per brand (55%), per categoria (40%), per sottotipo (4,5%) o su tutto il catalogo"""
+        ambito = casuale.random()
+        brand_id = categoria_id = None
+        tipo, specifiche = '', {}
+        if ambito < 0.55:
+            brand_id = casuale.randint(1, options['brand'])
+        elif ambito < 0.95:
+            categoria_id = casuale.randint(1, options['categorie'])
+        if ambito < 0.995 and (ambito >= 0.95 or casuale.random() < 0.3):
+            tipo = casuale.choice(TIPI)
+            if tipo in VALORI_SPECIFICHE and casuale.random() < 0.5:
+                campo, scelte = VALORI_SPECIFICHE[tipo]
+                specifiche = {campo: casuale.choice(scelte)[0]}
+        percentuale = casuale.random() < 0.7
+        return Promozione(
+            pk=numero + 1,
+            nome=f'Promozione {numero}',
+            codice_coupon=f'COUPON{numero}' if casuale.random() < 0.1 else None,
+            tipo_sconto=Promozione.SCONTO_PERCENTUALE if percentuale else Promozione.SCONTO_IMPORTO,
+            valore=Decimal(casuale.randint(5, 40)) if percentuale else Decimal(casuale.randint(1, 20)),
+            brand_id=brand_id,
+            categoria_id=categoria_id,
+            tipo_prodotto=tipo,
+            specifiche=specifiche,
+        )
+
+    def _scheda(self, options, casuale):
+        tipo = casuale.choice(TIPI)
+        specifiche = {}
+        if tipo in VALORI_SPECIFICHE:
+            campo, scelte = VALORI_SPECIFICHE[tipo]
+            specifiche = {campo: casuale.choice(scelte)[0]}
+        return SchedaProdotto(
+            prodotto_id=casuale.randint(1, 10 ** 6),
+            tipo=tipo,
+            brand_id=casuale.randint(1, options['brand']),
+            categoria_id=casuale.randint(1, options['categorie']),
+            specifiche=specifiche,
+            prezzo=Decimal(casuale.randint(10, 500)),
+        )
+
+    @staticmethod
+    def _tutte(regole, scheda, prezzo):
+        """Valutazione senza indice: ogni regola su ogni riga"""
+        migliore, sconto_migliore = None, Decimal(0)
+        for regola in regole:
+            if regola.si_applica(scheda):
+                sconto = regola.sconto(prezzo)
+                if sconto > sconto_migliore:
+                    migliore, sconto_migliore = regola, sconto
+        return migliore, sconto_migliore
+
+    @staticmethod
+    def _misura(carrelli, valuta):
+        """Mediana in microsecondi per carrello e risultati di tutte le righe"""
+        durate, risultati = [], []
+        for carrello in carrelli:
+            inizio = time.perf_counter()
+            parziali = [valuta(scheda, scheda.prezzo) for scheda in carrello]
+            durate.append((time.perf_counter() - inizio) * 1000000)
+            risultati += parziali
+        return statistics.median(durate), risultati
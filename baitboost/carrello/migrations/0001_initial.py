@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('prodotti', '0011_storicoprezzo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Promozione',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=200)),
+                ('codice_coupon', models.CharField(blank=True, help_text='Se indicato la promozione vale solo con questo coupon', max_length=50, null=True, unique=True)),
+                ('tipo_sconto', models.CharField(choices=[('percentuale', 'Percentuale'), ('importo', 'Importo fisso per unità')], default='percentuale', max_length=20)),
+                ('valore', models.DecimalField(decimal_places=2, help_text='Percentuale o importo in euro', max_digits=10)),
+                ('tipo_prodotto', models.CharField(blank=True, choices=[('prodotto', 'Prodotto'), ('mulinello', 'Mulinello'), ('canna', 'Canna'), ('esca', 'Esca')], help_text='Sottotipo di prodotto (vuoto = tutti)', max_length=20)),
+                ('specifiche', models.JSONField(blank=True, default=dict, help_text='Valori richiesti delle specifiche del sottotipo, es. {"tipo_esca": "ARTIFICIALE"}')),
+                ('attiva', models.BooleanField(default=True)),
+                ('data_inizio', models.DateTimeField(blank=True, null=True)),
+                ('data_fine', models.DateTimeField(blank=True, null=True)),
+                ('data_creazione', models.DateTimeField(auto_now_add=True)),
+                ('data_aggiornamento', models.DateTimeField(auto_now=True)),
+                ('brand', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='promozioni', to='prodotti.brand')),
+                ('categoria', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='promozioni', to='prodotti.categoria')),
+            ],
+            options={
+                'verbose_name': 'Promozione',
+                'verbose_name_plural': 'Promozioni',
+                'ordering': ['-data_creazione'],
+                'indexes': [models.Index(condition=models.Q(('attiva', True)), fields=['data_fine'], name='promozione_attiva_idx')],
+            },
+        ),
+    ]
@@ -1,3 +1,92 @@
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import Q
 
-# Create your models here.
+from prodotti.models import Brand, Categoria, SchedaProdotto
+from prodotti.schede import SPECIFICHE
+
+# Valori ammessi nelle specifiche di una promozione: confrontati per uguaglianza con
+# quelli delle schede e usati come chiave dell'indice, quindi scalari
+TIPI_VALORE_SPECIFICA = (str, int, float, bool)
+
+
+class Promozione(models.Model):
+    """
+    Regola di sconto sui prodotti di un brand, di una categoria (sottocategorie comprese)
+    e/o di un sottotipo, eventualmente ristretta a valori delle specifiche del sottotipo
+    (es. esche con ``{"tipo_esca": "ARTIFICIALE"}``). Con un codice coupon la regola vale
+    solo nei carrelli che lo indicano. Le regole attive vengono compilate in un indice
+    in memoria (vedi carrello/promozioni.py).
+    """
+    SCONTO_PERCENTUALE = 'percentuale'
+    SCONTO_IMPORTO = 'importo'
+    TIPI_SCONTO = [
+        (SCONTO_PERCENTUALE, 'Percentuale'),
+        (SCONTO_IMPORTO, 'Importo fisso per unità'),
+    ]
+
+    nome = models.CharField(max_length=200)
+    codice_coupon = models.CharField(
+        max_length=50, unique=True, blank=True, null=True,
+        help_text='Se indicato la promozione vale solo con questo coupon'
+    )
+    tipo_sconto = models.CharField(max_length=20, choices=TIPI_SCONTO, default=SCONTO_PERCENTUALE)
+    valore = models.DecimalField(max_digits=10, decimal_places=2, help_text='Percentuale o importo in euro')
+
+    # Ambito: i criteri indicati devono valere tutti, nessun criterio = tutto il catalogo
+    brand = models.ForeignKey(Brand, on_delete=models.CASCADE, blank=True, null=True, related_name='promozioni')
+    categoria = models.ForeignKey(
+        Categoria, on_delete=models.CASCADE, blank=True, null=True, related_name='promozioni'
+    )
+    tipo_prodotto = models.CharField(
+        max_length=20, choices=SchedaProdotto._meta.get_field('tipo').choices, blank=True,
+        help_text='Sottotipo di prodotto (vuoto = tutti)'
+    )
+    specifiche = models.JSONField(
+        default=dict, blank=True,
+        help_text='Valori richiesti delle specifiche del sottotipo, es. {"tipo_esca": "ARTIFICIALE"}'
+    )
+
+    attiva = models.BooleanField(default=True)
+    data_inizio = models.DateTimeField(blank=True, null=True)
+    data_fine = models.DateTimeField(blank=True, null=True)
+    data_creazione = models.DateTimeField(auto_now_add=True)
+    data_aggiornamento = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Promozione'
+        verbose_name_plural = 'Promozioni'
+        ordering = ['-data_creazione']
+        indexes = [
+            # Caricamento delle regole attive per la compilazione dell'indice
+            models.Index(fields=['data_fine'], name='promozione_attiva_idx', condition=Q(attiva=True)),
+        ]
+
+    def __str__(self):
+        return self.nome
+
+    def clean(self):
+        if self.valore is not None and self.valore <= 0:
+            raise ValidationError({'valore': 'Il valore deve essere positivo'})
+        if self.tipo_sconto == self.SCONTO_PERCENTUALE and self.valore is not None and self.valore > 100:
+            raise ValidationError({'valore': 'La percentuale non può superare 100'})
+        if self.data_inizio and self.data_fine and self.data_fine <= self.data_inizio:
+            raise ValidationError({'data_fine': 'La fine deve seguire l\'inizio'})
+        if self.specifiche:
+            if not isinstance(self.specifiche, dict):
+                raise ValidationError({'specifiche': 'Indicare un oggetto campo: valore'})
+            non_scalari = sorted(
+                campo for campo, valore in self.specifiche.items()
+                if not isinstance(valore, TIPI_VALORE_SPECIFICA)
+            )
+            if non_scalari:
+                raise ValidationError({'specifiche': (
+                    f"Indicare un solo valore (testo, numero o booleano) per: {', '.join(non_scalari)}"
+                )})
+            consentiti = SPECIFICHE.get(self.tipo_prodotto, [])
+            sconosciuti = set(self.specifiche) - set(consentiti)
+            if sconosciuti:
+                raise ValidationError({'specifiche': (
+                    f"Campi non disponibili per il sottotipo: {', '.join(sorted(sconosciuti))}. "
+                    f"Consentiti: {', '.join(consentiti) or 'nessuno (indicare il sottotipo)'}"
+                )})
@@ -0,0 +1,356 @@
+"""
+Motore delle promozioni e dei coupon.
+
+Le promozioni attive vengono compilate in un indice in memoria del processo: ogni
+regola sta sotto la chiave più selettiva che la riguarda (brand, poi ogni categoria
+coperta comprese le sottocategorie, poi sottotipo con il valore di una specifica,
+poi sottotipo, altrimenti tutto il catalogo). Per un prodotto bastano pochi accessi
+a dizionario per trovare le regole candidate, qualunque sia il numero di regole
+attive; i criteri restanti si controllano solo su quelle. I coupon sono indicizzati per codice.
+
+Il prezzo di un carrello costa una query (le schede dei prodotti, senza join) e un
+passaggio sulle righe; ``prezzi_promozionali`` fa lo stesso per una pagina di lista.
+Per ogni riga vale la promozione automatica più conveniente; il coupon, se si
+applica alla riga, si somma sul prezzo già scontato.
+
+L'indice si ricompila quando una promozione cambia (contatore di generazione nella
+cache condivisa, letto al massimo ogni PROMOZIONI_CONTROLLO_SECONDI, e comunque dopo
+PROMOZIONI_ETA_MASSIMA_SECONDI: vedi baitboost/generazioni.py), quando cambiano le
+categorie e quando una regola inizia o finisce.
+"""
+import logging
+import threading
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from baitboost.generazioni import GenerazioneCondivisa
+
+from prodotti.models import SchedaProdotto
+from prodotti.riferimenti import riferimenti
+
+from .models import TIPI_VALORE_SPECIFICA, Promozione
+
+logger = logging.getLogger(__name__)
+
+CHIAVE_GENERAZIONE = 'carrello:promozioni:generazione'
+CENTESIMO = Decimal('0.01')
+CENTO = Decimal(100)
+
+TUTTI = ('tutti',)
+
+
+def arrotonda(importo):
+    return importo.quantize(CENTESIMO, rounding=ROUND_HALF_UP)
+
+
+def normalizza_codice(codice):
+    return (codice or '').strip().upper()
+
+
+class Regola:
+    """Promozione compilata: solo i dati che servono a valutarla"""
+    __slots__ = ('id', 'nome', 'percentuale', 'valore', 'brand_id', 'categorie', 'tipo', 'specifiche', 'fine')
+
+    def __init__(self, promozione, categorie):
+        self.id = promozione.pk
+        self.nome = promozione.nome
+        self.percentuale = promozione.tipo_sconto == Promozione.SCONTO_PERCENTUALE
+        self.valore = promozione.valore
+        self.brand_id = promozione.brand_id
+        self.categorie = categorie
+        self.tipo = promozione.tipo_prodotto or None
+        self.specifiche = self._specifiche(promozione.specifiche)
+        self.fine = promozione.data_fine
+
+    @staticmethod
+    def _specifiche(specifiche):
+        """
+        Coppie (campo, valore) richieste.
+
+        Raises:
+            ValueError: se le specifiche non sono un oggetto di valori scalari (dati
+                salvati senza passare da ``Promozione.clean``).
+        """
+        if not specifiche:
+            return ()
+        if not isinstance(specifiche, dict) or not all(
+            isinstance(valore, TIPI_VALORE_SPECIFICA) for valore in specifiche.values()
+        ):
+            raise ValueError(f'Specifiche non valide: {specifiche!r}')
+        return tuple(specifiche.items())
+
+    def si_applica(self, scheda):
+        return (
+            (self.brand_id is None or self.brand_id == scheda.brand_id)
+            and (self.categorie is None or scheda.categoria_id in self.categorie)
+            and (self.tipo is None or self.tipo == scheda.tipo)
+            and (not self.specifiche or all(scheda.specifiche.get(campo) == valore for campo, valore in self.specifiche))
+        )
+
+    def sconto(self, prezzo):
+        """Sconto unitario sul prezzo indicato, mai oltre il prezzo stesso"""
+        if self.percentuale:
+            return arrotonda(prezzo * self.valore / CENTO)
+        return min(self.valore, prezzo)
+
+
+class IndicePromozioni:
+    """
+    Regole attive compilate in un certo istante.
+
+    Sotto ogni chiave le regole che non hanno altri criteri oltre a quello della chiave
+    (es. "-20% su tutto il brand X") si riducono alla percentuale e all'importo più alti:
+    per un dato prezzo lo sconto migliore è sempre uno dei due. Solo le regole con criteri
+    aggiuntivi restano in elenco e vanno verificate sul prodotto.
+    """
+
+    def __init__(self, promozioni, categorie, adesso):
+        self.per_chiave = defaultdict(list)
+        self.migliori = {}
+        self.coupon = {}
+        self.regole = 0
+        # Primo istante in cui una regola inizia o finisce: da lì l'indice va ricompilato
+        self.scadenza = None
+        discendenti = self._discendenti(categorie)
+        for promozione in promozioni:
+            confini = [data for data in (promozione.data_inizio, promozione.data_fine) if data and data > adesso]
+            if confini:
+                self.scadenza = min([self.scadenza, *confini]) if self.scadenza else min(confini)
+            if promozione.data_inizio and promozione.data_inizio > adesso:
+                continue
+            coperte = None
+            if promozione.categoria_id is not None:
+                coperte = frozenset(discendenti.get(promozione.categoria_id, (promozione.categoria_id,)))
+            try:
+                regola = Regola(promozione, coperte)
+            except ValueError as errore:
+                # Reason: una regola malformata non deve bloccare i prezzi di tutto il catalogo
+                logger.error('Promozione %s ignorata: %s', promozione.pk, errore)
+                continue
+            self.regole += 1
+            if promozione.codice_coupon:
+                self.coupon[normalizza_codice(promozione.codice_coupon)] = regola
+            elif regola.brand_id is not None:
+                completa = coperte is None and regola.tipo is None and not regola.specifiche
+                self._aggiungi(('brand', regola.brand_id), regola, completa)
+            elif coperte is not None:
+                for id_categoria in coperte:
+                    self._aggiungi(
+                        ('categoria', id_categoria), regola, regola.tipo is None and not regola.specifiche
+                    )
+            elif regola.tipo is not None and regola.specifiche:
+                campo, valore = regola.specifiche[0]
+                self._aggiungi(
+                    ('specifica', regola.tipo, campo, valore), regola, len(regola.specifiche) == 1
+                )
+            elif regola.tipo is not None:
+                self._aggiungi(('tipo', regola.tipo), regola, True)
+            else:
+                self._aggiungi(TUTTI, regola, True)
+        self.migliori = {chiave: tuple(per_tipo.values()) for chiave, per_tipo in self.migliori.items()}
+
+    def _aggiungi(self, chiave, regola, completa):
+        if not completa:
+            self.per_chiave[chiave].append(regola)
+            return
+        per_tipo = self.migliori.setdefault(chiave, {})
+        attuale = per_tipo.get(regola.percentuale)
+        if attuale is None or regola.valore > attuale.valore:
+            per_tipo[regola.percentuale] = regola
+
+    @staticmethod
+    def _discendenti(categorie):
+        """id categoria -> id della categoria e di tutte le sue sottocategorie"""
+        figli = defaultdict(list)
+        for categoria in categorie.values():
+            if categoria.parent_id is not None:
+                figli[categoria.parent_id].append(categoria.pk)
+        discendenti = {}
+        for id_categoria in categorie:
+            raccolte, da_visitare = set(), [id_categoria]
+            while da_visitare:
+                corrente = da_visitare.pop()
+                if corrente not in raccolte:
+                    raccolte.add(corrente)
+                    da_visitare.extend(figli[corrente])
+            discendenti[id_categoria] = raccolte
+        return discendenti
+
+    @staticmethod
+    def _chiavi(scheda):
+        chiavi = [('brand', scheda.brand_id), ('categoria', scheda.categoria_id), ('tipo', scheda.tipo), TUTTI]
+        chiavi += [('specifica', scheda.tipo, campo, valore) for campo, valore in scheda.specifiche.items()]
+        return chiavi
+
+    def candidate(self, scheda):
+        """Regole valutate per il prodotto: le migliori senza criteri aggiuntivi e quelle da verificare"""
+        candidate = []
+        for chiave in self._chiavi(scheda):
+            candidate += self.migliori.get(chiave, ())
+            candidate += self.per_chiave.get(chiave, ())
+        return candidate
+
+    def migliore(self, scheda, prezzo):
+        """(regola, sconto unitario) della promozione automatica più conveniente, o (None, 0)"""
+        migliore, sconto_migliore = None, Decimal(0)
+        for chiave in self._chiavi(scheda):
+            for regola in self.migliori.get(chiave, ()):
+                sconto = regola.sconto(prezzo)
+                if sconto > sconto_migliore:
+                    migliore, sconto_migliore = regola, sconto
+            for regola in self.per_chiave.get(chiave, ()):
+                if regola.si_applica(scheda):
+                    sconto = regola.sconto(prezzo)
+                    if sconto > sconto_migliore:
+                        migliore, sconto_migliore = regola, sconto
+        return migliore, sconto_migliore
+
+
+class CachePromozioni:
+    """Indice del processo, ricompilato quando cambiano le regole, le categorie o l'ora di validità"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indice = None
+        self._riferimenti = None
+        self.generazione = GenerazioneCondivisa(
+            CHIAVE_GENERAZIONE,
+            intervallo=lambda: settings.PROMOZIONI_CONTROLLO_SECONDI,
+            eta_massima=lambda: settings.PROMOZIONI_ETA_MASSIMA_SECONDI,
+        )
+
+    def compila(self):
+        """Carica le promozioni attive o future (una query) e ricostruisce l'indice"""
+        with self._lock:
+            generazione = self.generazione.leggi()
+            dati_riferimento = riferimenti.dati()
+            adesso = timezone.now()
+            promozioni = Promozione.objects.filter(attiva=True).filter(
+                Q(data_fine__isnull=True) | Q(data_fine__gt=adesso)
+            )
+            self._indice = IndicePromozioni(promozioni, dati_riferimento.categorie, adesso)
+            self._riferimenti = dati_riferimento
+            self.generazione.caricato(generazione)
+            return self._indice
+
+    def indice(self):
+        indice = self._indice
+        if indice is None or (indice.scadenza is not None and timezone.now() >= indice.scadenza):
+            return self.compila()
+        if self.generazione.da_ricaricare() or riferimenti.dati() is not self._riferimenti:
+            return self.compila()
+        return indice
+
+    def invalida(self):
+        """Segnala a tutti i processi che le promozioni sono cambiate"""
+        self.generazione.invalida()
+
+
+promozioni = CachePromozioni()
+
+
+def _prezzo_base(scheda):
+    if scheda.in_offerta and scheda.prezzo_scontato is not None:
+        return scheda.prezzo_scontato
+    return scheda.prezzo
+
+
+def _descrivi(regola):
+    return {'id': regola.id, 'nome': regola.nome, 'fine': regola.fine}
+
+
+def prezzi_promozionali(schede):
+    """
+    Promozione automatica migliore per ogni scheda di una lista (senza coupon).
+
+    Returns:
+        dict: id prodotto -> {'promozione', 'prezzo'}; assenti i prodotti senza promozioni.
+    """
+    indice = promozioni.indice()
+    risultato = {}
+    for scheda in schede:
+        prezzo = _prezzo_base(scheda)
+        regola, sconto = indice.migliore(scheda, prezzo)
+        if regola is not None:
+            risultato[scheda.prodotto_id] = {'promozione': _descrivi(regola), 'prezzo': prezzo - sconto}
+    return risultato
+
+
+def prezzi_promozionali_per_id(id_prodotti):
+    """Come ``prezzi_promozionali``, leggendo le schede dei prodotti indicati (una query)"""
+    return prezzi_promozionali(SchedaProdotto.objects.filter(prodotto_id__in=list(id_prodotti)))
+
+
+def prezza_carrello(righe, codice_coupon=None):
+    """
+    Calcola il prezzo di un carrello.
+
+    Args:
+        righe (list): tuple (id prodotto, quantità); gli id ripetuti si sommano.
+        codice_coupon (str): coupon indicato dal cliente, facoltativo.
+
+    Returns:
+        dict: righe con prezzo unitario, sconti e totale riga, prodotti non acquistabili,
+        esito del coupon e totali del carrello.
+    """
+    quantita = defaultdict(int)
+    for id_prodotto, numero in righe:
+        quantita[id_prodotto] += numero
+    indice = promozioni.indice()
+    codice = normalizza_codice(codice_coupon)
+    coupon = indice.coupon.get(codice) if codice else None
+
+    schede = {
+        scheda.prodotto_id: scheda
+        for scheda in SchedaProdotto.objects.filter(prodotto_id__in=list(quantita), in_vendita=True)
+    }
+    risultato_righe, non_disponibili = [], []
+    subtotale = sconto_totale = Decimal(0)
+    coupon_usato = False
+    for id_prodotto, numero in quantita.items():
+        scheda = schede.get(id_prodotto)
+        if scheda is None or scheda.quantita_disponibile < numero:
+            non_disponibili.append(id_prodotto)
+            continue
+        prezzo = _prezzo_base(scheda)
+        regola, sconto = indice.migliore(scheda, prezzo)
+        sconto_coupon = Decimal(0)
+        if coupon is not None and coupon.si_applica(scheda):
+            sconto_coupon = coupon.sconto(prezzo - sconto)
+            coupon_usato = coupon_usato or sconto_coupon > 0
+        unitario = prezzo - sconto - sconto_coupon
+        subtotale += prezzo * numero
+        sconto_totale += (sconto + sconto_coupon) * numero
+        risultato_righe.append({
+            'prodotto': id_prodotto,
+            'slug': scheda.slug,
+            'nome': scheda.nome,
+            'quantita': numero,
+            'prezzo_unitario': prezzo,
+            'promozione': _descrivi(regola) if regola else None,
+            'sconto_promozione': sconto,
+            'sconto_coupon': sconto_coupon,
+            'prezzo_finale': unitario,
+            'totale': unitario * numero,
+        })
+
+    if not codice:
+        esito_coupon = None
+    elif coupon is None:
+        esito_coupon = {'codice': codice, 'valido': False, 'messaggio': 'Coupon inesistente o scaduto'}
+    elif not coupon_usato:
+        esito_coupon = {'codice': codice, 'valido': False, 'messaggio': 'Nessun prodotto del carrello rientra nel coupon'}
+    else:
+        esito_coupon = {'codice': codice, 'valido': True, 'nome': coupon.nome}
+    return {
+        'righe': risultato_righe,
+        'non_disponibili': non_disponibili,
+        'coupon': esito_coupon,
+        'subtotale': subtotale,
+        'sconto': sconto_totale,
+        'totale': subtotale - sconto_totale,
+    }
@@ -0,0 +1,46 @@
+from django.conf import settings
+from rest_framework import serializers
+
+
+class RigaCarrelloSerializer(serializers.Serializer):
+    """Riga del carrello inviata dal client"""
+    prodotto = serializers.IntegerField(min_value=1)
+    quantita = serializers.IntegerField(min_value=1, max_value=999)
+
+
+class CarrelloSerializer(serializers.Serializer):
+    """Carrello da prezzare: righe ed eventuale coupon"""
+    righe = serializers.ListField(
+        child=RigaCarrelloSerializer(), min_length=1, max_length=settings.CARRELLO_MASSIMO_RIGHE
+    )
+    coupon = serializers.CharField(max_length=50, required=False, allow_blank=True)
+
+
+class PromozioneApplicataSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    nome = serializers.CharField()
+    fine = serializers.DateTimeField(allow_null=True)
+
+
+class RigaPrezzoSerializer(serializers.Serializer):
+    """Riga prezzata da carrello/promozioni.py"""
+    prodotto = serializers.IntegerField()
+    slug = serializers.SlugField()
+    nome = serializers.CharField()
+    quantita = serializers.IntegerField()
+    prezzo_unitario = serializers.DecimalField(max_digits=10, decimal_places=2)
+    promozione = PromozioneApplicataSerializer(allow_null=True)
+    sconto_promozione = serializers.DecimalField(max_digits=10, decimal_places=2)
+    sconto_coupon = serializers.DecimalField(max_digits=10, decimal_places=2)
+    prezzo_finale = serializers.DecimalField(max_digits=10, decimal_places=2)
+    totale = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+
+class PrezzoCarrelloSerializer(serializers.Serializer):
+    """Risultato del calcolo del prezzo del carrello"""
+    righe = RigaPrezzoSerializer(many=True)
+    non_disponibili = serializers.ListField(child=serializers.IntegerField())
+    coupon = serializers.DictField(allow_null=True)
+    subtotale = serializers.DecimalField(max_digits=12, decimal_places=2)
+    sconto = serializers.DecimalField(max_digits=12, decimal_places=2)
+    totale = serializers.DecimalField(max_digits=12, decimal_places=2)
@@ -0,0 +1,19 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from prodotti.home import programma_ricostruzione
+
+from .models import Promozione
+from .promozioni import promozioni
+
+
+@receiver(post_save, sender=Promozione)
+@receiver(post_delete, sender=Promozione)
+def invalida_promozioni(sender, using, **kwargs):
+    """
+    Fa ricompilare l'indice delle promozioni a tutti i worker dopo il commit della modifica
+    e ricostruire lo snapshot della home, che contiene i prezzi promozionali
+    """
+    transaction.on_commit(promozioni.invalida, using=using)
+    programma_ricostruzione(using=using)
@@ -0,0 +1,8 @@
+from django.urls import path
+
+from .views import PrezzoCarrelloView
+
+# Pattern URL per l'app carrello
+urlpatterns = [
+    path('api/carrello/prezzo/', PrezzoCarrelloView.as_view(), name='prezzo-carrello'),
+]
@@ -1,3 +1,23 @@
-from django.shortcuts import render
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from .promozioni import prezza_carrello
+from .serializers import CarrelloSerializer, PrezzoCarrelloSerializer
+
+
+class PrezzoCarrelloView(APIView):
+    """
+    API endpoint che calcola il prezzo di un carrello con promozioni e coupon
+    Uso: POST {"righe": [{"prodotto": 1, "quantita": 2}], "coupon": "ESTATE10"}
+    """
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        serializer = CarrelloSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        dati = serializer.validated_data
+        risultato = prezza_carrello(
+            [(riga['prodotto'], riga['quantita']) for riga in dati['righe']], dati.get('coupon')
+        )
+        return Response(PrezzoCarrelloSerializer(risultato).data)
@@ -0,0 +1,30 @@
+from django.contrib import admin, messages
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Compito
+
+
+@admin.register(Compito)
+class CompitoAdmin(admin.ModelAdmin):
+    list_display = ['id', 'nome', 'stato', 'priorita', 'tentativi', 'eseguibile_dal', 'durata_ms', 'data_creazione']
+    list_filter = ['stato', 'nome']
+    search_fields = ['nome', 'chiave_deduplica']
+    readonly_fields = ['preso_da', 'assegnazione', 'data_creazione', 'data_inizio', 'data_fine', 'durata_ms', 'errore']
+    show_full_result_count = False
+    actions = ['riaccoda']
+
+    @admin.action(description='Rimetti in coda i compiti selezionati')
+    def riaccoda(self, request, queryset):
+        try:
+            with transaction.atomic():
+                aggiornati = queryset.exclude(stato=Compito.STATO_IN_ESECUZIONE).update(
+                    stato=Compito.STATO_IN_ATTESA, tentativi=0, eseguibile_dal=timezone.now(),
+                    assegnazione=None, preso_da='', errore=''
+                )
+        except IntegrityError:
+            self.message_user(
+                request, 'Alcuni compiti hanno la stessa chiave di un compito già in attesa.', messages.ERROR
+            )
+            return
+        self.message_user(request, f'{aggiornati} compiti rimessi in coda.')
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class CodaConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'coda'
+
+    def ready(self):
+        # Registra i compiti dichiarati nei moduli compiti.py delle app
+        autodiscover_modules('compiti')
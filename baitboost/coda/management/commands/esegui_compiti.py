@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from coda.worker import MODALITA_PROCESSI, MODALITA_THREAD, Worker
+
+
+class Command(BaseCommand):
+    """
+    Worker della coda dei compiti. Resta in ascolto finché non riceve SIGTERM/SIGINT,
+    poi completa i compiti in esecuzione ed esce. Si possono avviare più worker.
+    """
+    help = 'Esegue i compiti in coda'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modalita', choices=[MODALITA_THREAD, MODALITA_PROCESSI], default=MODALITA_THREAD,
+                            help='Pool di thread (compiti di I/O) o di processi (compiti di CPU)')
+        parser.add_argument('--concorrenza', type=int, help='Compiti eseguiti in parallelo')
+        parser.add_argument('--intervallo', type=float, help='Secondi tra due controlli della coda vuota')
+        parser.add_argument('--una-volta', action='store_true',
+                            help='Esce quando la coda è vuota (es. da cron o nei deploy)')
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            concorrenza=options['concorrenza'],
+            modalita=options['modalita'],
+            intervallo=options['intervallo'],
+            una_volta=options['una_volta'],
+            scrivi=self.stdout.write,
+        )
+        self.stdout.write(f'Worker {worker.nome} avviato ({worker.modalita}, concorrenza {worker.concorrenza})')
+        riepilogo = worker.esegui()
+        self.stdout.write(self.style.SUCCESS(f'Worker terminato: {riepilogo}'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from coda.worker import statistiche_coda
+
+
+class Command(BaseCommand):
+    """Mostra quanti compiti ci sono per stato e da quanto aspetta il più vecchio"""
+    help = 'Mostra lo stato della coda dei compiti'
+
+    def handle(self, *args, **options):
+        statistiche = statistiche_coda()
+        for stato, totale in statistiche['per_stato'].items():
+            self.stdout.write(f'{stato}: {totale}')
+        self.stdout.write(f"Attesa massima: {statistiche['attesa_massima_secondi']} s")
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Compito',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(help_text='Nome registrato del compito', max_length=200)),
+                ('argomenti', models.JSONField(blank=True, default=dict, help_text='args e kwargs della chiamata')),
+                ('priorita', models.PositiveSmallIntegerField(default=5)),
+                ('stato', models.CharField(choices=[('in_attesa', 'In attesa'), ('in_esecuzione', 'In esecuzione'), ('completato', 'Completato'), ('fallito', 'Fallito')], default='in_attesa', max_length=20)),
+                ('chiave_deduplica', models.CharField(blank=True, help_text='Un solo compito in attesa per chiave: gli accodamenti successivi lo riusano', max_length=200, null=True)),
+                ('tentativi', models.PositiveSmallIntegerField(default=0)),
+                ('massimo_tentativi', models.PositiveSmallIntegerField(default=3)),
+                ('eseguibile_dal', models.DateTimeField(default=django.utils.timezone.now)),
+                ('preso_da', models.CharField(blank=True, max_length=100)),
+                ('assegnazione', models.UUIDField(blank=True, db_index=True, null=True)),
+                ('errore', models.TextField(blank=True)),
+                ('durata_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('data_creazione', models.DateTimeField(auto_now_add=True)),
+                ('data_inizio', models.DateTimeField(blank=True, null=True)),
+                ('data_fine', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Compito',
+                'verbose_name_plural': 'Compiti',
+                'ordering': ['-data_creazione'],
+                'indexes': [models.Index(condition=models.Q(('stato', 'in_attesa')), fields=['priorita', 'eseguibile_dal', 'id'], name='compito_prelievo_idx'), models.Index(condition=models.Q(('stato', 'in_esecuzione')), fields=['data_inizio'], name='compito_in_esecuzione_idx'), models.Index(fields=['stato', 'data_fine'], name='compito_stato_fine_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('stato', 'in_attesa')), fields=('chiave_deduplica',), name='compito_deduplica_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Compito(models.Model):
+    """
+    Compito in coda da eseguire in background dal comando ``esegui_compiti``.
+    La riga resta nella tabella anche a compito concluso, con esito, durata ed errore.
+    """
+    STATO_IN_ATTESA = 'in_attesa'
+    STATO_IN_ESECUZIONE = 'in_esecuzione'
+    STATO_COMPLETATO = 'completato'
+    STATO_FALLITO = 'fallito'
+    STATI = [
+        (STATO_IN_ATTESA, 'In attesa'),
+        (STATO_IN_ESECUZIONE, 'In esecuzione'),
+        (STATO_COMPLETATO, 'Completato'),
+        (STATO_FALLITO, 'Fallito'),
+    ]
+
+    # Valori più bassi vengono eseguiti prima
+    PRIORITA_ALTA = 0
+    PRIORITA_NORMALE = 5
+    PRIORITA_BASSA = 9
+
+    nome = models.CharField(max_length=200, help_text='Nome registrato del compito')
+    argomenti = models.JSONField(default=dict, blank=True, help_text='args e kwargs della chiamata')
+    priorita = models.PositiveSmallIntegerField(default=PRIORITA_NORMALE)
+    stato = models.CharField(max_length=20, choices=STATI, default=STATO_IN_ATTESA)
+    chiave_deduplica = models.CharField(
+        max_length=200, blank=True, null=True,
+        help_text='Un solo compito in attesa per chiave: gli accodamenti successivi lo riusano'
+    )
+    tentativi = models.PositiveSmallIntegerField(default=0)
+    massimo_tentativi = models.PositiveSmallIntegerField(default=3)
+    eseguibile_dal = models.DateTimeField(default=timezone.now)
+    # Worker e assegnazione che hanno preso in carico il compito
+    preso_da = models.CharField(max_length=100, blank=True)
+    assegnazione = models.UUIDField(null=True, blank=True, db_index=True)
+    errore = models.TextField(blank=True)
+    durata_ms = models.PositiveIntegerField(null=True, blank=True)
+    data_creazione = models.DateTimeField(auto_now_add=True)
+    data_inizio = models.DateTimeField(null=True, blank=True)
+    data_fine = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Compito'
+        verbose_name_plural = 'Compiti'
+        ordering = ['-data_creazione']
+        indexes = [
+            # Prelievo: solo i compiti in attesa, nell'ordine in cui vanno eseguiti
+            models.Index(
+                fields=['priorita', 'eseguibile_dal', 'id'], name='compito_prelievo_idx',
+                condition=Q(stato='in_attesa')
+            ),
+            # Recupero dei compiti rimasti in esecuzione dopo la morte di un worker
+            models.Index(
+                fields=['data_inizio'], name='compito_in_esecuzione_idx',
+                condition=Q(stato='in_esecuzione')
+            ),
+            models.Index(fields=['stato', 'data_fine'], name='compito_stato_fine_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['chiave_deduplica'], name='compito_deduplica_unico',
+                condition=Q(stato='in_attesa')
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.nome} #{self.pk} ({self.get_stato_display()})"
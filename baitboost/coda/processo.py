@@ -0,0 +1,16 @@
+"""
+Punti di ingresso dei processi del pool (modalità ``processi`` del worker).
+
+I processi partono con spawn e importano questo modulo prima che Django sia
+configurato: qui non si importano modelli a livello di modulo.
+"""
+
+
+def inizializza():
+    import django
+    django.setup()
+
+
+def esegui(id_compito):
+    from .worker import esegui_compito
+    return esegui_compito(id_compito)
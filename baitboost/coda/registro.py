@@ -0,0 +1,100 @@
+"""
+Registro dei compiti eseguibili in background e accodamento.
+
+Un compito è una funzione decorata con ``@compito`` in un modulo ``compiti.py``
+di un'app (i moduli vengono importati all'avvio da ``CodaConfig.ready``)::
+
+    @compito(priorita=Compito.PRIORITA_BASSA, massimo_tentativi=5)
+    def invia_email_ordine(id_ordine):
+        ...
+
+    invia_email_ordine.accoda(id_ordine, chiave=f'email-ordine-{id_ordine}')
+
+Il compito viene scritto nella stessa transazione della richiesta: se la
+transazione fallisce non resta in coda, e i worker lo vedono solo dopo il commit.
+Gli argomenti devono essere serializzabili in JSON (id, non istanze di modelli).
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Compito
+
+REGISTRO = {}
+
+
+class DefinizioneCompito:
+    """Funzione registrata come compito, con le sue opzioni di default"""
+
+    def __init__(self, funzione, nome, priorita, massimo_tentativi, attesa_base):
+        self.funzione = funzione
+        self.nome = nome
+        self.priorita = priorita
+        self.massimo_tentativi = massimo_tentativi
+        self.attesa_base = attesa_base
+        self.__doc__ = funzione.__doc__
+
+    def __call__(self, *args, **kwargs):
+        """Esegue il compito subito, nel processo corrente"""
+        return self.funzione(*args, **kwargs)
+
+    def attesa_tentativo(self, tentativo):
+        """Backoff esponenziale prima del tentativo successivo, al massimo un'ora"""
+        return min(self.attesa_base * 2 ** (tentativo - 1), 3600)
+
+    def accoda(self, *args, chiave=None, priorita=None, ritardo=0, using='default', **kwargs):
+        """
+        Accoda il compito.
+
+        Args:
+            chiave (str): chiave di deduplicazione; se c'è già un compito in attesa con
+                la stessa chiave non ne viene creato un altro e si restituisce quello.
+            priorita (int): sostituisce la priorità di default (valori bassi prima).
+            ritardo (int): secondi prima che il compito possa essere eseguito.
+
+        Returns:
+            Compito: il compito creato o quello già in attesa con la stessa chiave.
+        """
+        valori = {
+            'nome': self.nome,
+            'argomenti': {'args': list(args), 'kwargs': kwargs},
+            'priorita': self.priorita if priorita is None else priorita,
+            'massimo_tentativi': self.massimo_tentativi,
+            'eseguibile_dal': timezone.now() + timedelta(seconds=ritardo),
+            'chiave_deduplica': chiave,
+        }
+        if chiave is None:
+            return Compito.objects.using(using).create(**valori)
+        try:
+            with transaction.atomic(using=using):
+                return Compito.objects.using(using).create(**valori)
+        except IntegrityError:
+            esistente = Compito.objects.using(using).filter(
+                chiave_deduplica=chiave, stato=Compito.STATO_IN_ATTESA
+            ).first()
+            if esistente is None:
+                # Preso da un worker tra l'INSERT e la SELECT: ora la chiave è libera
+                return Compito.objects.using(using).create(**valori)
+            return esistente
+
+
+def compito(funzione=None, *, nome=None, priorita=Compito.PRIORITA_NORMALE, massimo_tentativi=3, attesa_base=10):
+    """
+    Decoratore che registra una funzione come compito.
+
+    Args:
+        nome (str): nome registrato, di default ``<modulo>.<funzione>``.
+        priorita (int): priorità di default (Compito.PRIORITA_*).
+        massimo_tentativi (int): esecuzioni prima di segnare il compito come fallito.
+        attesa_base (int): secondi di attesa prima del secondo tentativo, poi raddoppiano.
+    """
+    def registra(funzione):
+        nome_compito = nome or f'{funzione.__module__}.{funzione.__qualname__}'
+        definizione = DefinizioneCompito(funzione, nome_compito, priorita, massimo_tentativi, attesa_base)
+        REGISTRO[nome_compito] = definizione
+        return definizione
+
+    if funzione is not None:
+        return registra(funzione)
+    return registra
@@ -0,0 +1,347 @@
+"""
+Prelievo ed esecuzione dei compiti in coda.
+
+Il worker (comando ``esegui_compiti``) preleva i compiti in attesa in ordine di
+priorità e li esegue in un pool di thread o di processi. Il prelievo è sicuro
+con più worker in parallelo:
+- sui database con ``SELECT ... FOR UPDATE SKIP LOCKED`` (PostgreSQL) ogni worker
+  blocca solo le righe che prende e salta quelle già bloccate dagli altri;
+- su SQLite, che non ha lock di riga, il prelievo è un unico UPDATE con
+  sottoquery: la scrittura è serializzata dal lock del database e le righe
+  prese sono riconosciute da un UUID di assegnazione.
+I compiti rimasti in esecuzione oltre COMPITI_TIMEOUT_SECONDI (worker terminato
+a metà) tornano in attesa o falliscono se hanno finito i tentativi.
+"""
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+import uuid
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connections, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from . import processo
+from .models import Compito
+from .registro import REGISTRO
+
+logger = logging.getLogger(__name__)
+
+MODALITA_THREAD = 'thread'
+MODALITA_PROCESSI = 'processi'
+
+ESITO_COMPLETATO = 'completato'
+ESITO_RIPROVA = 'riprova'
+ESITO_FALLITO = 'fallito'
+
+_ORDINE_PRELIEVO = ['priorita', 'eseguibile_dal', 'id']
+
+
+def prendi_compiti(numero, worker, using='default'):
+    """
+    Prende in carico fino a ``numero`` compiti eseguibili.
+
+    Returns:
+        list: id dei compiti presi, in ordine di priorità.
+    """
+    adesso = timezone.now()
+    assegnazione = uuid.uuid4()
+    disponibili = Compito.objects.using(using).filter(
+        stato=Compito.STATO_IN_ATTESA, eseguibile_dal__lte=adesso
+    ).order_by(*_ORDINE_PRELIEVO)
+    presa = {
+        'stato': Compito.STATO_IN_ESECUZIONE,
+        'preso_da': worker,
+        'assegnazione': assegnazione,
+        'data_inizio': adesso,
+        'tentativi': F('tentativi') + 1,
+    }
+    if connections[using].features.has_select_for_update_skip_locked:
+        with transaction.atomic(using=using):
+            id_compiti = list(
+                disponibili.select_for_update(skip_locked=True).values_list('pk', flat=True)[:numero]
+            )
+            if not id_compiti:
+                return []
+            Compito.objects.using(using).filter(pk__in=id_compiti).update(**presa)
+    else:
+        # Reason: una SELECT seguita da UPDATE permetterebbe a due worker di prendere lo
+        # stesso compito; l'UPDATE con sottoquery legge e scrive nella stessa istruzione
+        Compito.objects.using(using).filter(
+            pk__in=disponibili.values('pk')[:numero], stato=Compito.STATO_IN_ATTESA
+        ).update(**presa)
+    return list(
+        Compito.objects.using(using).filter(assegnazione=assegnazione)
+        .order_by(*_ORDINE_PRELIEVO).values_list('pk', flat=True)
+    )
+
+
+def _rimetti_in_attesa(compito, errore, ritardo):
+    """Riprogramma il compito; se nel frattempo ne è stato accodato un altro con la stessa chiave lo chiude"""
+    riprova = {
+        'stato': Compito.STATO_IN_ATTESA,
+        'eseguibile_dal': timezone.now() + timedelta(seconds=ritardo),
+        'assegnazione': None,
+        'preso_da': '',
+        'errore': errore,
+    }
+    try:
+        with transaction.atomic():
+            Compito.objects.filter(pk=compito.pk, assegnazione=compito.assegnazione).update(**riprova)
+        return ESITO_RIPROVA
+    except IntegrityError:
+        Compito.objects.filter(pk=compito.pk, assegnazione=compito.assegnazione).update(
+            stato=Compito.STATO_FALLITO, data_fine=timezone.now(),
+            errore=errore + '\nNon riprovato: è già in attesa un compito con la stessa chiave',
+        )
+        return ESITO_FALLITO
+
+
+def esegui_compito(id_compito):
+    """
+    Esegue un compito preso in carico e ne registra l'esito.
+    Gira nei thread o nei processi del pool, ognuno con le proprie connessioni.
+
+    Returns:
+        tuple: (nome, esito, durata in ms, attesa in coda in ms).
+    """
+    close_old_connections()
+    try:
+        compito = Compito.objects.get(pk=id_compito)
+        attesa_ms = (compito.data_inizio - compito.eseguibile_dal).total_seconds() * 1000
+        inizio = time.perf_counter()
+        errore = ''
+        funzione = REGISTRO.get(compito.nome)
+        if funzione is None:
+            errore = f'Compito non registrato: {compito.nome}'
+        else:
+            try:
+                funzione(*compito.argomenti.get('args', []), **compito.argomenti.get('kwargs', {}))
+            except Exception:
+                errore = traceback.format_exc()
+        durata_ms = int((time.perf_counter() - inizio) * 1000)
+
+        # Le scritture sono condizionate all'assegnazione: se il compito è stato
+        # recuperato come bloccato e ripreso da un altro worker l'esito non lo tocca
+        if not errore:
+            Compito.objects.filter(pk=compito.pk, assegnazione=compito.assegnazione).update(
+                stato=Compito.STATO_COMPLETATO, data_fine=timezone.now(), durata_ms=durata_ms, errore=''
+            )
+            return compito.nome, ESITO_COMPLETATO, durata_ms, attesa_ms
+
+        logger.warning('Compito %s #%s non riuscito (tentativo %s)', compito.nome, compito.pk, compito.tentativi)
+        Compito.objects.filter(pk=compito.pk, assegnazione=compito.assegnazione).update(durata_ms=durata_ms)
+        if funzione is not None and compito.tentativi < compito.massimo_tentativi:
+            esito = _rimetti_in_attesa(compito, errore, funzione.attesa_tentativo(compito.tentativi))
+        else:
+            Compito.objects.filter(pk=compito.pk, assegnazione=compito.assegnazione).update(
+                stato=Compito.STATO_FALLITO, data_fine=timezone.now(), errore=errore
+            )
+            esito = ESITO_FALLITO
+        return compito.nome, esito, durata_ms, attesa_ms
+    finally:
+        close_old_connections()
+
+
+def recupera_compiti_bloccati(timeout=None):
+    """
+    Rimette in attesa (o segna come falliti) i compiti in esecuzione da più di ``timeout`` secondi.
+
+    Returns:
+        int: compiti recuperati.
+    """
+    timeout = settings.COMPITI_TIMEOUT_SECONDI if timeout is None else timeout
+    limite = timezone.now() - timedelta(seconds=timeout)
+    bloccati = Compito.objects.filter(stato=Compito.STATO_IN_ESECUZIONE, data_inizio__lt=limite)
+    recuperati = 0
+    for compito in bloccati.only('pk', 'assegnazione', 'tentativi', 'massimo_tentativi'):
+        errore = f'Interrotto: in esecuzione da più di {timeout} secondi'
+        if compito.tentativi < compito.massimo_tentativi:
+            _rimetti_in_attesa(compito, errore, 0)
+        else:
+            Compito.objects.filter(pk=compito.pk, assegnazione=compito.assegnazione).update(
+                stato=Compito.STATO_FALLITO, data_fine=timezone.now(), errore=errore
+            )
+        recuperati += 1
+    return recuperati
+
+
+def pulisci_compiti_conclusi(giorni=None):
+    """Elimina i compiti completati da più di ``giorni`` giorni; i falliti restano per l'analisi"""
+    giorni = settings.COMPITI_CONSERVAZIONE_GIORNI if giorni is None else giorni
+    limite = timezone.now() - timedelta(days=giorni)
+    eliminati, _ = Compito.objects.filter(stato=Compito.STATO_COMPLETATO, data_fine__lt=limite).delete()
+    return eliminati
+
+
+def statistiche_coda():
+    """Numero di compiti per stato ed età del compito eseguibile più vecchio"""
+    per_stato = dict(
+        Compito.objects.order_by().values_list('stato').annotate(totale=Count('pk'))
+    )
+    adesso = timezone.now()
+    piu_vecchio = Compito.objects.filter(
+        stato=Compito.STATO_IN_ATTESA, eseguibile_dal__lte=adesso
+    ).aggregate(minimo=Min('eseguibile_dal'))['minimo']
+    return {
+        'per_stato': {stato: per_stato.get(stato, 0) for stato, _ in Compito.STATI},
+        'attesa_massima_secondi': round((adesso - piu_vecchio).total_seconds(), 1) if piu_vecchio else 0,
+    }
+
+
+def _percentile(valori, percentuale):
+    if not valori:
+        return 0
+    ordinati = sorted(valori)
+    return ordinati[min(len(ordinati) - 1, int(len(ordinati) * percentuale / 100))]
+
+
+class Metriche:
+    """Throughput e latenze del worker; i percentili sono sugli ultimi 1000 compiti"""
+
+    def __init__(self, campioni=1000):
+        self._lock = threading.Lock()
+        self.inizio = time.monotonic()
+        self.esiti = Counter()
+        self.durate = deque(maxlen=campioni)
+        self.attese = deque(maxlen=campioni)
+
+    def registra(self, nome, esito, durata_ms, attesa_ms):
+        with self._lock:
+            self.esiti[esito] += 1
+            self.durate.append(durata_ms)
+            self.attese.append(attesa_ms)
+
+    def riepilogo(self):
+        with self._lock:
+            durate, attese = list(self.durate), list(self.attese)
+            eseguiti = sum(self.esiti.values())
+            secondi = max(time.monotonic() - self.inizio, 0.001)
+            return {
+                'completati': self.esiti[ESITO_COMPLETATO],
+                'riprovati': self.esiti[ESITO_RIPROVA],
+                'falliti': self.esiti[ESITO_FALLITO],
+                'compiti_al_secondo': round(eseguiti / secondi, 2),
+                'durata_p50_ms': _percentile(durate, 50),
+                'durata_p95_ms': _percentile(durate, 95),
+                'attesa_p50_ms': round(_percentile(attese, 50)),
+                'attesa_p95_ms': round(_percentile(attese, 95)),
+            }
+
+
+class Worker:
+    """
+    Ciclo di prelievo ed esecuzione dei compiti.
+
+    Args:
+        concorrenza (int): compiti eseguiti in parallelo.
+        modalita (str): MODALITA_THREAD per compiti che attendono I/O (email, HTTP, database),
+            MODALITA_PROCESSI per compiti che usano la CPU (es. derivati delle immagini).
+        una_volta (bool): termina quando la coda è vuota invece di restare in ascolto.
+        scrivi (callable): destinazione delle righe di log delle metriche.
+    """
+
+    def __init__(self, concorrenza=None, modalita=MODALITA_THREAD, intervallo=None, una_volta=False, scrivi=None):
+        self.concorrenza = concorrenza or settings.COMPITI_CONCORRENZA
+        self.modalita = modalita
+        self.intervallo = settings.COMPITI_INTERVALLO_POLLING if intervallo is None else intervallo
+        self.una_volta = una_volta
+        self.scrivi = scrivi or logger.info
+        self.nome = f'{socket.gethostname()}:{os.getpid()}'
+        self.metriche = Metriche()
+        self._fermo = False
+        self._pool_rotto = False
+
+    def ferma(self, *args):
+        """Smette di prelevare compiti; quelli in esecuzione vengono completati"""
+        self._fermo = True
+
+    def _pool(self):
+        if self.modalita == MODALITA_PROCESSI:
+            # Reason: con fork i figli erediterebbero le connessioni al database del padre
+            return ProcessPoolExecutor(
+                self.concorrenza, mp_context=get_context('spawn'), initializer=processo.inizializza
+            )
+        return ThreadPoolExecutor(self.concorrenza, thread_name_prefix='compito')
+
+    def _funzione(self):
+        return processo.esegui if self.modalita == MODALITA_PROCESSI else esegui_compito
+
+    def _manutenzione(self):
+        recuperati = recupera_compiti_bloccati()
+        if recuperati:
+            logger.warning('%s compiti bloccati rimessi in coda', recuperati)
+        pulisci_compiti_conclusi()
+
+    def _rilascia(self, id_compito, errore):
+        """Rimette subito in coda un compito preso ma non eseguito per un errore del pool"""
+        compito = Compito.objects.filter(pk=id_compito, stato=Compito.STATO_IN_ESECUZIONE).first()
+        if compito is not None:
+            _rimetti_in_attesa(compito, errore, 0)
+
+    def _raccogli(self, completati, in_volo):
+        for futuro in completati:
+            id_compito = in_volo.pop(futuro)
+            try:
+                self.metriche.registra(*futuro.result())
+            except BrokenProcessPool:
+                # Un processo del pool è terminato (es. memoria esaurita): il pool va ricreato
+                logger.error('Pool di processi interrotto durante il compito #%s', id_compito)
+                self._rilascia(id_compito, 'Processo del pool terminato durante l\'esecuzione')
+                self._pool_rotto = True
+            except Exception:
+                logger.exception('Esecuzione del compito #%s interrotta', id_compito)
+
+    def esegui(self):
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.ferma)
+            signal.signal(signal.SIGINT, self.ferma)
+        in_volo = {}
+        prossima_manutenzione = prossime_metriche = 0.0
+        pool = self._pool()
+        funzione = self._funzione()
+        try:
+            while not self._fermo:
+                adesso = time.monotonic()
+                if adesso >= prossima_manutenzione:
+                    self._manutenzione()
+                    prossima_manutenzione = adesso + settings.COMPITI_INTERVALLO_MANUTENZIONE
+                if adesso >= prossime_metriche:
+                    if prossime_metriche:
+                        self.scrivi(f'Metriche compiti: {self.metriche.riepilogo()}')
+                    prossime_metriche = adesso + settings.COMPITI_INTERVALLO_METRICHE
+                if self._pool_rotto and not in_volo:
+                    pool.shutdown(wait=False)
+                    pool = self._pool()
+                    self._pool_rotto = False
+
+                liberi = 0 if self._pool_rotto else self.concorrenza - len(in_volo)
+                for id_compito in prendi_compiti(liberi, self.nome) if liberi else []:
+                    try:
+                        in_volo[pool.submit(funzione, id_compito)] = id_compito
+                    except BrokenProcessPool:
+                        self._rilascia(id_compito, 'Pool di processi non disponibile')
+                        self._pool_rotto = True
+                if not in_volo:
+                    if self.una_volta and not self._pool_rotto:
+                        break
+                    time.sleep(self.intervallo)
+                    continue
+                completati, _ = wait(in_volo, timeout=self.intervallo, return_when=FIRST_COMPLETED)
+                self._raccogli(completati, in_volo)
+
+            completati, _ = wait(in_volo)
+            self._raccogli(completati, in_volo)
+        finally:
+            pool.shutdown(wait=True)
+        return self.metriche.riepilogo()
@@ -1,10 +1,105 @@
-from django.contrib import admin
+from decimal import Decimal
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.admin.views.main import PAGE_VAR
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connections
+from django.db.models import F
+from django.db.models.functions import Round
+from django.http import HttpResponseRedirect
+from django.utils.functional import cached_property
+
 from .models import (
     Categoria, Brand, Product, ProductImage,
-    Mulinello, Canna, Esca
+    Mulinello, Canna, Esca, Specie, Colore, Materiale, FasciaProfondita
 )
 
 
+class PaginatorStimato(Paginator):
+    """
+    Paginator che evita il COUNT(*) completo sulle tabelle grandi.
+    Senza filtri usa la stima delle statistiche di PostgreSQL, altrimenti conta al
+    massimo LIMITE_CONTEGGIO righe oltre la pagina richiesta. Quando il totale è una
+    stima o un conteggio troncato le pagine successive restano raggiungibili: ogni
+    pagina aperta sposta in avanti il conteggio e una pagina vuota segnala la fine.
+    """
+    LIMITE_CONTEGGIO = 10000
+    # Impostata dall'admin (PaginazioneStimataMixin) prima di leggere il conteggio
+    pagina_richiesta = 1
+    stimato = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        inizio = (self.pagina_richiesta - 1) * self.per_page
+        if not queryset.query.where:
+            stima = self._stima_postgresql(queryset)
+            if stima is not None and stima > inizio + self.per_page:
+                self.stimato = True
+                return stima
+        limite = inizio + self.LIMITE_CONTEGGIO
+        conteggio = queryset.order_by()[:limite].count()
+        self.stimato = conteggio == limite
+        return conteggio
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            numero = int(number)
+            if self.stimato and numero > self.num_pages:
+                return numero
+            raise
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.stimato:
+            return super().page(number)
+        # Senza ritagliare sul totale, che non è esatto
+        inizio = (number - 1) * self.per_page
+        return self._get_page(self.object_list[inizio:inizio + self.per_page], number, self)
+
+    def _stima_postgresql(self, queryset):
+        connessione = connections[queryset.db]
+        if connessione.vendor != 'postgresql':
+            return None
+        with connessione.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                [queryset.model._meta.db_table]
+            )
+            riga = cursor.fetchone()
+        # reltuples vale -1 (o 0) se la tabella non è mai stata analizzata
+        if not riga or riga[0] < self.LIMITE_CONTEGGIO:
+            return None
+        return riga[0]
+
+
+class PaginazioneStimataMixin:
+    """Changelist con PaginatorStimato, che riceve la pagina richiesta per il conteggio"""
+    paginator = PaginatorStimato
+    show_full_result_count = False
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        paginator = super().get_paginator(request, queryset, per_page, orphans, allow_empty_first_page)
+        try:
+            paginator.pagina_richiesta = max(1, int(request.GET.get(PAGE_VAR, 1)))
+        except ValueError:
+            pass
+        return paginator
+
+
+class ProdottoActionForm(ActionForm):
+    # Reason: oltre -100% i prezzi diventerebbero nulli o negativi; il campo rifiuta anche NaN e Infinity
+    percentuale = forms.DecimalField(
+        label='Percentuale', required=False, max_digits=5, decimal_places=2,
+        min_value=Decimal('-99.99'), max_value=Decimal('999.99'),
+        help_text='Per le azioni sui prezzi, es. 10 o -15'
+    )
+
+
 class ProductImageInline(admin.TabularInline):
     model = ProductImage
     extra = 1
@@ -14,6 +109,7 @@ class ProductImageInline(admin.TabularInline):
 @admin.register(Categoria)
 class CategoriaAdmin(admin.ModelAdmin):
     list_display = ['nome', 'parent', 'ordine']
+    list_select_related = ['parent']
     list_filter = ['parent']
     search_fields = ['nome', 'descrizione']
     prepopulated_fields = {'slug': ('nome',)}
@@ -27,11 +123,19 @@ class BrandAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('nome',)}
 
 
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(PaginazioneStimataMixin, admin.ModelAdmin):
     list_display = ['nome', 'codice_sku', 'categoria', 'brand', 'prezzo', 
                     'prezzo_scontato', 'quantita_disponibile', 'in_evidenza', 'in_vendita']
+    list_select_related = ['categoria', 'brand']
     list_filter = ['categoria', 'brand', 'in_evidenza', 'in_vendita', 'nuovo', 'usato']
-    search_fields = ['nome', 'descrizione_breve', 'codice_sku']
+    # Solo ricerche che usano un indice: prefisso del nome e SKU esatto
+    search_fields = ['^nome', 'codice_sku__exact']
+    autocomplete_fields = ['categoria', 'brand']
+    action_form = ProdottoActionForm
+    actions = [
+        'modifica_prezzi', 'metti_in_vendita', 'togli_dalla_vendita',
+        'metti_in_evidenza', 'togli_dall_evidenza'
+    ]
     prepopulated_fields = {'slug': ('nome',)}
     readonly_fields = ['data_creazione', 'data_aggiornamento']
     fieldsets = [
@@ -60,6 +164,57 @@ class ProductAdmin(admin.ModelAdmin):
         }),
     ]
     inlines = [ProductImageInline]
+    
+    def _form_azione(self, request):
+        """Form delle azioni validato, con le scelte delle azioni come lo costruisce l'admin"""
+        form = self.action_form(request.POST)
+        form.fields['action'].choices = self.get_action_choices(request)
+        form.is_valid()
+        return form
+    
+    def response_action(self, request, queryset):
+        # Reason: con un form delle azioni non valido l'admin non esegue l'azione e risponde
+        # "No action selected"; l'errore sulla percentuale va mostrato per quello che è
+        errori = self._form_azione(request).errors.get('percentuale')
+        if errori:
+            self.message_user(request, f"Percentuale non valida: {' '.join(errori)}", messages.ERROR)
+            return HttpResponseRedirect(request.get_full_path())
+        return super().response_action(request, queryset)
+    
+    # Le azioni eseguono un unico UPDATE sull'insieme selezionato, senza caricare i prodotti
+    
+    @admin.action(description='Modifica i prezzi della percentuale indicata')
+    def modifica_prezzi(self, request, queryset):
+        percentuale = self._form_azione(request).cleaned_data.get('percentuale')
+        if percentuale is None:
+            self.message_user(request, 'Indica una percentuale valida', messages.ERROR)
+            return
+        fattore = 1 + percentuale / 100
+        aggiornati = queryset.update(
+            prezzo=Round(F('prezzo') * fattore, 2),
+            prezzo_scontato=Round(F('prezzo_scontato') * fattore, 2)
+        )
+        self.message_user(request, f'Prezzi aggiornati per {aggiornati} prodotti')
+    
+    def _imposta(self, request, queryset, **valori):
+        aggiornati = queryset.update(**valori)
+        self.message_user(request, f'{aggiornati} prodotti aggiornati')
+    
+    @admin.action(description='Metti in vendita')
+    def metti_in_vendita(self, request, queryset):
+        self._imposta(request, queryset, in_vendita=True)
+    
+    @admin.action(description='Togli dalla vendita')
+    def togli_dalla_vendita(self, request, queryset):
+        self._imposta(request, queryset, in_vendita=False)
+    
+    @admin.action(description='Metti in evidenza')
+    def metti_in_evidenza(self, request, queryset):
+        self._imposta(request, queryset, in_evidenza=True)
+    
+    @admin.action(description="Togli dall'evidenza")
+    def togli_dall_evidenza(self, request, queryset):
+        self._imposta(request, queryset, in_evidenza=False)
 
 
 @admin.register(Mulinello)
@@ -92,9 +247,19 @@ class EscaAdmin(ProductAdmin):
     ]
 
 
+@admin.register(Specie, Colore, Materiale, FasciaProfondita)
+class TagSpecificaAdmin(admin.ModelAdmin):
+    """Tag ricavati dal testo delle specifiche: si può correggere il nome mostrato, lo slug è nei filtri"""
+    list_display = ['nome', 'slug']
+    search_fields = ['nome', 'slug']
+    readonly_fields = ['slug']
+
+
 @admin.register(ProductImage)
-class ProductImageAdmin(admin.ModelAdmin):
+class ProductImageAdmin(PaginazioneStimataMixin, admin.ModelAdmin):
     list_display = ['prodotto', 'immagine', 'is_principale', 'ordine']
+    list_select_related = ['prodotto']
     list_filter = ['is_principale']
-    search_fields = ['prodotto__nome', 'alt_text']
+    search_fields = ['^prodotto__nome', 'prodotto__codice_sku__exact']
+    raw_id_fields = ['prodotto']
     list_editable = ['is_principale', 'ordine']
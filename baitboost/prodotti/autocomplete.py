@@ -0,0 +1,251 @@
+"""
+Indice in memoria per l'autocompletamento della ricerca.
+
+Le chiavi (nomi normalizzati, parole interne, SKU, specie target) stanno in una
+lista ordinata di tuple: la ricerca per prefisso è una bisezione più una breve
+scansione, senza query al database. L'indice si costruisce all'avvio del worker
+(vedi prodotti/warmup.py) e si aggiorna con i segnali di salvataggio ed eliminazione.
+"""
+import bisect
+import logging
+import sys
+import threading
+import time
+import unicodedata
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Brand, Categoria, Product
+
+logger = logging.getLogger(__name__)
+
+TIPO_PRODOTTO = 'prodotto'
+TIPO_BRAND = 'brand'
+TIPO_CATEGORIA = 'categoria'
+
+# Origine della chiave, usata per il ranking (valori più bassi = corrispondenza migliore)
+ORIGINE_INIZIO = 0
+ORIGINE_PAROLA = 1
+ORIGINE_SKU = 2
+ORIGINE_SPECIE = 3
+
+PESO_TIPO = {TIPO_BRAND: 3.0, TIPO_CATEGORIA: 2.5, TIPO_PRODOTTO: 1.0}
+PESO_ORIGINE = {ORIGINE_INIZIO: 2.0, ORIGINE_PAROLA: 1.0, ORIGINE_SKU: 2.0, ORIGINE_SPECIE: 0.5}
+
+# Chiavi esaminate al massimo per ricerca, anche per prefissi molto corti
+MASSIMO_SCANSIONE = 2000
+
+
+def normalizza(testo):
+    """Minuscolo, senza accenti e con spazi singoli"""
+    testo = unicodedata.normalize('NFKD', testo or '')
+    testo = ''.join(carattere for carattere in testo if not unicodedata.combining(carattere))
+    return ' '.join(testo.lower().split())
+
+
+def _chiavi_testo(testo):
+    """Chiave del testo completo più una chiave per ogni parola successiva alla prima"""
+    parole = normalizza(testo).split()
+    chiavi = []
+    for posizione in range(len(parole)):
+        origine = ORIGINE_INIZIO if posizione == 0 else ORIGINE_PAROLA
+        chiavi.append((' '.join(parole[posizione:]), origine))
+    return chiavi
+
+
+def _dimensione(oggetto, visti):
+    """Stima ricorsiva della memoria occupata da liste, tuple, dizionari e stringhe"""
+    if id(oggetto) in visti:
+        return 0
+    visti.add(id(oggetto))
+    dimensione = sys.getsizeof(oggetto)
+    if isinstance(oggetto, dict):
+        dimensione += sum(_dimensione(k, visti) + _dimensione(v, visti) for k, v in oggetto.items())
+    elif isinstance(oggetto, (list, tuple)):
+        dimensione += sum(_dimensione(elemento, visti) for elemento in oggetto)
+    return dimensione
+
+
+class IndicePrefissi:
+    """Indice per prefisso basato su array ordinato, sicuro tra thread"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._chiavi = []
+        self._voci = {}
+        self._costruzione_in_corso = False
+        self.costruito_il = None
+        self.durata_costruzione = None
+
+    # Costruzione
+
+    def _voci_da_database(self):
+        voci = []
+        prodotti = Product.objects.filter(in_vendita=True).values_list(
+            'id', 'nome', 'slug', 'codice_sku', 'in_evidenza', 'esca__specie_target'
+        )
+        for id_prodotto, nome, slug, sku, in_evidenza, specie in prodotti.iterator(chunk_size=5000):
+            voci.append(self._voce_prodotto(id_prodotto, nome, slug, sku, in_evidenza, specie))
+        for id_brand, nome, slug in Brand.objects.values_list('id', 'nome', 'slug'):
+            voci.append(((TIPO_BRAND, id_brand), nome, slug, 0.0, _chiavi_testo(nome)))
+        for id_categoria, nome, slug in Categoria.objects.values_list('id', 'nome', 'slug'):
+            voci.append(((TIPO_CATEGORIA, id_categoria), nome, slug, 0.0, _chiavi_testo(nome)))
+        return voci
+
+    def _voce_prodotto(self, id_prodotto, nome, slug, sku, in_evidenza, specie):
+        chiavi = _chiavi_testo(nome)
+        if sku:
+            chiavi.append((normalizza(sku), ORIGINE_SKU))
+        for parte in (specie or '').split(','):
+            if parte.strip():
+                chiavi.append((normalizza(parte), ORIGINE_SPECIE))
+        bonus = 0.5 if in_evidenza else 0.0
+        return (TIPO_PRODOTTO, id_prodotto), nome, slug, bonus, chiavi
+
+    def costruisci(self):
+        """Ricostruisce l'indice da zero leggendo il database"""
+        inizio = time.perf_counter()
+        chiavi = []
+        dati = {}
+        for riferimento, nome, slug, bonus, elenco in self._voci_da_database():
+            voci = tuple((chiave, riferimento[0], riferimento[1], origine) for chiave, origine in elenco)
+            chiavi.extend(voci)
+            dati[riferimento] = (nome, slug, bonus, voci)
+        chiavi.sort()
+        with self._lock:
+            self._chiavi = chiavi
+            self._voci = dati
+            self.costruito_il = time.monotonic()
+            self.durata_costruzione = time.perf_counter() - inizio
+        statistiche = self.statistiche()
+        logger.info(
+            'Indice autocomplete costruito: %s chiavi, %s voci, %.1f KiB in %.3fs',
+            statistiche['chiavi'], statistiche['voci'], statistiche['memoria_byte'] / 1024,
+            self.durata_costruzione
+        )
+
+    def _ricostruisci_in_background(self):
+        try:
+            self.costruisci()
+        except Exception:
+            # Resta servito l'indice precedente, si riprova alla richiesta successiva
+            logger.exception("Ricostruzione dell'indice autocomplete non riuscita")
+        finally:
+            self._costruzione_in_corso = False
+            # Il thread non serve altre richieste: la sua connessione va chiusa
+            connection.close()
+
+    def assicura_aggiornato(self):
+        """Costruisce l'indice se manca e lo ricostruisce in background se è troppo vecchio"""
+        if self.costruito_il is None:
+            with self._lock:
+                if self.costruito_il is None:
+                    self.costruisci()
+            return
+        ttl = getattr(settings, 'AUTOCOMPLETE_TTL', 300)
+        # Reason: ogni worker riceve solo i segnali delle proprie scritture,
+        # la ricostruzione periodica recupera quelle fatte dagli altri processi
+        if time.monotonic() - self.costruito_il > ttl and not self._costruzione_in_corso:
+            self._costruzione_in_corso = True
+            threading.Thread(target=self._ricostruisci_in_background, daemon=True).start()
+
+    # Aggiornamenti puntuali
+
+    def _rimuovi(self, riferimento):
+        dati = self._voci.pop(riferimento, None)
+        if dati is None:
+            return
+        for voce in dati[3]:
+            posizione = bisect.bisect_left(self._chiavi, voce)
+            if posizione < len(self._chiavi) and self._chiavi[posizione] == voce:
+                del self._chiavi[posizione]
+
+    def _inserisci(self, riferimento, nome, slug, bonus, chiavi):
+        voci = tuple((chiave, riferimento[0], riferimento[1], origine) for chiave, origine in chiavi)
+        self._voci[riferimento] = (nome, slug, bonus, voci)
+        for voce in voci:
+            bisect.insort(self._chiavi, voce)
+
+    def aggiorna_prodotto(self, prodotto):
+        if self.costruito_il is None:
+            return
+        riferimento = (TIPO_PRODOTTO, prodotto.pk)
+        with self._lock:
+            self._rimuovi(riferimento)
+            if prodotto.in_vendita:
+                specie = getattr(prodotto, 'specie_target', None)
+                self._inserisci(*self._voce_prodotto(
+                    prodotto.pk, prodotto.nome, prodotto.slug, prodotto.codice_sku, prodotto.in_evidenza, specie
+                ))
+
+    def aggiorna_riferimento(self, tipo, oggetto):
+        """Aggiorna un brand o una categoria"""
+        if self.costruito_il is None:
+            return
+        with self._lock:
+            self._rimuovi((tipo, oggetto.pk))
+            self._inserisci((tipo, oggetto.pk), oggetto.nome, oggetto.slug, 0.0, _chiavi_testo(oggetto.nome))
+
+    def rimuovi(self, tipo, pk):
+        if self.costruito_il is None:
+            return
+        with self._lock:
+            self._rimuovi((tipo, pk))
+
+    # Ricerca
+
+    def cerca(self, testo, limite=10):
+        """
+        Restituisce i suggerimenti ordinati per rilevanza.
+
+        Args:
+            testo (str): prefisso digitato dall'utente.
+            limite (int): numero massimo di suggerimenti.
+
+        Returns:
+            list: dizionari con tipo, id, testo e slug.
+        """
+        prefisso = normalizza(testo)
+        if not prefisso:
+            return []
+        self.assicura_aggiornato()
+        punteggi = {}
+        with self._lock:
+            chiavi = self._chiavi
+            posizione = bisect.bisect_left(chiavi, (prefisso,))
+            fine = min(len(chiavi), posizione + MASSIMO_SCANSIONE)
+            while posizione < fine and chiavi[posizione][0].startswith(prefisso):
+                chiave, tipo, pk, origine = chiavi[posizione]
+                punteggio = PESO_TIPO[tipo] + PESO_ORIGINE[origine]
+                if chiave == prefisso:
+                    punteggio += 1.0
+                riferimento = (tipo, pk)
+                if punteggio > punteggi.get(riferimento, 0):
+                    punteggi[riferimento] = punteggio
+                posizione += 1
+            risultati = []
+            for riferimento, punteggio in punteggi.items():
+                nome, slug, bonus, _ = self._voci[riferimento]
+                # A parità di punteggio vincono i testi più corti
+                risultati.append((-(punteggio + bonus), len(nome), nome, riferimento, slug))
+        risultati.sort()
+        return [
+            {'tipo': riferimento[0], 'id': riferimento[1], 'testo': nome, 'slug': slug}
+            for _, _, nome, riferimento, slug in risultati[:limite]
+        ]
+
+    def statistiche(self):
+        """Dimensioni e occupazione di memoria stimata dell'indice"""
+        with self._lock:
+            memoria = _dimensione(self._chiavi, set()) + _dimensione(self._voci, set())
+            return {
+                'chiavi': len(self._chiavi),
+                'voci': len(self._voci),
+                'memoria_byte': memoria,
+                'durata_costruzione': self.durata_costruzione,
+                'eta_secondi': None if self.costruito_il is None else time.monotonic() - self.costruito_il,
+            }
+
+
+indice_autocomplete = IndicePrefissi()
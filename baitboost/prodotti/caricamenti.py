@@ -0,0 +1,248 @@
+"""
+Caricamento a parti, riprendibile, delle immagini dei prodotti.
+
+Ogni parte viene letta dal corpo della richiesta a blocchi e scritta subito
+sullo storage, calcolando lo SHA-256 durante la copia: la memoria usata non
+dipende dalla dimensione del file. Al completamento le parti vengono lette in
+sequenza dallo storage e riscritte come un unico file, sempre a blocchi, poi
+il file viene collegato a un nuovo ``ProductImage``. Le parti sono indipendenti,
+quindi possono arrivare in parallelo e in qualsiasi ordine.
+"""
+import hashlib
+import io
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from .models import CaricamentoImmagine, ParteCaricamento, ProductImage
+
+DIMENSIONE_BLOCCO = 64 * 1024
+CARTELLA_PARTI = 'caricamenti'
+
+
+class CaricamentoNonValido(ValueError):
+    """Parte o caricamento rifiutato (dimensione, checksum o stato non validi)"""
+
+
+class _FlussoVerificato(io.RawIOBase):
+    """
+    File in sola lettura che consuma una sequenza di blocchi e ne calcola lo SHA-256.
+    Non è riavvolgibile: gli storage lo leggono una sola volta dall'inizio.
+    """
+
+    def __init__(self, blocchi, dimensione):
+        super().__init__()
+        self._blocchi = iter(blocchi)
+        self._resto = b''
+        self.size = dimensione
+        self.letti = 0
+        self.hash = hashlib.sha256()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._resto:
+            try:
+                self._resto = next(self._blocchi)
+            except StopIteration:
+                return 0
+        quantita = min(len(buffer), len(self._resto))
+        buffer[:quantita] = self._resto[:quantita]
+        self.hash.update(self._resto[:quantita])
+        self._resto = self._resto[quantita:]
+        self.letti += quantita
+        return quantita
+
+    def tell(self):
+        return self.letti
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        # Gli storage riavvolgono il file prima di leggerlo: è possibile solo se non è ancora stato letto
+        if offset == 0 and whence == os.SEEK_SET and self.letti == 0:
+            return 0
+        raise io.UnsupportedOperation('Flusso non riavvolgibile')
+
+
+def _blocchi_da_stream(stream, lunghezza):
+    """Legge al massimo ``lunghezza`` byte dallo stream, un blocco alla volta"""
+    rimanenti = lunghezza
+    while rimanenti > 0:
+        blocco = stream.read(min(DIMENSIONE_BLOCCO, rimanenti))
+        if not blocco:
+            return
+        rimanenti -= len(blocco)
+        yield blocco
+
+
+def _blocchi_da_parti(percorsi):
+    for percorso in percorsi:
+        with default_storage.open(percorso, 'rb') as file:
+            yield from file.chunks(DIMENSIONE_BLOCCO)
+
+
+def _percorso_parte(caricamento, indice):
+    return f'{CARTELLA_PARTI}/{caricamento.pk}/{indice:05d}.part'
+
+
+def crea_caricamento(dati, utente=None):
+    """Registra un nuovo caricamento; ``dati`` sono i campi già validati dal serializer"""
+    if dati['dimensione_totale'] > settings.CARICAMENTI_DIMENSIONE_MASSIMA:
+        raise CaricamentoNonValido('File troppo grande')
+    dati.setdefault('dimensione_parte', settings.CARICAMENTI_DIMENSIONE_PARTE)
+    if not 0 < dati['dimensione_parte'] <= settings.CARICAMENTI_DIMENSIONE_PARTE:
+        raise CaricamentoNonValido(
+            f'La dimensione delle parti deve essere al massimo {settings.CARICAMENTI_DIMENSIONE_PARTE} byte'
+        )
+    return CaricamentoImmagine.objects.create(utente=utente, **dati)
+
+
+def salva_parte(caricamento, indice, stream, lunghezza, sha256):
+    """
+    Scrive una parte sullo storage verificandone dimensione e checksum.
+    Ricaricare una parte già ricevuta la sostituisce, così un client può riprovare senza rischi.
+
+    Args:
+        caricamento (CaricamentoImmagine): caricamento in corso.
+        indice (int): posizione della parte, da 0.
+        stream: corpo della richiesta, letto a blocchi.
+        lunghezza (int): Content-Length della richiesta.
+        sha256 (str): checksum esadecimale atteso della parte.
+
+    Returns:
+        ParteCaricamento: la parte salvata.
+    """
+    if caricamento.stato != CaricamentoImmagine.STATO_IN_CORSO:
+        raise CaricamentoNonValido('Il caricamento non è più in corso')
+    if indice >= caricamento.numero_parti:
+        raise CaricamentoNonValido('Indice della parte fuori intervallo')
+    attesa = caricamento.dimensione_attesa(indice)
+    if lunghezza != attesa:
+        raise CaricamentoNonValido(f'La parte {indice} deve essere di {attesa} byte')
+    if not sha256:
+        raise CaricamentoNonValido('Checksum SHA-256 della parte mancante')
+
+    flusso = _FlussoVerificato(_blocchi_da_stream(stream, lunghezza), lunghezza)
+    percorso = default_storage.save(_percorso_parte(caricamento, indice), File(flusso))
+    if flusso.letti != attesa or flusso.hash.hexdigest() != sha256.lower():
+        default_storage.delete(percorso)
+        raise CaricamentoNonValido(f'Parte {indice} incompleta o con checksum errato')
+
+    # Reason: l'UPDATE del caricamento all'inizio della transazione blocca la riga (e su
+    # SQLite prende subito il lock di scrittura), così le parti dello stesso caricamento
+    # vengono registrate una alla volta anche se arrivano in parallelo
+    with transaction.atomic():
+        _segna_attivita(caricamento)
+        precedente = ParteCaricamento.objects.filter(caricamento=caricamento, indice=indice).first()
+        if precedente is None:
+            return ParteCaricamento.objects.create(
+                caricamento=caricamento, indice=indice, dimensione=attesa,
+                sha256=sha256.lower(), percorso=percorso
+            )
+        # Parte ricaricata: il file della versione sostituita va rimosso dallo storage
+        vecchio_percorso = precedente.percorso
+        precedente.sha256 = sha256.lower()
+        precedente.percorso = percorso
+        precedente.save(update_fields=['sha256', 'percorso'])
+    if vecchio_percorso != percorso:
+        default_storage.delete(vecchio_percorso)
+    return precedente
+
+
+def _segna_attivita(caricamento):
+    # Tiene aggiornata la data usata per riconoscere i caricamenti abbandonati
+    CaricamentoImmagine.objects.filter(pk=caricamento.pk).update(data_aggiornamento=timezone.now())
+
+
+def _verifica_immagine(campo):
+    """Controlla con Pillow che il file assemblato sia un'immagine valida"""
+    try:
+        with campo.storage.open(campo.name, 'rb') as file, Image.open(file) as immagine:
+            immagine.verify()
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as errore:
+        raise CaricamentoNonValido('Il file caricato non è un\'immagine valida') from errore
+
+
+def _elimina_parti(caricamento):
+    for percorso in caricamento.parti.values_list('percorso', flat=True):
+        default_storage.delete(percorso)
+    caricamento.parti.all().delete()
+
+
+def completa_caricamento(caricamento):
+    """
+    Riunisce le parti in un unico file e crea l'immagine del prodotto.
+
+    Returns:
+        ProductImage: l'immagine creata.
+    """
+    if caricamento.stato != CaricamentoImmagine.STATO_IN_CORSO:
+        raise CaricamentoNonValido('Il caricamento non è più in corso')
+    percorsi = list(caricamento.parti.order_by('indice').values_list('percorso', flat=True))
+    if len(percorsi) != caricamento.numero_parti:
+        mancanti = sorted(set(range(caricamento.numero_parti)) - set(
+            caricamento.parti.values_list('indice', flat=True)
+        ))
+        raise CaricamentoNonValido(f'Parti mancanti: {mancanti}')
+
+    # Solo una richiesta di completamento può procedere, anche se arrivano in parallelo
+    presi = CaricamentoImmagine.objects.filter(
+        pk=caricamento.pk, stato=CaricamentoImmagine.STATO_IN_CORSO
+    ).update(stato=CaricamentoImmagine.STATO_COMPLETATO)
+    if not presi:
+        raise CaricamentoNonValido('Il caricamento non è più in corso')
+
+    immagine = ProductImage(
+        prodotto_id=caricamento.prodotto_id, alt_text=caricamento.alt_text,
+        is_principale=caricamento.is_principale, ordine=caricamento.ordine
+    )
+    flusso = _FlussoVerificato(_blocchi_da_parti(percorsi), caricamento.dimensione_totale)
+    try:
+        immagine.immagine.save(caricamento.nome_file, File(flusso), save=False)
+        if caricamento.sha256 and flusso.hash.hexdigest() != caricamento.sha256.lower():
+            raise CaricamentoNonValido('Checksum del file completo errato')
+        _verifica_immagine(immagine.immagine)
+    except Exception:
+        # Il file salvato resta senza riferimenti e viene eliminato da pulisci_media
+        CaricamentoImmagine.objects.filter(pk=caricamento.pk).update(stato=CaricamentoImmagine.STATO_IN_CORSO)
+        raise
+
+    with transaction.atomic():
+        immagine.save()
+        caricamento.stato = CaricamentoImmagine.STATO_COMPLETATO
+        caricamento.immagine = immagine
+        caricamento.save(update_fields=['stato', 'immagine', 'data_aggiornamento'])
+    _elimina_parti(caricamento)
+    return immagine
+
+
+def annulla_caricamento(caricamento):
+    """Annulla il caricamento ed elimina dallo storage le parti già ricevute"""
+    _elimina_parti(caricamento)
+    caricamento.stato = CaricamentoImmagine.STATO_ANNULLATO
+    caricamento.save(update_fields=['stato', 'data_aggiornamento'])
+
+
+def pulisci_caricamenti_abbandonati(ore=None):
+    """
+    Annulla i caricamenti in corso fermi da più di ``ore`` ore.
+
+    Returns:
+        int: caricamenti annullati.
+    """
+    ore = settings.CARICAMENTI_SCADENZA_ORE if ore is None else ore
+    limite = timezone.now() - timedelta(hours=ore)
+    abbandonati = CaricamentoImmagine.objects.filter(
+        stato=CaricamentoImmagine.STATO_IN_CORSO, data_aggiornamento__lt=limite
+    )
+    totale = 0
+    for caricamento in abbandonati.iterator():
+        annulla_caricamento(caricamento)
+        totale += 1
+    return totale
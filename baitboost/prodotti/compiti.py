@@ -0,0 +1,55 @@
+from django.core.cache import cache
+
+from coda.models import Compito
+from coda.registro import compito
+
+from .feed import pulisci_eliminazioni
+from .home import costruisci_snapshot
+from .media import ricalcola_riferimenti
+from .popolarita import ricalcola_popolarita
+from .prezzi import compatta_storico
+from .schede import verifica_schede
+from .sitemap import CHIAVE_ACCODATA, aggiorna_sitemap
+
+
+@compito(priorita=Compito.PRIORITA_BASSA)
+def correggi_schede_prodotto():
+    """Riallinea le schede prodotto alle tabelle di origine"""
+    verifica_schede(correggi=True)
+
+
+@compito(priorita=Compito.PRIORITA_BASSA)
+def ricalcola_riferimenti_media():
+    """Ricalcola i riferimenti ai blob dopo modifiche fatte senza segnali"""
+    ricalcola_riferimenti()
+
+
+@compito(priorita=Compito.PRIORITA_BASSA)
+def ricalcola_popolarita_prodotti():
+    """Ricalcola i punteggi di popolarità dalle visite giornaliere"""
+    ricalcola_popolarita()
+
+
+@compito(priorita=Compito.PRIORITA_BASSA)
+def compatta_storico_prezzi():
+    """Elimina lo storico prezzi che non serve più al minimo dei 30 giorni"""
+    compatta_storico()
+
+
+@compito(priorita=Compito.PRIORITA_BASSA)
+def pulisci_eliminazioni_feed():
+    """Elimina le tracce delle eliminazioni più vecchie della conservazione del feed"""
+    pulisci_eliminazioni()
+
+
+@compito(priorita=Compito.PRIORITA_BASSA)
+def aggiorna_sitemap_catalogo():
+    """Rigenera gli shard cambiati della sitemap, accodato alla scadenza di SITEMAP_TTL"""
+    aggiorna_sitemap()
+    cache.delete(CHIAVE_ACCODATA)
+
+
+@compito()
+def ricostruisci_snapshot_home():
+    """Ricostruisce lo snapshot della home dopo le modifiche al catalogo o alle promozioni"""
+    costruisci_snapshot()
@@ -0,0 +1,282 @@
+"""
+Calcolo offline dei prodotti correlati.
+
+Ogni prodotto viene codificato in un vettore NumPy (sottotipo, categoria, brand,
+prezzo e specifiche del sottotipo); la similarità è il coseno tra i vettori e
+per ogni prodotto si salvano i primi K vicini in ``ProdottoCorrelato``.
+Il prodotto matrice per matrice è fatto a blocchi di righe, così la memoria usata
+resta limitata anche con centinaia di migliaia di prodotti.
+"""
+import math
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .models import CalcoloCorrelati, Canna, Esca, Mulinello, ProdottoCorrelato, Product
+
+VICINI = 12
+
+# Elementi massimi della matrice di similarità calcolata per blocco (float32)
+ELEMENTI_PER_BLOCCO = 16_000_000
+
+# Peso di ogni gruppo di caratteristiche nel vettore finale
+PESI = {
+    'sottotipo': 3.0,
+    'categoria': 1.5,
+    'brand': 0.5,
+    'prezzo': 1.5,
+    'specifiche': 2.0,
+}
+
+CAMPI = [
+    'id', 'categoria_id', 'brand_id', 'prezzo', 'prezzo_scontato',
+    'mulinello__tipo_mulinello', 'mulinello__frizione', 'mulinello__cuscinetti', 'mulinello__freno_massimo',
+    'canna__tipo_canna', 'canna__azione', 'canna__lunghezza',
+    'esca__tipo_esca', 'esca__categoria_artificiale', 'esca__peso_esca', 'esca__specie_target',
+]
+
+# Posizione di ogni azione della canna nella scala da morbida a rigida
+ORDINE_AZIONE = {
+    scelta: posizione for posizione, (scelta, _) in enumerate(Canna._meta.get_field('azione').choices)
+}
+
+
+def _one_hot(valori):
+    """Codifica una lista di valori categorici (None = nessun valore)"""
+    vocabolario = {valore: i for i, valore in enumerate(sorted({v for v in valori if v is not None}, key=str))}
+    matrice = np.zeros((len(valori), max(len(vocabolario), 1)), dtype=np.float32)
+    for riga, valore in enumerate(valori):
+        if valore is not None:
+            matrice[riga, vocabolario[valore]] = 1.0
+    return matrice
+
+
+def _multi_hot(testi):
+    """Codifica testi liberi separati da virgole (es. "Spigola, Trota") come insiemi di etichette"""
+    insiemi = [
+        {parte.strip().lower() for parte in testo.split(',') if parte.strip()} if testo else set()
+        for testo in testi
+    ]
+    vocabolario = {etichetta: i for i, etichetta in enumerate(sorted(set().union(*insiemi)))}
+    matrice = np.zeros((len(testi), max(len(vocabolario), 1)), dtype=np.float32)
+    for riga, insieme in enumerate(insiemi):
+        for etichetta in insieme:
+            matrice[riga, vocabolario[etichetta]] = 1.0
+    return matrice
+
+
+def _bin_morbidi(valori, numero_bin=10, logaritmico=True):
+    """
+    Codifica un valore numerico su bin gaussiani sovrapposti.
+    Reason: una sola colonna numerica non funziona con il coseno, mentre con i bin
+    morbidi due valori vicini hanno vettori simili e due valori lontani ortogonali.
+    """
+    x = np.array([math.nan if v is None else float(v) for v in valori], dtype=np.float64)
+    if logaritmico:
+        x = np.log1p(np.clip(x, 0, None))
+    validi = ~np.isnan(x)
+    matrice = np.zeros((len(valori), numero_bin), dtype=np.float32)
+    if not validi.any():
+        return matrice
+    minimo, massimo = x[validi].min(), x[validi].max()
+    centri = np.linspace(minimo, massimo, numero_bin)
+    larghezza = max((massimo - minimo) / max(numero_bin - 1, 1), 1e-6)
+    distanze = (x[validi, None] - centri[None, :]) / larghezza
+    matrice[validi] = np.exp(-0.5 * distanze ** 2)
+    return matrice
+
+
+def _normalizza(matrice):
+    """Normalizza le righe a norma unitaria (le righe nulle restano nulle)"""
+    norme = np.linalg.norm(matrice, axis=1, keepdims=True)
+    norme[norme == 0] = 1.0
+    return matrice / norme
+
+
+def codifica_prodotti():
+    """
+    Legge tutti i prodotti con i campi dei sottotipi in una sola query e li codifica.
+
+    Returns:
+        tuple: (array degli id, matrice float32 con una riga normalizzata per prodotto).
+    """
+    righe = list(Product.objects.order_by('id').values_list(*CAMPI).iterator(chunk_size=5000))
+    if not righe:
+        return np.array([], dtype=np.int64), np.zeros((0, 0), dtype=np.float32)
+    colonne = dict(zip(CAMPI, zip(*righe)))
+
+    sottotipi = []
+    for tipo_mulinello, tipo_canna, tipo_esca in zip(
+        colonne['mulinello__tipo_mulinello'], colonne['canna__tipo_canna'], colonne['esca__tipo_esca']
+    ):
+        if tipo_mulinello is not None:
+            sottotipi.append(Mulinello.__name__)
+        elif tipo_canna is not None:
+            sottotipi.append(Canna.__name__)
+        elif tipo_esca is not None:
+            sottotipi.append(Esca.__name__)
+        else:
+            sottotipi.append(Product.__name__)
+
+    prezzi = [
+        scontato if scontato is not None and scontato < prezzo else prezzo
+        for prezzo, scontato in zip(colonne['prezzo'], colonne['prezzo_scontato'])
+    ]
+    azioni = [
+        # Valori fuori dalle scelte (salvati senza validazione) trattati come mancanti
+        ORDINE_AZIONE.get(azione)
+        for azione in colonne['canna__azione']
+    ]
+    specifiche = np.hstack([
+        _one_hot(colonne['mulinello__tipo_mulinello']),
+        _one_hot(colonne['mulinello__frizione']),
+        _bin_morbidi(colonne['mulinello__cuscinetti'], 6, logaritmico=False),
+        _bin_morbidi(colonne['mulinello__freno_massimo'], 6, logaritmico=False),
+        _one_hot(colonne['canna__tipo_canna']),
+        _bin_morbidi(azioni, len(ORDINE_AZIONE), logaritmico=False),
+        _bin_morbidi(colonne['canna__lunghezza'], 8, logaritmico=False),
+        _one_hot(colonne['esca__tipo_esca']),
+        _one_hot(colonne['esca__categoria_artificiale']),
+        _bin_morbidi(colonne['esca__peso_esca'], 8),
+        _multi_hot(colonne['esca__specie_target']),
+    ])
+
+    blocchi = {
+        'sottotipo': _one_hot(sottotipi),
+        'categoria': _one_hot(colonne['categoria_id']),
+        'brand': _one_hot(colonne['brand_id']),
+        'prezzo': _bin_morbidi(prezzi, 12),
+        'specifiche': specifiche,
+    }
+    vettori = np.hstack([_normalizza(blocco) * PESI[nome] for nome, blocco in blocchi.items()])
+    return np.array(colonne['id'], dtype=np.int64), _normalizza(vettori).astype(np.float32)
+
+
+def _righe_per_blocco(numero_prodotti):
+    return max(1, min(4096, ELEMENTI_PER_BLOCCO // max(numero_prodotti, 1)))
+
+
+def calcola_vicini(vettori, indici_righe, k=VICINI):
+    """
+    Calcola a blocchi i primi k vicini delle righe indicate.
+
+    Yields:
+        tuple: (indice riga, array indici vicini, array punteggi) in ordine di punteggio.
+    """
+    k = min(k, len(vettori) - 1)
+    if k <= 0:
+        return
+    passo = _righe_per_blocco(len(vettori))
+    for inizio in range(0, len(indici_righe), passo):
+        blocco = np.asarray(indici_righe[inizio:inizio + passo])
+        similarita = vettori[blocco] @ vettori.T
+        # Un prodotto non è correlato a se stesso
+        similarita[np.arange(len(blocco)), blocco] = -np.inf
+        migliori = np.argpartition(-similarita, k - 1, axis=1)[:, :k]
+        punteggi = np.take_along_axis(similarita, migliori, axis=1)
+        ordine = np.argsort(-punteggi, axis=1)
+        migliori = np.take_along_axis(migliori, ordine, axis=1)
+        punteggi = np.take_along_axis(punteggi, ordine, axis=1)
+        for posizione, riga in enumerate(blocco):
+            yield riga, migliori[posizione], punteggi[posizione]
+
+
+def _righe_da_ricalcolare(ids, vettori, ultimo_calcolo, k):
+    """
+    Individua i prodotti da ricalcolare dopo l'ultimo calcolo:
+    quelli modificati o nuovi, quelli che avevano tra i vicini un prodotto modificato
+    o eliminato e quelli per cui un prodotto modificato è ora più simile dell'ultimo vicino.
+    """
+    posizione_id = {int(id_prodotto): i for i, id_prodotto in enumerate(ids)}
+    k = min(k, len(ids) - 1)
+
+    modificati = set(
+        Product.objects.filter(data_aggiornamento__gte=ultimo_calcolo.data_inizio).values_list('id', flat=True)
+    )
+    soglie = {
+        riga['prodotto_id']: (riga['minimo'], riga['totale'])
+        for riga in ProdottoCorrelato.objects.values('prodotto_id').annotate(
+            minimo=Min('punteggio'), totale=Count('id')
+        )
+    }
+    # Prodotti nuovi o con meno vicini del previsto (un vicino è stato eliminato)
+    modificati.update(id_prodotto for id_prodotto in posizione_id if soglie.get(id_prodotto, (0, 0))[1] < k)
+    da_ricalcolare = set(modificati)
+    elenco_modificati = list(modificati)
+    for inizio in range(0, len(elenco_modificati), 500):
+        da_ricalcolare.update(
+            ProdottoCorrelato.objects.filter(
+                correlato_id__in=elenco_modificati[inizio:inizio + 500]
+            ).values_list('prodotto_id', flat=True)
+        )
+
+    righe_modificate = [posizione_id[id_prodotto] for id_prodotto in modificati if id_prodotto in posizione_id]
+    if righe_modificate:
+        soglia = np.full(len(ids), np.inf, dtype=np.float32)
+        for id_prodotto, (minimo, _) in soglie.items():
+            if id_prodotto in posizione_id:
+                soglia[posizione_id[id_prodotto]] = minimo
+        massimo = np.full(len(ids), -np.inf, dtype=np.float32)
+        passo = _righe_per_blocco(len(ids))
+        for inizio in range(0, len(righe_modificate), passo):
+            blocco = righe_modificate[inizio:inizio + passo]
+            similarita = vettori[blocco] @ vettori.T
+            similarita[np.arange(len(blocco)), blocco] = -np.inf
+            massimo = np.maximum(massimo, similarita.max(axis=0))
+        da_ricalcolare.update(int(ids[i]) for i in np.nonzero(massimo > soglia)[0])
+
+    return sorted(posizione_id[id_prodotto] for id_prodotto in da_ricalcolare if id_prodotto in posizione_id)
+
+
+def _salva(ids, risultati):
+    """Sostituisce i vicini salvati dei prodotti ricalcolati"""
+    id_prodotti = [int(ids[riga]) for riga, _, _ in risultati]
+    nuovi = [
+        ProdottoCorrelato(
+            prodotto_id=int(ids[riga]), correlato_id=int(ids[vicino]),
+            posizione=posizione, punteggio=float(punteggio),
+        )
+        for riga, vicini, punteggi in risultati
+        for posizione, (vicino, punteggio) in enumerate(zip(vicini, punteggi))
+    ]
+    with transaction.atomic():
+        ProdottoCorrelato.objects.filter(prodotto_id__in=id_prodotti).delete()
+        ProdottoCorrelato.objects.bulk_create(nuovi, batch_size=1000)
+
+
+def aggiorna_correlati(completo=False, k=VICINI, lotto=500):
+    """
+    Aggiorna l'indice dei prodotti correlati.
+
+    Args:
+        completo (bool): ricalcola tutti i prodotti invece dei soli modificati.
+        k (int): numero di vicini per prodotto.
+        lotto (int): prodotti salvati per transazione.
+
+    Returns:
+        CalcoloCorrelati: l'esecuzione registrata.
+    """
+    ultimo = CalcoloCorrelati.objects.filter(data_fine__isnull=False).first()
+    calcolo = CalcoloCorrelati.objects.create(data_inizio=timezone.now(), completo=completo or ultimo is None)
+
+    ids, vettori = codifica_prodotti()
+    if calcolo.completo:
+        righe = list(range(len(ids)))
+    else:
+        righe = _righe_da_ricalcolare(ids, vettori, ultimo, k)
+
+    risultati = []
+    for risultato in calcola_vicini(vettori, righe, k):
+        risultati.append(risultato)
+        if len(risultati) >= lotto:
+            _salva(ids, risultati)
+            risultati = []
+    if risultati:
+        _salva(ids, risultati)
+
+    calcolo.data_fine = timezone.now()
+    calcolo.prodotti_ricalcolati = len(righe)
+    calcolo.save(update_fields=['data_fine', 'prodotti_ricalcolati'])
+    return calcolo
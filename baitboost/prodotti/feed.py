@@ -0,0 +1,174 @@
+"""
+Feed delle modifiche al catalogo per la rivalidazione incrementale del frontend.
+
+Il cursore è opaco per il client: codifica, per prodotti, categorie e brand, la
+coppia (data_aggiornamento, id) dell'ultimo elemento restituito e l'id
+dell'ultima eliminazione. Ogni pagina è una scansione dell'indice
+(data_aggiornamento, id), quindi il costo dipende dal numero di modifiche e non
+dalla dimensione del catalogo.
+
+Le tracce delle eliminazioni sono conservate per FEED_ELIMINAZIONI_CONSERVAZIONE_GIORNI:
+il cursore ricorda anche quando è stato letto, e se è più vecchio della conservazione
+la risposta chiede al client di ricaricare il catalogo completo.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Brand, Categoria, Eliminazione, Product
+
+DIMENSIONE_LOTTO = 1000
+
+
+class CursoreNonValido(ValueError):
+    """Cursore del feed non decodificabile"""
+
+
+def codifica_cursore(posizioni):
+    testo = json.dumps(posizioni, separators=(',', ':'))
+    return base64.urlsafe_b64encode(testo.encode()).decode().rstrip('=')
+
+
+def decodifica_cursore(cursore):
+    if not cursore:
+        return {}
+    try:
+        testo = base64.urlsafe_b64decode(cursore + '=' * (-len(cursore) % 4)).decode()
+        posizioni = json.loads(testo)
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as errore:
+        raise CursoreNonValido('Cursore non valido') from errore
+    if not isinstance(posizioni, dict):
+        raise CursoreNonValido('Cursore non valido')
+    return posizioni
+
+
+def _modifiche(queryset, posizione, limite_data, limite, campi):
+    """
+    Restituisce gli elementi modificati dopo la posizione (data_aggiornamento, id).
+
+    Returns:
+        tuple: (elementi, nuova posizione, True se ci sono altri elementi).
+    """
+    queryset = queryset.filter(data_aggiornamento__lte=limite_data)
+    if posizione:
+        try:
+            data = datetime.fromisoformat(posizione[0])
+            int(posizione[1])
+        except (TypeError, ValueError, IndexError, KeyError) as errore:
+            raise CursoreNonValido('Cursore non valido') from errore
+        # Equivale a (data_aggiornamento, id) > (data, id) ma resta una scansione di intervallo sull'indice
+        queryset = queryset.filter(data_aggiornamento__gte=data).exclude(
+            data_aggiornamento=data, id__lte=posizione[1]
+        )
+    righe = list(queryset.order_by('data_aggiornamento', 'id').values(*campi)[:limite + 1])
+    altri = len(righe) > limite
+    righe = righe[:limite]
+    if righe:
+        posizione = [righe[-1]['data_aggiornamento'].isoformat(), righe[-1]['id']]
+    return righe, posizione, altri
+
+
+def _id_eliminazione(valore):
+    if not isinstance(valore, int):
+        raise CursoreNonValido('Cursore non valido')
+    return valore
+
+
+def _scaduto(letto):
+    """True se il cursore è stato letto prima dell'inizio della conservazione delle eliminazioni"""
+    if letto is None:
+        return False
+    try:
+        data = datetime.fromisoformat(letto)
+    except (TypeError, ValueError) as errore:
+        raise CursoreNonValido('Cursore non valido') from errore
+    return data < timezone.now() - timedelta(days=settings.FEED_ELIMINAZIONI_CONSERVAZIONE_GIORNI)
+
+
+def _tipo_prodotto(riga):
+    sottotipi = [tipo for tipo in ('mulinello', 'canna', 'esca') if riga.pop(tipo) is not None]
+    return sottotipi[0] if sottotipi else 'prodotto'
+
+
+def leggi_modifiche(cursore=None, limite=200):
+    """
+    Restituisce una pagina del feed delle modifiche.
+
+    Args:
+        cursore (str): cursore restituito dalla pagina precedente (None = dall'inizio).
+        limite (int): elementi massimi per tipo.
+
+    Returns:
+        dict: prodotti, categorie, brand ed eliminati cambiati dopo il cursore,
+        il nuovo cursore, il flag ``altri`` se conviene richiedere subito un'altra pagina
+        e il flag ``ricarica`` se il cursore è più vecchio delle eliminazioni conservate.
+    """
+    posizioni = decodifica_cursore(cursore)
+    ricarica = _scaduto(posizioni.get('letto'))
+    # Reason: una transazione iniziata prima può ancora fare commit con una
+    # data_aggiornamento precedente; il margine evita di saltare quelle modifiche
+    limite_data = timezone.now() - timedelta(seconds=settings.FEED_MARGINE_SECONDI)
+    posizioni['letto'] = limite_data.isoformat()
+
+    prodotti, posizioni['prodotti'], altri_prodotti = _modifiche(
+        Product.objects.all(), posizioni.get('prodotti'), limite_data, limite,
+        ['id', 'slug', 'in_vendita', 'categoria__slug', 'brand__slug', 'data_aggiornamento',
+         'mulinello', 'canna', 'esca']
+    )
+    for riga in prodotti:
+        riga['tipo'] = _tipo_prodotto(riga)
+
+    categorie, posizioni['categorie'], altre_categorie = _modifiche(
+        Categoria.objects.all(), posizioni.get('categorie'), limite_data, limite,
+        ['id', 'slug', 'parent__slug', 'data_aggiornamento']
+    )
+    brand, posizioni['brand'], altri_brand = _modifiche(
+        Brand.objects.all(), posizioni.get('brand'), limite_data, limite,
+        ['id', 'slug', 'data_aggiornamento']
+    )
+
+    eliminati = list(
+        Eliminazione.objects.filter(
+            id__gt=_id_eliminazione(posizioni.get('eliminati', 0)), data_eliminazione__lte=limite_data
+        ).order_by('id').values('id', 'tipo', 'oggetto_id', 'slug', 'data_eliminazione')[:limite + 1]
+    )
+    altri_eliminati = len(eliminati) > limite
+    eliminati = eliminati[:limite]
+    if eliminati:
+        posizioni['eliminati'] = eliminati[-1]['id']
+
+    return {
+        'prodotti': prodotti,
+        'categorie': categorie,
+        'brand': brand,
+        'eliminati': eliminati,
+        'cursore': codifica_cursore(posizioni),
+        'altri': altri_prodotti or altre_categorie or altri_brand or altri_eliminati,
+        'ricarica': ricarica,
+    }
+
+
+def pulisci_eliminazioni(giorni=None, using=None):
+    """
+    Elimina a lotti le tracce delle eliminazioni più vecchie di ``giorni`` giorni.
+
+    Returns:
+        int: tracce eliminate.
+    """
+    giorni = settings.FEED_ELIMINAZIONI_CONSERVAZIONE_GIORNI if giorni is None else giorni
+    limite = timezone.now() - timedelta(days=giorni)
+    eliminate = 0
+    while True:
+        id_tracce = list(
+            Eliminazione.objects.using(using).filter(data_eliminazione__lt=limite)
+            .order_by('id').values_list('id', flat=True)[:DIMENSIONE_LOTTO]
+        )
+        if not id_tracce:
+            return eliminate
+        with transaction.atomic(using=using):
+            eliminate += Eliminazione.objects.using(using).filter(id__in=id_tracce).delete()[0]
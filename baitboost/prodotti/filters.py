@@ -1,9 +1,40 @@
 from django import forms
-from django.db.models import Q, F
+from django.db.models import Count, F, Q
 from django.utils import timezone
 from django_filters import rest_framework as filters
 
-from .models import Product, Mulinello, Canna, Esca, Categoria, Brand
+from .models import Product, Mulinello, Canna, Esca, SchedaProdotto
+from . import riferimenti
+
+
+class TagFilter(filters.BaseInFilter, filters.CharFilter):
+    """
+    Filtro su un campo di tag (vedi prodotti/tag.py) per slug esatto; più slug separati
+    da virgola selezionano i prodotti con almeno uno dei tag (?colore=rosso,argento).
+    Cerca nella tabella di associazione con una sottoquery, senza join sui prodotti
+    né DISTINCT, ed espone i conteggi per tag usati dalle faccette.
+    """
+
+    def _associazioni(self, modello):
+        campo = modello._meta.get_field(self.field_name)
+        return campo.remote_field.through, campo.m2m_field_name(), campo.m2m_reverse_field_name()
+
+    def filter(self, qs, value):
+        if not value:
+            return qs
+        associazione, colonna_oggetto, colonna_tag = self._associazioni(qs.model)
+        return qs.filter(pk__in=associazione.objects.filter(
+            **{f'{colonna_tag}__slug__in': value}
+        ).values(colonna_oggetto))
+
+    def conteggi(self, queryset):
+        """Tag presenti nei prodotti del queryset con il numero di prodotti, dal più frequente"""
+        associazione, colonna_oggetto, colonna_tag = self._associazioni(queryset.model)
+        return list(associazione.objects.filter(
+            **{f'{colonna_oggetto}__in': queryset.values('pk')}
+        ).values(
+            slug=F(f'{colonna_tag}__slug'), nome=F(f'{colonna_tag}__nome')
+        ).annotate(conteggio=Count('pk')).order_by('-conteggio', 'nome'))
 
 
 class ProductFilter(filters.FilterSet):
@@ -16,16 +47,20 @@ class ProductFilter(filters.FilterSet):
     
     # Filtri sui campi comuni
     nome = filters.CharFilter(lookup_expr='icontains', label='Nome')
-    categoria = filters.ModelChoiceFilter(queryset=Categoria.objects.all(), label='Categoria')
-    categorie = filters.ModelMultipleChoiceFilter(
-        queryset=Categoria.objects.all(),
+    # Reason: le scelte vengono dalla cache dei dati di riferimento, la validazione
+    # degli id non interroga le tabelle di categorie e brand
+    categoria = filters.ChoiceFilter(choices=riferimenti.scelte_categorie, label='Categoria')
+    categorie = filters.MultipleChoiceFilter(
+        choices=riferimenti.scelte_categorie,
         field_name='categoria',
+        distinct=False,
         label='Categorie (multiple)'
     )
-    brand = filters.ModelChoiceFilter(queryset=Brand.objects.all(), label='Brand')
-    brands = filters.ModelMultipleChoiceFilter(
-        queryset=Brand.objects.all(),
+    brand = filters.ChoiceFilter(choices=riferimenti.scelte_brand, label='Brand')
+    brands = filters.MultipleChoiceFilter(
+        choices=riferimenti.scelte_brand,
         field_name='brand',
+        distinct=False,
         label='Brands (multiple)'
     )
     
@@ -33,6 +68,7 @@ class ProductFilter(filters.FilterSet):
     prezzo_min = filters.NumberFilter(field_name='prezzo', lookup_expr='gte', label='Prezzo minimo')
     prezzo_max = filters.NumberFilter(field_name='prezzo', lookup_expr='lte', label='Prezzo massimo')
     in_sconto = filters.BooleanFilter(method='filter_in_sconto', label='In sconto')
+    sconto_min = filters.NumberFilter(field_name='sconto_percentuale', lookup_expr='gte', label='Sconto minimo (%)')
     
     # Filtri sulla disponibilità
     disponibile = filters.BooleanFilter(method='filter_disponibile', label='Disponibile')
@@ -47,7 +83,7 @@ class ProductFilter(filters.FilterSet):
         model = Product
         fields = [
             'nome', 'categoria', 'brand', 'prezzo_min', 'prezzo_max', 
-            'in_sconto', 'disponibile', 'nuovo', 'usato', 'in_evidenza'
+            'in_sconto', 'sconto_min', 'disponibile', 'nuovo', 'usato', 'in_evidenza'
         ]
     
     def filter_query(self, queryset, name, value):
@@ -68,7 +104,7 @@ class ProductFilter(filters.FilterSet):
     def filter_in_sconto(self, queryset, name, value):
         """Filtra prodotti in sconto"""
         if value:
-            return queryset.filter(prezzo_scontato__isnull=False).filter(prezzo_scontato__lt=models.F('prezzo'))
+            return queryset.filter(in_offerta=True)
         return queryset
     
     def filter_disponibile(self, queryset, name, value):
@@ -127,7 +163,7 @@ class CannaFilter(ProductFilter):
         choices=Canna._meta.get_field('azione').choices,
         label='Azione della canna'
     )
-    materiale = filters.CharFilter(field_name='materiale', lookup_expr='icontains', label='Materiale')
+    materiale = TagFilter(field_name='materiali', label='Materiali (slug separati da virgola)')
     ingombro_max = filters.NumberFilter(field_name='ingombro', lookup_expr='lte', label='Ingombro massimo (cm)')
     
     # Filtri per potenza di lancio
@@ -223,11 +259,11 @@ class EscaFilter(ProductFilter):
     lunghezza_max = filters.NumberFilter(field_name='lunghezza_esca', lookup_expr='lte', label='Lunghezza massima (cm)')
     peso_min = filters.NumberFilter(field_name='peso_esca', lookup_expr='gte', label='Peso minimo (g)')
     peso_max = filters.NumberFilter(field_name='peso_esca', lookup_expr='lte', label='Peso massimo (g)')
-    profondita = filters.CharFilter(field_name='profondita_lavoro', lookup_expr='icontains', label='Profondità di lavoro')
-    colore = filters.CharFilter(field_name='colore', lookup_expr='icontains', label='Colore')
+    profondita = TagFilter(field_name='fasce_profondita', label='Fasce di profondità (slug separati da virgola)')
+    colore = TagFilter(field_name='colori', label='Colori (slug separati da virgola)')
     galleggiante = filters.BooleanFilter(field_name='galleggiante', label='Galleggiante')
     rattlin = filters.BooleanFilter(field_name='rattlin', label='Con suoni/vibrazioni')
-    specie_target = filters.CharFilter(field_name='specie_target', lookup_expr='icontains', label='Specie target')
+    specie_target = TagFilter(field_name='specie', label='Specie target (slug separati da virgola)')
     
     class Meta(ProductFilter.Meta):
         model = Esca
@@ -236,3 +272,51 @@ class EscaFilter(ProductFilter):
             'lunghezza_max', 'peso_min', 'peso_max', 'profondita',
             'colore', 'galleggiante', 'rattlin', 'specie_target'
         ]
+
+
+class SchedaProdottoFilter(filters.FilterSet):
+    """
+    Filtri comuni dei prodotti applicati alle schede denormalizzate.
+    Gli stessi nomi di ProductFilter, ma ogni filtro è una condizione sulla sola tabella delle schede.
+    """
+    nome = filters.CharFilter(lookup_expr='icontains', label='Nome')
+    categoria = filters.ChoiceFilter(
+        field_name='categoria_id', choices=riferimenti.scelte_categorie, label='Categoria'
+    )
+    categorie = filters.MultipleChoiceFilter(
+        field_name='categoria_id', choices=riferimenti.scelte_categorie, distinct=False,
+        label='Categorie (multiple)'
+    )
+    brand = filters.ChoiceFilter(field_name='brand_id', choices=riferimenti.scelte_brand, label='Brand')
+    brands = filters.MultipleChoiceFilter(
+        field_name='brand_id', choices=riferimenti.scelte_brand, distinct=False, label='Brands (multiple)'
+    )
+    prezzo_min = filters.NumberFilter(field_name='prezzo', lookup_expr='gte', label='Prezzo minimo')
+    prezzo_max = filters.NumberFilter(field_name='prezzo', lookup_expr='lte', label='Prezzo massimo')
+    in_sconto = filters.BooleanFilter(method='filter_vero', field_name='in_offerta', label='In sconto')
+    sconto_min = filters.NumberFilter(field_name='sconto_percentuale', lookup_expr='gte', label='Sconto minimo (%)')
+    disponibile = filters.BooleanFilter(method='filter_disponibile', label='Disponibile')
+    nuovo = filters.BooleanFilter(field_name='nuovo', label='Nuovo')
+    usato = filters.BooleanFilter(field_name='usato', label='Usato')
+    in_evidenza = filters.BooleanFilter(field_name='in_evidenza', label='In evidenza')
+    recente = filters.BooleanFilter(method='filter_recente', label='Prodotti recenti')
+
+    class Meta:
+        model = SchedaProdotto
+        fields = []
+
+    def filter_vero(self, queryset, name, value):
+        """Come in ProductFilter, il valore falso non filtra"""
+        if value:
+            return queryset.filter(**{name: True})
+        return queryset
+
+    def filter_disponibile(self, queryset, name, value):
+        if value:
+            return queryset.filter(quantita_disponibile__gt=0)
+        return queryset
+
+    def filter_recente(self, queryset, name, value):
+        if value:
+            return queryset.filter(data_creazione__gte=timezone.now() - timezone.timedelta(days=30))
+        return queryset
@@ -0,0 +1,87 @@
+"""
+Snapshot precalcolato della homepage.
+
+Le sezioni della home (in evidenza, nuovi arrivi, migliori offerte, albero
+delle categorie, brand) vengono serializzate una volta sola in un JSON salvato
+in cache: servire la home costa una lettura di cache. Quando un prodotto,
+un'immagine, una categoria o un brand cambiano, i segnali accodano nella stessa
+transazione un compito di ricostruzione sulla coda (coda/), deduplicato per
+chiave e ritardato di HOME_RITARDO_SECONDI; nel frattempo resta servito lo
+snapshot precedente. Anche le modifiche alle promozioni programmano una
+ricostruzione (carrello/signals.py). Gli aggiornamenti che non inviano segnali,
+e le promozioni che iniziano o finiscono per data, vengono recuperati alla
+scadenza di HOME_TTL.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from carrello.promozioni import prezzi_promozionali_per_id
+
+from .models import Brand, Categoria, Product
+from .serializers import BrandSerializer, CategoriaSerializer, ProductSerializer
+
+CHIAVE_CACHE = 'prodotti:home'
+CHIAVE_COMPITO = 'home-snapshot'
+PRODOTTI_PER_SEZIONE = 12
+
+
+def _prodotti(queryset):
+    queryset = queryset.select_related('categoria', 'brand').prefetch_related('immagini')
+    prodotti = list(queryset[:PRODOTTI_PER_SEZIONE])
+    promozioni = prezzi_promozionali_per_id(prodotto.pk for prodotto in prodotti)
+    return ProductSerializer(prodotti, many=True, context={'promozioni': promozioni}).data
+
+
+def _albero_categorie():
+    """Categorie annidate sotto il rispettivo parent, con una sola query"""
+    nodi = {}
+    radici = []
+    categorie = Categoria.objects.order_by('ordine', 'nome')
+    for categoria in categorie:
+        nodi[categoria.pk] = {**CategoriaSerializer(categoria).data, 'sottocategorie': []}
+    for categoria in categorie:
+        figli = nodi[categoria.parent_id]['sottocategorie'] if categoria.parent_id in nodi else radici
+        figli.append(nodi[categoria.pk])
+    return radici
+
+
+def costruisci_snapshot():
+    """
+    Costruisce lo snapshot della home e lo salva in cache.
+
+    Returns:
+        bytes: il JSON della home.
+    """
+    in_vendita = Product.objects.filter(in_vendita=True)
+    dati = {
+        'in_evidenza': _prodotti(in_vendita.filter(in_evidenza=True).order_by('-data_creazione')),
+        'nuovi_arrivi': _prodotti(in_vendita.order_by('-data_creazione')),
+        # Stesso ordinamento di migliori_offerte, letto dall'indice prodotto_offerte_idx
+        'in_sconto': _prodotti(in_vendita.filter(in_offerta=True).order_by('-sconto_percentuale', 'id')),
+        'categorie': _albero_categorie(),
+        'brand': BrandSerializer(Brand.objects.order_by('nome'), many=True).data,
+        'generato_il': timezone.now(),
+    }
+    contenuto = JSONRenderer().render(dati)
+    cache.set(CHIAVE_CACHE, contenuto, settings.HOME_TTL)
+    return contenuto
+
+
+def leggi_home():
+    """Restituisce il JSON della home dalla cache, costruendolo solo se manca"""
+    contenuto = cache.get(CHIAVE_CACHE)
+    if contenuto is None:
+        contenuto = costruisci_snapshot()
+    return contenuto
+
+
+def programma_ricostruzione(using=DEFAULT_DB_ALIAS):
+    """
+    Accoda la ricostruzione dello snapshot. Le modifiche ravvicinate (es. salvataggi in admin
+    con più immagini) trovano il compito già in attesa con la stessa chiave e non ne creano altri.
+    """
+    from .compiti import ricostruisci_snapshot_home
+    ricostruisci_snapshot_home.accoda(chiave=CHIAVE_COMPITO, ritardo=settings.HOME_RITARDO_SECONDI, using=using)
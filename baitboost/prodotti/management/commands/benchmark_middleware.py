@@ -0,0 +1,59 @@
+import statistics
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from rest_framework.views import APIView
+
+# Middleware di Django sostituiti dalle versioni del percorso leggero (baitboost/leggero.py)
+ORIGINALI = {
+    'baitboost.leggero.SessionMiddlewareLeggero': 'django.contrib.sessions.middleware.SessionMiddleware',
+    'baitboost.leggero.CsrfViewMiddlewareLeggero': 'django.middleware.csrf.CsrfViewMiddleware',
+    'baitboost.leggero.AuthenticationMiddlewareLeggero': 'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'baitboost.leggero.MessageMiddlewareLeggero': 'django.contrib.messages.middleware.MessageMiddleware',
+}
+MARCATORE = 'baitboost.leggero.PercorsoLeggeroMiddleware'
+
+
+class Command(BaseCommand):
+    """
+    Misura il tempo per richiesta delle letture anonime delle API con lo stack di
+    middleware completo di Django e con il percorso leggero.
+    """
+    help = 'Confronta il costo per richiesta dello stack di middleware completo e del percorso leggero'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--richieste', type=int, default=500, help='Richieste per URL e configurazione')
+        parser.add_argument('--url', action='append',
+                            help='URL da chiamare (ripetibile, default: /api/home/ e /api/prodotti/)')
+
+    def handle(self, *args, **options):
+        urls = options['url'] or ['/api/home/', '/api/prodotti/']
+        completo = [ORIGINALI.get(percorso, percorso) for percorso in settings.MIDDLEWARE if percorso != MARCATORE]
+        configurazioni = [('completo', completo), ('leggero', settings.MIDDLEWARE)]
+        for url in urls:
+            risultati = {}
+            for nome, middleware in configurazioni:
+                # Senza limitazione per client: tutte le richieste arrivano dallo stesso IP
+                with override_settings(MIDDLEWARE=middleware, ALLOWED_HOSTS=['testserver']), \
+                        mock.patch.object(APIView, 'throttle_classes', []):
+                    risultati[nome] = self._misura(url, options['richieste'])
+            differenza = risultati['completo'] - risultati['leggero']
+            self.stdout.write(
+                f"{url}: completo {risultati['completo']:.0f} µs, leggero {risultati['leggero']:.0f} µs "
+                f"per richiesta ({differenza:.0f} µs risparmiati)"
+            )
+
+    def _misura(self, url, richieste):
+        """Mediana in microsecondi, dopo alcune richieste di riscaldamento"""
+        client = Client()
+        for _ in range(10):
+            client.get(url)
+        durate = []
+        for _ in range(richieste):
+            inizio = time.perf_counter()
+            client.get(url)
+            durate.append((time.perf_counter() - inizio) * 1000000)
+        return statistics.median(durate)
@@ -0,0 +1,146 @@
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from baitboost.sqlite_profile import TIMEOUT_SECONDI, applica_pragma
+from prodotti.models import Brand, Categoria, Product
+
+QUERY_LETTURA = (
+    'SELECT p.id, p.nome, p.prezzo, b.nome FROM prodotti_product p '
+    'JOIN prodotti_brand b ON b.id = p.brand_id '
+    'WHERE p.categoria_id = ? ORDER BY p.data_creazione DESC LIMIT 12'
+)
+
+
+class Command(BaseCommand):
+    """
+    Test di concorrenza su SQLite: lettori e scrittori in parallelo sulle tabelle prodotti.
+    Confronta la configurazione di default con il profilo di produzione
+    (vedi baitboost/sqlite_profile.py) e riporta throughput ed errori di lock.
+    """
+    help = 'Confronta throughput ed errori di lock di SQLite prima e dopo il profilo di produzione'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lettori', type=int, default=8, help='Thread lettori')
+        parser.add_argument('--scrittori', type=int, default=2, help='Thread scrittori')
+        parser.add_argument('--durata', type=float, default=5.0, help='Secondi per ogni profilo')
+        parser.add_argument('--prodotti', type=int, default=2000, help='Prodotti di prova da creare')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as cartella:
+            for profilo in ('default', 'produzione'):
+                percorso = Path(cartella) / f'benchmark_{profilo}.sqlite3'
+                categorie = self._prepara_database(percorso, options['prodotti'])
+                risultati = self._esegui(percorso, profilo, categorie, options)
+                self._stampa(profilo, risultati, options['durata'])
+
+    def _prepara_database(self, percorso, numero_prodotti):
+        """Crea un database temporaneo con lo schema reale e lo popola con prodotti di prova"""
+        alias = 'benchmark_sqlite'
+        connections.settings[alias] = {**connections['default'].settings_dict, 'NAME': str(percorso)}
+        try:
+            call_command('migrate', database=alias, verbosity=0)
+            categorie = Categoria.objects.using(alias).bulk_create(
+                Categoria(nome=f'Categoria {i}', slug=f'categoria-{i}') for i in range(10)
+            )
+            brand = Brand.objects.using(alias).create(nome='Benchmark', slug='benchmark')
+            Product.objects.using(alias).bulk_create(
+                (
+                    Product(
+                        nome=f'Prodotto {i}', slug=f'prodotto-{i}', codice_sku=f'BEN-{i:08d}',
+                        categoria_id=categorie[i % len(categorie)].pk, brand_id=brand.pk,
+                        descrizione_breve='Prodotto di prova', immagine_principale='prodotti/prova.jpg',
+                        prezzo=Decimal('19.90'), quantita_disponibile=100,
+                    )
+                    for i in range(numero_prodotti)
+                ),
+                batch_size=500,
+            )
+            return [categoria.pk for categoria in categorie]
+        finally:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+
+    def _connetti(self, percorso, profilo):
+        connessione = sqlite3.connect(percorso, timeout=TIMEOUT_SECONDI, isolation_level=None,
+                                      check_same_thread=False)
+        if profilo == 'produzione':
+            applica_pragma(connessione)
+        return connessione
+
+    def _esegui(self, percorso, profilo, categorie, options):
+        """Avvia lettori e scrittori per la durata richiesta e raccoglie i contatori"""
+        connessione = self._connetti(percorso, profilo)
+        id_prodotti = [riga[0] for riga in connessione.execute('SELECT id FROM prodotti_product')]
+        connessione.close()
+
+        fine = time.monotonic() + options['durata']
+        risultati = {'letture': 0, 'scritture': 0, 'errori_lettura': 0, 'errori_scrittura': 0}
+        lock = threading.Lock()
+        inizio_scrittura = 'BEGIN IMMEDIATE' if profilo == 'produzione' else 'BEGIN'
+
+        def lettore():
+            connessione = self._connetti(percorso, profilo)
+            letture = errori = 0
+            while time.monotonic() < fine:
+                try:
+                    connessione.execute(QUERY_LETTURA, (random.choice(categorie),)).fetchall()
+                    letture += 1
+                except sqlite3.OperationalError:
+                    errori += 1
+            connessione.close()
+            with lock:
+                risultati['letture'] += letture
+                risultati['errori_lettura'] += errori
+
+        def scrittore():
+            connessione = self._connetti(percorso, profilo)
+            scritture = errori = 0
+            while time.monotonic() < fine:
+                id_prodotto = random.choice(id_prodotti)
+                try:
+                    # Come Model.save(): lettura e poi scrittura nella stessa transazione
+                    connessione.execute(inizio_scrittura)
+                    connessione.execute(
+                        'SELECT quantita_disponibile FROM prodotti_product WHERE id = ?', (id_prodotto,)
+                    ).fetchone()
+                    connessione.execute(
+                        'UPDATE prodotti_product SET quantita_disponibile = quantita_disponibile + 1 '
+                        'WHERE id = ?', (id_prodotto,)
+                    )
+                    connessione.execute('COMMIT')
+                    scritture += 1
+                except sqlite3.OperationalError:
+                    errori += 1
+                    if connessione.in_transaction:
+                        connessione.execute('ROLLBACK')
+            connessione.close()
+            with lock:
+                risultati['scritture'] += scritture
+                risultati['errori_scrittura'] += errori
+
+        threads = [threading.Thread(target=lettore) for _ in range(options['lettori'])]
+        threads += [threading.Thread(target=scrittore) for _ in range(options['scrittori'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return risultati
+
+    def _stampa(self, profilo, risultati, durata):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Profilo {profilo}'))
+        self.stdout.write(
+            f"  letture:   {risultati['letture'] / durata:10.1f}/s  errori di lock: {risultati['errori_lettura']}"
+        )
+        self.stdout.write(
+            f"  scritture: {risultati['scritture'] / durata:10.1f}/s  errori di lock: {risultati['errori_scrittura']}"
+        )
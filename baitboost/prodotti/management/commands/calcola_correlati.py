@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from prodotti.correlati import VICINI, aggiorna_correlati
+
+
+class Command(BaseCommand):
+    """
+    Aggiorna l'indice dei prodotti correlati.
+    Di default ricalcola solo i prodotti cambiati dall'ultima esecuzione.
+    """
+    help = 'Calcola i prodotti simili per ogni prodotto del catalogo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--completo', action='store_true', help='Ricalcola tutto il catalogo')
+        parser.add_argument('--vicini', type=int, default=VICINI, help='Prodotti correlati per prodotto')
+
+    def handle(self, *args, **options):
+        calcolo = aggiorna_correlati(completo=options['completo'], k=options['vicini'])
+        durata = (calcolo.data_fine - calcolo.data_inizio).total_seconds()
+        tipo = 'completo' if calcolo.completo else 'incrementale'
+        self.stdout.write(self.style.SUCCESS(
+            f'Calcolo {tipo}: {calcolo.prodotti_ricalcolati} prodotti ricalcolati in {durata:.1f}s'
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from prodotti.prezzi import compatta_storico
+
+
+class Command(BaseCommand):
+    """
+    Elimina le righe dello storico prezzi che non servono più al calcolo del minimo dei 30 giorni.
+    Le variazioni di prezzo accodano già la compattazione; il comando serve per lanci manuali o da cron.
+    """
+    help = 'Compatta lo storico dei prezzi dei prodotti'
+
+    def handle(self, *args, **options):
+        eliminate = compatta_storico()
+        self.stdout.write(self.style.SUCCESS(f'{eliminate} righe di storico eliminate'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from prodotti.sitemap import aggiorna_sitemap
+
+
+class Command(BaseCommand):
+    """
+    Aggiorna gli shard della sitemap su disco.
+    Di default rigenera solo gli shard con prodotti modificati.
+    """
+    help = 'Genera la sitemap del catalogo divisa in shard'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--completa', action='store_true', help='Rigenera tutti gli shard')
+
+    def handle(self, *args, **options):
+        rigenerate = aggiorna_sitemap(completa=options['completa'])
+        if rigenerate:
+            self.stdout.write(self.style.SUCCESS(f'Shard rigenerati: {", ".join(rigenerate)}'))
+        else:
+            self.stdout.write('Nessuno shard da rigenerare')
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from prodotti.caricamenti import pulisci_caricamenti_abbandonati
+
+
+class Command(BaseCommand):
+    """
+    Annulla i caricamenti a parti rimasti fermi ed elimina le parti dallo storage.
+    Pensato per essere eseguito periodicamente (es. da cron).
+    """
+    help = 'Elimina i caricamenti di immagini abbandonati'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ore', type=int, help='Ore di inattività (default: CARICAMENTI_SCADENZA_ORE)')
+
+    def handle(self, *args, **options):
+        annullati = pulisci_caricamenti_abbandonati(options['ore'])
+        self.stdout.write(self.style.SUCCESS(f'Caricamenti annullati: {annullati}'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from prodotti.feed import pulisci_eliminazioni
+
+
+class Command(BaseCommand):
+    """
+    Elimina le tracce delle eliminazioni più vecchie della conservazione del feed delle modifiche.
+    Le eliminazioni accodano già la pulizia; il comando serve per lanci manuali o da cron.
+    """
+    help = 'Elimina le tracce delle eliminazioni scadute dal feed delle modifiche'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--giorni', type=int, help='Giorni di conservazione (default: FEED_ELIMINAZIONI_CONSERVAZIONE_GIORNI)'
+        )
+
+    def handle(self, *args, **options):
+        eliminate = pulisci_eliminazioni(options['giorni'])
+        self.stdout.write(self.style.SUCCESS(f'{eliminate} tracce di eliminazione rimosse'))
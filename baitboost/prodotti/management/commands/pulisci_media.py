@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from baitboost.storage import storage_contenuti
+from prodotti.media import DIMENSIONE_LOTTO, raccogli_blob, ricalcola_riferimenti
+
+
+class Command(BaseCommand):
+    """
+    Elimina dallo storage indirizzato per contenuto i file non più usati da nessun modello.
+    Pensato per essere eseguito periodicamente (es. da cron).
+    """
+    help = 'Elimina i file media senza riferimenti'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ricalcola', action='store_true',
+                            help='Ricalcola i riferimenti dai modelli prima della raccolta')
+        parser.add_argument('--grazia-ore', type=float, default=1,
+                            help='Età minima in ore dei file da eliminare (default: 1)')
+        parser.add_argument('--lotto', type=int, default=DIMENSIONE_LOTTO, help='File per transazione')
+
+    def handle(self, *args, **options):
+        if options['ricalcola']:
+            aggiornati = ricalcola_riferimenti()
+            self.stdout.write(f'Riferimenti ricalcolati per {aggiornati} blob')
+        eliminati, liberati = raccogli_blob(
+            storage_contenuti(), grazia=timedelta(hours=options['grazia_ore']), lotto=options['lotto']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Blob eliminati: {eliminati} ({liberati / 1024 / 1024:.1f} MiB liberati)'
+        ))
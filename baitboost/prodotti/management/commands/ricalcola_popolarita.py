@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from prodotti.popolarita import buffer_visite, ricalcola_popolarita
+
+
+class Command(BaseCommand):
+    """
+    Ricalcola la popolarità dei prodotti dalle visite giornaliere.
+    Le scritture delle visite accodano già il ricalcolo; il comando serve a farlo
+    decadere anche nei giorni senza visite (es. da cron una volta al giorno).
+    """
+    help = 'Ricalcola i punteggi di popolarità dei prodotti'
+
+    def handle(self, *args, **options):
+        buffer_visite.svuota()
+        risultato = ricalcola_popolarita()
+        self.stdout.write(self.style.SUCCESS(
+            f"{risultato['aggiornati']} prodotti aggiornati, {risultato['visite_eliminate']} visite eliminate"
+        ))
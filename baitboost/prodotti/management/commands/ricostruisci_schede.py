@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from prodotti.schede import ricostruisci_schede, verifica_schede
+
+
+class Command(BaseCommand):
+    """
+    Ricostruisce le schede prodotto denormalizzate dalle tabelle di origine,
+    oppure le confronta con esse. Da eseguire dopo la migrazione che crea la tabella
+    e dopo modifiche fatte con SQL diretto.
+    """
+    help = 'Ricostruisce o verifica le schede prodotto'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verifica', action='store_true',
+                            help='Confronta le schede con i prodotti senza modificarle')
+        parser.add_argument('--correggi', action='store_true',
+                            help='Confronta le schede e riscrive solo quelle errate, mancanti od orfane')
+
+    def handle(self, *args, **options):
+        if options['verifica'] or options['correggi']:
+            risultato = verifica_schede(correggi=options['correggi'])
+            messaggio = 'Schede mancanti: {mancanti}, diverse: {diverse}, orfane: {orfane}'.format(**risultato)
+            if any(risultato.values()) and not options['correggi']:
+                self.stdout.write(self.style.WARNING(messaggio))
+            else:
+                self.stdout.write(self.style.SUCCESS(messaggio))
+            return
+        totale = ricostruisci_schede()
+        self.stdout.write(self.style.SUCCESS(f'Schede ricostruite: {totale}'))
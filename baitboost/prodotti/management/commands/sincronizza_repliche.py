@@ -0,0 +1,38 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    """
+    Copia il database primario SQLite nelle repliche SQLite locali.
+    Serve a simulare le repliche in sviluppo: tra una sincronizzazione e l'altra
+    le repliche restano indietro, come una replica reale in ritardo.
+    """
+    help = 'Copia il database SQLite primario nei file delle repliche locali'
+
+    def handle(self, *args, **options):
+        repliche = settings.DATABASE_REPLICAS
+        if not repliche:
+            raise CommandError('Nessuna replica configurata (BAITBOOST_SQLITE_REPLICAS)')
+
+        primario = settings.DATABASES['default']
+        if primario['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('La sincronizzazione locale funziona solo con SQLite')
+
+        # Chiudiamo le connessioni Django per non tenere lock sui file
+        connections.close_all()
+        sorgente = sqlite3.connect(primario['NAME'])
+        try:
+            for alias in repliche:
+                destinazione = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+                try:
+                    # L'API di backup copia in modo consistente anche con scritture in corso
+                    sorgente.backup(destinazione)
+                finally:
+                    destinazione.close()
+                self.stdout.write(self.style.SUCCESS(f'Replica {alias} sincronizzata'))
+        finally:
+            sorgente.close()
@@ -0,0 +1,311 @@
+import json
+import random
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+MIX_DEFAULT = 'lista=35,filtri=20,sottotipi=15,dettaglio=20,ricerca=8,scrittura=2'
+
+# Filtri dei sottotipi con valori plausibili per ogni endpoint
+FILTRI_SOTTOTIPI = {
+    'mulinelli': [
+        {'cuscinetti_min': ['4', '6', '8']},
+        {'peso_max': ['250', '300', '400']},
+        {'bobina_di_ricambio': ['true']},
+        {'freno_min': ['5', '8', '12']},
+    ],
+    'canne': [
+        {'lunghezza_min': ['1.8', '2.1', '2.4']},
+        {'lunghezza_max': ['2.7', '3.0', '3.6']},
+        {'materiale': ['carbonio', 'fibra-di-vetro', 'carbonio,fibra-di-vetro']},
+        {'potenza_min': ['5', '10', '20']},
+    ],
+    'esche': [
+        {'galleggiante': ['true', 'false']},
+        {'peso_max': ['10', '20', '40']},
+        {'colore': ['rosso', 'argento', 'verde']},
+        {'specie_target': ['spigola', 'luccio', 'trota', 'spigola,trota']},
+    ],
+}
+ORDINAMENTI = ['prezzo', '-prezzo', 'nome', '-data_creazione', '-sconto_percentuale', 'brand__nome', '-popolarita']
+PAROLE_RICERCA = ['mulinello', 'canna', 'esca', 'spinning', 'carbonio', 'trota', 'spigola', 'shimano', 'rapala']
+
+
+class Risultati:
+    """Durate ed esiti raccolti dagli utenti virtuali, per scenario"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durate = defaultdict(list)
+        self.errori = defaultdict(int)
+        self.limitate = defaultdict(int)
+
+    def registra(self, scenario, durata_ms, stato):
+        with self._lock:
+            self.durate[scenario].append(durata_ms)
+            if stato == 429:
+                self.limitate[scenario] += 1
+            elif stato is None or stato >= 500:
+                self.errori[scenario] += 1
+
+
+class Command(BaseCommand):
+    """
+    Generatore di carico con un mix realistico di traffico del negozio, da lanciare
+    contro un server già avviato (runserver, gunicorn, ...) per trovare il punto di
+    saturazione e confrontare configurazioni di deploy diverse.
+
+    Ogni utente virtuale è un thread che sceglie lo scenario secondo i pesi del mix,
+    fa la richiesta e aspetta il tempo di riflessione. Ogni utente usa un proprio
+    X-Forwarded-For, così la limitazione per client lo tratta come un visitatore
+    distinto: il server va avviato con BAITBOOST_NUM_PROXIES=1, altrimenti l'header è
+    ignorato e tutti gli utenti virtuali condividono il bucket di 127.0.0.1.
+
+    Le scritture e le metriche del server (api/metriche/) richiedono un token API
+    di un utente staff con scope di scrittura; senza token le scritture sono saltate.
+    Le metriche del server sono quelle del solo worker che risponde: sono complete con
+    un unico processo (runserver o gunicorn con un worker a thread).
+    """
+    help = 'Genera carico concorrente sul server con un mix configurabile di letture e scritture'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url-base', default='http://127.0.0.1:8000', help='Indirizzo del server')
+        parser.add_argument('--utenti', type=int, default=20, help='Utenti virtuali concorrenti')
+        parser.add_argument('--durata', type=float, default=30, help='Durata della prova in secondi')
+        parser.add_argument('--mix', default=MIX_DEFAULT,
+                            help=f'Pesi degli scenari, es. "{MIX_DEFAULT}"')
+        parser.add_argument('--pensiero', type=float, default=0.0,
+                            help='Pausa media tra due richieste dello stesso utente, in secondi')
+        parser.add_argument('--token', help='Token API staff con scope di scrittura (Bearer)')
+        parser.add_argument('--timeout', type=float, default=30, help='Timeout di ogni richiesta in secondi')
+        parser.add_argument('--seed', type=int, help='Seme del generatore casuale, per prove ripetibili')
+
+    def handle(self, *args, **options):
+        self.url_base = options['url_base'].rstrip('/')
+        self.token = options['token']
+        self.timeout = options['timeout']
+        mix = self._leggi_mix(options['mix'])
+        if not self.token and mix.pop('scrittura', None):
+            self.stdout.write(self.style.WARNING('Nessun token: scritture escluse dal mix'))
+        if not mix:
+            raise CommandError('Il mix non contiene scenari eseguibili')
+
+        casuale = random.Random(options['seed'])
+        self._prepara_dati()
+        metriche_iniziali = self._metriche()
+
+        risultati = Risultati()
+        fine = time.monotonic() + options['durata']
+        utenti = [
+            threading.Thread(
+                target=self._utente,
+                args=(i, mix, fine, options['pensiero'], random.Random(casuale.random()), risultati),
+                daemon=True,
+            )
+            for i in range(options['utenti'])
+        ]
+        inizio = time.monotonic()
+        for utente in utenti:
+            utente.start()
+        for utente in utenti:
+            utente.join()
+        durata = time.monotonic() - inizio
+
+        self._stampa(risultati, durata, options['utenti'])
+        metriche_finali = self._metriche()
+        if metriche_iniziali and metriche_finali:
+            self._stampa_metriche(metriche_iniziali, metriche_finali)
+
+    def _leggi_mix(self, testo):
+        mix = {}
+        for parte in filter(None, (p.strip() for p in testo.split(','))):
+            nome, _, peso = parte.partition('=')
+            if not hasattr(self, f'_scenario_{nome}'):
+                raise CommandError(f'Scenario sconosciuto: {nome}')
+            try:
+                mix[nome] = float(peso)
+            except ValueError:
+                raise CommandError(f'Peso non valido per {nome}: {peso!r}')
+        return {nome: peso for nome, peso in mix.items() if peso > 0}
+
+    def _richiesta(self, percorso, metodo='GET', dati=None, parametri=None, client='127.0.0.1', token=None):
+        """Esegue una richiesta e restituisce (stato, corpo); stato None per errori di connessione"""
+        url = self.url_base + percorso
+        if parametri:
+            url += '?' + urllib.parse.urlencode(parametri, doseq=True)
+        headers = {'Accept': 'application/json', 'X-Forwarded-For': client}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        corpo = None
+        if dati is not None:
+            corpo = json.dumps(dati).encode()
+            headers['Content-Type'] = 'application/json'
+        richiesta = urllib.request.Request(url, data=corpo, headers=headers, method=metodo)
+        try:
+            with urllib.request.urlopen(richiesta, timeout=self.timeout) as risposta:
+                return risposta.status, risposta.read()
+        except urllib.error.HTTPError as errore:
+            return errore.code, errore.read()
+        except (urllib.error.URLError, OSError):
+            return None, b''
+
+    def _leggi_tutti(self, percorso):
+        """Tutte le pagine di una lista (usato solo in preparazione)"""
+        elementi, pagina = [], 1
+        while True:
+            stato, corpo = self._richiesta(percorso, parametri={'page': pagina})
+            if stato != 200:
+                if stato is None and pagina == 1:
+                    raise CommandError(f'Server non raggiungibile su {self.url_base}')
+                return elementi
+            dati = json.loads(corpo)
+            if isinstance(dati, list):
+                return elementi + dati
+            elementi += dati.get('results', [])
+            if not dati.get('next'):
+                return elementi
+            pagina += 1
+
+    def _prepara_dati(self):
+        """Legge slug e id reali dall'API, così le richieste colpiscono dati esistenti"""
+        prodotti = self._leggi_tutti('/api/prodotti/')
+        if not prodotti:
+            raise CommandError('Nessun prodotto: il test di carico richiede un catalogo')
+        self.slug_prodotti = [prodotto['slug'] for prodotto in prodotti]
+        self.id_categorie = [str(c['id']) for c in self._leggi_tutti('/api/categorie/')]
+        self.id_brand = [str(b['id']) for b in self._leggi_tutti('/api/brands/')]
+        self.stdout.write(
+            f'Catalogo: {len(self.slug_prodotti)} prodotti, {len(self.id_categorie)} categorie, '
+            f'{len(self.id_brand)} brand'
+        )
+
+    def _utente(self, numero, mix, fine, pensiero, casuale, risultati):
+        client = f'10.{numero // 65536 % 256}.{numero // 256 % 256}.{numero % 256}'
+        scenari, pesi = list(mix), list(mix.values())
+        while time.monotonic() < fine:
+            scenario = casuale.choices(scenari, pesi)[0]
+            inizio = time.perf_counter()
+            stato = getattr(self, f'_scenario_{scenario}')(casuale, client)
+            risultati.registra(scenario, (time.perf_counter() - inizio) * 1000, stato)
+            if pensiero:
+                time.sleep(casuale.expovariate(1 / pensiero))
+
+    # Scenari: ognuno fa una richiesta e restituisce lo stato HTTP
+
+    def _scenario_lista(self, casuale, client):
+        parametri = {'page': casuale.choice([1, 1, 1, 2, 3])}
+        if casuale.random() < 0.5:
+            parametri['ordering'] = casuale.choice(ORDINAMENTI)
+        return self._richiesta('/api/prodotti/', parametri=parametri, client=client)[0]
+
+    def _scenario_filtri(self, casuale, client):
+        """Combinazione casuale di 1-3 filtri di ProductFilter"""
+        possibili = {
+            'categoria': lambda: casuale.choice(self.id_categorie),
+            'categorie': lambda: casuale.sample(self.id_categorie, min(2, len(self.id_categorie))),
+            'brand': lambda: casuale.choice(self.id_brand),
+            'brands': lambda: casuale.sample(self.id_brand, min(2, len(self.id_brand))),
+            'prezzo_min': lambda: casuale.choice([10, 20, 50]),
+            'prezzo_max': lambda: casuale.choice([50, 100, 200, 500]),
+            'in_sconto': lambda: 'true',
+            'sconto_min': lambda: casuale.choice([10, 20, 30]),
+            'disponibile': lambda: 'true',
+            'nuovo': lambda: casuale.choice(['true', 'false']),
+            'in_evidenza': lambda: 'true',
+            'recente': lambda: 'true',
+            'nome': lambda: casuale.choice(PAROLE_RICERCA),
+        }
+        if not self.id_categorie:
+            for nome in ('categoria', 'categorie'):
+                possibili.pop(nome)
+        if not self.id_brand:
+            for nome in ('brand', 'brands'):
+                possibili.pop(nome)
+        scelti = casuale.sample(list(possibili), casuale.randint(1, 3))
+        parametri = {nome: possibili[nome]() for nome in scelti}
+        if casuale.random() < 0.5:
+            parametri['ordering'] = casuale.choice(ORDINAMENTI)
+        return self._richiesta('/api/prodotti/', parametri=parametri, client=client)[0]
+
+    def _scenario_sottotipi(self, casuale, client):
+        endpoint = casuale.choice(list(FILTRI_SOTTOTIPI))
+        parametri = {}
+        for filtro in casuale.sample(FILTRI_SOTTOTIPI[endpoint], casuale.randint(1, 2)):
+            for nome, valori in filtro.items():
+                parametri[nome] = casuale.choice(valori)
+        return self._richiesta(f'/api/{endpoint}/', parametri=parametri, client=client)[0]
+
+    def _scenario_dettaglio(self, casuale, client):
+        slug = casuale.choice(self.slug_prodotti)
+        return self._richiesta(f'/api/prodotti/{slug}/', client=client)[0]
+
+    def _scenario_ricerca(self, casuale, client):
+        parametri = {'query': ' '.join(casuale.sample(PAROLE_RICERCA, casuale.randint(1, 2)))}
+        if casuale.random() < 0.3:
+            parametri = {'search': casuale.choice(PAROLE_RICERCA)}
+        return self._richiesta('/api/prodotti/', parametri=parametri, client=client)[0]
+
+    def _scenario_scrittura(self, casuale, client):
+        """Modifica della giacenza dall'admin: scrittura concorrente sulle stesse righe"""
+        slug = casuale.choice(self.slug_prodotti)
+        dati = {'quantita_disponibile': casuale.randint(0, 50)}
+        return self._richiesta(f'/api/prodotti/{slug}/', metodo='PATCH', dati=dati, client=client,
+                               token=self.token)[0]
+
+    def _metriche(self):
+        if not self.token:
+            return None
+        stato, corpo = self._richiesta('/api/metriche/', token=self.token)
+        if stato != 200:
+            self.stdout.write(self.style.WARNING(f'Metriche del server non disponibili ({stato})'))
+            return None
+        return json.loads(corpo)
+
+    def _stampa(self, risultati, durata, utenti):
+        self.stdout.write(f'\n{utenti} utenti per {durata:.1f} s')
+        self.stdout.write(
+            f"{'scenario':<12}{'richieste':>10}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+            f"{'p99 ms':>9}{'max ms':>9}{'errori':>9}{'429':>7}"
+        )
+        tutte = []
+        for scenario in sorted(risultati.durate):
+            durate = risultati.durate[scenario]
+            tutte += durate
+            self._riga(scenario, durate, durata, risultati.errori[scenario], risultati.limitate[scenario])
+        if tutte:
+            self._riga('totale', tutte, durata, sum(risultati.errori.values()), sum(risultati.limitate.values()))
+
+    def _riga(self, nome, durate, durata, errori, limitate):
+        if len(durate) > 1:
+            percentili = statistics.quantiles(durate, n=100, method='inclusive')
+            p50, p95, p99 = percentili[49], percentili[94], percentili[98]
+        else:
+            p50 = p95 = p99 = durate[0]
+        self.stdout.write(
+            f'{nome:<12}{len(durate):>10}{len(durate) / durata:>9.1f}{p50:>9.1f}{p95:>9.1f}'
+            f'{p99:>9.1f}{max(durate):>9.1f}{errori / len(durate):>8.1%}{limitate / len(durate):>7.1%}'
+        )
+
+    def _stampa_metriche(self, prima, dopo):
+        if prima.get('processo') != dopo.get('processo'):
+            self.stdout.write(self.style.WARNING(
+                'Metriche lette da due worker diversi: il confronto non è significativo'
+            ))
+            return
+        query = dopo['query'] - prima['query']
+        scritture = dopo['scritture'] - prima['scritture']
+        attesa = dopo['tempo_scritture_ms'] - prima['tempo_scritture_ms']
+        self.stdout.write(f'\nServer (processo {dopo["processo"]}):')
+        self.stdout.write(f'  query eseguite: {query}')
+        self.stdout.write(
+            f'  scritture: {scritture}, tempo totale {attesa:.0f} ms'
+            f' (media {attesa / scritture if scritture else 0:.1f} ms, include l\'attesa dei lock)'
+        )
+        self.stdout.write(f'  errori "database is locked": {dopo["errori_lock"] - prima["errori_lock"]}')
+        self.stdout.write(f'  latenza media query: {dopo["latenza_database_ms"]} ms')
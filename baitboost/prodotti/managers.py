@@ -0,0 +1,72 @@
+from django.db import models, transaction
+from django.utils import timezone
+
+# Campi che, se aggiornati in blocco, generano una variazione di prezzo
+CAMPI_PREZZO = {'prezzo', 'prezzo_scontato'}
+
+# Campi calcolati dalle statistiche: non sono modifiche del prodotto
+CAMPI_TECNICI = {'popolarita', 'prezzo_minimo_30gg'}
+
+
+class ProductQuerySet(models.QuerySet):
+    """QuerySet dei prodotti che intercetta gli aggiornamenti e gli inserimenti in blocco"""
+
+    def update(self, **kwargs):
+        if kwargs and CAMPI_TECNICI.issuperset(kwargs):
+            # Reason: popolarità e minimo dei 30 giorni non devono comparire da soli nel feed
+            # delle modifiche né nella sitemap; chi li calcola aggiorna da sé le schede
+            return super().update(**kwargs)
+
+        # Reason: update() non applica auto_now, ma il feed delle modifiche e la sitemap
+        # si basano su data_aggiornamento anche per gli aggiornamenti in blocco
+        kwargs.setdefault('data_aggiornamento', timezone.now())
+
+        # Reason: QuerySet.update() non invia segnali, quindi le variazioni di prezzo,
+        # i tag delle specifiche e le schede prodotto delle modifiche in blocco (azioni admin, bulk_update)
+        # vanno aggiornate qui, nella stessa transazione
+        from .prezzi import registra_variazioni_per_id
+        from .schede import aggiorna_schede
+        from .tag import campi_origine, sincronizza_tag_per_id
+
+        with transaction.atomic(using=self.db):
+            id_prodotti = list(self.values_list('pk', flat=True))
+            righe = super().update(**kwargs)
+            if CAMPI_PREZZO.intersection(kwargs):
+                registra_variazioni_per_id(id_prodotti, using=self.db)
+            if campi_origine(self.model).intersection(kwargs):
+                sincronizza_tag_per_id(self.model, id_prodotti, using=self.db)
+            aggiorna_schede(id_prodotti, using=self.db)
+        return righe
+
+    update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        # Reason: bulk_create() non invia post_save, quindi lo storico dei prezzi, i tag delle
+        # specifiche e le schede dei prodotti inseriti in blocco vanno creati qui, nella stessa
+        # transazione; senza scheda un prodotto non comparirebbe in nessuna lista
+        from .prezzi import registra_storico
+        from .schede import aggiorna_schede
+        from .tag import sincronizza_tag_per_id
+
+        with transaction.atomic(using=self.db):
+            oggetti = super().bulk_create(objs, *args, **kwargs)
+            # Con ignore_conflicts gli oggetti non ricevono la chiave primaria
+            nuovi = [oggetto for oggetto in oggetti if oggetto.pk is not None]
+            if nuovi:
+                id_prodotti = [oggetto.pk for oggetto in nuovi]
+                minimi = registra_storico(
+                    [(oggetto.pk, oggetto.prezzo, oggetto.prezzo_scontato) for oggetto in nuovi], using=self.db
+                )
+                for oggetto in nuovi:
+                    if oggetto.pk in minimi:
+                        oggetto.prezzo_minimo_30gg = minimi[oggetto.pk]
+                sincronizza_tag_per_id(self.model, id_prodotti, using=self.db)
+                aggiorna_schede(id_prodotti, using=self.db)
+        return oggetti
+
+    bulk_create.alters_data = True
+
+
+class ProductManager(models.Manager.from_queryset(ProductQuerySet)):
+    """Manager di default dei prodotti e dei loro sottotipi"""
+    pass
@@ -0,0 +1,139 @@
+"""
+Conteggio dei riferimenti ai file dello storage indirizzato per contenuto e
+raccolta dei file non più usati.
+
+Lo storage (vedi baitboost/storage.py) registra ogni blob salvato; i segnali
+in prodotti/signals.py incrementano e decrementano i riferimenti quando un
+campo immagine cambia o una riga viene eliminata. La raccolta elimina a lotti
+i blob senza riferimenti e non toccati da un periodo di grazia, così un file
+appena caricato non viene eliminato prima che il modello che lo usa sia salvato.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, router, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from baitboost.storage import storage_contenuti
+
+from .models import BlobMedia, Brand, Categoria, Product, ProductImage
+
+# Campi immagine salvati nello storage indirizzato per contenuto
+CAMPI_MEDIA = {
+    Product: ['immagine_principale'],
+    ProductImage: ['immagine'],
+    Brand: ['logo'],
+    Categoria: ['immagine'],
+}
+
+DIMENSIONE_LOTTO = 500
+
+
+def campi_media(modello):
+    """Campi media del modello, anche per i sottotipi di Product"""
+    for base, campi in CAMPI_MEDIA.items():
+        if issubclass(modello, base):
+            return campi
+    return []
+
+
+def registra_blob(nome, dimensione, using=None):
+    """
+    Registra un blob appena salvato (o riusato) e rinnova il suo periodo di grazia.
+    Senza ``using`` il blob va sul database scelto dal router per BlobMedia.
+    """
+    using = using or router.db_for_write(BlobMedia)
+    if BlobMedia.objects.using(using).filter(nome=nome).update(data_aggiornamento=timezone.now()):
+        return
+    try:
+        with transaction.atomic(using=using):
+            BlobMedia.objects.using(using).create(nome=nome, dimensione=dimensione)
+    except IntegrityError:
+        # Registrato nel frattempo da un salvataggio parallelo dello stesso contenuto
+        pass
+
+
+def nomi_media(istanza):
+    return {campo: getattr(istanza, campo).name or None for campo in campi_media(type(istanza))}
+
+
+def _dimensione(nome):
+    try:
+        return storage_contenuti().size(nome)
+    except (OSError, NotImplementedError):
+        return 0
+
+
+def aggiorna_riferimenti(aggiunti, rimossi, using='default'):
+    """Incrementa i riferimenti dei blob aggiunti e decrementa quelli dei blob rimossi"""
+    for nome in aggiunti:
+        if not nome:
+            continue
+        blob = BlobMedia.objects.using(using).filter(nome=nome)
+        if not blob.update(riferimenti=F('riferimenti') + 1):
+            # Reason: lo storage non conosce il database del modello e registra il blob
+            # su quello del router; se il modello è stato salvato altrove lo si registra lì
+            registra_blob(nome, _dimensione(nome), using=using)
+            blob.update(riferimenti=F('riferimenti') + 1)
+    for nome in rimossi:
+        if nome:
+            BlobMedia.objects.using(using).filter(nome=nome).update(riferimenti=F('riferimenti') - 1)
+
+
+def ricalcola_riferimenti():
+    """
+    Ricalcola i riferimenti di tutti i blob con un unico UPDATE.
+    Corregge i conteggi dopo modifiche che non inviano segnali (QuerySet.update, SQL diretto).
+
+    Returns:
+        int: blob aggiornati.
+    """
+    totale = Value(0)
+    for modello, campi in CAMPI_MEDIA.items():
+        for campo in campi:
+            conteggio = modello._base_manager.filter(**{campo: OuterRef('nome')}).order_by().values(
+                campo
+            ).annotate(totale=Count('pk')).values('totale')[:1]
+            totale = totale + Coalesce(Subquery(conteggio), 0)
+    return BlobMedia.objects.update(riferimenti=totale)
+
+
+def raccogli_blob(storage, grazia=timedelta(hours=1), lotto=DIMENSIONE_LOTTO):
+    """
+    Elimina a lotti i blob senza riferimenti.
+
+    Args:
+        storage: storage indirizzato per contenuto da cui eliminare i file.
+        grazia (timedelta): età minima dall'ultimo salvataggio o riuso del blob.
+        lotto (int): blob esaminati per transazione.
+
+    Returns:
+        tuple: (blob eliminati, byte liberati).
+    """
+    eliminati = liberati = 0
+    ultimo_id = 0
+    while True:
+        limite = timezone.now() - grazia
+        candidati = list(
+            BlobMedia.objects.filter(
+                id__gt=ultimo_id, riferimenti__lte=0, data_aggiornamento__lt=limite
+            ).order_by('id').values_list('id', 'nome', 'dimensione')[:lotto]
+        )
+        if not candidati:
+            return eliminati, liberati
+        ultimo_id = candidati[-1][0]
+        with transaction.atomic():
+            # Reason: la condizione viene ricontrollata nella DELETE, un blob riusato nel
+            # frattempo ha riferimenti o data_aggiornamento nuovi e non viene toccato
+            selezionati = BlobMedia.objects.filter(
+                id__in=[id_blob for id_blob, _, _ in candidati],
+                riferimenti__lte=0, data_aggiornamento__lt=limite
+            )
+            confermati = set(selezionati.values_list('id', flat=True))
+            selezionati.filter(id__in=confermati).delete()
+        for id_blob, nome, dimensione in candidati:
+            if id_blob in confermati:
+                storage.delete(nome)
+                eliminati += 1
+                liberati += dimensione
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prodotti', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VariazionePrezzo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prezzo', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('prezzo_scontato', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('prezzo_effettivo', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('data_variazione', models.DateTimeField(auto_now_add=True)),
+                ('prodotto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variazioni_prezzo', to='prodotti.product')),
+            ],
+            options={
+                'verbose_name': 'Variazione prezzo',
+                'verbose_name_plural': 'Variazioni prezzo',
+                'ordering': ['id'],
+            },
+        ),
+    ]
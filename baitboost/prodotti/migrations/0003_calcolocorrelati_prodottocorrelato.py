@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prodotti', '0002_variazioneprezzo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalcoloCorrelati',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_inizio', models.DateTimeField()),
+                ('data_fine', models.DateTimeField(blank=True, null=True)),
+                ('completo', models.BooleanField(default=False)),
+                ('prodotti_ricalcolati', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Calcolo correlati',
+                'verbose_name_plural': 'Calcoli correlati',
+                'ordering': ['-data_inizio'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProdottoCorrelato',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posizione', models.PositiveSmallIntegerField()),
+                ('punteggio', models.FloatField()),
+                ('correlato', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='prodotti.product')),
+                ('prodotto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='correlati', to='prodotti.product')),
+            ],
+            options={
+                'verbose_name': 'Prodotto correlato',
+                'verbose_name_plural': 'Prodotti correlati',
+                'ordering': ['prodotto', 'posizione'],
+                'constraints': [models.UniqueConstraint(fields=('prodotto', 'posizione'), name='correlato_prodotto_posizione_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prodotti', '0003_calcolocorrelati_prodottocorrelato'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Eliminazione',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('prodotto', 'Prodotto'), ('categoria', 'Categoria'), ('brand', 'Brand')], max_length=20)),
+                ('oggetto_id', models.BigIntegerField()),
+                ('slug', models.SlugField(max_length=280)),
+                ('data_eliminazione', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Eliminazione',
+                'verbose_name_plural': 'Eliminazioni',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='brand',
+            index=models.Index(fields=['data_aggiornamento', 'id'], name='brand_modifica_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='categoria',
+            index=models.Index(fields=['data_aggiornamento', 'id'], name='categoria_modifica_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['data_aggiornamento', 'id'], name='prodotto_modifica_idx'),
+        ),
+    ]
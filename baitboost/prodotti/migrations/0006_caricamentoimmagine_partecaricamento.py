@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:06
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prodotti', '0005_product_prodotto_creazione_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaricamentoImmagine',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('nome_file', models.CharField(max_length=255)),
+                ('dimensione_totale', models.PositiveBigIntegerField()),
+                ('dimensione_parte', models.PositiveIntegerField()),
+                ('sha256', models.CharField(blank=True, help_text='Checksum del file completo (opzionale)', max_length=64)),
+                ('stato', models.CharField(choices=[('in_corso', 'In corso'), ('completato', 'Completato'), ('annullato', 'Annullato')], default='in_corso', max_length=20)),
+                ('alt_text', models.CharField(blank=True, max_length=255, null=True)),
+                ('is_principale', models.BooleanField(default=False)),
+                ('ordine', models.PositiveIntegerField(default=0)),
+                ('data_creazione', models.DateTimeField(auto_now_add=True)),
+                ('data_aggiornamento', models.DateTimeField(auto_now=True)),
+                ('immagine', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='prodotti.productimage')),
+                ('prodotto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='caricamenti', to='prodotti.product')),
+                ('utente', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Caricamento immagine',
+                'verbose_name_plural': 'Caricamenti immagini',
+                'ordering': ['-data_creazione'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ParteCaricamento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('indice', models.PositiveIntegerField()),
+                ('dimensione', models.PositiveIntegerField()),
+                ('sha256', models.CharField(max_length=64)),
+                ('percorso', models.CharField(max_length=255)),
+                ('data_creazione', models.DateTimeField(auto_now_add=True)),
+                ('caricamento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='parti', to='prodotti.caricamentoimmagine')),
+            ],
+            options={
+                'verbose_name': 'Parte caricamento',
+                'verbose_name_plural': 'Parti caricamento',
+                'ordering': ['indice'],
+                'constraints': [models.UniqueConstraint(fields=('caricamento', 'indice'), name='parte_caricamento_indice_uniq')],
+            },
+        ),
+    ]
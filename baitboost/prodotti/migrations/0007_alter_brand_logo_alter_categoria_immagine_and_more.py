@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:08
+
+import baitboost.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prodotti', '0006_caricamentoimmagine_partecaricamento'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='brand',
+            name='logo',
+            field=models.ImageField(blank=True, null=True, storage=baitboost.storage.storage_contenuti, upload_to='brands/'),
+        ),
+        migrations.AlterField(
+            model_name='categoria',
+            name='immagine',
+            field=models.ImageField(blank=True, null=True, storage=baitboost.storage.storage_contenuti, upload_to='categorie/'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='immagine_principale',
+            field=models.ImageField(storage=baitboost.storage.storage_contenuti, upload_to='prodotti/'),
+        ),
+        migrations.AlterField(
+            model_name='productimage',
+            name='immagine',
+            field=models.ImageField(storage=baitboost.storage.storage_contenuti, upload_to='prodotti/'),
+        ),
+        migrations.CreateModel(
+            name='BlobMedia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=255, unique=True)),
+                ('dimensione', models.PositiveBigIntegerField(default=0)),
+                ('riferimenti', models.IntegerField(default=0)),
+                ('data_creazione', models.DateTimeField(auto_now_add=True)),
+                ('data_aggiornamento', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Blob media',
+                'verbose_name_plural': 'Blob media',
+                'indexes': [models.Index(fields=['riferimenti', 'data_aggiornamento'], name='blob_raccolta_idx')],
+            },
+        ),
+    ]
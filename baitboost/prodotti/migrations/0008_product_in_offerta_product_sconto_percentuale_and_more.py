@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:09
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+import django.db.models.functions.math
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prodotti', '0007_alter_brand_logo_alter_categoria_immagine_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='in_offerta',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(prezzo_scontato__isnull=False, prezzo_scontato__lt=models.F('prezzo'), then=models.Value(True)), default=models.Value(False)), output_field=models.BooleanField()),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='sconto_percentuale',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(prezzo_scontato__isnull=False, prezzo_scontato__lt=models.F('prezzo'), then=django.db.models.functions.comparison.Cast(django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('prezzo'), '-', models.F('prezzo_scontato')), '*', models.Value(100)), '/', models.F('prezzo'))), models.IntegerField())), default=models.Value(0)), output_field=models.IntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('in_offerta', True), ('in_vendita', True)), fields=['-sconto_percentuale', 'id'], name='prodotto_offerte_idx'),
+        ),
+    ]
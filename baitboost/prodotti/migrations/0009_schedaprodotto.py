@@ -0,0 +1,112 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Specifiche copiate nelle schede, per sottotipo (come in prodotti/schede.py al momento della migrazione)
+SPECIFICHE = {
+    'mulinello': ['tipo_mulinello', 'cuscinetti', 'rapporto_recupero', 'peso_mulinello', 'freno_massimo', 'frizione'],
+    'canna': ['tipo_canna', 'lunghezza', 'numero_sezioni', 'potenza_lancio', 'azione', 'materiale'],
+    'esca': ['tipo_esca', 'lunghezza_esca', 'peso_esca', 'profondita_lavoro', 'colore', 'specie_target'],
+}
+
+
+def _valore_json(valore):
+    if valore is None or isinstance(valore, (str, int, bool)):
+        return valore
+    return float(valore)
+
+
+def popola_schede(apps, schema_editor):
+    """
+    Crea le schede dei prodotti esistenti: senza, le liste servite dalle schede
+    risponderebbero vuote fino al primo ``ricostruisci_schede``.
+    """
+    alias = schema_editor.connection.alias
+    Product = apps.get_model('prodotti', 'Product')
+    SchedaProdotto = apps.get_model('prodotti', 'SchedaProdotto')
+    modelli = {tipo: apps.get_model('prodotti', tipo.capitalize()) for tipo in SPECIFICHE}
+
+    gruppi = [(tipo, modello.objects.using(alias)) for tipo, modello in modelli.items()]
+    # Prodotti senza sottotipo
+    gruppi.append(('prodotto', Product.objects.using(alias).filter(
+        mulinello__isnull=True, canna__isnull=True, esca__isnull=True
+    )))
+    for tipo, prodotti in gruppi:
+        schede = []
+        for prodotto in prodotti.select_related('categoria', 'brand').iterator(chunk_size=500):
+            schede.append(SchedaProdotto(
+                prodotto_id=prodotto.pk,
+                tipo=tipo,
+                nome=prodotto.nome,
+                slug=prodotto.slug,
+                codice_sku=prodotto.codice_sku,
+                descrizione_breve=prodotto.descrizione_breve,
+                immagine_principale=prodotto.immagine_principale.name or '',
+                categoria_id=prodotto.categoria_id,
+                categoria_nome=prodotto.categoria.nome,
+                categoria_slug=prodotto.categoria.slug,
+                brand_id=prodotto.brand_id,
+                brand_nome=prodotto.brand.nome,
+                brand_slug=prodotto.brand.slug,
+                prezzo=prodotto.prezzo,
+                prezzo_scontato=prodotto.prezzo_scontato,
+                sconto_percentuale=prodotto.sconto_percentuale,
+                in_offerta=prodotto.in_offerta,
+                quantita_disponibile=prodotto.quantita_disponibile,
+                in_evidenza=prodotto.in_evidenza,
+                in_vendita=prodotto.in_vendita,
+                nuovo=prodotto.nuovo,
+                usato=prodotto.usato,
+                specifiche={campo: _valore_json(getattr(prodotto, campo)) for campo in SPECIFICHE.get(tipo, [])},
+                data_creazione=prodotto.data_creazione,
+                data_aggiornamento=prodotto.data_aggiornamento,
+            ))
+        SchedaProdotto.objects.using(alias).bulk_create(schede, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prodotti', '0008_product_in_offerta_product_sconto_percentuale_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchedaProdotto',
+            fields=[
+                ('prodotto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='scheda', serialize=False, to='prodotti.product')),
+                ('tipo', models.CharField(choices=[('prodotto', 'Prodotto'), ('mulinello', 'Mulinello'), ('canna', 'Canna'), ('esca', 'Esca')], max_length=20)),
+                ('nome', models.CharField(max_length=255)),
+                ('slug', models.SlugField(max_length=280, unique=True)),
+                ('codice_sku', models.CharField(max_length=50)),
+                ('descrizione_breve', models.TextField()),
+                ('immagine_principale', models.CharField(blank=True, max_length=255)),
+                ('categoria_id', models.BigIntegerField()),
+                ('categoria_nome', models.CharField(max_length=100)),
+                ('categoria_slug', models.SlugField(max_length=120)),
+                ('brand_id', models.BigIntegerField()),
+                ('brand_nome', models.CharField(max_length=100)),
+                ('brand_slug', models.SlugField(max_length=120)),
+                ('prezzo', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('prezzo_scontato', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('sconto_percentuale', models.IntegerField(default=0)),
+                ('in_offerta', models.BooleanField(default=False)),
+                ('quantita_disponibile', models.PositiveIntegerField(default=0)),
+                ('in_evidenza', models.BooleanField(default=False)),
+                ('in_vendita', models.BooleanField(default=True)),
+                ('nuovo', models.BooleanField(default=False)),
+                ('usato', models.BooleanField(default=False)),
+                ('specifiche', models.JSONField(blank=True, default=dict)),
+                ('data_creazione', models.DateTimeField()),
+                ('data_aggiornamento', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Scheda prodotto',
+                'verbose_name_plural': 'Schede prodotto',
+                'ordering': ['-data_creazione'],
+                'indexes': [models.Index(fields=['-data_creazione', 'prodotto'], name='scheda_creazione_idx'), models.Index(fields=['tipo', '-data_creazione'], name='scheda_tipo_idx'), models.Index(fields=['categoria_id', '-data_creazione'], name='scheda_categoria_idx'), models.Index(fields=['brand_id', '-data_creazione'], name='scheda_brand_idx'), models.Index(fields=['prezzo'], name='scheda_prezzo_idx'), models.Index(fields=['-sconto_percentuale'], name='scheda_sconto_idx')],
+            },
+        ),
+        migrations.RunPython(popola_schede, migrations.RunPython.noop),
+    ]
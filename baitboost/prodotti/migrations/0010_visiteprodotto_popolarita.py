@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prodotti', '0009_schedaprodotto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisiteProdotto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('giorno', models.DateField()),
+                ('visualizzazioni', models.PositiveIntegerField(default=0)),
+                ('clic', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Visite prodotto',
+                'verbose_name_plural': 'Visite prodotti',
+                'ordering': ['-giorno', 'prodotto'],
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='popolarita',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='schedaprodotto',
+            name='popolarita',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-popolarita', 'id'], name='prodotto_popolarita_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedaprodotto',
+            index=models.Index(fields=['-popolarita', 'prodotto'], name='scheda_popolarita_idx'),
+        ),
+        migrations.AddField(
+            model_name='visiteprodotto',
+            name='prodotto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visite', to='prodotti.product'),
+        ),
+        migrations.AddIndex(
+            model_name='visiteprodotto',
+            index=models.Index(fields=['giorno'], name='visite_giorno_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='visiteprodotto',
+            constraint=models.UniqueConstraint(fields=('prodotto', 'giorno'), name='visite_prodotto_giorno_unico'),
+        ),
+    ]
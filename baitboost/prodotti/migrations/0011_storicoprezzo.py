@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def apri_storico(apps, schema_editor):
+    """Una riga di storico con il prezzo attuale per ogni prodotto esistente, dalla sua creazione"""
+    Product = apps.get_model('prodotti', 'Product')
+    StoricoPrezzo = apps.get_model('prodotti', 'StoricoPrezzo')
+    alias = schema_editor.connection.alias
+    righe = []
+    for pk, prezzo, prezzo_scontato, data_creazione in Product.objects.using(alias).values_list(
+        'pk', 'prezzo', 'prezzo_scontato', 'data_creazione'
+    ).iterator(chunk_size=2000):
+        effettivo = prezzo_scontato if prezzo_scontato is not None and prezzo_scontato < prezzo else prezzo
+        righe.append(StoricoPrezzo(
+            prodotto_id=pk, prezzo=prezzo, prezzo_scontato=prezzo_scontato,
+            prezzo_effettivo=effettivo, data_inizio=data_creazione,
+        ))
+    StoricoPrezzo.objects.using(alias).bulk_create(righe, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prodotti', '0010_visiteprodotto_popolarita'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='prezzo_minimo_30gg',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='schedaprodotto',
+            name='prezzo_minimo_30gg',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.CreateModel(
+            name='StoricoPrezzo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prezzo', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('prezzo_scontato', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('prezzo_effettivo', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('data_inizio', models.DateTimeField()),
+                ('prodotto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='storico_prezzi', to='prodotti.product')),
+            ],
+            options={
+                'verbose_name': 'Storico prezzo',
+                'verbose_name_plural': 'Storico prezzi',
+                'ordering': ['prodotto', 'data_inizio'],
+                'indexes': [models.Index(fields=['prodotto', 'data_inizio'], name='storico_prodotto_data_idx')],
+            },
+        ),
+        migrations.RunPython(apri_storico, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:39
+
+from django.db import migrations, models
+
+
+def ricava_tag(apps, schema_editor):
+    """Tag dei prodotti esistenti, ricavati dal testo delle specifiche descrittive"""
+    from prodotti.tag import TAG_SPECIFICHE, sincronizza_tag_per_id
+    alias = schema_editor.connection.alias
+    for nome_modello in TAG_SPECIFICHE:
+        modello = apps.get_model('prodotti', nome_modello)
+        sincronizza_tag_per_id(modello, modello.objects.using(alias).values_list('pk', flat=True), using=alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prodotti', '0011_storicoprezzo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Colore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=100)),
+                ('slug', models.SlugField(max_length=120, unique=True)),
+            ],
+            options={
+                'verbose_name': 'Colore',
+                'verbose_name_plural': 'Colori',
+                'ordering': ['nome'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='FasciaProfondita',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=100)),
+                ('slug', models.SlugField(max_length=120, unique=True)),
+            ],
+            options={
+                'verbose_name': 'Fascia di profondità',
+                'verbose_name_plural': 'Fasce di profondità',
+                'ordering': ['nome'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Materiale',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=100)),
+                ('slug', models.SlugField(max_length=120, unique=True)),
+            ],
+            options={
+                'verbose_name': 'Materiale',
+                'verbose_name_plural': 'Materiali',
+                'ordering': ['nome'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Specie',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=100)),
+                ('slug', models.SlugField(max_length=120, unique=True)),
+            ],
+            options={
+                'verbose_name': 'Specie',
+                'verbose_name_plural': 'Specie',
+                'ordering': ['nome'],
+                'abstract': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='esca',
+            name='colori',
+            field=models.ManyToManyField(blank=True, editable=False, related_name='esche', to='prodotti.colore'),
+        ),
+        migrations.AddField(
+            model_name='esca',
+            name='fasce_profondita',
+            field=models.ManyToManyField(blank=True, editable=False, related_name='esche', to='prodotti.fasciaprofondita'),
+        ),
+        migrations.AddField(
+            model_name='canna',
+            name='materiali',
+            field=models.ManyToManyField(blank=True, editable=False, related_name='canne', to='prodotti.materiale'),
+        ),
+        migrations.AddField(
+            model_name='esca',
+            name='specie',
+            field=models.ManyToManyField(blank=True, editable=False, related_name='esche', to='prodotti.specie'),
+        ),
+        migrations.RunPython(ricava_tag, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+from prodotti.tag import DIMENSIONE_LOTTO, collega_tag, fasce_profondita
+
+
+def ricalcola_fasce(apps, schema_editor):
+    """
+    Fasce di profondità delle esche esistenti ricavate di nuovo: l'unità scritta una sola
+    volta ("50-80 cm") ora vale per tutto l'intervallo e "fino a X" parte da zero
+    """
+    Esca = apps.get_model('prodotti', 'Esca')
+    alias = schema_editor.connection.alias
+    campo = Esca._meta.get_field('fasce_profondita')
+    id_esche = list(Esca.objects.using(alias).values_list('pk', flat=True))
+    for inizio in range(0, len(id_esche), DIMENSIONE_LOTTO):
+        esche = list(Esca.objects.using(alias).filter(
+            pk__in=id_esche[inizio:inizio + DIMENSIONE_LOTTO]
+        ).only('profondita_lavoro'))
+        collega_tag(esche, campo, 'profondita_lavoro', fasce_profondita, using=alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prodotti', '0012_tag_specifiche'),
+    ]
+
+    operations = [
+        migrations.RunPython(ricalcola_fasce, migrations.RunPython.noop),
+    ]
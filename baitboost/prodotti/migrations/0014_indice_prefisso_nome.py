@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:56
+
+import prodotti.models.catalogo
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prodotti', '0013_ricalcola_fasce_profondita'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=prodotti.models.catalogo.IndicePrefisso(fields=['nome'], name='prodotto_nome_prefisso_idx'),
+        ),
+    ]
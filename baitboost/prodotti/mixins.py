@@ -0,0 +1,177 @@
+"""
+Mixin dei viewset dei prodotti: letture dalle repliche, liste servite dal read model
+``SchedaProdotto``, conteggio delle visite e faccette dei filtri di tag.
+"""
+from django.http import Http404
+from rest_framework import filters, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from baitboost.db_router import (
+    METODI_SICURI, attiva_letture_replica, ripristina_letture, deve_leggere_dal_primario
+)
+from carrello.promozioni import prezzi_promozionali, prezzi_promozionali_per_id
+from .filters import SchedaProdottoFilter, TagFilter
+from .models import SchedaProdotto
+from .popolarita import CLIC, buffer_visite
+from .serializers import SchedaProdottoSerializer
+
+
+class ReplicaReadMixin:
+    """
+    Manda le letture sicure del viewset (filtri compresi) alle repliche.
+    Le scritture restano sul primario e chi ha appena scritto continua a leggere dal primario.
+    """
+    _token_replica = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in METODI_SICURI and not deve_leggere_dal_primario(request):
+            self._token_replica = attiva_letture_replica()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self._token_replica is not None:
+            ripristina_letture(self._token_replica)
+            self._token_replica = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ListaSchedeMixin:
+    """
+    Con ``?formato=scheda`` serve la lista in formato card dalla tabella denormalizzata
+    ``SchedaProdotto``, con query su una sola tabella. Se la richiesta usa parametri che le
+    schede non coprono (ricerca testuale, filtri e ordinamenti specifici del sottotipo) gli id
+    della pagina si scelgono sui modelli, ma la risposta resta quella delle schede.
+    Senza il parametro la lista resta quella classica del serializer del viewset.
+    In entrambi i casi le promozioni della pagina si calcolano in blocco.
+    """
+    tipo_scheda = None
+    _promozioni = None
+    FORMATO_SCHEDA = 'scheda'
+    parametri_lista = {'ordering', 'page', 'format', 'formato'}
+    ordinamenti_scheda = {
+        'nome': 'nome', 'prezzo': 'prezzo', 'prezzo_scontato': 'prezzo_scontato',
+        'sconto_percentuale': 'sconto_percentuale', 'data_creazione': 'data_creazione',
+        'quantita_disponibile': 'quantita_disponibile',
+        'brand__nome': 'brand_nome', 'categoria__nome': 'categoria_nome', 'popolarita': 'popolarita',
+    }
+
+    def _ordinamento_scheda(self, request):
+        """Ordinamento tradotto sui campi della scheda, None se non è traducibile"""
+        termini = [t.strip() for t in request.query_params.get('ordering', '').split(',') if t.strip()]
+        if not termini:
+            return list(self.ordering)
+        ordinamento = []
+        for termine in termini:
+            campo = termine.lstrip('-')
+            if campo not in self.ordering_fields or campo not in self.ordinamenti_scheda:
+                return None
+            ordinamento.append(termine.replace(campo, self.ordinamenti_scheda[campo]))
+        return ordinamento
+
+    def paginate_queryset(self, queryset):
+        pagina = super().paginate_queryset(queryset)
+        if pagina:
+            # Pagine di prodotti delle altre azioni: promozioni con una sola query sulle schede
+            self._promozioni = prezzi_promozionali_per_id(elemento.pk for elemento in pagina)
+        return pagina
+
+    def calcola_promozioni(self, prodotti):
+        """
+        Promozioni in blocco (una query sulle schede) per le azioni che serializzano
+        prodotti fuori dalle pagine della lista; restituisce i prodotti già caricati.
+        """
+        prodotti = list(prodotti)
+        self._promozioni = prezzi_promozionali_per_id(prodotto.pk for prodotto in prodotti)
+        return prodotti
+
+    def get_serializer_context(self):
+        contesto = super().get_serializer_context()
+        if self._promozioni is not None:
+            contesto['promozioni'] = self._promozioni
+        return contesto
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('formato') != self.FORMATO_SCHEDA:
+            return super().list(request, *args, **kwargs)
+
+        consentiti = self.parametri_lista | set(SchedaProdottoFilter.base_filters)
+        ordinamento = self._ordinamento_scheda(request)
+        if ordinamento is None or not consentiti.issuperset(request.query_params):
+            return self._lista_da_modelli(request)
+
+        schede = SchedaProdotto.objects.all()
+        if self.tipo_scheda is not None:
+            schede = schede.filter(tipo=self.tipo_scheda)
+        filtro = SchedaProdottoFilter(request.query_params, queryset=schede, request=request)
+        if not filtro.is_valid():
+            raise ValidationError(filtro.errors)
+        schede = filtro.qs.order_by(*ordinamento)
+
+        return self._risposta_schede(self.paginator.paginate_queryset(schede, request, view=self))
+
+    def _lista_da_modelli(self, request):
+        """
+        Lista in formato card con parametri che le schede non coprono: filtri, ricerca e
+        ordinamento del viewset sui modelli scelgono solo gli id della pagina, poi i prodotti
+        vengono letti dalle schede. Costa una query in più, non una per prodotto.
+        """
+        prodotti = self.filter_queryset(self.get_queryset()).values_list('pk', flat=True)
+        id_pagina = self.paginator.paginate_queryset(prodotti, request, view=self)
+        schede = SchedaProdotto.objects.in_bulk(id_pagina)
+        return self._risposta_schede([schede[pk] for pk in id_pagina if pk in schede])
+
+    def _risposta_schede(self, pagina):
+        # Promozioni calcolate in blocco per tutta la pagina, senza query
+        self._promozioni = prezzi_promozionali(pagina)
+        serializer = SchedaProdottoSerializer(pagina, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+
+class ContaVisiteMixin:
+    """
+    Conta le visualizzazioni del dettaglio e i clic sui prodotti per la popolarità.
+    I conteggi restano nel buffer del worker (prodotti/popolarita.py), senza scritture nella richiesta.
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        buffer_visite.registra(instance.pk)
+        self._promozioni = prezzi_promozionali_per_id([instance.pk])
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['post'])
+    def clic(self, request, slug=None):
+        """Registra un clic sul prodotto (es. dalla card in una lista o da un banner)"""
+        id_prodotto = self.get_queryset().filter(slug=slug).values_list('pk', flat=True).first()
+        if id_prodotto is None:
+            raise Http404
+        buffer_visite.registra(id_prodotto, CLIC)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class FaccetteTagMixin:
+    """
+    Faccette dei filtri di tag (``TagFilter``) della lista: per ogni filtro i tag presenti
+    nei prodotti filtrati, con slug, nome e numero di prodotti. Ogni faccetta ignora il
+    proprio filtro, così selezionare un colore non nasconde gli altri colori disponibili.
+    """
+
+    @action(detail=False, methods=['get'])
+    def faccette(self, request):
+        filtri_tag = {
+            nome: filtro for nome, filtro in self.filterset_class.base_filters.items()
+            if isinstance(filtro, TagFilter)
+        }
+        risultato = {}
+        for nome, filtro in filtri_tag.items():
+            parametri = request.query_params.copy()
+            parametri.pop(nome, None)
+            filtro_lista = self.filterset_class(parametri, queryset=self.get_queryset(), request=request)
+            if not filtro_lista.is_valid():
+                raise ValidationError(filtro_lista.errors)
+            prodotti = filters.SearchFilter().filter_queryset(request, filtro_lista.qs, self)
+            risultato[nome] = filtro.conteggi(prodotti)
+        return Response(risultato)
@@ -0,0 +1,15 @@
+"""
+Modelli dell'app prodotti, divisi per area:
+- ``catalogo``: categorie, brand, prodotti, sottotipi, immagini e tag delle specifiche;
+- ``tecnici``: code, storici, statistiche, caricamenti e media;
+- ``scheda``: il read model ``SchedaProdotto`` delle liste (vedi prodotti/schede.py).
+"""
+from .catalogo import (
+    Categoria, Brand, Product, ProductImage, TagSpecifica, Specie, Colore, Materiale, FasciaProfondita,
+    Mulinello, Canna, Esca
+)
+from .tecnici import (
+    VariazionePrezzo, VisiteProdotto, StoricoPrezzo, ProdottoCorrelato, CalcoloCorrelati, Eliminazione,
+    CaricamentoImmagine, ParteCaricamento, BlobMedia
+)
+from .scheda import SchedaProdotto
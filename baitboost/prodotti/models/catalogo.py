@@ -1,15 +1,21 @@
-from django.db import models
+"""Catalogo: categorie, brand, prodotti con i sottotipi, immagini e tag delle specifiche"""
+from django.db import models, router, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Cast, Collate, Round, Upper
 from django.utils.text import slugify
 from django.urls import reverse
 import uuid
 
+from baitboost.storage import storage_contenuti
+from ..managers import ProductManager
+
 
 class Categoria(models.Model):
     """Categoria di prodotti per la pesca sportiva"""
     nome = models.CharField(max_length=100)
     slug = models.SlugField(max_length=120, unique=True, blank=True)
     descrizione = models.TextField(blank=True, null=True)
-    immagine = models.ImageField(upload_to='categorie/', blank=True, null=True)
+    immagine = models.ImageField(upload_to='categorie/', blank=True, null=True, storage=storage_contenuti)
     parent = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='sottocategorie')
     ordine = models.PositiveIntegerField(default=0)
     data_creazione = models.DateTimeField(auto_now_add=True)
@@ -19,6 +25,10 @@ class Categoria(models.Model):
         verbose_name = 'Categoria'
         verbose_name_plural = 'Categorie'
         ordering = ['ordine', 'nome']
+        indexes = [
+            # Per il feed delle modifiche (vedi prodotti/feed.py)
+            models.Index(fields=['data_aggiornamento', 'id'], name='categoria_modifica_idx'),
+        ]
     
     def __str__(self):
         return self.nome
@@ -26,7 +36,10 @@ class Categoria(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.nome)
-        super().save(*args, **kwargs)
+        # Le schede prodotto vengono aggiornate dai segnali nella stessa transazione
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
     
     def get_absolute_url(self):
         return reverse('categoria-detail', kwargs={'slug': self.slug})
@@ -37,7 +50,7 @@ class Brand(models.Model):
     nome = models.CharField(max_length=100)
     slug = models.SlugField(max_length=120, unique=True, blank=True)
     descrizione = models.TextField(blank=True, null=True)
-    logo = models.ImageField(upload_to='brands/', blank=True, null=True)
+    logo = models.ImageField(upload_to='brands/', blank=True, null=True, storage=storage_contenuti)
     sito_web = models.URLField(blank=True, null=True)
     data_creazione = models.DateTimeField(auto_now_add=True)
     data_aggiornamento = models.DateTimeField(auto_now=True)
@@ -46,6 +59,9 @@ class Brand(models.Model):
         verbose_name = 'Brand'
         verbose_name_plural = 'Brands'
         ordering = ['nome']
+        indexes = [
+            models.Index(fields=['data_aggiornamento', 'id'], name='brand_modifica_idx'),
+        ]
     
     def __str__(self):
         return self.nome
@@ -53,7 +69,34 @@ class Brand(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.nome)
-        super().save(*args, **kwargs)
+        # Le schede prodotto vengono aggiornate dai segnali nella stessa transazione
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+
+class IndicePrefisso(models.Index):
+    """
+    Indice per la ricerca per prefisso senza distinzione di maiuscole (``istartswith``,
+    il ``^`` dei search_fields dell'admin), che un indice semplice sul campo non serve:
+    - PostgreSQL confronta ``UPPER(campo) LIKE UPPER('abc%')``: indice sull'espressione
+      con ``text_pattern_ops``, che vale per LIKE con qualunque collation;
+    - SQLite usa LIKE, già senza distinzione di maiuscole: indice con collation NOCASE;
+    - gli altri database hanno collation senza distinzione di maiuscole: indice semplice.
+    """
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        colonna = F(self.fields[0])
+        vendor = schema_editor.connection.vendor
+        if vendor == 'postgresql':
+            from django.contrib.postgres.indexes import OpClass
+            espressione = OpClass(Upper(colonna), name='text_pattern_ops')
+        elif vendor == 'sqlite':
+            espressione = Collate(colonna, 'NOCASE')
+        else:
+            return super().create_sql(model, schema_editor, using=using, **kwargs)
+        indice = models.Index(espressione, name=self.name)
+        return indice.create_sql(model, schema_editor, using=using, **kwargs)
 
 
 class Product(models.Model):
@@ -70,7 +113,7 @@ class Product(models.Model):
     # Informazioni principali
     descrizione_breve = models.TextField()
     descrizione_completa = models.TextField(blank=True, null=True)
-    immagine_principale = models.ImageField(upload_to='prodotti/')
+    immagine_principale = models.ImageField(upload_to='prodotti/', storage=storage_contenuti)
     
     # Informazioni di prezzo e stock
     prezzo = models.DecimalField(max_digits=10, decimal_places=2)
@@ -78,6 +121,33 @@ class Product(models.Model):
     quantita_disponibile = models.PositiveIntegerField(default=0)
     peso = models.DecimalField(max_digits=6, decimal_places=2, help_text='Peso in grammi', blank=True, null=True)
     
+    # Prezzo effettivo più basso dei 30 giorni prima dell'ultima variazione (direttiva Omnibus),
+    # aggiornato a ogni variazione dallo storico prezzi (vedi prodotti/prezzi.py)
+    prezzo_minimo_30gg = models.DecimalField(
+        max_digits=10, decimal_places=2, blank=True, null=True, editable=False
+    )
+    
+    # Calcolati dal database a ogni scrittura dei prezzi, per filtrare e ordinare per sconto
+    in_offerta = models.GeneratedField(
+        expression=Case(
+            When(prezzo_scontato__isnull=False, prezzo_scontato__lt=F('prezzo'), then=Value(True)),
+            default=Value(False)
+        ),
+        output_field=models.BooleanField(),
+        db_persist=True
+    )
+    sconto_percentuale = models.GeneratedField(
+        expression=Case(
+            When(
+                prezzo_scontato__isnull=False, prezzo_scontato__lt=F('prezzo'),
+                then=Cast(Round((F('prezzo') - F('prezzo_scontato')) * 100 / F('prezzo')), models.IntegerField())
+            ),
+            default=Value(0)
+        ),
+        output_field=models.IntegerField(),
+        db_persist=True
+    )
+    
     # Flags e metadati
     in_evidenza = models.BooleanField(default=False)
     in_vendita = models.BooleanField(default=True)
@@ -91,18 +161,46 @@ class Product(models.Model):
     meta_descrizione = models.TextField(blank=True, null=True)
     meta_keywords = models.CharField(max_length=255, blank=True, null=True)
     
+    # Punteggio con decadimento calcolato da visualizzazioni e clic (vedi prodotti/popolarita.py)
+    popolarita = models.FloatField(default=0, editable=False)
+    
     # Timestamp
     data_creazione = models.DateTimeField(auto_now_add=True)
     data_aggiornamento = models.DateTimeField(auto_now=True)
     
+    objects = ProductManager()
+    
     class Meta:
         verbose_name = 'Prodotto'
         verbose_name_plural = 'Prodotti'
         ordering = ['-data_creazione']
+        indexes = [
+            models.Index(fields=['data_aggiornamento', 'id'], name='prodotto_modifica_idx'),
+            # Ordinamenti predefinito e per nome, ricerca per prefisso del changelist admin
+            models.Index(fields=['data_creazione', 'id'], name='prodotto_creazione_idx'),
+            models.Index(fields=['nome'], name='prodotto_nome_idx'),
+            IndicePrefisso(fields=['nome'], name='prodotto_nome_prefisso_idx'),
+            # Feed delle migliori offerte: indice parziale letto già in ordine di sconto,
+            # contiene solo i prodotti in vendita e in offerta
+            models.Index(
+                fields=['-sconto_percentuale', 'id'], name='prodotto_offerte_idx',
+                condition=models.Q(in_vendita=True, in_offerta=True)
+            ),
+            models.Index(fields=['-popolarita', 'id'], name='prodotto_popolarita_idx'),
+        ]
     
     def __str__(self):
         return self.nome
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        istanza = super().from_db(db, field_names, values)
+        # Prezzi letti dal DB, per capire al salvataggio se sono cambiati
+        istanza._prezzi_originali = (
+            istanza.__dict__.get('prezzo'), istanza.__dict__.get('prezzo_scontato')
+        )
+        return istanza
+    
     def save(self, *args, **kwargs):
         # Genera slug se non esiste
         if not self.slug:
@@ -115,10 +213,13 @@ class Product(models.Model):
             unique_id = str(uuid.uuid4())[:8]
             self.codice_sku = f"{prefix}-{unique_id}"
         
-        super().save(*args, **kwargs)
+        # Le schede prodotto vengono aggiornate dai segnali nella stessa transazione
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
     
     def get_absolute_url(self):
-        return reverse('product-detail', kwargs={'slug': self.slug})
+        return reverse('prodotto-detail', kwargs={'slug': self.slug})
     
     @property
     def is_in_stock(self):
@@ -129,17 +230,21 @@ class Product(models.Model):
         return self.prezzo_scontato is not None and self.prezzo_scontato < self.prezzo
     
     @property
-    def sconto_percentuale(self):
-        if self.is_on_sale:
-            sconto = ((self.prezzo - self.prezzo_scontato) / self.prezzo) * 100
-            return round(sconto)
-        return 0
+    def prezzo_effettivo(self):
+        """Prezzo pagato dal cliente: scontato se in offerta, altrimenti pieno"""
+        return self.prezzo_scontato if self.is_on_sale else self.prezzo
+    
+    @property
+    def prezzi_modificati(self):
+        """True se prezzo o prezzo scontato sono cambiati rispetto al DB"""
+        originali = getattr(self, '_prezzi_originali', None)
+        return originali is not None and originali != (self.prezzo, self.prezzo_scontato)
 
 
 class ProductImage(models.Model):
     """Immagini aggiuntive per i prodotti"""
     prodotto = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='immagini')
-    immagine = models.ImageField(upload_to='prodotti/')
+    immagine = models.ImageField(upload_to='prodotti/', storage=storage_contenuti)
     alt_text = models.CharField(max_length=255, blank=True, null=True)
     is_principale = models.BooleanField(default=False)
     ordine = models.PositiveIntegerField(default=0)
@@ -153,6 +258,59 @@ class ProductImage(models.Model):
         return f"Immagine di {self.prodotto.nome}"
 
 
+class TagSpecifica(models.Model):
+    """
+    Valore normalizzato di una specifica testuale, usato da filtri e faccette.
+    I tag sono ricavati dal testo dei prodotti (vedi prodotti/tag.py).
+    """
+    nome = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=120, unique=True)
+    
+    class Meta:
+        abstract = True
+        ordering = ['nome']
+    
+    def __str__(self):
+        return self.nome
+    
+    def save(self, *args, **kwargs):
+        if not self.slug:
+            self.slug = slugify(self.nome)
+        super().save(*args, **kwargs)
+
+
+class Specie(TagSpecifica):
+    """Specie ittica insidiata da un'esca"""
+    
+    class Meta(TagSpecifica.Meta):
+        verbose_name = 'Specie'
+        verbose_name_plural = 'Specie'
+
+
+class Colore(TagSpecifica):
+    """Colore di un'esca"""
+    
+    class Meta(TagSpecifica.Meta):
+        verbose_name = 'Colore'
+        verbose_name_plural = 'Colori'
+
+
+class Materiale(TagSpecifica):
+    """Materiale del fusto di una canna"""
+    
+    class Meta(TagSpecifica.Meta):
+        verbose_name = 'Materiale'
+        verbose_name_plural = 'Materiali'
+
+
+class FasciaProfondita(TagSpecifica):
+    """Fascia di profondità di lavoro (standard o testo non riconosciuto)"""
+    
+    class Meta(TagSpecifica.Meta):
+        verbose_name = 'Fascia di profondità'
+        verbose_name_plural = 'Fasce di profondità'
+
+
 class Mulinello(Product):
     """Modello specifico per mulinelli da pesca"""
     # Caratteristiche tecniche specifiche dei mulinelli
@@ -216,6 +374,8 @@ class Canna(Product):
     ingombro = models.DecimalField(max_digits=5, decimal_places=2, help_text='Ingombro chiusa in cm', blank=True, null=True)
     anelli = models.CharField(max_length=100, blank=True, null=True)
     porta_mulinello = models.CharField(max_length=100, blank=True, null=True)
+    # Ricavati da materiale (vedi prodotti/tag.py)
+    materiali = models.ManyToManyField(Materiale, blank=True, editable=False, related_name='canne')
     
     class Meta:
         verbose_name = 'Canna da pesca'
@@ -252,6 +412,11 @@ class Esca(Product):
     rattlin = models.BooleanField(default=False, help_text='Produce suoni/vibrazioni')
     specie_target = models.CharField(max_length=255, blank=True, null=True, help_text='Es. Spigola, Trota, Black Bass')
     
+    # Ricavati da specie_target, colore e profondita_lavoro (vedi prodotti/tag.py)
+    specie = models.ManyToManyField(Specie, blank=True, editable=False, related_name='esche')
+    colori = models.ManyToManyField(Colore, blank=True, editable=False, related_name='esche')
+    fasce_profondita = models.ManyToManyField(FasciaProfondita, blank=True, editable=False, related_name='esche')
+    
     class Meta:
         verbose_name = 'Esca'
         verbose_name_plural = 'Esche'
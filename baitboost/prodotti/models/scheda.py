@@ -0,0 +1,74 @@
+from django.db import models
+
+from .catalogo import Product
+
+
+class SchedaProdotto(models.Model):
+    """
+    Read model denormalizzato: una riga per prodotto con i dati della scheda nelle liste.
+    Contiene nomi e slug di brand e categoria, l'immagine principale, il sottotipo e le
+    specifiche principali, così le liste si leggono da una sola tabella senza join.
+    Viene aggiornato nella stessa transazione delle modifiche (vedi prodotti/schede.py).
+    """
+    TIPO_PRODOTTO = 'prodotto'
+    TIPO_MULINELLO = 'mulinello'
+    TIPO_CANNA = 'canna'
+    TIPO_ESCA = 'esca'
+    
+    prodotto = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='scheda')
+    tipo = models.CharField(max_length=20, choices=[
+        (TIPO_PRODOTTO, 'Prodotto'),
+        (TIPO_MULINELLO, 'Mulinello'),
+        (TIPO_CANNA, 'Canna'),
+        (TIPO_ESCA, 'Esca')
+    ])
+    nome = models.CharField(max_length=255)
+    slug = models.SlugField(max_length=280, unique=True)
+    codice_sku = models.CharField(max_length=50)
+    descrizione_breve = models.TextField()
+    immagine_principale = models.CharField(max_length=255, blank=True)
+    
+    # Categoria e brand copiati per evitare le join
+    categoria_id = models.BigIntegerField()
+    categoria_nome = models.CharField(max_length=100)
+    categoria_slug = models.SlugField(max_length=120)
+    brand_id = models.BigIntegerField()
+    brand_nome = models.CharField(max_length=100)
+    brand_slug = models.SlugField(max_length=120)
+    
+    prezzo = models.DecimalField(max_digits=10, decimal_places=2)
+    prezzo_scontato = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    prezzo_minimo_30gg = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    sconto_percentuale = models.IntegerField(default=0)
+    in_offerta = models.BooleanField(default=False)
+    quantita_disponibile = models.PositiveIntegerField(default=0)
+    in_evidenza = models.BooleanField(default=False)
+    in_vendita = models.BooleanField(default=True)
+    nuovo = models.BooleanField(default=False)
+    usato = models.BooleanField(default=False)
+    specifiche = models.JSONField(default=dict, blank=True)
+    popolarita = models.FloatField(default=0)
+    
+    data_creazione = models.DateTimeField()
+    data_aggiornamento = models.DateTimeField()
+    
+    class Meta:
+        verbose_name = 'Scheda prodotto'
+        verbose_name_plural = 'Schede prodotto'
+        ordering = ['-data_creazione']
+        indexes = [
+            models.Index(fields=['-data_creazione', 'prodotto'], name='scheda_creazione_idx'),
+            models.Index(fields=['tipo', '-data_creazione'], name='scheda_tipo_idx'),
+            models.Index(fields=['categoria_id', '-data_creazione'], name='scheda_categoria_idx'),
+            models.Index(fields=['brand_id', '-data_creazione'], name='scheda_brand_idx'),
+            models.Index(fields=['prezzo'], name='scheda_prezzo_idx'),
+            models.Index(fields=['-sconto_percentuale'], name='scheda_sconto_idx'),
+            models.Index(fields=['-popolarita', 'prodotto'], name='scheda_popolarita_idx'),
+        ]
+    
+    def __str__(self):
+        return self.nome
+    
+    @property
+    def is_in_stock(self):
+        return self.quantita_disponibile > 0
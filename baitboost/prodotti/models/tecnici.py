@@ -0,0 +1,241 @@
+"""
+Tabelle di servizio dei prodotti: code e storici dei prezzi, visite, prodotti
+correlati, eliminazioni per il feed, caricamenti a parti e riferimenti ai media.
+"""
+import uuid
+
+from django.conf import settings
+from django.db import models
+
+from .catalogo import Product, ProductImage
+
+
+class VariazionePrezzo(models.Model):
+    """
+    Coda delle variazioni di prezzo dei prodotti.
+    Viene svuotata a lotti dai job che reagiscono ai cambi di prezzo (es. ribassi in wishlist).
+    """
+    prodotto = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='variazioni_prezzo')
+    prezzo = models.DecimalField(max_digits=10, decimal_places=2)
+    prezzo_scontato = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    prezzo_effettivo = models.DecimalField(max_digits=10, decimal_places=2)
+    data_variazione = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Variazione prezzo'
+        verbose_name_plural = 'Variazioni prezzo'
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"{self.prodotto_id}: {self.prezzo_effettivo}"
+
+
+class VisiteProdotto(models.Model):
+    """
+    Visualizzazioni e clic di un prodotto in un giorno.
+    Scritti a lotti dal buffer in memoria dei worker (vedi prodotti/popolarita.py),
+    così le richieste non scrivono mai sulla riga del prodotto.
+    """
+    prodotto = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='visite')
+    giorno = models.DateField()
+    visualizzazioni = models.PositiveIntegerField(default=0)
+    clic = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Visite prodotto'
+        verbose_name_plural = 'Visite prodotti'
+        ordering = ['-giorno', 'prodotto']
+        constraints = [
+            models.UniqueConstraint(fields=['prodotto', 'giorno'], name='visite_prodotto_giorno_unico'),
+        ]
+        indexes = [
+            # Letture del ricalcolo e pulizia dei giorni fuori finestra
+            models.Index(fields=['giorno'], name='visite_giorno_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.prodotto_id} {self.giorno}: {self.visualizzazioni} visualizzazioni, {self.clic} clic"
+
+
+class StoricoPrezzo(models.Model):
+    """
+    Storico dei prezzi dei prodotti, in sola aggiunta: una riga per ogni prezzo applicato,
+    valido da data_inizio fino alla riga successiva dello stesso prodotto.
+    Il job di compattazione elimina le righe che non servono più al minimo dei 30 giorni.
+    """
+    prodotto = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='storico_prezzi')
+    prezzo = models.DecimalField(max_digits=10, decimal_places=2)
+    prezzo_scontato = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    prezzo_effettivo = models.DecimalField(max_digits=10, decimal_places=2)
+    data_inizio = models.DateTimeField()
+    
+    class Meta:
+        verbose_name = 'Storico prezzo'
+        verbose_name_plural = 'Storico prezzi'
+        ordering = ['prodotto', 'data_inizio']
+        indexes = [
+            models.Index(fields=['prodotto', 'data_inizio'], name='storico_prodotto_data_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.prodotto_id}: {self.prezzo_effettivo} dal {self.data_inizio:%d/%m/%Y %H:%M}"
+
+
+class ProdottoCorrelato(models.Model):
+    """
+    Indice precalcolato dei prodotti simili (vedi prodotti/correlati.py).
+    Una riga per ogni vicino: i vicini di un prodotto si leggono con una sola query sull'indice.
+    """
+    prodotto = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='correlati')
+    correlato = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    posizione = models.PositiveSmallIntegerField()
+    punteggio = models.FloatField()
+    
+    class Meta:
+        verbose_name = 'Prodotto correlato'
+        verbose_name_plural = 'Prodotti correlati'
+        ordering = ['prodotto', 'posizione']
+        constraints = [
+            models.UniqueConstraint(fields=['prodotto', 'posizione'], name='correlato_prodotto_posizione_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.prodotto_id} -> {self.correlato_id}"
+
+
+class CalcoloCorrelati(models.Model):
+    """Esecuzione del job dei prodotti correlati, usata per il ricalcolo incrementale"""
+    data_inizio = models.DateTimeField()
+    data_fine = models.DateTimeField(blank=True, null=True)
+    completo = models.BooleanField(default=False)
+    prodotti_ricalcolati = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Calcolo correlati'
+        verbose_name_plural = 'Calcoli correlati'
+        ordering = ['-data_inizio']
+    
+    def __str__(self):
+        return f"Calcolo del {self.data_inizio:%Y-%m-%d %H:%M}"
+
+
+class Eliminazione(models.Model):
+    """
+    Traccia (tombstone) di un prodotto, una categoria o un brand eliminato.
+    Permette al feed delle modifiche di comunicare anche le cancellazioni.
+    """
+    TIPO_PRODOTTO = 'prodotto'
+    TIPO_CATEGORIA = 'categoria'
+    TIPO_BRAND = 'brand'
+    
+    tipo = models.CharField(max_length=20, choices=[
+        (TIPO_PRODOTTO, 'Prodotto'),
+        (TIPO_CATEGORIA, 'Categoria'),
+        (TIPO_BRAND, 'Brand')
+    ])
+    oggetto_id = models.BigIntegerField()
+    slug = models.SlugField(max_length=280)
+    data_eliminazione = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Eliminazione'
+        verbose_name_plural = 'Eliminazioni'
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"{self.tipo} {self.slug}"
+
+
+class CaricamentoImmagine(models.Model):
+    """
+    Caricamento a parti di un'immagine prodotto, riprendibile dopo un'interruzione.
+    Le parti vengono salvate sullo storage man mano che arrivano e riunite al completamento.
+    """
+    STATO_IN_CORSO = 'in_corso'
+    STATO_COMPLETATO = 'completato'
+    STATO_ANNULLATO = 'annullato'
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    prodotto = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='caricamenti')
+    utente = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    nome_file = models.CharField(max_length=255)
+    dimensione_totale = models.PositiveBigIntegerField()
+    dimensione_parte = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64, blank=True, help_text='Checksum del file completo (opzionale)')
+    stato = models.CharField(max_length=20, default=STATO_IN_CORSO, choices=[
+        (STATO_IN_CORSO, 'In corso'),
+        (STATO_COMPLETATO, 'Completato'),
+        (STATO_ANNULLATO, 'Annullato')
+    ])
+    
+    # Dati dell'immagine da creare al completamento
+    alt_text = models.CharField(max_length=255, blank=True, null=True)
+    is_principale = models.BooleanField(default=False)
+    ordine = models.PositiveIntegerField(default=0)
+    immagine = models.ForeignKey(ProductImage, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    
+    data_creazione = models.DateTimeField(auto_now_add=True)
+    data_aggiornamento = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Caricamento immagine'
+        verbose_name_plural = 'Caricamenti immagini'
+        ordering = ['-data_creazione']
+    
+    def __str__(self):
+        return f"{self.nome_file} ({self.stato})"
+    
+    @property
+    def numero_parti(self):
+        return max(1, -(-self.dimensione_totale // self.dimensione_parte))
+    
+    def dimensione_attesa(self, indice):
+        """Dimensione in byte che deve avere la parte con l'indice indicato"""
+        if indice < self.numero_parti - 1:
+            return self.dimensione_parte
+        return self.dimensione_totale - self.dimensione_parte * (self.numero_parti - 1)
+
+
+class ParteCaricamento(models.Model):
+    """Singola parte di un caricamento, già salvata sullo storage"""
+    caricamento = models.ForeignKey(CaricamentoImmagine, on_delete=models.CASCADE, related_name='parti')
+    indice = models.PositiveIntegerField()
+    dimensione = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64)
+    percorso = models.CharField(max_length=255)
+    data_creazione = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Parte caricamento'
+        verbose_name_plural = 'Parti caricamento'
+        ordering = ['indice']
+        constraints = [
+            models.UniqueConstraint(fields=['caricamento', 'indice'], name='parte_caricamento_indice_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"Parte {self.indice} di {self.caricamento_id}"
+
+
+class BlobMedia(models.Model):
+    """
+    File dello storage indirizzato per contenuto, con il numero di campi che lo usano.
+    I blob senza riferimenti vengono eliminati dal comando pulisci_media.
+    """
+    nome = models.CharField(max_length=255, unique=True)
+    dimensione = models.PositiveBigIntegerField(default=0)
+    riferimenti = models.IntegerField(default=0)
+    data_creazione = models.DateTimeField(auto_now_add=True)
+    data_aggiornamento = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Blob media'
+        verbose_name_plural = 'Blob media'
+        indexes = [
+            models.Index(fields=['riferimenti', 'data_aggiornamento'], name='blob_raccolta_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.nome} ({self.riferimenti})"
@@ -0,0 +1,188 @@
+"""
+Conteggio di visualizzazioni e clic dei prodotti e punteggio di popolarità.
+
+Le richieste non scrivono sul database: ``buffer_visite`` accumula i conteggi in
+memoria nel worker e, al massimo ogni VISITE_INTERVALLO_SECONDI (o quando il buffer
+supera VISITE_MASSIMO_BUFFER prodotti), un thread in background li somma alla tabella
+``VisiteProdotto`` (una riga per prodotto e giorno) con pochi UPDATE a lotti.
+Il ricalcolo (compito in coda accodato dopo ogni scrittura, o comando
+``ricalcola_popolarita``) somma le visite degli ultimi POPOLARITA_FINESTRA_GIORNI
+con un decadimento esponenziale e scrive ``popolarita`` su prodotti e schede.
+Se un worker termina senza svuotare il buffer si perdono al massimo i conteggi
+dell'ultimo intervallo.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Product, SchedaProdotto, VisiteProdotto
+
+logger = logging.getLogger(__name__)
+
+# Numero massimo di id per singola query IN (sotto il limite di variabili di SQLite)
+DIMENSIONE_LOTTO = 500
+
+VISUALIZZAZIONE = 0
+CLIC = 1
+
+
+class BufferVisite:
+    """Conteggi del worker non ancora scritti, per (id prodotto, giorno)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conteggi = defaultdict(lambda: [0, 0])
+        self._svuotato_il = time.monotonic()
+        self._svuotamento_in_corso = False
+
+    def registra(self, id_prodotto, tipo=VISUALIZZAZIONE):
+        """Conta una visualizzazione o un clic; non fa query"""
+        with self._lock:
+            self._conteggi[(id_prodotto, timezone.localdate())][tipo] += 1
+            scaduto = (
+                time.monotonic() - self._svuotato_il >= settings.VISITE_INTERVALLO_SECONDI
+                or len(self._conteggi) >= settings.VISITE_MASSIMO_BUFFER
+            )
+            if not scaduto or self._svuotamento_in_corso:
+                return
+            self._svuotamento_in_corso = True
+        threading.Thread(target=self._svuota_in_background, daemon=True).start()
+
+    def _svuota_in_background(self):
+        try:
+            self.svuota()
+        finally:
+            self._svuotamento_in_corso = False
+            # Il thread non serve altre richieste: la sua connessione va chiusa
+            connection.close()
+
+    def svuota(self):
+        """Scrive i conteggi accumulati; in caso di errore li rimette nel buffer"""
+        with self._lock:
+            conteggi, self._conteggi = self._conteggi, defaultdict(lambda: [0, 0])
+            self._svuotato_il = time.monotonic()
+        if not conteggi:
+            return 0
+        try:
+            scrivi_visite(conteggi)
+        except DatabaseError:
+            logger.exception('Scrittura di %s conteggi di visite non riuscita', len(conteggi))
+            with self._lock:
+                for chiave, (visualizzazioni, clic) in conteggi.items():
+                    self._conteggi[chiave][VISUALIZZAZIONE] += visualizzazioni
+                    self._conteggi[chiave][CLIC] += clic
+            return 0
+        return len(conteggi)
+
+    def in_attesa(self):
+        with self._lock:
+            return len(self._conteggi)
+
+
+buffer_visite = BufferVisite()
+atexit.register(buffer_visite.svuota)
+
+
+def scrivi_visite(conteggi, using=None):
+    """
+    Somma i conteggi alle righe giornaliere in una transazione.
+
+    Crea le righe mancanti con un INSERT che ignora i conflitti, poi incrementa con
+    un UPDATE per ogni coppia di incrementi uguali (quasi tutti i prodotti ne hanno
+    pochi): gli incrementi sono atomici anche con più worker che scrivono insieme.
+
+    Args:
+        conteggi (dict): (id prodotto, giorno) -> [visualizzazioni, clic].
+    """
+    chiavi = list(conteggi)
+    esistenti = set()
+    for inizio in range(0, len(chiavi), DIMENSIONE_LOTTO):
+        lotto = {id_prodotto for id_prodotto, _ in chiavi[inizio:inizio + DIMENSIONE_LOTTO]}
+        esistenti.update(Product.objects.using(using).filter(pk__in=lotto).values_list('pk', flat=True))
+
+    gruppi = defaultdict(list)
+    for (id_prodotto, giorno), (visualizzazioni, clic) in conteggi.items():
+        # I prodotti eliminati nel frattempo violerebbero la foreign key
+        if id_prodotto in esistenti:
+            gruppi[(giorno, visualizzazioni, clic)].append(id_prodotto)
+
+    with transaction.atomic(using=using):
+        VisiteProdotto.objects.using(using).bulk_create(
+            [
+                VisiteProdotto(prodotto_id=id_prodotto, giorno=giorno)
+                for (giorno, _, _), id_prodotti in gruppi.items() for id_prodotto in id_prodotti
+            ],
+            ignore_conflicts=True, batch_size=DIMENSIONE_LOTTO,
+        )
+        for (giorno, visualizzazioni, clic), id_prodotti in gruppi.items():
+            for inizio in range(0, len(id_prodotti), DIMENSIONE_LOTTO):
+                VisiteProdotto.objects.using(using).filter(
+                    giorno=giorno, prodotto_id__in=id_prodotti[inizio:inizio + DIMENSIONE_LOTTO]
+                ).update(visualizzazioni=F('visualizzazioni') + visualizzazioni, clic=F('clic') + clic)
+        if gruppi:
+            # Un solo ricalcolo in attesa raccoglie tutte le scritture arrivate nel frattempo
+            from .compiti import ricalcola_popolarita_prodotti
+            ricalcola_popolarita_prodotti.accoda(
+                chiave='ricalcola-popolarita', ritardo=settings.POPOLARITA_RITARDO_SECONDI, using=using
+            )
+
+
+def calcola_punteggi(oggi=None, using=None):
+    """
+    Punteggio di ogni prodotto con visite nella finestra: visualizzazioni più clic
+    pesati, dimezzati ogni POPOLARITA_EMIVITA_GIORNI di età.
+
+    Returns:
+        dict: id prodotto -> punteggio arrotondato.
+    """
+    oggi = oggi or timezone.localdate()
+    inizio = oggi - timedelta(days=settings.POPOLARITA_FINESTRA_GIORNI - 1)
+    punteggi = defaultdict(float)
+    righe = VisiteProdotto.objects.using(using).filter(giorno__gte=inizio, giorno__lte=oggi).values_list(
+        'prodotto_id', 'giorno', 'visualizzazioni', 'clic'
+    )
+    for id_prodotto, giorno, visualizzazioni, clic in righe.iterator(chunk_size=2000):
+        decadimento = 0.5 ** ((oggi - giorno).days / settings.POPOLARITA_EMIVITA_GIORNI)
+        punteggi[id_prodotto] += (visualizzazioni + clic * settings.POPOLARITA_PESO_CLIC) * decadimento
+    return {id_prodotto: round(punteggio, 3) for id_prodotto, punteggio in punteggi.items()}
+
+
+def ricalcola_popolarita(oggi=None, using=None):
+    """
+    Scrive su prodotti e schede i punteggi cambiati e azzera quelli usciti dalla finestra,
+    poi elimina le visite più vecchie di VISITE_CONSERVAZIONE_GIORNI.
+
+    Returns:
+        dict: prodotti aggiornati e righe di visite eliminate.
+    """
+    oggi = oggi or timezone.localdate()
+    punteggi = calcola_punteggi(oggi, using=using)
+    attuali = dict(
+        Product.objects.using(using).exclude(popolarita=0).values_list('pk', 'popolarita').iterator()
+    )
+    variati = {pk: punteggio for pk, punteggio in punteggi.items() if attuali.get(pk, 0) != punteggio}
+    variati.update({pk: 0 for pk in attuali if pk not in punteggi})
+
+    id_variati = list(variati)
+    for inizio in range(0, len(id_variati), DIMENSIONE_LOTTO):
+        lotto = id_variati[inizio:inizio + DIMENSIONE_LOTTO]
+        with transaction.atomic(using=using):
+            # Passa dal ProductQuerySet.update senza toccare data_aggiornamento (campo tecnico)
+            Product.objects.using(using).bulk_update(
+                [Product(pk=pk, popolarita=variati[pk]) for pk in lotto], ['popolarita']
+            )
+            SchedaProdotto.objects.using(using).bulk_update(
+                [SchedaProdotto(prodotto_id=pk, popolarita=variati[pk]) for pk in lotto], ['popolarita']
+            )
+
+    limite = oggi - timedelta(days=settings.VISITE_CONSERVAZIONE_GIORNI)
+    eliminate, _ = VisiteProdotto.objects.using(using).filter(giorno__lt=limite).delete()
+    return {'aggiornati': len(variati), 'visite_eliminate': eliminate}
@@ -0,0 +1,185 @@
+"""
+Funzioni di supporto per i prezzi dei prodotti e la registrazione delle variazioni.
+
+Ogni variazione (salvataggio o aggiornamento in blocco) aggiunge una riga a
+``StoricoPrezzo`` e ricalcola ``Product.prezzo_minimo_30gg``: il prezzo effettivo più
+basso applicato nei PREZZO_MINIMO_GIORNI prima della variazione. Il valore cambia
+solo quando cambia il prezzo, quindi basta calcolarlo lì, leggendo le poche righe
+di storico del prodotto che cadono nella finestra più quella in vigore al suo inizio.
+``compatta_storico`` elimina le righe che nessun calcolo futuro può più usare.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Product, SchedaProdotto, StoricoPrezzo, VariazionePrezzo
+
+# Numero massimo di id per singola query IN (sotto il limite di variabili di SQLite)
+DIMENSIONE_LOTTO = 500
+
+
+def calcola_prezzo_effettivo(prezzo, prezzo_scontato):
+    """Restituisce il prezzo pagato dal cliente dati prezzo pieno e scontato"""
+    if prezzo_scontato is not None and prezzo_scontato < prezzo:
+        return prezzo_scontato
+    return prezzo
+
+
+def registra_variazioni(righe, using=None):
+    """
+    Accoda le variazioni di prezzo con un unico INSERT e le aggiunge allo storico.
+
+    Args:
+        righe (iterable): tuple (id_prodotto, prezzo, prezzo_scontato).
+        using (str): alias del database.
+
+    Returns:
+        dict: id prodotto -> nuovo prezzo_minimo_30gg, per i prodotti il cui prezzo è cambiato.
+    """
+    variazioni = [
+        VariazionePrezzo(
+            prodotto_id=id_prodotto,
+            prezzo=prezzo,
+            prezzo_scontato=prezzo_scontato,
+            prezzo_effettivo=calcola_prezzo_effettivo(prezzo, prezzo_scontato),
+        )
+        for id_prodotto, prezzo, prezzo_scontato in righe
+    ]
+    VariazionePrezzo.objects.using(using).bulk_create(variazioni, batch_size=DIMENSIONE_LOTTO)
+    if not variazioni:
+        return {}
+    # Un solo compito in attesa raccoglie tutte le variazioni arrivate nel frattempo
+    from utenti.compiti import rileva_ribassi_prezzo
+    rileva_ribassi_prezzo.accoda(chiave='rileva-ribassi', ritardo=settings.RIBASSI_RITARDO_SECONDI, using=using)
+    return registra_storico(
+        [(variazione.prodotto_id, variazione.prezzo, variazione.prezzo_scontato) for variazione in variazioni],
+        using=using,
+    )
+
+
+def registra_variazioni_per_id(id_prodotti, using=None):
+    """Rilegge i prezzi correnti dei prodotti indicati e accoda le variazioni a lotti"""
+    id_prodotti = list(id_prodotti)
+    for inizio in range(0, len(id_prodotti), DIMENSIONE_LOTTO):
+        lotto = id_prodotti[inizio:inizio + DIMENSIONE_LOTTO]
+        righe = Product.objects.using(using).filter(pk__in=lotto).values_list(
+            'pk', 'prezzo', 'prezzo_scontato'
+        )
+        registra_variazioni(righe, using=using)
+
+
+def _segmenti_in_finestra(id_prodotti, inizio_finestra, using=None):
+    """
+    Righe di storico ancora in vigore dopo ``inizio_finestra``, per prodotto e in ordine
+    di data: quelle iniziate dopo più l'ultima iniziata prima. Due query.
+    """
+    inizi = dict(
+        StoricoPrezzo.objects.using(using).filter(
+            prodotto_id__in=id_prodotti, data_inizio__lte=inizio_finestra
+        ).values('prodotto_id').annotate(data=Max('data_inizio')).values_list('prodotto_id', 'data')
+    )
+    # Dopo la compattazione resta al massimo una riga per prodotto prima della finestra
+    righe = StoricoPrezzo.objects.using(using).filter(
+        prodotto_id__in=id_prodotti, data_inizio__gte=min([inizio_finestra, *inizi.values()])
+    ).order_by('prodotto_id', 'data_inizio', 'id').values_list(
+        'prodotto_id', 'data_inizio', 'prezzo', 'prezzo_scontato', 'prezzo_effettivo'
+    )
+    segmenti = defaultdict(list)
+    for id_prodotto, data_inizio, prezzo, prezzo_scontato, prezzo_effettivo in righe:
+        if data_inizio >= inizi.get(id_prodotto, inizio_finestra):
+            segmenti[id_prodotto].append((data_inizio, prezzo, prezzo_scontato, prezzo_effettivo))
+    return segmenti
+
+
+def registra_storico(righe, using=None):
+    """
+    Aggiunge allo storico i prezzi cambiati e aggiorna prezzo_minimo_30gg di prodotti e schede.
+    I prezzi uguali all'ultimo registrato (es. update in blocco senza effetto) sono ignorati.
+
+    Args:
+        righe (iterable): tuple (id_prodotto, prezzo, prezzo_scontato).
+
+    Returns:
+        dict: id prodotto -> nuovo prezzo_minimo_30gg (None senza prezzi precedenti nella finestra).
+    """
+    righe = list(righe)
+    adesso = timezone.now()
+    inizio_finestra = adesso - timedelta(days=settings.PREZZO_MINIMO_GIORNI)
+    minimi = {}
+    with transaction.atomic(using=using):
+        for inizio in range(0, len(righe), DIMENSIONE_LOTTO):
+            lotto = righe[inizio:inizio + DIMENSIONE_LOTTO]
+            segmenti = _segmenti_in_finestra({riga[0] for riga in lotto}, inizio_finestra, using=using)
+            nuove = []
+            for id_prodotto, prezzo, prezzo_scontato in lotto:
+                precedenti = segmenti[id_prodotto]
+                if precedenti and precedenti[-1][1:3] == (prezzo, prezzo_scontato):
+                    continue
+                minimi[id_prodotto] = min((segmento[3] for segmento in precedenti), default=None)
+                effettivo = calcola_prezzo_effettivo(prezzo, prezzo_scontato)
+                precedenti.append((adesso, prezzo, prezzo_scontato, effettivo))
+                nuove.append(StoricoPrezzo(
+                    prodotto_id=id_prodotto, prezzo=prezzo, prezzo_scontato=prezzo_scontato,
+                    prezzo_effettivo=effettivo, data_inizio=adesso,
+                ))
+            StoricoPrezzo.objects.using(using).bulk_create(nuove)
+        _salva_minimi(minimi, using=using)
+    if minimi:
+        from .compiti import compatta_storico_prezzi
+        compatta_storico_prezzi.accoda(
+            chiave='compatta-storico-prezzi', ritardo=settings.STORICO_PREZZI_COMPATTAZIONE_SECONDI, using=using
+        )
+    return minimi
+
+
+def _salva_minimi(minimi, using=None):
+    id_prodotti = list(minimi)
+    for inizio in range(0, len(id_prodotti), DIMENSIONE_LOTTO):
+        lotto = id_prodotti[inizio:inizio + DIMENSIONE_LOTTO]
+        # Campo tecnico: l'update di ProductQuerySet non ricalcola data_aggiornamento e schede
+        Product.objects.using(using).bulk_update(
+            [Product(pk=pk, prezzo_minimo_30gg=minimi[pk]) for pk in lotto], ['prezzo_minimo_30gg']
+        )
+        SchedaProdotto.objects.using(using).bulk_update(
+            [SchedaProdotto(prodotto_id=pk, prezzo_minimo_30gg=minimi[pk]) for pk in lotto], ['prezzo_minimo_30gg']
+        )
+
+
+def compatta_storico(using=None):
+    """
+    Elimina le righe di storico iniziate prima della finestra, tranne l'ultima di ogni
+    prodotto: è quella ancora in vigore all'inizio della finestra (o il prezzo attuale).
+
+    Returns:
+        int: righe eliminate.
+    """
+    inizio_finestra = timezone.now() - timedelta(days=settings.PREZZO_MINIMO_GIORNI)
+    eliminate = 0
+    ultimo_id = 0
+    while True:
+        id_prodotti = list(
+            StoricoPrezzo.objects.using(using).filter(
+                prodotto_id__gt=ultimo_id, data_inizio__lt=inizio_finestra
+            ).order_by('prodotto_id').values_list('prodotto_id', flat=True).distinct()[:DIMENSIONE_LOTTO]
+        )
+        if not id_prodotti:
+            return eliminate
+        ultimo_id = id_prodotti[-1]
+        with transaction.atomic(using=using):
+            vecchie = StoricoPrezzo.objects.using(using).filter(
+                prodotto_id__in=id_prodotti, data_inizio__lt=inizio_finestra
+            ).order_by('prodotto_id', '-data_inizio', '-id').values_list('id', 'prodotto_id')
+            visti = set()
+            da_eliminare = []
+            for id_riga, id_prodotto in vecchie:
+                if id_prodotto in visti:
+                    da_eliminare.append(id_riga)
+                visti.add(id_prodotto)
+            for inizio in range(0, len(da_eliminare), DIMENSIONE_LOTTO):
+                eliminate += StoricoPrezzo.objects.using(using).filter(
+                    id__in=da_eliminare[inizio:inizio + DIMENSIONE_LOTTO]
+                ).delete()[0]
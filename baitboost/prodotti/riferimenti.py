@@ -0,0 +1,86 @@
+"""
+Cache in memoria dei dati di riferimento: categorie e brand.
+
+Filtri e serializer validano gli id di categoria e brand su questa cache invece
+di interrogare ogni volta le tabelle. I dati si caricano nel riscaldamento del
+worker (vedi prodotti/warmup.py): con il caricamento dell'applicazione nel
+processo master (es. ``gunicorn --preload``) e ``gc.freeze()`` le pagine restano
+condivise in sola lettura tra i worker creati con fork.
+
+Ogni modifica di categorie o brand incrementa un contatore di generazione nella
+cache condivisa; ogni processo lo legge al massimo una volta ogni
+RIFERIMENTI_CONTROLLO_SECONDI e ricarica i dati quando è cambiato, e comunque
+dopo RIFERIMENTI_ETA_MASSIMA_SECONDI (vedi baitboost/generazioni.py).
+"""
+import threading
+
+from django.conf import settings
+
+from baitboost.generazioni import GenerazioneCondivisa
+
+from .models import Brand, Categoria
+
+CHIAVE_GENERAZIONE = 'prodotti:riferimenti:generazione'
+
+
+class DatiRiferimento:
+    """Istantanea immutabile di categorie e brand, indicizzati per id"""
+
+    def __init__(self, categorie, brand):
+        self.categorie = {categoria.pk: categoria for categoria in categorie}
+        self.brand = {marca.pk: marca for marca in brand}
+        self.scelte_categorie = tuple((str(pk), str(categoria)) for pk, categoria in self.categorie.items())
+        self.scelte_brand = tuple((str(pk), str(marca)) for pk, marca in self.brand.items())
+
+
+class CacheRiferimenti:
+    """Dati di riferimento del processo, ricaricati quando cambia la generazione condivisa"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dati = None
+        self.generazione = GenerazioneCondivisa(
+            CHIAVE_GENERAZIONE,
+            intervallo=lambda: settings.RIFERIMENTI_CONTROLLO_SECONDI,
+            eta_massima=lambda: settings.RIFERIMENTI_ETA_MASSIMA_SECONDI,
+        )
+
+    def carica(self):
+        """Legge categorie e brand dal database (due query) e sostituisce l'istantanea"""
+        with self._lock:
+            generazione = self.generazione.leggi()
+            self._dati = DatiRiferimento(Categoria.objects.all(), Brand.objects.all())
+            self.generazione.caricato(generazione)
+            return self._dati
+
+    def dati(self):
+        """Istantanea corrente; controlla la generazione condivisa solo se è passato l'intervallo"""
+        dati = self._dati
+        if dati is not None and not self.generazione.da_ricaricare():
+            return dati
+        return self.carica()
+
+    def invalida(self):
+        """Segnala a tutti i processi che categorie o brand sono cambiati"""
+        self.generazione.invalida()
+
+
+riferimenti = CacheRiferimenti()
+
+
+# Reason: funzioni di modulo e non metodi legati, perché filtri e campi dei serializer
+# vengono copiati con deepcopy, che copierebbe anche l'istanza della cache
+def categoria(pk):
+    return riferimenti.dati().categorie.get(pk)
+
+
+def brand(pk):
+    return riferimenti.dati().brand.get(pk)
+
+
+def scelte_categorie():
+    return riferimenti.dati().scelte_categorie
+
+
+def scelte_brand():
+    return riferimenti.dati().scelte_brand
@@ -0,0 +1,169 @@
+"""
+Sincronizzazione del read model ``SchedaProdotto``.
+
+Le schede vengono ricalcolate dai prodotti con un'unica query a lotti
+(select_related di categoria, brand e sottotipi) e scritte con un upsert.
+Sono aggiornate:
+- al salvataggio di un prodotto, nella stessa transazione (segnali post_save);
+- negli aggiornamenti in blocco, dall'hook di ``ProductQuerySet.update``;
+- alla modifica di brand e categorie, con un solo UPDATE delle schede coinvolte.
+Il comando ``ricostruisci_schede`` le ricostruisce o le verifica da zero.
+"""
+from .models import Product, SchedaProdotto
+
+DIMENSIONE_LOTTO = 500
+
+# Specifiche principali mostrate nelle liste, per sottotipo
+SPECIFICHE = {
+    SchedaProdotto.TIPO_MULINELLO: [
+        'tipo_mulinello', 'cuscinetti', 'rapporto_recupero', 'peso_mulinello', 'freno_massimo', 'frizione'
+    ],
+    SchedaProdotto.TIPO_CANNA: [
+        'tipo_canna', 'lunghezza', 'numero_sezioni', 'potenza_lancio', 'azione', 'materiale'
+    ],
+    SchedaProdotto.TIPO_ESCA: [
+        'tipo_esca', 'lunghezza_esca', 'peso_esca', 'profondita_lavoro', 'colore', 'specie_target'
+    ],
+}
+
+# Campi della scheda riscritti dall'upsert (tutti tranne la chiave)
+CAMPI_AGGIORNATI = [
+    campo.name for campo in SchedaProdotto._meta.concrete_fields if not campo.primary_key
+]
+
+
+def _valore_json(valore):
+    # Decimal non è serializzabile in JSON: le specifiche numeriche diventano float
+    if valore is None or isinstance(valore, (str, int, bool)):
+        return valore
+    return float(valore)
+
+
+def _tipo_e_sottotipo(prodotto):
+    for tipo in SPECIFICHE:
+        sottotipo = getattr(prodotto, tipo, None)
+        if sottotipo is not None:
+            return tipo, sottotipo
+    return SchedaProdotto.TIPO_PRODOTTO, None
+
+
+def scheda_da_prodotto(prodotto):
+    """Costruisce la scheda (non salvata) di un prodotto caricato con ``_prodotti_completi``"""
+    tipo, sottotipo = _tipo_e_sottotipo(prodotto)
+    specifiche = {
+        campo: _valore_json(getattr(sottotipo, campo)) for campo in SPECIFICHE.get(tipo, [])
+    }
+    return SchedaProdotto(
+        prodotto_id=prodotto.pk,
+        tipo=tipo,
+        nome=prodotto.nome,
+        slug=prodotto.slug,
+        codice_sku=prodotto.codice_sku,
+        descrizione_breve=prodotto.descrizione_breve,
+        immagine_principale=prodotto.immagine_principale.name or '',
+        categoria_id=prodotto.categoria_id,
+        categoria_nome=prodotto.categoria.nome,
+        categoria_slug=prodotto.categoria.slug,
+        brand_id=prodotto.brand_id,
+        brand_nome=prodotto.brand.nome,
+        brand_slug=prodotto.brand.slug,
+        prezzo=prodotto.prezzo,
+        prezzo_scontato=prodotto.prezzo_scontato,
+        sconto_percentuale=prodotto.sconto_percentuale,
+        prezzo_minimo_30gg=prodotto.prezzo_minimo_30gg,
+        in_offerta=prodotto.in_offerta,
+        quantita_disponibile=prodotto.quantita_disponibile,
+        in_evidenza=prodotto.in_evidenza,
+        in_vendita=prodotto.in_vendita,
+        nuovo=prodotto.nuovo,
+        usato=prodotto.usato,
+        specifiche=specifiche,
+        popolarita=prodotto.popolarita,
+        data_creazione=prodotto.data_creazione,
+        data_aggiornamento=prodotto.data_aggiornamento,
+    )
+
+
+def _prodotti_completi(using=None):
+    return Product.objects.using(using).select_related(
+        'categoria', 'brand', 'mulinello', 'canna', 'esca'
+    )
+
+
+def aggiorna_schede(id_prodotti, using=None):
+    """
+    Ricalcola e salva con un upsert le schede dei prodotti indicati, a lotti.
+    I prodotti non più esistenti perdono la scheda per CASCADE.
+    """
+    id_prodotti = list(id_prodotti)
+    for inizio in range(0, len(id_prodotti), DIMENSIONE_LOTTO):
+        lotto = id_prodotti[inizio:inizio + DIMENSIONE_LOTTO]
+        schede = [scheda_da_prodotto(prodotto) for prodotto in _prodotti_completi(using).filter(pk__in=lotto)]
+        SchedaProdotto.objects.using(using).bulk_create(
+            schede, update_conflicts=True, unique_fields=['prodotto'], update_fields=CAMPI_AGGIORNATI
+        )
+
+
+def aggiorna_riferimento(campo, oggetto, using=None):
+    """Copia nome e slug di un brand o di una categoria in tutte le sue schede, con un solo UPDATE"""
+    SchedaProdotto.objects.using(using).filter(**{f'{campo}_id': oggetto.pk}).update(**{
+        f'{campo}_nome': oggetto.nome,
+        f'{campo}_slug': oggetto.slug,
+    })
+
+
+def _valori(scheda):
+    return tuple(getattr(scheda, campo) for campo in CAMPI_AGGIORNATI)
+
+
+def verifica_schede(correggi=False):
+    """
+    Confronta le schede con le tabelle di origine, a lotti in ordine di id.
+
+    Args:
+        correggi (bool): riscrive le schede errate o mancanti ed elimina quelle orfane.
+
+    Returns:
+        dict: numero di schede mancanti, diverse e orfane.
+    """
+    risultato = {'mancanti': 0, 'diverse': 0, 'orfane': 0}
+    ultimo_id = 0
+    while True:
+        prodotti = list(_prodotti_completi().filter(pk__gt=ultimo_id).order_by('pk')[:DIMENSIONE_LOTTO])
+        if not prodotti:
+            break
+        ultimo_id = prodotti[-1].pk
+        esistenti = SchedaProdotto.objects.in_bulk([prodotto.pk for prodotto in prodotti])
+        da_correggere = []
+        for prodotto in prodotti:
+            attesa = scheda_da_prodotto(prodotto)
+            attuale = esistenti.get(prodotto.pk)
+            if attuale is None:
+                risultato['mancanti'] += 1
+                da_correggere.append(prodotto.pk)
+            elif _valori(attuale) != _valori(attesa):
+                risultato['diverse'] += 1
+                da_correggere.append(prodotto.pk)
+        if correggi and da_correggere:
+            aggiorna_schede(da_correggere)
+
+    orfane = SchedaProdotto.objects.exclude(prodotto__in=Product.objects.all())
+    risultato['orfane'] = orfane.count()
+    if correggi and risultato['orfane']:
+        orfane.delete()
+    return risultato
+
+
+def ricostruisci_schede():
+    """Ricalcola tutte le schede; restituisce il numero di prodotti elaborati"""
+    totale = 0
+    ultimo_id = 0
+    while True:
+        lotto = list(
+            Product.objects.filter(pk__gt=ultimo_id).order_by('pk').values_list('pk', flat=True)[:DIMENSIONE_LOTTO]
+        )
+        if not lotto:
+            return totale
+        ultimo_id = lotto[-1]
+        aggiorna_schede(lotto)
+        totale += len(lotto)
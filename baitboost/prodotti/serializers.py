@@ -1,5 +1,33 @@
 from rest_framework import serializers
-from .models import Categoria, Brand, Product, ProductImage, Mulinello, Canna, Esca
+
+from baitboost.storage import storage_contenuti
+from .models import (
+    Categoria, Brand, Product, ProductImage, Mulinello, Canna, Esca, CaricamentoImmagine, SchedaProdotto
+)
+from . import riferimenti
+
+
+class RiferimentoField(serializers.PrimaryKeyRelatedField):
+    """
+    Chiave primaria di una categoria o di un brand validata sulla cache dei dati di riferimento.
+    Il queryset serve solo a elencare le scelte nella API navigabile.
+    """
+
+    def __init__(self, cerca, **kwargs):
+        self.cerca = cerca
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        oggetto = self.cerca(pk)
+        if oggetto is None:
+            self.fail('does_not_exist', pk_value=data)
+        return oggetto
 
 
 class CategoriaSerializer(serializers.ModelSerializer):
@@ -23,16 +51,29 @@ class ProductImageSerializer(serializers.ModelSerializer):
         fields = ['id', 'immagine', 'alt_text', 'is_principale', 'ordine']
 
 
+def promozione_in_contesto(contesto, id_prodotto):
+    """
+    Promozione in corso e prezzo promozionale del prodotto, calcolati in blocco
+    per la pagina dalla vista (vedi carrello/promozioni.py); None se non ce ne sono.
+    """
+    promozione = contesto.get('promozioni', {}).get(id_prodotto)
+    if promozione is None:
+        return None
+    return {**promozione['promozione'], 'prezzo': str(promozione['prezzo'])}
+
+
 class ProductSerializer(serializers.ModelSerializer):
     """Serializer base per tutti i prodotti"""
     categoria = CategoriaSerializer(read_only=True)
-    categoria_id = serializers.PrimaryKeyRelatedField(
+    categoria_id = RiferimentoField(
+        riferimenti.categoria,
         queryset=Categoria.objects.all(),
         source='categoria',
         write_only=True
     )
     brand = BrandSerializer(read_only=True)
-    brand_id = serializers.PrimaryKeyRelatedField(
+    brand_id = RiferimentoField(
+        riferimenti.brand,
         queryset=Brand.objects.all(),
         source='brand',
         write_only=True
@@ -41,6 +82,7 @@ class ProductSerializer(serializers.ModelSerializer):
     sconto_percentuale = serializers.IntegerField(read_only=True)
     is_in_stock = serializers.BooleanField(read_only=True)
     is_on_sale = serializers.BooleanField(read_only=True)
+    promozione = serializers.SerializerMethodField()
     
     class Meta:
         model = Product
@@ -48,12 +90,15 @@ class ProductSerializer(serializers.ModelSerializer):
             'id', 'nome', 'slug', 'codice_sku', 
             'categoria', 'categoria_id', 'brand', 'brand_id',
             'descrizione_breve', 'descrizione_completa', 'immagine_principale',
-            'prezzo', 'prezzo_scontato', 'sconto_percentuale',
+            'prezzo', 'prezzo_scontato', 'sconto_percentuale', 'prezzo_minimo_30gg', 'promozione',
             'quantita_disponibile', 'is_in_stock', 'is_on_sale',
             'peso', 'in_evidenza', 'in_vendita', 'nuovo', 'usato', 'condizione',
             'immagini', 'meta_titolo', 'meta_descrizione', 'meta_keywords',
             'data_creazione', 'data_aggiornamento'
         ]
+    
+    def get_promozione(self, obj):
+        return promozione_in_contesto(self.context, obj.pk)
 
 
 class MulinelloSerializer(ProductSerializer):
@@ -86,3 +131,71 @@ class EscaSerializer(ProductSerializer):
             'profondita_lavoro', 'colore', 'galleggiante', 'ancorette',
             'rattlin', 'specie_target'
         ]
+
+
+class CaricamentoImmagineSerializer(serializers.ModelSerializer):
+    """Serializer per i caricamenti a parti delle immagini prodotto"""
+    numero_parti = serializers.IntegerField(read_only=True)
+    parti_ricevute = serializers.SerializerMethodField()
+    immagine = ProductImageSerializer(read_only=True)
+    
+    class Meta:
+        model = CaricamentoImmagine
+        fields = [
+            'id', 'prodotto', 'nome_file', 'dimensione_totale', 'dimensione_parte', 'sha256',
+            'alt_text', 'is_principale', 'ordine', 'stato', 'numero_parti', 'parti_ricevute',
+            'immagine', 'data_creazione'
+        ]
+        read_only_fields = ['stato', 'data_creazione']
+        extra_kwargs = {'dimensione_parte': {'required': False}}
+    
+    def get_parti_ricevute(self, obj):
+        return list(obj.parti.values_list('indice', flat=True))
+    
+    def validate_nome_file(self, value):
+        estensione = value.rsplit('.', 1)[-1].lower() if '.' in value else ''
+        if estensione not in ('jpg', 'jpeg', 'png', 'webp', 'gif'):
+            raise serializers.ValidationError('Formato immagine non supportato')
+        return value
+
+
+class SchedaProdottoSerializer(serializers.ModelSerializer):
+    """
+    Serializer delle schede denormalizzate usate nelle liste: i dati del prodotto
+    per la card, senza join con categoria, brand e sottotipi
+    """
+    id = serializers.IntegerField(source='prodotto_id', read_only=True)
+    categoria = serializers.SerializerMethodField()
+    brand = serializers.SerializerMethodField()
+    immagine_principale = serializers.SerializerMethodField()
+    is_in_stock = serializers.BooleanField(read_only=True)
+    is_on_sale = serializers.BooleanField(source='in_offerta', read_only=True)
+    promozione = serializers.SerializerMethodField()
+
+    class Meta:
+        model = SchedaProdotto
+        fields = [
+            'id', 'tipo', 'nome', 'slug', 'codice_sku', 'categoria', 'brand',
+            'descrizione_breve', 'immagine_principale',
+            'prezzo', 'prezzo_scontato', 'sconto_percentuale', 'prezzo_minimo_30gg', 'promozione',
+            'quantita_disponibile', 'is_in_stock', 'is_on_sale',
+            'in_evidenza', 'in_vendita', 'nuovo', 'usato', 'specifiche',
+            'data_creazione', 'data_aggiornamento'
+        ]
+
+    def get_categoria(self, obj):
+        return {'id': obj.categoria_id, 'nome': obj.categoria_nome, 'slug': obj.categoria_slug}
+
+    def get_brand(self, obj):
+        return {'id': obj.brand_id, 'nome': obj.brand_nome, 'slug': obj.brand_slug}
+
+    def get_promozione(self, obj):
+        return promozione_in_contesto(self.context, obj.pk)
+
+    def get_immagine_principale(self, obj):
+        # Stesso formato di ImageField: URL assoluto quando c'è la richiesta
+        if not obj.immagine_principale:
+            return None
+        url = storage_contenuti().url(obj.immagine_principale)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
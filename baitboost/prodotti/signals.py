@@ -0,0 +1,183 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .autocomplete import TIPO_BRAND, TIPO_CATEGORIA, TIPO_PRODOTTO, indice_autocomplete
+from .home import programma_ricostruzione
+from .media import aggiorna_riferimenti, campi_media, nomi_media
+from .models import Brand, Categoria, Eliminazione, Product, ProductImage, Mulinello, Canna, Esca
+from .prezzi import registra_storico, registra_variazioni
+from .riferimenti import riferimenti
+from .schede import aggiorna_riferimento, aggiorna_schede
+from .tag import campi_origine, sincronizza_tag
+
+
+# I segnali del multi-table inheritance partono solo per la classe salvata,
+# per questo ogni ricevitore è collegato al prodotto base e a tutti i sottotipi
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Mulinello)
+@receiver(post_save, sender=Canna)
+@receiver(post_save, sender=Esca)
+def registra_variazione_prezzo(sender, instance, created, using, **kwargs):
+    """Accoda una variazione quando un prodotto esistente cambia prezzo; i nuovi aprono lo storico"""
+    riga = (instance.pk, instance.prezzo, instance.prezzo_scontato)
+    minimi = {}
+    if created:
+        minimi = registra_storico([riga], using=using)
+    elif instance.prezzi_modificati:
+        minimi = registra_variazioni([riga], using=using)
+    if instance.pk in minimi:
+        # Il minimo è scritto con un update: l'istanza non deve riscriverlo vecchio al prossimo save
+        instance.prezzo_minimo_30gg = minimi[instance.pk]
+    instance._prezzi_originali = (instance.prezzo, instance.prezzo_scontato)
+
+
+@receiver(post_save, sender=Canna)
+@receiver(post_save, sender=Esca)
+def sincronizza_tag_specifiche(sender, instance, using, update_fields, **kwargs):
+    """Ricava dal testo delle specifiche i tag usati da filtri e faccette"""
+    if update_fields is not None and not campi_origine(sender).intersection(update_fields):
+        return
+    sincronizza_tag(sender, [instance], using=using)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Mulinello)
+@receiver(post_save, sender=Canna)
+@receiver(post_save, sender=Esca)
+def aggiorna_autocomplete_prodotto(sender, instance, **kwargs):
+    """Aggiorna l'indice di autocompletamento del worker corrente"""
+    indice_autocomplete.aggiorna_prodotto(instance)
+
+
+@receiver(post_delete, sender=Product)
+def rimuovi_autocomplete_prodotto(sender, instance, **kwargs):
+    # L'eliminazione di un sottotipo elimina sempre anche la riga di Product
+    indice_autocomplete.rimuovi(TIPO_PRODOTTO, instance.pk)
+
+
+@receiver(post_save, sender=Brand)
+def aggiorna_autocomplete_brand(sender, instance, **kwargs):
+    indice_autocomplete.aggiorna_riferimento(TIPO_BRAND, instance)
+
+
+@receiver(post_save, sender=Categoria)
+def aggiorna_autocomplete_categoria(sender, instance, **kwargs):
+    indice_autocomplete.aggiorna_riferimento(TIPO_CATEGORIA, instance)
+
+
+@receiver(post_delete, sender=Brand)
+def rimuovi_autocomplete_brand(sender, instance, **kwargs):
+    indice_autocomplete.rimuovi(TIPO_BRAND, instance.pk)
+
+
+@receiver(post_delete, sender=Categoria)
+def rimuovi_autocomplete_categoria(sender, instance, **kwargs):
+    indice_autocomplete.rimuovi(TIPO_CATEGORIA, instance.pk)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Categoria)
+@receiver(post_delete, sender=Brand)
+def registra_eliminazione(sender, instance, using, **kwargs):
+    """Lascia una traccia dell'eliminazione per il feed delle modifiche"""
+    tipo = {
+        Product: Eliminazione.TIPO_PRODOTTO,
+        Categoria: Eliminazione.TIPO_CATEGORIA,
+        Brand: Eliminazione.TIPO_BRAND,
+    }[sender]
+    Eliminazione.objects.using(using).create(tipo=tipo, oggetto_id=instance.pk, slug=instance.slug)
+    from .compiti import pulisci_eliminazioni_feed
+    pulisci_eliminazioni_feed.accoda(
+        chiave='pulisci-eliminazioni-feed', ritardo=settings.FEED_ELIMINAZIONI_PULIZIA_SECONDI, using=using
+    )
+
+
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=Mulinello)
+@receiver(pre_save, sender=Canna)
+@receiver(pre_save, sender=Esca)
+@receiver(pre_save, sender=ProductImage)
+@receiver(pre_save, sender=Brand)
+@receiver(pre_save, sender=Categoria)
+def leggi_media_precedenti(sender, instance, using, **kwargs):
+    """Legge dal database i file usati prima del salvataggio, per aggiornare i riferimenti"""
+    instance._media_precedenti = {}
+    if instance.pk is None:
+        return
+    campi = campi_media(sender)
+    precedenti = sender._base_manager.using(using).filter(pk=instance.pk).values(*campi).first()
+    if precedenti:
+        instance._media_precedenti = {campo: nome or None for campo, nome in precedenti.items()}
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Mulinello)
+@receiver(post_save, sender=Canna)
+@receiver(post_save, sender=Esca)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_save, sender=Brand)
+@receiver(post_save, sender=Categoria)
+def aggiorna_riferimenti_media(sender, instance, using, **kwargs):
+    precedenti = getattr(instance, '_media_precedenti', {})
+    attuali = nomi_media(instance)
+    aggiunti = [nome for campo, nome in attuali.items() if nome != precedenti.get(campo)]
+    rimossi = [nome for campo, nome in precedenti.items() if nome != attuali.get(campo)]
+    aggiorna_riferimenti(aggiunti, rimossi, using=using)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_delete, sender=Brand)
+@receiver(post_delete, sender=Categoria)
+def rilascia_riferimenti_media(sender, instance, using, **kwargs):
+    aggiorna_riferimenti([], nomi_media(instance).values(), using=using)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Mulinello)
+@receiver(post_save, sender=Canna)
+@receiver(post_save, sender=Esca)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_save, sender=Brand)
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_delete, sender=Brand)
+@receiver(post_delete, sender=Categoria)
+def aggiorna_snapshot_home(sender, using, **kwargs):
+    """Accoda la ricostruzione dello snapshot della home, nella transazione della modifica"""
+    programma_ricostruzione(using=using)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Mulinello)
+@receiver(post_save, sender=Canna)
+@receiver(post_save, sender=Esca)
+def aggiorna_scheda_prodotto(sender, instance, using, **kwargs):
+    """Riscrive la scheda del prodotto salvato (la save è già in una transazione)"""
+    aggiorna_schede([instance.pk], using=using)
+
+
+@receiver(post_save, sender=Brand)
+def aggiorna_schede_brand(sender, instance, using, created, **kwargs):
+    """Copia nome e slug del brand modificato nelle sue schede"""
+    if not created:
+        aggiorna_riferimento('brand', instance, using=using)
+
+
+@receiver(post_save, sender=Categoria)
+def aggiorna_schede_categoria(sender, instance, using, created, **kwargs):
+    """Copia nome e slug della categoria modificata nelle sue schede"""
+    if not created:
+        aggiorna_riferimento('categoria', instance, using=using)
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Brand)
+@receiver(post_delete, sender=Categoria)
+def invalida_riferimenti(sender, using, **kwargs):
+    """Fa ricaricare categorie e brand a tutti i worker dopo il commit della modifica"""
+    transaction.on_commit(riferimenti.invalida, using=using)
@@ -0,0 +1,188 @@
+"""
+Sitemap del catalogo divisa in shard da al massimo 50.000 URL.
+
+Gli shard dei prodotti coprono intervalli fissi di id, quindi un prodotto resta
+sempre nello stesso shard. Per ogni shard si salva su disco un'impronta
+(numero di prodotti e ultima ``data_aggiornamento``): con una sola query
+aggregata si capisce quali shard sono cambiati e si rigenerano solo quelli.
+Gli URL sono quelli delle pagine del negozio (SITEMAP_PERCORSO_PRODOTTO e
+SITEMAP_PERCORSO_CATEGORIA), non quelli dell'API, e vengono scritti in streaming dal database al file, senza caricare i
+prodotti in memoria. Alla scadenza di SITEMAP_TTL l'aggiornamento gira sulla coda
+dei compiti: le richieste continuano a ricevere i file della generazione precedente.
+"""
+import json
+import os
+import time
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, ExpressionWrapper, F, IntegerField, Max
+
+from .models import Categoria, Product
+
+URL_PER_SHARD = 50000
+MANIFESTO = 'manifest.json'
+INDICE = 'sitemap.xml'
+SEZIONE_CATEGORIE = 'categorie'
+CHIAVE_ACCODATA = 'prodotti:sitemap:accodata'
+
+INTESTAZIONE_URLSET = '<?xml version="1.0" encoding="UTF-8"?>\n' \
+    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+INTESTAZIONE_INDICE = '<?xml version="1.0" encoding="UTF-8"?>\n' \
+    '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+
+
+def cartella_sitemap():
+    cartella = Path(settings.SITEMAP_ROOT)
+    cartella.mkdir(parents=True, exist_ok=True)
+    return cartella
+
+
+def nome_file(sezione):
+    return f'sitemap-{sezione}.xml'
+
+
+def _modello_url(sezione):
+    """
+    Restituisce un formato per costruire gli URL assoluti delle pagine del negozio.
+    Reason: get_absolute_url() dei modelli punta all'API, che non va indicizzata
+    """
+    percorso = settings.SITEMAP_PERCORSO_CATEGORIA if sezione == SEZIONE_CATEGORIE \
+        else settings.SITEMAP_PERCORSO_PRODOTTO
+    return settings.SITEMAP_URL_BASE.rstrip('/') + '/' + percorso.lstrip('/')
+
+
+def _impronte():
+    """Impronta di ogni shard con una sola query aggregata per i prodotti"""
+    shard = ExpressionWrapper((F('id') - 1) / URL_PER_SHARD, output_field=IntegerField())
+    righe = Product.objects.filter(in_vendita=True).annotate(shard=shard).values('shard').annotate(
+        totale=Count('id'), ultimo=Max('data_aggiornamento')
+    ).order_by('shard')
+    impronte = {
+        f'prodotti-{riga["shard"] + 1}': {
+            'impronta': f'{riga["totale"]}|{riga["ultimo"].isoformat()}',
+            'lastmod': riga['ultimo'].isoformat(),
+            'shard': riga['shard'],
+        }
+        for riga in righe
+    }
+    categorie = Categoria.objects.aggregate(totale=Count('id'), ultimo=Max('data_aggiornamento'))
+    if categorie['totale']:
+        impronte[SEZIONE_CATEGORIE] = {
+            'impronta': f'{categorie["totale"]}|{categorie["ultimo"].isoformat()}',
+            'lastmod': categorie['ultimo'].isoformat(),
+        }
+    return impronte
+
+
+def _righe_sezione(sezione, dati):
+    """Righe (slug, data_aggiornamento) della sezione, lette a blocchi dal database"""
+    if sezione == SEZIONE_CATEGORIE:
+        queryset = Categoria.objects.order_by('id')
+    else:
+        primo = dati['shard'] * URL_PER_SHARD + 1
+        queryset = Product.objects.filter(
+            in_vendita=True, id__gte=primo, id__lt=primo + URL_PER_SHARD
+        ).order_by('id')
+    return queryset.values_list('slug', 'data_aggiornamento').iterator(chunk_size=2000)
+
+
+def _scrivi_atomico(percorso, righe):
+    """Scrive le righe in un file temporaneo e lo sostituisce a quello vecchio"""
+    temporaneo = percorso.with_suffix(f'.{os.getpid()}.tmp')
+    with open(temporaneo, 'w', encoding='utf-8') as file:
+        for riga in righe:
+            file.write(riga)
+    os.replace(temporaneo, percorso)
+
+
+def _genera_sezione(sezione, dati):
+    modello = _modello_url(sezione)
+
+    def righe():
+        yield INTESTAZIONE_URLSET
+        for slug, aggiornamento in _righe_sezione(sezione, dati):
+            yield (
+                f'<url><loc>{escape(modello.format(slug=slug))}</loc>'
+                f'<lastmod>{aggiornamento.isoformat()}</lastmod></url>\n'
+            )
+        yield '</urlset>\n'
+
+    _scrivi_atomico(cartella_sitemap() / nome_file(sezione), righe())
+
+
+def _genera_indice(impronte):
+    base = settings.SITEMAP_URL_BASE.rstrip('/')
+
+    def righe():
+        yield INTESTAZIONE_INDICE
+        for sezione, dati in impronte.items():
+            yield (
+                f'<sitemap><loc>{escape(base)}/{nome_file(sezione)}</loc>'
+                f'<lastmod>{dati["lastmod"]}</lastmod></sitemap>\n'
+            )
+        yield '</sitemapindex>\n'
+
+    _scrivi_atomico(cartella_sitemap() / INDICE, righe())
+
+
+def leggi_manifesto():
+    try:
+        with open(cartella_sitemap() / MANIFESTO, encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def aggiorna_sitemap(completa=False):
+    """
+    Rigenera gli shard cambiati dall'ultima generazione e l'indice.
+
+    Args:
+        completa (bool): rigenera tutti gli shard.
+
+    Returns:
+        list: sezioni rigenerate.
+    """
+    cartella = cartella_sitemap()
+    precedente = {} if completa else leggi_manifesto()
+    impronte = _impronte()
+
+    rigenerate = []
+    for sezione, dati in impronte.items():
+        invariata = precedente.get(sezione, {}).get('impronta') == dati['impronta']
+        if invariata and (cartella / nome_file(sezione)).exists():
+            continue
+        _genera_sezione(sezione, dati)
+        rigenerate.append(sezione)
+
+    # Shard rimasti senza prodotti in vendita
+    for sezione in set(precedente) - set(impronte):
+        (cartella / nome_file(sezione)).unlink(missing_ok=True)
+
+    if rigenerate or set(precedente) != set(impronte) or not (cartella / INDICE).exists():
+        _genera_indice(impronte)
+    _scrivi_atomico(cartella / MANIFESTO, [json.dumps(impronte)])
+    return rigenerate
+
+
+def assicura_sitemap():
+    """
+    Se l'ultima verifica è più vecchia di SITEMAP_TTL secondi accoda l'aggiornamento
+    sulla coda dei compiti e intanto continua a servire i file esistenti. Solo se la
+    sitemap non è mai stata generata la genera subito, nella richiesta.
+    """
+    cartella = cartella_sitemap()
+    try:
+        eta = time.time() - (cartella / MANIFESTO).stat().st_mtime
+    except FileNotFoundError:
+        eta = None
+    if eta is None or not (cartella / INDICE).exists():
+        aggiorna_sitemap()
+    elif eta > settings.SITEMAP_TTL and cache.add(CHIAVE_ACCODATA, True, settings.SITEMAP_TTL):
+        # Reason: la chiave in cache evita un tentativo di accodamento a ogni richiesta
+        # finché il worker non ha aggiornato il manifesto
+        from .compiti import aggiorna_sitemap_catalogo
+        aggiorna_sitemap_catalogo.accoda(chiave='aggiorna-sitemap')
@@ -0,0 +1,179 @@
+"""
+Tag normalizzati delle specifiche testuali di esche e canne.
+
+I campi descrittivi (``Esca.specie_target``, ``colore``, ``profondita_lavoro`` e
+``Canna.materiale``) restano testo libero, modificabile da admin e API; da ognuno
+vengono ricavati i tag di una tabella many-to-many (specie, colori, fasce di
+profondità, materiali) identificati dallo slug. I filtri e le faccette delle liste
+usano i tag, con ricerche esatte sugli indici al posto di ``icontains`` sul testo.
+I tag sono riallineati:
+- al salvataggio di un'esca o di una canna (segnali post_save);
+- negli aggiornamenti in blocco, dall'hook di ``ProductQuerySet.update``;
+- per i dati esistenti, dalla migrazione che ha introdotto le tabelle.
+"""
+import re
+
+from django.utils.text import slugify
+
+DIMENSIONE_LOTTO = 500
+
+# Separatori tra più valori nello stesso campo: "Spigola, Trota", "Rosso/Bianco", "Carbonio e kevlar"
+SEPARATORI = re.compile(r'\s*(?:[,;/|+]|\s\be\b\s)\s*', re.IGNORECASE)
+
+# Fasce di profondità standard: (nome, da metri, a metri); None = senza limite
+FASCE_PROFONDITA = [
+    ('Superficie', 0, 0),
+    ('0-1 m', 0, 1),
+    ('1-3 m', 1, 3),
+    ('3-6 m', 3, 6),
+    ('Oltre 6 m', 6, None),
+]
+MISURA = re.compile(r'(\d+(?:[.,]\d+)?)\s*(cm|m)?', re.IGNORECASE)
+PAROLE_SUPERFICIE = ('superficie', 'galla', 'topwater')
+# "fino a 2 m": l'intervallo parte da zero
+PAROLE_DA_ZERO = ('fino a',)
+
+
+def dividi_nomi(testo):
+    """
+    Nomi dei tag contenuti in un campo testuale, senza duplicati (stesso slug).
+
+    Returns:
+        list: nomi ripuliti, con l'iniziale maiuscola, nell'ordine del testo.
+    """
+    nomi = {}
+    for parte in SEPARATORI.split(testo or ''):
+        nome = ' '.join(parte.split())[:100]
+        slug = slugify(nome)
+        if slug and slug not in nomi:
+            nomi[slug] = nome[0].upper() + nome[1:]
+    return list(nomi.values())
+
+
+def fasce_profondita(testo):
+    """
+    Fasce standard toccate da una profondità di lavoro ("0-1m", "1,5 - 4 m", "80cm",
+    "50-80 cm", "fino a 2 m", "Superficie"). Un intervallo comprende tutte le fasce con
+    cui si sovrappone; il testo senza misure riconoscibili (es. "Fondo") diventa un tag a sé.
+    """
+    testo = testo or ''
+    minuscolo = testo.lower()
+    misure = [(float(numero.replace(',', '.')), unita.lower()) for numero, unita in MISURA.findall(testo)]
+    metri = []
+    for indice, (valore, unita) in enumerate(misure):
+        if not unita:
+            # "50-80 cm": l'unità scritta una volta vale per tutto l'intervallo; senza unità, metri
+            unita = next((u for _, u in misure[indice + 1:] if u), None) or next(
+                (u for _, u in reversed(misure[:indice]) if u), 'm'
+            )
+        metri.append(valore / 100 if unita == 'cm' else valore)
+
+    superficie = any(parola in minuscolo for parola in PAROLE_SUPERFICIE)
+    if metri and (superficie or any(parola in minuscolo for parola in PAROLE_DA_ZERO)):
+        # "Superficie - 1m", "fino a 2 m": l'intervallo parte da zero
+        metri.append(0)
+    fasce = []
+    if superficie or metri and max(metri) == 0:
+        fasce.append(FASCE_PROFONDITA[0][0])
+    if metri and max(metri) > 0:
+        minimo, massimo = min(metri), max(metri)
+        for nome, da, a in FASCE_PROFONDITA[1:]:
+            if minimo == massimo:
+                # Profondità puntuale: la fascia che la contiene
+                compresa = da <= minimo and (a is None or minimo < a)
+            else:
+                compresa = minimo < (a if a is not None else float('inf')) and massimo > da
+            if compresa:
+                fasce.append(nome)
+    if not fasce:
+        return dividi_nomi(testo)
+    return fasce
+
+
+# Per modello: campo many-to-many dei tag -> (campo testuale di origine, funzione che ne ricava i nomi).
+# Le chiavi sono i nomi dei modelli perché la tabella serve anche alle migrazioni
+TAG_SPECIFICHE = {
+    'Esca': {
+        'specie': ('specie_target', dividi_nomi),
+        'colori': ('colore', dividi_nomi),
+        'fasce_profondita': ('profondita_lavoro', fasce_profondita),
+    },
+    'Canna': {
+        'materiali': ('materiale', dividi_nomi),
+    },
+}
+
+
+def campi_origine(modello):
+    """Campi testuali da cui il modello ricava dei tag (vuoto per gli altri modelli)"""
+    return {origine for origine, _ in TAG_SPECIFICHE.get(modello.__name__, {}).values()}
+
+
+def collega_tag(oggetti, campo, campo_testo, analizza, using=None):
+    """
+    Allinea i tag di un campo many-to-many al testo di origine degli oggetti.
+
+    Crea i tag mancanti e scrive solo le associazioni cambiate: un oggetto salvato
+    senza modificare il testo costa due query per campo.
+
+    Args:
+        oggetti (list): istanze con il campo testuale caricato.
+        campo (ManyToManyField): campo dei tag (anche di un modello storico delle migrazioni).
+    """
+    Tag = campo.related_model
+    Associazione = campo.remote_field.through
+    colonna_oggetto = f'{campo.m2m_field_name()}_id'
+    colonna_tag = f'{campo.m2m_reverse_field_name()}_id'
+
+    richiesti = {}
+    nomi_per_slug = {}
+    for oggetto in oggetti:
+        nomi = analizza(getattr(oggetto, campo_testo))
+        richiesti[oggetto.pk] = {slugify(nome) for nome in nomi}
+        for nome in nomi:
+            nomi_per_slug.setdefault(slugify(nome), nome)
+
+    id_tag = {}
+    if nomi_per_slug:
+        id_tag = dict(Tag.objects.using(using).filter(slug__in=nomi_per_slug).values_list('slug', 'pk'))
+        mancanti = [Tag(nome=nome, slug=slug) for slug, nome in nomi_per_slug.items() if slug not in id_tag]
+        if mancanti:
+            # Reason: un altro worker può creare lo stesso tag nel frattempo, lo slug è unico
+            Tag.objects.using(using).bulk_create(mancanti, ignore_conflicts=True)
+            id_tag = dict(Tag.objects.using(using).filter(slug__in=nomi_per_slug).values_list('slug', 'pk'))
+
+    attuali = {}
+    for pk, id_oggetto, id_associato in Associazione.objects.using(using).filter(
+        **{f'{colonna_oggetto}__in': list(richiesti)}
+    ).values_list('pk', colonna_oggetto, colonna_tag):
+        attuali[(id_oggetto, id_associato)] = pk
+    attesi = {(pk, id_tag[slug]) for pk, slugs in richiesti.items() for slug in slugs}
+
+    da_eliminare = [pk for coppia, pk in attuali.items() if coppia not in attesi]
+    if da_eliminare:
+        Associazione.objects.using(using).filter(pk__in=da_eliminare).delete()
+    nuove = attesi.difference(attuali)
+    if nuove:
+        Associazione.objects.using(using).bulk_create([
+            Associazione(**{colonna_oggetto: id_oggetto, colonna_tag: id_associato})
+            for id_oggetto, id_associato in nuove
+        ])
+
+
+def sincronizza_tag(modello, oggetti, using=None):
+    """Allinea tutti i campi di tag del modello per le istanze indicate"""
+    for nome_campo, (campo_testo, analizza) in TAG_SPECIFICHE.get(modello.__name__, {}).items():
+        collega_tag(oggetti, modello._meta.get_field(nome_campo), campo_testo, analizza, using=using)
+
+
+def sincronizza_tag_per_id(modello, id_oggetti, using=None):
+    """Come ``sincronizza_tag``, leggendo a lotti il testo degli oggetti indicati"""
+    origini = campi_origine(modello)
+    if not origini:
+        return
+    id_oggetti = list(id_oggetti)
+    for inizio in range(0, len(id_oggetti), DIMENSIONE_LOTTO):
+        oggetti = list(modello._base_manager.using(using).filter(
+            pk__in=id_oggetti[inizio:inizio + DIMENSIONE_LOTTO]
+        ).only(*origini))
+        sincronizza_tag(modello, oggetti, using=using)
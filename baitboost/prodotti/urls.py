@@ -3,8 +3,10 @@ from rest_framework.routers import DefaultRouter
 
 from .views import (
     ProductViewSet, MulinelloViewSet, CannaViewSet, EscaViewSet,
-    CategoriaViewSet, BrandViewSet
+    CategoriaViewSet, BrandViewSet, AutocompleteView, AutocompleteStatoView,
+    FeedModificheView, MetricheCaricoView, HomeView, sitemap_indice, sitemap_sezione
 )
+from .views_caricamenti import CaricamentoImmagineViewSet
 
 # Configurazione del router DRF per le API
 router = DefaultRouter()
@@ -14,8 +16,16 @@ router.register('canne', CannaViewSet, basename='canna')
 router.register('esche', EscaViewSet, basename='esca')
 router.register('categorie', CategoriaViewSet, basename='categoria')
 router.register('brands', BrandViewSet, basename='brand')
+router.register('caricamenti', CaricamentoImmagineViewSet, basename='caricamento')
 
 # Pattern URL per l'app prodotti
 urlpatterns = [
+    path('api/autocomplete/', AutocompleteView.as_view(), name='autocomplete'),
+    path('api/autocomplete/stato/', AutocompleteStatoView.as_view(), name='autocomplete-stato'),
+    path('api/home/', HomeView.as_view(), name='home'),
+    path('api/modifiche/', FeedModificheView.as_view(), name='feed-modifiche'),
+    path('api/metriche/', MetricheCaricoView.as_view(), name='metriche-carico'),
     path('api/', include(router.urls)),
+    path('sitemap.xml', sitemap_indice, name='sitemap'),
+    path('sitemap-<slug:sezione>.xml', sitemap_sezione, name='sitemap-sezione'),
 ]
@@ -2,21 +2,33 @@ from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import patch_cache_control
+import hashlib
+import json
 from django.db.models import Count, Avg
 
+from baitboost.carico import stato_carico
+from carrello.promozioni import prezzi_promozionali_per_id
 from .models import (
     Categoria, Brand, Product, 
-    ProductImage, Mulinello, Canna, Esca
+    ProductImage, Mulinello, Canna, Esca, ProdottoCorrelato, SchedaProdotto
 )
 from .serializers import (
     CategoriaSerializer, BrandSerializer, ProductSerializer,
-    ProductImageSerializer, MulinelloSerializer, CannaSerializer, EscaSerializer
+    MulinelloSerializer, CannaSerializer, EscaSerializer
 )
 from .filters import ProductFilter, MulinelloFilter, CannaFilter, EscaFilter
+from .autocomplete import indice_autocomplete
+from .feed import CursoreNonValido, leggi_modifiche
+from .home import leggi_home
+from .mixins import ContaVisiteMixin, FaccetteTagMixin, ListaSchedeMixin, ReplicaReadMixin
+from .sitemap import INDICE, assicura_sitemap, cartella_sitemap, leggi_manifesto, nome_file
 
 
-class CategoriaViewSet(viewsets.ModelViewSet):
+class CategoriaViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """
     API endpoint per le categorie di prodotti
     Permette visualizzazione, creazione, modifica e cancellazione di categorie
@@ -41,12 +53,13 @@ class CategoriaViewSet(viewsets.ModelViewSet):
     def prodotti(self, request, slug=None):
         """Restituisce i prodotti appartenenti a una categoria"""
         categoria = self.get_object()
-        prodotti = Product.objects.filter(categoria=categoria)
-        serializer = ProductSerializer(prodotti, many=True)
+        prodotti = list(Product.objects.filter(categoria=categoria))
+        promozioni = prezzi_promozionali_per_id(prodotto.pk for prodotto in prodotti)
+        serializer = ProductSerializer(prodotti, many=True, context={'promozioni': promozioni})
         return Response(serializer.data)
 
 
-class BrandViewSet(viewsets.ModelViewSet):
+class BrandViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """
     API endpoint per i brand/produttori
     """
@@ -70,12 +83,34 @@ class BrandViewSet(viewsets.ModelViewSet):
     def prodotti(self, request, slug=None):
         """Restituisce i prodotti di un determinato brand"""
         brand = self.get_object()
-        prodotti = Product.objects.filter(brand=brand)
-        serializer = ProductSerializer(prodotti, many=True)
+        prodotti = list(Product.objects.filter(brand=brand))
+        promozioni = prezzi_promozionali_per_id(prodotto.pk for prodotto in prodotti)
+        serializer = ProductSerializer(prodotti, many=True, context={'promozioni': promozioni})
         return Response(serializer.data)
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+# Valori massimi per richiesta batch e durata della cache HTTP delle risposte
+BATCH_MASSIMO = 50
+BATCH_CACHE_SECONDI = 60
+
+
+def _sottotipo(prodotto):
+    """
+    Restituisce tipo, istanza e serializer del sottotipo di un prodotto caricato con
+    select_related('mulinello', 'canna', 'esca') e prefetch_related('immagini').
+    """
+    for tipo, serializer_class in (
+        ('mulinello', MulinelloSerializer), ('canna', CannaSerializer), ('esca', EscaSerializer)
+    ):
+        istanza = getattr(prodotto, tipo, None)
+        if istanza is not None:
+            # Le immagini sono già state caricate sul prodotto base
+            istanza._prefetched_objects_cache = getattr(prodotto, '_prefetched_objects_cache', {})
+            return tipo, istanza, serializer_class
+    return 'prodotto', prodotto, ProductSerializer
+
+
+class ProductViewSet(ContaVisiteMixin, ListaSchedeMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     """
     API endpoint per tutti i prodotti
     Implementa filtri avanzati sia per ricerca testuale che per campi specifici
@@ -87,14 +122,14 @@ class ProductViewSet(viewsets.ModelViewSet):
     filterset_class = ProductFilter
     search_fields = ['nome', 'descrizione_breve', 'descrizione_completa', 'codice_sku']
     ordering_fields = [
-        'nome', 'prezzo', 'prezzo_scontato', 'data_creazione', 
-        'quantita_disponibile', 'brand__nome', 'categoria__nome'
+        'nome', 'prezzo', 'prezzo_scontato', 'sconto_percentuale', 'data_creazione', 
+        'quantita_disponibile', 'brand__nome', 'categoria__nome', 'popolarita'
     ]
     ordering = ['-data_creazione']
     
     def get_permissions(self):
         """Solo lettura per utenti non autenticati"""
-        if self.action in ['list', 'retrieve', 'in_evidenza', 'nuovi_arrivi', 'in_sconto']:
+        if self.action in ['list', 'retrieve', 'clic', 'in_evidenza', 'nuovi_arrivi', 'in_sconto', 'migliori_offerte', 'correlati', 'batch']:
             permission_classes = [AllowAny]
         else:
             permission_classes = [IsAdminUser]
@@ -103,7 +138,7 @@ class ProductViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def in_evidenza(self, request):
         """Restituisce i prodotti in evidenza"""
-        prodotti = self.get_queryset().filter(in_evidenza=True)
+        prodotti = self.calcola_promozioni(self.get_queryset().filter(in_evidenza=True))
         serializer = self.get_serializer(prodotti, many=True)
         return Response(serializer.data)
     
@@ -114,22 +149,106 @@ class ProductViewSet(viewsets.ModelViewSet):
         from datetime import timedelta
         
         data_limite = timezone.now() - timedelta(days=30)
-        prodotti = self.get_queryset().filter(data_creazione__gte=data_limite)
+        prodotti = self.calcola_promozioni(self.get_queryset().filter(data_creazione__gte=data_limite))
         serializer = self.get_serializer(prodotti, many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def in_sconto(self, request):
-        """Restituisce i prodotti in sconto"""
-        from django.db.models import F
-        
+        """
+        Restituisce i prodotti in sconto, con filtri e ordinamento della lista
+        L'elenco è completo come sempre; con ?page= la risposta è paginata come le liste
+        """
+        prodotti = self.filter_queryset(self.get_queryset()).filter(in_offerta=True)
+        if self.paginator.page_query_param in request.query_params:
+            pagina = self.paginate_queryset(prodotti)
+            return self.get_paginated_response(self.get_serializer(pagina, many=True).data)
+        serializer = self.get_serializer(self.calcola_promozioni(prodotti), many=True)
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def migliori_offerte(self, request):
+        """
+        Restituisce i prodotti in vendita con lo sconto più alto
+        Letti in ordine dall'indice prodotto_offerte_idx, senza conteggi né ordinamenti del catalogo
+        """
+        try:
+            limite = max(1, min(int(request.query_params.get('limite', 24)), 100))
+            sconto_min = int(request.query_params.get('sconto_min', 1))
+        except ValueError:
+            return Response({'errore': 'Parametri non validi'}, status=status.HTTP_400_BAD_REQUEST)
         prodotti = self.get_queryset().filter(
-            prezzo_scontato__isnull=False
-        ).filter(prezzo_scontato__lt=F('prezzo'))
-        
-        serializer = self.get_serializer(prodotti, many=True)
+            in_vendita=True, in_offerta=True, sconto_percentuale__gte=sconto_min
+        ).select_related('categoria', 'brand').prefetch_related('immagini').order_by(
+            '-sconto_percentuale', 'id'
+        )[:limite]
+        serializer = self.get_serializer(self.calcola_promozioni(prodotti), many=True)
+        return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'])
+    def correlati(self, request, slug=None):
+        """Restituisce i prodotti simili, precalcolati dal comando calcola_correlati"""
+        # 404 per uno slug sconosciuto, come le altre azioni di dettaglio
+        prodotto = self.get_object()
+        righe = ProdottoCorrelato.objects.filter(
+            prodotto=prodotto, correlato__in_vendita=True
+        ).select_related(
+            'correlato__categoria', 'correlato__brand'
+        ).prefetch_related('correlato__immagini').order_by('posizione')
+        serializer = self.get_serializer(self.calcola_promozioni(riga.correlato for riga in righe), many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def batch(self, request):
+        """
+        Restituisce più prodotti con una sola richiesta, nell'ordine richiesto
+        Uso: ?slug=a,b,c oppure ?id=1,2,3 oppure ?sku=X,Y (al massimo BATCH_MASSIMO valori)
+        A regime costa tre query (prodotti, immagini e schede per le promozioni), più il
+        caricamento dei dati di riferimento quando scadono; i prodotti non trovati
+        compaiono con un errore
+        """
+        chiavi = [chiave for chiave in ('slug', 'id', 'sku') if chiave in request.query_params]
+        if len(chiavi) != 1:
+            return Response(
+                {'errore': 'Indicare uno solo tra slug, id e sku'}, status=status.HTTP_400_BAD_REQUEST
+            )
+        chiave = chiavi[0]
+        valori = [valore.strip() for valore in request.query_params[chiave].split(',') if valore.strip()]
+        if not valori or len(valori) > BATCH_MASSIMO:
+            return Response(
+                {'errore': f'Indicare da 1 a {BATCH_MASSIMO} valori'}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if chiave == 'id' and not all(valore.isdigit() for valore in valori):
+            return Response({'errore': 'Id non validi'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        campo = {'slug': 'slug', 'id': 'id', 'sku': 'codice_sku'}[chiave]
+        prodotti = self.get_queryset().filter(**{f'{campo}__in': valori}).select_related(
+            'categoria', 'brand', 'mulinello', 'canna', 'esca'
+        ).prefetch_related('immagini')
+        trovati = {str(getattr(prodotto, campo)): prodotto for prodotto in self.calcola_promozioni(prodotti)}
+        
+        risultati = []
+        for valore in valori:
+            prodotto = trovati.get(valore)
+            if prodotto is None:
+                risultati.append({'richiesta': valore, 'errore': 'Prodotto non trovato'})
+                continue
+            tipo, istanza, serializer_class = _sottotipo(prodotto)
+            serializer = serializer_class(istanza, context=self.get_serializer_context())
+            risultati.append({'richiesta': valore, 'tipo': tipo, 'prodotto': serializer.data})
+        
+        # ETag dal contenuto: il client (o una cache) riusa la risposta finché i prodotti non cambiano
+        etag = '"%s"' % hashlib.md5(
+            json.dumps(risultati, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        if etag in request.headers.get('If-None-Match', ''):
+            risposta = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            risposta = Response({'risultati': risultati})
+        risposta['ETag'] = etag
+        patch_cache_control(risposta, public=True, max_age=BATCH_CACHE_SECONDI)
+        return risposta
+    
     @action(detail=False, methods=['get'])
     def statistiche(self, request):
         """
@@ -141,7 +260,7 @@ class ProductViewSet(viewsets.ModelViewSet):
         total_products = Product.objects.count()
         products_in_stock = Product.objects.filter(quantita_disponibile__gt=0).count()
         products_out_of_stock = Product.objects.filter(quantita_disponibile=0).count()
-        products_on_sale = Product.objects.filter(prezzo_scontato__isnull=False).count()
+        products_on_sale = Product.objects.filter(in_offerta=True).count()
         
         products_by_category = Categoria.objects.annotate(
             product_count=Count('prodotti')
@@ -161,79 +280,169 @@ class ProductViewSet(viewsets.ModelViewSet):
         })
     
     
-class MulinelloViewSet(viewsets.ModelViewSet):
+class MulinelloViewSet(ContaVisiteMixin, ListaSchedeMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     """
     API endpoint per i mulinelli
     Implementa filtri avanzati specifici per i mulinelli
     """
     queryset = Mulinello.objects.all()
+    tipo_scheda = SchedaProdotto.TIPO_MULINELLO
     serializer_class = MulinelloSerializer
     lookup_field = 'slug'
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = MulinelloFilter
     search_fields = ['nome', 'descrizione_breve', 'descrizione_completa', 'codice_sku']
     ordering_fields = [
-        'nome', 'prezzo', 'prezzo_scontato', 'data_creazione', 
-        'cuscinetti', 'peso_mulinello', 'freno_massimo'
+        'nome', 'prezzo', 'prezzo_scontato', 'sconto_percentuale', 'data_creazione', 
+        'cuscinetti', 'peso_mulinello', 'freno_massimo', 'popolarita'
     ]
     ordering = ['-data_creazione']
     
     def get_permissions(self):
         """Solo lettura per utenti non autenticati"""
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'clic']:
             permission_classes = [AllowAny]
         else:
             permission_classes = [IsAdminUser]
         return [permission() for permission in permission_classes]
 
 
-class CannaViewSet(viewsets.ModelViewSet):
+class CannaViewSet(FaccetteTagMixin, ContaVisiteMixin, ListaSchedeMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     """
     API endpoint per le canne da pesca
     Implementa filtri avanzati specifici per le canne
     """
     queryset = Canna.objects.all()
+    tipo_scheda = SchedaProdotto.TIPO_CANNA
     serializer_class = CannaSerializer
     lookup_field = 'slug'
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = CannaFilter
     search_fields = ['nome', 'descrizione_breve', 'descrizione_completa', 'codice_sku']
     ordering_fields = [
-        'nome', 'prezzo', 'prezzo_scontato', 'data_creazione', 
-        'lunghezza', 'ingombro'
+        'nome', 'prezzo', 'prezzo_scontato', 'sconto_percentuale', 'data_creazione', 
+        'lunghezza', 'ingombro', 'popolarita'
     ]
     ordering = ['-data_creazione']
     
     def get_permissions(self):
         """Solo lettura per utenti non autenticati"""
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'clic', 'faccette']:
             permission_classes = [AllowAny]
         else:
             permission_classes = [IsAdminUser]
         return [permission() for permission in permission_classes]
 
 
-class EscaViewSet(viewsets.ModelViewSet):
+class EscaViewSet(FaccetteTagMixin, ContaVisiteMixin, ListaSchedeMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     """
     API endpoint per le esche
     Implementa filtri avanzati specifici per le esche
     """
     queryset = Esca.objects.all()
+    tipo_scheda = SchedaProdotto.TIPO_ESCA
     serializer_class = EscaSerializer
     lookup_field = 'slug'
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = EscaFilter
     search_fields = ['nome', 'descrizione_breve', 'descrizione_completa', 'codice_sku', 'specie_target']
     ordering_fields = [
-        'nome', 'prezzo', 'prezzo_scontato', 'data_creazione', 
-        'lunghezza_esca', 'peso_esca'
+        'nome', 'prezzo', 'prezzo_scontato', 'sconto_percentuale', 'data_creazione', 
+        'lunghezza_esca', 'peso_esca', 'popolarita'
     ]
     ordering = ['-data_creazione']
     
     def get_permissions(self):
         """Solo lettura per utenti non autenticati"""
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'clic', 'faccette']:
             permission_classes = [AllowAny]
         else:
             permission_classes = [IsAdminUser]
         return [permission() for permission in permission_classes]
+
+
+class AutocompleteView(APIView):
+    """
+    API endpoint per i suggerimenti della casella di ricerca
+    Risponde dall'indice in memoria del worker, senza query al database
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    
+    def get(self, request):
+        testo = request.query_params.get('q', '')
+        try:
+            limite = max(1, min(int(request.query_params.get('limite', 10)), 50))
+        except ValueError:
+            limite = 10
+        return Response({'q': testo, 'suggerimenti': indice_autocomplete.cerca(testo, limite)})
+
+
+class AutocompleteStatoView(APIView):
+    """
+    API endpoint con dimensioni e memoria occupata dall'indice di autocompletamento
+    """
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        return Response(indice_autocomplete.statistiche())
+
+
+class MetricheCaricoView(APIView):
+    """
+    API endpoint con i contatori di carico e di attesa del database del worker che risponde.
+    Usato dal comando test_carico per confrontare le configurazioni di deploy.
+    """
+    permission_classes = [IsAdminUser]
+    throttle_classes = []
+
+    def get(self, request):
+        return Response(stato_carico())
+
+
+class HomeView(APIView):
+    """
+    Contenuti della homepage in un'unica risposta
+    Il JSON è precalcolato in cache (vedi prodotti/home.py): la vista non esegue query,
+    tranne quando lo snapshot manca e va ricostruito; resta soggetta alla limitazione per client
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request):
+        risposta = HttpResponse(leggi_home(), content_type='application/json')
+        patch_cache_control(risposta, public=True, max_age=30)
+        return risposta
+
+
+class FeedModificheView(APIView):
+    """
+    API endpoint con le modifiche al catalogo successive a un cursore
+    Il frontend conserva il cursore restituito e rivalida solo le pagine cambiate
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    
+    def get(self, request):
+        try:
+            limite = max(1, min(int(request.query_params.get('limite', 200)), 1000))
+        except ValueError:
+            limite = 200
+        try:
+            return Response(leggi_modifiche(request.query_params.get('cursore'), limite))
+        except CursoreNonValido as errore:
+            return Response({'errore': str(errore)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def sitemap_indice(request):
+    """Indice della sitemap, con i riferimenti agli shard di prodotti e categorie"""
+    assicura_sitemap()
+    return FileResponse(open(cartella_sitemap() / INDICE, 'rb'), content_type='application/xml')
+
+
+def sitemap_sezione(request, sezione):
+    """Singolo shard della sitemap, servito dal file generato su disco"""
+    assicura_sitemap()
+    if sezione not in leggi_manifesto():
+        raise Http404('Sezione della sitemap inesistente')
+    return FileResponse(open(cartella_sitemap() / nome_file(sezione), 'rb'), content_type='application/xml')
@@ -0,0 +1,66 @@
+"""API del caricamento a parti delle immagini prodotto (logica in prodotti/caricamenti.py)"""
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from .caricamenti import (
+    CaricamentoNonValido, annulla_caricamento, completa_caricamento, crea_caricamento, salva_parte
+)
+from .models import CaricamentoImmagine
+from .serializers import CaricamentoImmagineSerializer, ProductImageSerializer
+
+
+class CaricamentoImmagineViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                                 mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    API endpoint per il caricamento a parti, riprendibile, delle immagini prodotto
+    
+    1. POST /api/caricamenti/ con prodotto, nome_file e dimensione_totale
+    2. PUT /api/caricamenti/<id>/parti/<indice>/ con i byte della parte e
+       l'header X-Checksum-Sha256, anche in parallelo
+    3. POST /api/caricamenti/<id>/completa/ per creare l'immagine
+    
+    GET sul caricamento restituisce le parti già ricevute, per riprendere dopo un'interruzione.
+    """
+    queryset = CaricamentoImmagine.objects.all()
+    serializer_class = CaricamentoImmagineSerializer
+    permission_classes = [IsAdminUser]
+    
+    def perform_create(self, serializer):
+        try:
+            serializer.instance = crea_caricamento(dict(serializer.validated_data), self.request.user)
+        except CaricamentoNonValido as errore:
+            raise ValidationError({'errore': str(errore)})
+    
+    def perform_destroy(self, instance):
+        annulla_caricamento(instance)
+    
+    @action(detail=True, methods=['put'], url_path=r'parti/(?P<indice>\d+)')
+    def parte(self, request, pk=None, indice=None):
+        """Riceve una parte leggendo il corpo della richiesta a blocchi, senza bufferizzarlo"""
+        caricamento = self.get_object()
+        try:
+            lunghezza = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            lunghezza = 0
+        try:
+            parte = salva_parte(
+                caricamento, int(indice), request._request, lunghezza,
+                request.META.get('HTTP_X_CHECKSUM_SHA256', '')
+            )
+        except CaricamentoNonValido as errore:
+            return Response({'errore': str(errore)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'indice': parte.indice, 'dimensione': parte.dimensione, 'sha256': parte.sha256})
+    
+    @action(detail=True, methods=['post'])
+    def completa(self, request, pk=None):
+        """Riunisce le parti e collega il file a una nuova immagine del prodotto"""
+        caricamento = self.get_object()
+        try:
+            immagine = completa_caricamento(caricamento)
+        except CaricamentoNonValido as errore:
+            return Response({'errore': str(errore)}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = ProductImageSerializer(immagine, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
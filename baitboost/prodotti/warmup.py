@@ -0,0 +1,35 @@
+"""
+Riscaldamento del worker: prepara le strutture in memoria prima della prima richiesta.
+Viene chiamato da wsgi.py e asgi.py dopo il caricamento dell'applicazione.
+"""
+import gc
+import logging
+
+from django.db import DatabaseError, connections
+from django.urls import get_resolver
+
+from carrello.promozioni import promozioni
+
+from .autocomplete import indice_autocomplete
+from .riferimenti import riferimenti
+
+logger = logging.getLogger(__name__)
+
+
+def riscalda_worker():
+    """Costruisce gli indici in memoria; se il database non è pronto rimanda alla prima richiesta"""
+    try:
+        indice_autocomplete.costruisci()
+        riferimenti.carica()
+        promozioni.compila()
+    except DatabaseError:
+        logger.warning('Database non disponibile: riscaldamento rimandato alla prima richiesta')
+    finally:
+        # Le connessioni aperte nel master non vanno ereditate dai worker
+        connections.close_all()
+    # Importa le viste e compila i pattern degli URL prima della prima richiesta
+    get_resolver().reverse_dict
+    # Reason: con l'applicazione caricata nel master (gunicorn --preload) gli oggetti creati
+    # fin qui escono dal garbage collector ciclico, che altrimenti li toccherebbe nei worker
+    # e farebbe copiare le pagine condivise con il fork
+    gc.freeze()
@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.test import APIRequestFactory
+
+from autenticazione.models import TokenApi
+from autenticazione.tokens import TokenApiAuthentication, cache_token
+
+factory = APIRequestFactory()
+
+
+@pytest.fixture
+def utente(db):
+    return User.objects.create_user('integrazione', password='x')
+
+
+def _autentica(chiave, metodo='get'):
+    request = getattr(factory, metodo)('/api/prodotti/', HTTP_AUTHORIZATION=f'Bearer {chiave}')
+    return TokenApiAuthentication().authenticate(request)
+
+
+def test_token_valido(utente):
+    token, chiave = TokenApi.crea(utente, 'magazzino', [TokenApi.SCOPE_LETTURA, TokenApi.SCOPE_SCRITTURA])
+    assert _autentica(chiave) == (utente, token)
+    assert _autentica(chiave, 'post') == (utente, token)
+    token.refresh_from_db()
+    assert token.ultimo_uso is not None
+
+
+def test_senza_header_nessuna_autenticazione(db):
+    assert TokenApiAuthentication().authenticate(factory.get('/api/prodotti/')) is None
+
+
+def test_segreto_errato(utente):
+    _, chiave = TokenApi.crea(utente, 'magazzino', [TokenApi.SCOPE_LETTURA])
+    with pytest.raises(exceptions.AuthenticationFailed):
+        _autentica(chiave[:-4] + 'xxxx')
+    with pytest.raises(exceptions.AuthenticationFailed):
+        _autentica('bb_formato-non-valido')
+
+
+def test_token_scaduto(utente):
+    _, chiave = TokenApi.crea(
+        utente, 'magazzino', [TokenApi.SCOPE_LETTURA], scadenza=timezone.now() - timedelta(minutes=1)
+    )
+    with pytest.raises(exceptions.AuthenticationFailed, match='scaduto o revocato'):
+        _autentica(chiave)
+
+
+def test_token_di_sola_lettura_in_scrittura(utente):
+    _, chiave = TokenApi.crea(utente, 'report', [TokenApi.SCOPE_LETTURA])
+    assert _autentica(chiave)[0] == utente
+    with pytest.raises(exceptions.PermissionDenied):
+        _autentica(chiave, 'post')
+
+
+def test_revoca_rimuove_il_token_dalla_cache(utente):
+    token, chiave = TokenApi.crea(utente, 'magazzino', [TokenApi.SCOPE_LETTURA])
+    _autentica(chiave)
+    assert cache_token.leggi(chiave) is not None
+
+    token.revoca()
+
+    assert cache_token.leggi(chiave) is None
+    with pytest.raises(exceptions.AuthenticationFailed, match='scaduto o revocato'):
+        _autentica(chiave)
@@ -0,0 +1,114 @@
+import time
+
+import pytest
+from django.contrib.auth.models import AnonymousUser, User
+from django.http import HttpResponse
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from baitboost import carico
+from baitboost.carico import LoadSheddingMiddleware, TokenBucketThrottle, _LatenzaDatabase, tempo_in_coda_ms
+
+factory = RequestFactory()
+
+
+@pytest.fixture
+def bucket(settings):
+    settings.THROTTLE_BUCKET = {
+        'anonimi': {'capacita': 6, 'ricarica_al_secondo': 1.0},
+        'utenti': {'capacita': 6, 'ricarica_al_secondo': 1.0},
+    }
+
+
+def _richiesta(utente=None, **parametri):
+    request = Request(factory.get('/api/prodotti/', parametri, REMOTE_ADDR='10.0.0.1'))
+    request.user = utente or AnonymousUser()
+    return request
+
+
+def test_token_bucket_consuma_e_risponde_con_l_attesa(bucket):
+    throttle = TokenBucketThrottle()
+    assert [throttle.allow_request(_richiesta(), None) for _ in range(7)] == [True] * 6 + [False]
+    assert 0 < throttle.wait() <= 1
+
+
+def test_token_bucket_costo_della_ricerca(bucket):
+    throttle = TokenBucketThrottle()
+    # La ricerca costa 1 + 5 token: la seconda non ci sta
+    assert throttle.allow_request(_richiesta(search='canna'), None)
+    assert not throttle.allow_request(_richiesta(search='canna'), None)
+    assert throttle.wait() == pytest.approx(6, abs=0.1)
+
+
+def test_token_bucket_si_ricarica(bucket, monkeypatch):
+    throttle = TokenBucketThrottle()
+    for _ in range(6):
+        throttle.allow_request(_richiesta(), None)
+    adesso = time.time()
+    monkeypatch.setattr(carico.time, 'time', lambda: adesso + 2)
+    assert [throttle.allow_request(_richiesta(), None) for _ in range(3)] == [True, True, False]
+
+
+@pytest.mark.django_db
+def test_token_bucket_per_utente_e_staff_illimitato(bucket):
+    throttle = TokenBucketThrottle()
+    utente = User.objects.create_user('pescatore', password='x')
+    staff = User.objects.create_user('staff', password='x', is_staff=True)
+    for _ in range(6):
+        throttle.allow_request(_richiesta(), None)
+    # Bucket separati per utente e IP
+    assert throttle.allow_request(_richiesta(utente), None)
+    assert all(throttle.allow_request(_richiesta(staff), None) for _ in range(20))
+
+
+@pytest.mark.parametrize('formato', [
+    lambda inizio: f't={inizio:.3f}',       # secondi (nginx)
+    lambda inizio: str(int(inizio * 1000)),  # millisecondi
+    lambda inizio: str(int(inizio * 1000000)),  # microsecondi
+])
+def test_tempo_in_coda_riconosce_l_unita(formato):
+    request = factory.get('/', HTTP_X_REQUEST_START=formato(time.time() - 0.25))
+    assert tempo_in_coda_ms(request) == pytest.approx(250, abs=50)
+
+
+@pytest.mark.parametrize('valore', ['', 'non-un-numero', f't={time.time() + 60}'])
+def test_tempo_in_coda_assente_o_non_valido(valore):
+    assert tempo_in_coda_ms(factory.get('/', HTTP_X_REQUEST_START=valore)) == 0
+
+
+@pytest.fixture
+def latenza(monkeypatch):
+    latenza = _LatenzaDatabase(peso=1)
+    monkeypatch.setattr(carico, 'latenza_database', latenza)
+    return latenza
+
+
+def _middleware(request):
+    return LoadSheddingMiddleware(lambda request: HttpResponse('ok'))(request)
+
+
+def test_scarta_solo_le_richieste_costose_sotto_carico(latenza, settings):
+    latenza.registra(settings.CARICO_SOGLIA_DATABASE_MS * 2)
+
+    scartata = _middleware(factory.get('/api/prodotti/', {'query': 'canna'}))
+    assert scartata.status_code == 503
+    assert scartata['Retry-After'] == str(settings.CARICO_RETRY_AFTER)
+    assert _middleware(factory.get('/api/prodotti/')).status_code == 200
+
+
+def test_scarta_con_attesa_in_coda(latenza, settings):
+    inizio = time.time() - settings.CARICO_SOGLIA_CODA_MS / 1000 * 2
+    request = factory.get('/api/prodotti/', {'search': 'canna'}, HTTP_X_REQUEST_START=f't={inizio}')
+    assert _middleware(request).status_code == 503
+
+
+def test_latenza_decade_senza_nuove_query(latenza, settings, monkeypatch):
+    latenza.registra(settings.CARICO_SOGLIA_DATABASE_MS * 2)
+    adesso = time.monotonic()
+    costosa = factory.get('/api/prodotti/', {'query': 'canna'})
+    assert _middleware(costosa).status_code == 503
+
+    # Dopo due emivite la media è un quarto: il worker torna ad accettare le richieste costose
+    monkeypatch.setattr(carico.time, 'monotonic', lambda: adesso + 2 * settings.CARICO_EMIVITA_LATENZA_SECONDI)
+    assert latenza.media_ms == pytest.approx(settings.CARICO_SOGLIA_DATABASE_MS / 2, rel=0.01)
+    assert _middleware(costosa).status_code == 200
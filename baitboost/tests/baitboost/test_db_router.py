@@ -0,0 +1,104 @@
+import time
+
+import pytest
+from django.contrib.auth.models import AnonymousUser, User
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from baitboost.db_router import (
+    COOKIE_PRIMARIO, ReplicaRouter, ReplicaStickyMiddleware, _replica_corrente, deve_leggere_dal_primario,
+    letture_su_replica,
+)
+from prodotti.mixins import ReplicaReadMixin
+from prodotti.models import Product
+
+factory = RequestFactory()
+router = ReplicaRouter()
+
+
+@pytest.fixture(autouse=True)
+def repliche(settings):
+    settings.DATABASE_REPLICAS = ['replica_1']
+
+
+def test_letture_sul_primario_se_non_abilitate():
+    assert router.db_for_read(Product) == DEFAULT_DB_ALIAS
+    with letture_su_replica():
+        assert router.db_for_read(Product) == 'replica_1'
+        assert router.db_for_write(Product) == DEFAULT_DB_ALIAS
+    assert router.db_for_read(Product) == DEFAULT_DB_ALIAS
+
+
+@pytest.mark.django_db
+def test_transazioni_sempre_sul_primario():
+    with letture_su_replica(), transaction.atomic():
+        assert router.db_for_read(Product) == DEFAULT_DB_ALIAS
+
+
+def test_nessuna_migrazione_sulle_repliche():
+    assert router.allow_migrate('replica_1', 'prodotti') is False
+    assert router.allow_migrate(DEFAULT_DB_ALIAS, 'prodotti') is None
+
+
+def _middleware(metodo, stato, utente):
+    request = getattr(factory, metodo)('/api/prodotti/')
+    request.user = utente
+    return ReplicaStickyMiddleware(lambda request: HttpResponse(status=stato))(request)
+
+
+@pytest.mark.django_db
+def test_scrittura_riuscita_aggancia_al_primario():
+    utente = User.objects.create_user('scrittore', password='x')
+    risposta = _middleware('post', 201, utente)
+
+    cookie = risposta.cookies[COOKIE_PRIMARIO]
+    assert cookie['max-age'] == 5 and cookie['httponly']
+    factory.cookies[COOKIE_PRIMARIO] = cookie.value
+    try:
+        assert deve_leggere_dal_primario(factory.get('/api/prodotti/'))
+    finally:
+        del factory.cookies[COOKIE_PRIMARIO]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('metodo,stato,autenticato', [
+    ('get', 200, True), ('post', 400, True), ('post', 201, False),
+])
+def test_nessun_aggancio(metodo, stato, autenticato):
+    utente = User.objects.create_user('lettore', password='x') if autenticato else AnonymousUser()
+    assert COOKIE_PRIMARIO not in _middleware(metodo, stato, utente).cookies
+
+
+@pytest.mark.parametrize('valore', [str(int(time.time()) - 1), 'non-un-numero'])
+def test_cookie_scaduto_o_non_valido(valore):
+    request = factory.get('/api/prodotti/')
+    request.COOKIES[COOKIE_PRIMARIO] = valore
+    assert not deve_leggere_dal_primario(request)
+
+
+class VistaReplica(ReplicaReadMixin, APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        return Response({'replica': _replica_corrente.get()})
+
+    def post(self, request):
+        return Response({'replica': _replica_corrente.get()})
+
+
+def test_mixin_legge_dalla_replica_e_ripristina():
+    risposta = VistaReplica.as_view()(factory.get('/'))
+    assert risposta.data == {'replica': 'replica_1'}
+    assert _replica_corrente.get() is None
+
+
+def test_mixin_sul_primario_dopo_una_scrittura_e_per_le_scritture():
+    request = factory.get('/')
+    request.COOKIES[COOKIE_PRIMARIO] = str(time.time() + 5)
+    assert VistaReplica.as_view()(request).data == {'replica': None}
+    assert VistaReplica.as_view()(factory.post('/')).data == {'replica': None}
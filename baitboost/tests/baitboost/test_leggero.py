@@ -0,0 +1,62 @@
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from baitboost.leggero import (
+    AuthenticationMiddlewareLeggero, CsrfViewMiddlewareLeggero, MessageMiddlewareLeggero,
+    PercorsoLeggeroMiddleware, SessionMiddlewareLeggero
+)
+
+factory = RequestFactory()
+
+
+def _vista(request):
+    return HttpResponse()
+
+
+def _esegui(request):
+    """Passa la richiesta nello stesso ordine dei middleware in settings.MIDDLEWARE"""
+    csrf = CsrfViewMiddlewareLeggero(_vista)
+    catena = PercorsoLeggeroMiddleware(SessionMiddlewareLeggero(
+        AuthenticationMiddlewareLeggero(MessageMiddlewareLeggero(_vista))
+    ))
+    catena(request)
+    return csrf.process_view(request, _vista, (), {})
+
+
+def test_get_anonima_sulle_api_salta_lo_stack():
+    request = factory.get('/api/prodotti/')
+    assert _esegui(request) is None
+
+    assert request.percorso_leggero is True
+    assert isinstance(request.user, AnonymousUser)
+    assert not hasattr(request, 'session')
+    assert not hasattr(request, '_messages')
+
+
+@pytest.mark.parametrize('request_', [
+    factory.get('/api/prodotti/', HTTP_AUTHORIZATION='Token abc'),
+    factory.get('/api/prodotti/', HTTP_COOKIE='sessionid=abc'),
+    factory.get('/admin/prodotti/'),
+    factory.get('/'),
+], ids=['authorization', 'cookie-sessione', 'admin', 'fuori-prefisso'])
+def test_credenziali_o_rotte_private_usano_lo_stack_completo(request_, db):
+    _esegui(request_)
+    assert request_.percorso_leggero is False
+    assert hasattr(request_, 'session')
+    assert hasattr(request_, '_messages')
+
+
+def test_scrittura_anonima_con_csrf():
+    request = factory.post('/api/prodotti/')
+    risposta = _esegui(request)
+    assert request.percorso_leggero is False
+    assert risposta.status_code == 403
+
+
+def test_risposta_leggera_senza_cookie(client, db):
+    risposta = client.get('/api/categorie/')
+    assert risposta.status_code == 200
+    assert not risposta.cookies
+    assert 'Cookie' not in risposta.get('Vary', '')
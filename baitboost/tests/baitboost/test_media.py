@@ -0,0 +1,106 @@
+import pytest
+from django.contrib.auth.models import AnonymousUser, User
+from django.http import Http404
+from django.test import RequestFactory
+
+from baitboost.media import serve_media
+from prodotti.models import CaricamentoImmagine
+
+factory = RequestFactory()
+CONTENUTO = b'0123456789' * 10
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    settings.MEDIA_INVIO = ''
+    (tmp_path / 'prodotti').mkdir()
+    (tmp_path / 'prodotti' / 'foto.jpg').write_bytes(CONTENUTO)
+    return tmp_path
+
+
+def _richiesta(utente=None, **headers):
+    request = factory.get('/media/', **headers)
+    request.user = utente or AnonymousUser()
+    return request
+
+
+def _corpo(risposta):
+    return b''.join(risposta.streaming_content)
+
+
+def test_file_pubblico():
+    risposta = serve_media(_richiesta(), 'prodotti/foto.jpg')
+    assert risposta.status_code == 200
+    assert risposta['Content-Type'] == 'image/jpeg'
+    assert risposta['Accept-Ranges'] == 'bytes'
+    assert _corpo(risposta) == CONTENUTO
+
+
+def test_richiesta_condizionale():
+    etag = serve_media(_richiesta(), 'prodotti/foto.jpg')['ETag']
+    assert serve_media(_richiesta(HTTP_IF_NONE_MATCH=etag), 'prodotti/foto.jpg').status_code == 304
+
+
+def test_intervallo():
+    risposta = serve_media(_richiesta(HTTP_RANGE='bytes=10-19'), 'prodotti/foto.jpg')
+    assert risposta.status_code == 206
+    assert risposta['Content-Range'] == 'bytes 10-19/100'
+    assert risposta['Content-Length'] == '10'
+    assert _corpo(risposta) == CONTENUTO[10:20]
+
+
+def test_intervallo_finale():
+    risposta = serve_media(_richiesta(HTTP_RANGE='bytes=-5'), 'prodotti/foto.jpg')
+    assert risposta.status_code == 206
+    assert _corpo(risposta) == CONTENUTO[-5:]
+
+
+def test_intervallo_oltre_la_fine():
+    risposta = serve_media(_richiesta(HTTP_RANGE='bytes=100-'), 'prodotti/foto.jpg')
+    assert risposta.status_code == 416
+    assert risposta['Content-Range'] == 'bytes */100'
+
+
+@pytest.mark.parametrize('percorso', ['prodotti/mancante.jpg', '../segreti.txt', 'prodotti'])
+def test_percorsi_non_validi(percorso):
+    with pytest.raises(Http404):
+        serve_media(_richiesta(), percorso)
+
+
+@pytest.fixture
+def parte_privata(media_root, crea_prodotto):
+    proprietario = User.objects.create_user('caricatore', password='x')
+    caricamento = CaricamentoImmagine.objects.create(
+        prodotto=crea_prodotto(), utente=proprietario, nome_file='foto.jpg',
+        dimensione_totale=100, dimensione_parte=100,
+    )
+    cartella = media_root / 'caricamenti' / str(caricamento.pk)
+    cartella.mkdir(parents=True)
+    (cartella / '0').write_bytes(CONTENUTO)
+    return proprietario, f'caricamenti/{caricamento.pk}/0'
+
+
+def test_file_privato_visibile_al_proprietario_e_allo_staff(parte_privata):
+    proprietario, percorso = parte_privata
+    staff = User.objects.create_user('staff', password='x', is_staff=True)
+    for utente in (proprietario, staff):
+        risposta = serve_media(_richiesta(utente), percorso)
+        assert risposta.status_code == 200
+        assert risposta['Cache-Control'] == 'private, no-store'
+
+
+def test_file_privato_nascosto_agli_altri(parte_privata):
+    _, percorso = parte_privata
+    altro = User.objects.create_user('altro', password='x')
+    for utente in (None, altro):
+        with pytest.raises(Http404):
+            serve_media(_richiesta(utente), percorso)
+
+
+def test_file_privato_con_id_non_valido(media_root, db):
+    (media_root / 'caricamenti' / 'non-uuid').mkdir(parents=True)
+    (media_root / 'caricamenti' / 'non-uuid' / '0').write_bytes(CONTENUTO)
+    utente = User.objects.create_user('curioso', password='x')
+    with pytest.raises(Http404):
+        serve_media(_richiesta(utente), 'caricamenti/non-uuid/0')
@@ -0,0 +1,124 @@
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from carrello.models import Promozione
+from carrello.promozioni import IndicePromozioni, prezza_carrello
+from prodotti.models import Esca, SchedaProdotto
+
+# Albero delle categorie: 1 > 2 > 3, 4 separata
+CATEGORIE = {
+    1: SimpleNamespace(pk=1, parent_id=None),
+    2: SimpleNamespace(pk=2, parent_id=1),
+    3: SimpleNamespace(pk=3, parent_id=2),
+    4: SimpleNamespace(pk=4, parent_id=None),
+}
+
+
+def _promozione(pk, valore, **campi):
+    return Promozione(pk=pk, nome=f'Promo {pk}', valore=Decimal(valore), **campi)
+
+
+def _scheda(**campi):
+    valori = {'prodotto_id': 1, 'brand_id': 1, 'categoria_id': 3, 'tipo': 'esca', 'specifiche': {}}
+    valori.update(campi)
+    return SchedaProdotto(**valori)
+
+
+def _indice(*promozioni):
+    return IndicePromozioni(promozioni, CATEGORIE, timezone.now())
+
+
+def test_vince_lo_sconto_piu_alto():
+    indice = _indice(
+        _promozione(1, '10', categoria_id=1),
+        _promozione(2, '3', tipo_sconto=Promozione.SCONTO_IMPORTO, brand_id=1),
+    )
+    regola, sconto = indice.migliore(_scheda(), Decimal('20.00'))
+    assert (regola.id, sconto) == (2, Decimal('3'))
+    regola, sconto = indice.migliore(_scheda(), Decimal('50.00'))
+    assert (regola.id, sconto) == (1, Decimal('5.00'))
+
+
+def test_categoria_comprende_le_sottocategorie():
+    indice = _indice(_promozione(1, '10', categoria_id=2))
+    assert indice.migliore(_scheda(categoria_id=3), Decimal('10'))[0].id == 1
+    assert indice.migliore(_scheda(categoria_id=1), Decimal('10')) == (None, Decimal(0))
+    assert indice.migliore(_scheda(categoria_id=4), Decimal('10')) == (None, Decimal(0))
+
+
+def test_specifiche_e_criteri_combinati():
+    indice = _indice(_promozione(
+        1, '20', brand_id=1, tipo_prodotto='esca', specifiche={'tipo_esca': 'ARTIFICIALE'}
+    ))
+    artificiale = _scheda(specifiche={'tipo_esca': 'ARTIFICIALE'})
+    naturale = _scheda(specifiche={'tipo_esca': 'NATURALE'})
+    assert indice.migliore(artificiale, Decimal('10'))[1] == Decimal('2.00')
+    assert indice.migliore(naturale, Decimal('10'))[0] is None
+    assert indice.migliore(_scheda(brand_id=2, specifiche={'tipo_esca': 'ARTIFICIALE'}), Decimal('10'))[0] is None
+
+
+def test_importo_mai_oltre_il_prezzo():
+    indice = _indice(_promozione(1, '15', tipo_sconto=Promozione.SCONTO_IMPORTO))
+    assert indice.migliore(_scheda(), Decimal('9.99'))[1] == Decimal('9.99')
+
+
+def test_regole_future_e_scadenza_dell_indice():
+    adesso = timezone.now()
+    inizio = adesso + timedelta(hours=1)
+    indice = IndicePromozioni([_promozione(1, '10', data_inizio=inizio)], CATEGORIE, adesso)
+    assert indice.migliore(_scheda(), Decimal('10'))[0] is None
+    assert indice.scadenza == inizio
+
+
+def test_regola_con_specifiche_non_scalari_ignorata():
+    indice = _indice(
+        _promozione(1, '50', tipo_prodotto='esca', specifiche={'colore': ['rosso', 'blu']}),
+        _promozione(2, '10'),
+    )
+    assert indice.regole == 1
+    assert indice.migliore(_scheda(), Decimal('10'))[0].id == 2
+
+
+def test_clean_rifiuta_specifiche_non_scalari():
+    promozione = _promozione(None, '10', tipo_prodotto='esca', specifiche={'colore': ['rosso', 'blu']})
+    with pytest.raises(ValidationError) as errore:
+        promozione.clean()
+    assert 'specifiche' in errore.value.message_dict
+
+
+@pytest.fixture
+def esca(crea_prodotto):
+    return crea_prodotto(Esca, tipo_esca='ARTIFICIALE', prezzo=Decimal('20.00'))
+
+
+def test_prezza_carrello_con_promozione_e_coupon(esca):
+    Promozione.objects.create(nome='Esche -10%', valore=Decimal('10'), tipo_prodotto='esca')
+    Promozione.objects.create(
+        nome='Coupon 2 euro', valore=Decimal('2'), tipo_sconto=Promozione.SCONTO_IMPORTO, codice_coupon='PESCA'
+    )
+
+    carrello = prezza_carrello([(esca.pk, 1), (esca.pk, 2)], codice_coupon=' pesca ')
+
+    [riga] = carrello['righe']
+    assert riga['quantita'] == 3
+    assert riga['sconto_promozione'] == Decimal('2.00')
+    assert riga['sconto_coupon'] == Decimal('2')
+    assert riga['prezzo_finale'] == Decimal('16.00')
+    assert carrello['coupon'] == {'codice': 'PESCA', 'valido': True, 'nome': 'Coupon 2 euro'}
+    assert (carrello['subtotale'], carrello['sconto'], carrello['totale']) == (
+        Decimal('60.00'), Decimal('12.00'), Decimal('48.00')
+    )
+
+
+def test_prezza_carrello_prodotti_non_disponibili(esca, crea_prodotto):
+    fuori_vendita = crea_prodotto(in_vendita=False)
+    carrello = prezza_carrello([(esca.pk, 6), (fuori_vendita.pk, 1), (999999, 1)], codice_coupon='NESSUNO')
+    assert carrello['righe'] == []
+    assert carrello['non_disponibili'] == [esca.pk, fuori_vendita.pk, 999999]
+    assert carrello['coupon']['valido'] is False
+    assert carrello['totale'] == 0
@@ -0,0 +1,110 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from coda.models import Compito
+from coda.registro import compito
+from coda.worker import ESITO_COMPLETATO, ESITO_FALLITO, ESITO_RIPROVA, esegui_compito, prendi_compiti
+
+eseguiti = []
+
+
+@compito(nome='test.registra')
+def registra(valore):
+    eseguiti.append(valore)
+
+
+@compito(nome='test.fallisce', massimo_tentativi=2, attesa_base=30)
+def fallisce():
+    raise RuntimeError('errore di prova')
+
+
+def _rendi_eseguibile(id_compito):
+    Compito.objects.filter(pk=id_compito).update(eseguibile_dal=timezone.now() - timedelta(seconds=1))
+
+
+@pytest.mark.django_db
+def test_prendi_compiti_in_ordine_di_priorita():
+    normale = registra.accoda(1)
+    urgente = registra.accoda(2, priorita=Compito.PRIORITA_ALTA)
+    registra.accoda(3, ritardo=3600)
+
+    assert prendi_compiti(10, 'worker-1') == [urgente.pk, normale.pk]
+    assert set(Compito.objects.filter(preso_da='worker-1').values_list('stato', flat=True)) == {
+        Compito.STATO_IN_ESECUZIONE
+    }
+    # Già presi, e quello ritardato non è ancora eseguibile
+    assert prendi_compiti(10, 'worker-2') == []
+
+
+@pytest.mark.django_db
+def test_prendi_compiti_rispetta_il_numero():
+    for valore in range(5):
+        registra.accoda(valore)
+    primi = prendi_compiti(2, 'worker-1')
+    altri = prendi_compiti(10, 'worker-2')
+    assert len(primi) == 2 and len(altri) == 3
+    assert not set(primi) & set(altri)
+
+
+@pytest.mark.django_db
+def test_deduplicazione_per_chiave():
+    primo = registra.accoda(1, chiave='ricalcolo')
+    assert registra.accoda(2, chiave='ricalcolo') == primo
+    assert Compito.objects.count() == 1
+
+    # Una volta preso in carico la chiave torna libera
+    prendi_compiti(1, 'worker-1')
+    secondo = registra.accoda(3, chiave='ricalcolo')
+    assert secondo != primo
+    assert Compito.objects.count() == 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_esecuzione_completata():
+    eseguiti.clear()
+    registra.accoda('ok')
+    [id_compito] = prendi_compiti(1, 'worker-1')
+    nome, esito, _, _ = esegui_compito(id_compito)
+    assert (nome, esito) == ('test.registra', ESITO_COMPLETATO)
+    assert eseguiti == ['ok']
+    assert Compito.objects.get(pk=id_compito).stato == Compito.STATO_COMPLETATO
+
+
+@pytest.mark.django_db(transaction=True)
+def test_riprova_poi_fallisce():
+    fallisce.accoda()
+    [id_compito] = prendi_compiti(1, 'worker-1')
+    assert esegui_compito(id_compito)[1] == ESITO_RIPROVA
+    compito_riprogrammato = Compito.objects.get(pk=id_compito)
+    assert compito_riprogrammato.stato == Compito.STATO_IN_ATTESA
+    assert compito_riprogrammato.eseguibile_dal > timezone.now()
+    assert 'errore di prova' in compito_riprogrammato.errore
+
+    _rendi_eseguibile(id_compito)
+    assert prendi_compiti(1, 'worker-1') == [id_compito]
+    assert esegui_compito(id_compito)[1] == ESITO_FALLITO
+    compito_fallito = Compito.objects.get(pk=id_compito)
+    assert compito_fallito.stato == Compito.STATO_FALLITO
+    assert compito_fallito.tentativi == 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_riprova_con_chiave_gia_in_attesa():
+    fallisce.accoda(chiave='unico')
+    [id_compito] = prendi_compiti(1, 'worker-1')
+    nuovo = fallisce.accoda(chiave='unico')
+
+    # Non può tornare in attesa accanto al nuovo compito con la stessa chiave
+    assert esegui_compito(id_compito)[1] == ESITO_FALLITO
+    assert 'stessa chiave' in Compito.objects.get(pk=id_compito).errore
+    assert Compito.objects.get(pk=nuovo.pk).stato == Compito.STATO_IN_ATTESA
+
+
+@pytest.mark.django_db(transaction=True)
+def test_compito_non_registrato():
+    id_compito = Compito.objects.create(nome='test.inesistente', argomenti={}).pk
+    prendi_compiti(1, 'worker-1')
+    assert esegui_compito(id_compito)[1] == ESITO_FALLITO
+    assert 'non registrato' in Compito.objects.get(pk=id_compito).errore
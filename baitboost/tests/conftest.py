@@ -0,0 +1,65 @@
+"""
+Fixture comuni della suite.
+
+La cache di Django e le cache in memoria dei moduli (token, riferimenti, indice
+delle promozioni) vengono svuotate prima di ogni test: altrimenti un test
+vedrebbe i dati caricati da quello precedente, che nel frattempo sono stati
+annullati con il rollback della transazione.
+"""
+from decimal import Decimal
+from itertools import count
+
+import pytest
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from autenticazione.tokens import cache_token
+from carrello.promozioni import promozioni
+from prodotti.models import Brand, Categoria, Product
+from prodotti.riferimenti import riferimenti
+
+_progressivo = count(1)
+
+
+@pytest.fixture(autouse=True)
+def cache_pulite():
+    cache.clear()
+    cache_token._voci.clear()
+    riferimenti._dati = None
+    promozioni._indice = None
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def client():
+    return APIClient()
+
+
+@pytest.fixture
+def categoria(db):
+    return Categoria.objects.create(nome='Esche')
+
+
+@pytest.fixture
+def brand(db):
+    return Brand.objects.create(nome='Rapala')
+
+
+@pytest.fixture
+def crea_prodotto(categoria, brand):
+    """Crea un prodotto base (o del modello indicato) con i soli campi obbligatori"""
+    def crea(modello=Product, **campi):
+        numero = next(_progressivo)
+        valori = {
+            'nome': f'Prodotto {numero}',
+            'categoria': categoria,
+            'brand': brand,
+            'descrizione_breve': 'Prodotto di prova',
+            'immagine_principale': f'prodotti/prova-{numero}.jpg',
+            'prezzo': Decimal('10.00'),
+            'quantita_disponibile': 5,
+        }
+        valori.update(campi)
+        return modello.objects.create(**valori)
+    return crea
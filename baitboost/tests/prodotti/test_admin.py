@@ -0,0 +1,35 @@
+from decimal import Decimal
+
+import pytest
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.auth.models import User
+
+from prodotti.models import Esca
+
+
+@pytest.fixture
+def admin_client(client, db):
+    client.force_login(User.objects.create_superuser('admin', password='x'))
+    return client
+
+
+def _modifica_prezzi(admin_client, prodotto, percentuale):
+    return admin_client.post('/admin/prodotti/esca/', {
+        'action': 'modifica_prezzi', ACTION_CHECKBOX_NAME: [prodotto.pk], 'percentuale': percentuale,
+    }, follow=True)
+
+
+def test_modifica_prezzi(admin_client, crea_prodotto):
+    prodotto = crea_prodotto(Esca, prezzo=Decimal('20.00'), prezzo_scontato=Decimal('10.00'))
+    _modifica_prezzi(admin_client, prodotto, '-15')
+    prodotto.refresh_from_db()
+    assert (prodotto.prezzo, prodotto.prezzo_scontato) == (Decimal('17.00'), Decimal('8.50'))
+
+
+@pytest.mark.parametrize('percentuale', ['NaN', 'Infinity', '-100', '1000', 'dieci', ''])
+def test_modifica_prezzi_rifiuta_percentuali_non_valide(admin_client, crea_prodotto, percentuale):
+    prodotto = crea_prodotto(Esca, prezzo=Decimal('20.00'))
+    risposta = _modifica_prezzi(admin_client, prodotto, percentuale)
+    assert risposta.status_code == 200
+    assert Esca.objects.get(pk=prodotto.pk).prezzo == Decimal('20.00')
+    assert [messaggio.level_tag for messaggio in risposta.context['messages']] == ['error']
@@ -0,0 +1,30 @@
+from types import SimpleNamespace
+
+from django.db import DatabaseError
+
+from prodotti import autocomplete
+from prodotti.autocomplete import IndicePrefissi
+
+
+def test_autocompletamento_limite_minimo(client, crea_prodotto):
+    crea_prodotto()
+    crea_prodotto()
+    risposta = client.get('/api/autocomplete/', {'q': 'prod', 'limite': '-3'})
+    assert risposta.status_code == 200
+    assert len(risposta.json()['suggerimenti']) == 1
+
+
+def test_errore_della_ricostruzione_in_background_registrato(monkeypatch, caplog):
+    indice = IndicePrefissi()
+    indice._costruzione_in_corso = True
+    chiusure = []
+
+    def guasto():
+        raise DatabaseError('database non raggiungibile')
+    monkeypatch.setattr(indice, 'costruisci', guasto)
+    monkeypatch.setattr(autocomplete, 'connection', SimpleNamespace(close=lambda: chiusure.append(True)))
+    indice._ricostruisci_in_background()
+
+    assert 'database non raggiungibile' in caplog.text
+    assert not indice._costruzione_in_corso
+    assert chiusure == [True]
@@ -0,0 +1,61 @@
+import pytest
+
+from prodotti.models import Esca, Mulinello
+from prodotti.views import BATCH_MASSIMO
+
+
+@pytest.fixture
+def prodotti(crea_prodotto):
+    return [crea_prodotto(), crea_prodotto(Esca, tipo_esca='ARTIFICIALE'), crea_prodotto(Mulinello, tipo_mulinello='SPINNING')]
+
+
+def _batch(client, **parametri):
+    return client.get('/api/prodotti/batch/', parametri)
+
+
+def test_ordine_della_richiesta_e_sottotipi(client, prodotti):
+    richiesti = [prodotti[2], prodotti[0], prodotti[1]]
+    risultati = _batch(client, slug=','.join(prodotto.slug for prodotto in richiesti)).json()['risultati']
+
+    assert [risultato['richiesta'] for risultato in risultati] == [prodotto.slug for prodotto in richiesti]
+    assert [risultato['tipo'] for risultato in risultati] == ['mulinello', 'prodotto', 'esca']
+    assert risultati[2]['prodotto']['tipo_esca'] == 'ARTIFICIALE'
+
+
+def test_prodotti_mancanti(client, prodotti):
+    risultati = _batch(client, id=f'{prodotti[0].pk},999999').json()['risultati']
+    assert risultati[0]['prodotto']['id'] == prodotti[0].pk
+    assert risultati[1] == {'richiesta': '999999', 'errore': 'Prodotto non trovato'}
+
+
+def test_tre_query_a_regime(client, prodotti, django_assert_num_queries):
+    sku = ','.join(prodotto.codice_sku for prodotto in prodotti)
+    _batch(client, sku=sku)
+    with django_assert_num_queries(3):
+        assert _batch(client, sku=sku).status_code == 200
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('parametri', [
+    {},
+    {'slug': 'a', 'id': '1'},
+    {'id': ','.join(str(numero) for numero in range(1, BATCH_MASSIMO + 2))},
+    {'id': '1,due'},
+    {'slug': ' , '},
+])
+def test_richieste_non_valide(client, parametri):
+    assert _batch(client, **parametri).status_code == 400
+
+
+def test_etag_e_304(client, prodotti):
+    risposta = _batch(client, slug=prodotti[0].slug)
+    etag = risposta['ETag']
+    assert 'max-age' in risposta['Cache-Control']
+
+    non_modificata = client.get('/api/prodotti/batch/', {'slug': prodotti[0].slug}, HTTP_IF_NONE_MATCH=etag)
+    assert non_modificata.status_code == 304
+    assert non_modificata['ETag'] == etag
+
+    prodotti[0].nome = 'Nome cambiato'
+    prodotti[0].save()
+    assert client.get('/api/prodotti/batch/', {'slug': prodotti[0].slug}, HTTP_IF_NONE_MATCH=etag).status_code == 200
@@ -0,0 +1,131 @@
+import hashlib
+import io
+import os
+
+import pytest
+from django.contrib.auth.models import User
+from PIL import Image
+
+from prodotti.models import CaricamentoImmagine, ProductImage
+
+DIMENSIONE_PARTE = 100
+
+
+def _png():
+    buffer = io.BytesIO()
+    # Pixel casuali: il PNG non si comprime e occupa più parti
+    Image.frombytes('RGB', (20, 20), os.urandom(20 * 20 * 3)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def _sha(dati):
+    return hashlib.sha256(dati).hexdigest()
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
+
+
+@pytest.fixture
+def admin(client, db):
+    client.force_authenticate(User.objects.create_user('admin', password='x', is_staff=True))
+    return client
+
+
+@pytest.fixture
+def immagine():
+    return _png()
+
+
+def _crea(client, prodotto, contenuto, **campi):
+    dati = {
+        'prodotto': prodotto.pk, 'nome_file': 'foto.png', 'dimensione_totale': len(contenuto),
+        'dimensione_parte': DIMENSIONE_PARTE, 'sha256': _sha(contenuto),
+    }
+    dati.update(campi)
+    return client.post('/api/caricamenti/', dati, format='json')
+
+
+def _parte(client, caricamento, indice, dati, sha256=None):
+    return client.put(
+        f'/api/caricamenti/{caricamento}/parti/{indice}/', data=dati, content_type='application/octet-stream',
+        HTTP_X_CHECKSUM_SHA256=sha256 or _sha(dati),
+    )
+
+
+def _parti(contenuto):
+    return [contenuto[inizio:inizio + DIMENSIONE_PARTE] for inizio in range(0, len(contenuto), DIMENSIONE_PARTE)]
+
+
+def test_parti_in_ordine_sparso(admin, crea_prodotto, immagine):
+    prodotto = crea_prodotto()
+    caricamento = _crea(admin, prodotto, immagine).json()
+    parti = _parti(immagine)
+    assert caricamento['numero_parti'] == len(parti) > 2
+
+    for indice in reversed(range(len(parti))):
+        assert _parte(admin, caricamento['id'], indice, parti[indice]).status_code == 200
+    risposta = admin.post(f'/api/caricamenti/{caricamento["id"]}/completa/')
+
+    assert risposta.status_code == 201
+    creata = ProductImage.objects.get(prodotto=prodotto)
+    with creata.immagine.open('rb') as file:
+        assert file.read() == immagine
+    assert CaricamentoImmagine.objects.get().stato == CaricamentoImmagine.STATO_COMPLETATO
+    assert not CaricamentoImmagine.objects.get().parti.exists()
+
+
+def test_ripresa_dopo_un_interruzione(admin, crea_prodotto, immagine):
+    caricamento = _crea(admin, crea_prodotto(), immagine).json()
+    parti = _parti(immagine)
+    _parte(admin, caricamento['id'], 0, parti[0])
+    _parte(admin, caricamento['id'], 2, parti[2])
+
+    incompleto = admin.post(f'/api/caricamenti/{caricamento["id"]}/completa/')
+    assert incompleto.status_code == 400
+    assert '1' in incompleto.json()['errore']
+
+    stato = admin.get(f'/api/caricamenti/{caricamento["id"]}/').json()
+    assert sorted(stato['parti_ricevute']) == [0, 2]
+    for indice in set(range(len(parti))) - set(stato['parti_ricevute']):
+        _parte(admin, caricamento['id'], indice, parti[indice])
+    # Una parte ricaricata sostituisce la precedente
+    assert _parte(admin, caricamento['id'], 0, parti[0]).status_code == 200
+    assert admin.post(f'/api/caricamenti/{caricamento["id"]}/completa/').status_code == 201
+
+
+def test_checksum_errato(admin, crea_prodotto, immagine):
+    caricamento = _crea(admin, crea_prodotto(), immagine).json()
+    parti = _parti(immagine)
+
+    risposta = _parte(admin, caricamento['id'], 0, parti[0], sha256=_sha(b'altro'))
+    assert risposta.status_code == 400
+    assert admin.get(f'/api/caricamenti/{caricamento["id"]}/').json()['parti_ricevute'] == []
+    assert _parte(admin, caricamento['id'], 0, parti[0][:-1]).status_code == 400
+
+
+def test_checksum_del_file_completo_errato(admin, crea_prodotto, immagine):
+    caricamento = _crea(admin, crea_prodotto(), immagine, sha256=_sha(b'altro')).json()
+    for indice, dati in enumerate(_parti(immagine)):
+        _parte(admin, caricamento['id'], indice, dati)
+
+    assert admin.post(f'/api/caricamenti/{caricamento["id"]}/completa/').status_code == 400
+    assert CaricamentoImmagine.objects.get().stato == CaricamentoImmagine.STATO_IN_CORSO
+    assert not ProductImage.objects.exists()
+
+
+def test_limiti_di_dimensione(admin, crea_prodotto, settings):
+    settings.CARICAMENTI_DIMENSIONE_MASSIMA = 1000
+    settings.CARICAMENTI_DIMENSIONE_PARTE = 500
+    prodotto = crea_prodotto()
+
+    assert _crea(admin, prodotto, b'x' * 1001).status_code == 400
+    assert _crea(admin, prodotto, b'x' * 1000, dimensione_parte=501).status_code == 400
+    assert _crea(admin, prodotto, b'x' * 1000, dimensione_parte=500).status_code == 201
+
+
+def test_solo_lo_staff(client, crea_prodotto, immagine):
+    client.force_authenticate(User.objects.create_user('cliente', password='x'))
+    assert _crea(client, crea_prodotto(), immagine).status_code == 403
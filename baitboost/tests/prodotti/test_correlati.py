@@ -0,0 +1,76 @@
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from prodotti.correlati import aggiorna_correlati, calcola_vicini
+from prodotti.models import Canna, Esca, Mulinello, ProdottoCorrelato, Product
+
+
+def test_calcola_vicini_in_ordine_di_punteggio():
+    vettori = np.array([[1, 0], [0.9, 0.1], [0.5, 0.5], [0, 1]], dtype=np.float32)
+    vettori /= np.linalg.norm(vettori, axis=1, keepdims=True)
+
+    [(riga, vicini, punteggi)] = calcola_vicini(vettori, [0], k=2)
+
+    assert riga == 0
+    assert list(vicini) == [1, 2]
+    assert punteggi[0] > punteggi[1]
+
+
+def test_calcola_vicini_con_un_solo_prodotto():
+    assert list(calcola_vicini(np.ones((1, 3), dtype=np.float32), [0])) == []
+
+
+@pytest.fixture
+def catalogo(crea_prodotto):
+    return {
+        'spigola': crea_prodotto(Esca, tipo_esca='ARTIFICIALE', specie_target='Spigola', peso_esca=Decimal('12')),
+        'spigola_2': crea_prodotto(Esca, tipo_esca='ARTIFICIALE', specie_target='Spigola', peso_esca=Decimal('14')),
+        'trota': crea_prodotto(Esca, tipo_esca='NATURALE', specie_target='Trota', peso_esca=Decimal('2')),
+        'mulinello': crea_prodotto(Mulinello, tipo_mulinello='SPINNING', prezzo=Decimal('120.00')),
+        'canna': crea_prodotto(Canna, tipo_canna='SPINNING', lunghezza=Decimal('2.40'), prezzo=Decimal('90.00')),
+    }
+
+
+def _vicini(prodotto):
+    return list(ProdottoCorrelato.objects.filter(prodotto=prodotto).order_by('posizione').values_list(
+        'correlato_id', flat=True
+    ))
+
+
+def test_primi_k_vicini_salvati_in_ordine(catalogo):
+    calcolo = aggiorna_correlati(k=2)
+
+    assert calcolo.completo and calcolo.prodotti_ricalcolati == 5
+    assert _vicini(catalogo['spigola']) == [catalogo['spigola_2'].pk, catalogo['trota'].pk]
+    punteggi = list(ProdottoCorrelato.objects.filter(prodotto=catalogo['spigola']).order_by('posizione')
+                    .values_list('punteggio', flat=True))
+    assert punteggi == sorted(punteggi, reverse=True)
+    assert all(len(_vicini(prodotto)) == 2 for prodotto in catalogo.values())
+
+
+def test_ricalcolo_incrementale_dei_soli_prodotti_coinvolti(catalogo, crea_prodotto):
+    aggiorna_correlati(k=1)
+    righe_mulinello = list(ProdottoCorrelato.objects.filter(prodotto=catalogo['mulinello']).values_list('pk'))
+
+    nuova = crea_prodotto(Esca, tipo_esca='ARTIFICIALE', specie_target='Spigola', peso_esca=Decimal('13'))
+    calcolo = aggiorna_correlati(k=1)
+
+    assert not calcolo.completo
+    assert 0 < calcolo.prodotti_ricalcolati < 6
+    # La nuova esca ha il proprio vicino ed entra tra i vicini delle esche simili
+    assert _vicini(nuova)[0] in (catalogo['spigola'].pk, catalogo['spigola_2'].pk)
+    assert nuova.pk in _vicini(catalogo['spigola']) + _vicini(catalogo['spigola_2'])
+    # I prodotti lontani non vengono ricalcolati
+    assert list(ProdottoCorrelato.objects.filter(prodotto=catalogo['mulinello']).values_list('pk')) == righe_mulinello
+
+
+def test_api_correlati(client, catalogo):
+    aggiorna_correlati(k=2)
+    Product.objects.filter(pk=catalogo['trota'].pk).update(in_vendita=False)
+
+    risposta = client.get(f"/api/prodotti/{catalogo['spigola'].slug}/correlati/")
+
+    assert [prodotto['id'] for prodotto in risposta.json()] == [catalogo['spigola_2'].pk]
+    assert client.get('/api/prodotti/inesistente/correlati/').status_code == 404
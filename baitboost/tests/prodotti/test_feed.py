@@ -0,0 +1,100 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from coda.models import Compito
+from prodotti.feed import codifica_cursore, decodifica_cursore, leggi_modifiche, pulisci_eliminazioni
+from prodotti.models import Eliminazione, Mulinello, Product
+
+
+@pytest.fixture(autouse=True)
+def senza_margine(settings):
+    settings.FEED_MARGINE_SECONDI = 0
+
+
+def _tutte_le_pagine(limite=1):
+    cursore, pagine = None, []
+    while True:
+        pagina = leggi_modifiche(cursore, limite)
+        pagine.append(pagina)
+        cursore = pagina['cursore']
+        if not pagina['altri']:
+            return pagine, cursore
+
+
+def test_cursore_andata_e_ritorno():
+    posizioni = {'prodotti': ['2026-01-01T10:00:00+00:00', 7], 'eliminati': 3}
+    assert decodifica_cursore(codifica_cursore(posizioni)) == posizioni
+
+
+def test_pagine_con_data_aggiornamento_uguale(crea_prodotto):
+    prodotti = [crea_prodotto(), crea_prodotto(Mulinello, tipo_mulinello='SPINNING'), crea_prodotto()]
+    Product.objects.update(data_aggiornamento=timezone.now() - timedelta(minutes=1))
+
+    pagine, cursore = _tutte_le_pagine(limite=1)
+
+    letti = [riga['id'] for pagina in pagine for riga in pagina['prodotti']]
+    assert letti == [prodotto.pk for prodotto in prodotti]
+    assert [riga['tipo'] for pagina in pagine for riga in pagina['prodotti']] == ['prodotto', 'mulinello', 'prodotto']
+    assert leggi_modifiche(cursore)['prodotti'] == []
+
+
+def test_modifica_successiva_al_cursore(crea_prodotto):
+    primo, secondo = crea_prodotto(), crea_prodotto()
+    cursore = leggi_modifiche()['cursore']
+
+    secondo.nome = 'Nome cambiato'
+    secondo.save()
+
+    assert [riga['id'] for riga in leggi_modifiche(cursore)['prodotti']] == [secondo.pk]
+
+
+def test_eliminazioni_nel_feed(crea_prodotto):
+    prodotto = crea_prodotto()
+    cursore = leggi_modifiche()['cursore']
+    id_prodotto, slug = prodotto.pk, prodotto.slug
+
+    prodotto.delete()
+
+    pagina = leggi_modifiche(cursore)
+    assert [(riga['tipo'], riga['oggetto_id'], riga['slug']) for riga in pagina['eliminati']] == [
+        (Eliminazione.TIPO_PRODOTTO, id_prodotto, slug)
+    ]
+    assert leggi_modifiche(pagina['cursore'])['eliminati'] == []
+
+
+def test_eliminazione_accoda_la_pulizia(crea_prodotto):
+    crea_prodotto().delete()
+    crea_prodotto().delete()
+    compito = Compito.objects.get(chiave_deduplica='pulisci-eliminazioni-feed')
+    assert compito.nome == 'prodotti.compiti.pulisci_eliminazioni_feed'
+
+
+@pytest.mark.django_db
+def test_pulizia_delle_tracce_scadute(settings):
+    settings.FEED_ELIMINAZIONI_CONSERVAZIONE_GIORNI = 30
+    vecchia = Eliminazione.objects.create(tipo=Eliminazione.TIPO_BRAND, oggetto_id=1, slug='vecchio')
+    Eliminazione.objects.filter(pk=vecchia.pk).update(data_eliminazione=timezone.now() - timedelta(days=31))
+    recente = Eliminazione.objects.create(tipo=Eliminazione.TIPO_BRAND, oggetto_id=2, slug='recente')
+
+    assert pulisci_eliminazioni() == 1
+    assert list(Eliminazione.objects.values_list('pk', flat=True)) == [recente.pk]
+
+
+@pytest.mark.django_db
+def test_cursore_piu_vecchio_della_conservazione_chiede_ricarica(settings):
+    settings.FEED_ELIMINAZIONI_CONSERVAZIONE_GIORNI = 30
+    pagina = leggi_modifiche()
+    assert pagina['ricarica'] is False
+    assert leggi_modifiche(pagina['cursore'])['ricarica'] is False
+
+    posizioni = decodifica_cursore(pagina['cursore'])
+    posizioni['letto'] = (timezone.now() - timedelta(days=31)).isoformat()
+    assert leggi_modifiche(codifica_cursore(posizioni))['ricarica'] is True
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('cursore', ['%%%', codifica_cursore([1]), codifica_cursore({'prodotti': ['ieri', 1]})])
+def test_cursore_non_valido(client, cursore):
+    assert client.get('/api/modifiche/', {'cursore': cursore}).status_code == 400
@@ -0,0 +1,60 @@
+import json
+from decimal import Decimal
+
+import pytest
+from django.core.cache import cache
+
+from coda.models import Compito
+from prodotti.compiti import ricostruisci_snapshot_home
+from prodotti.home import CHIAVE_CACHE, CHIAVE_COMPITO, leggi_home
+
+
+def test_snapshot_costruito_alla_prima_lettura(crea_prodotto, django_assert_num_queries):
+    prodotto = crea_prodotto(in_evidenza=True, prezzo=Decimal('20.00'), prezzo_scontato=Decimal('15.00'))
+
+    home = json.loads(leggi_home())
+
+    assert [elemento['id'] for elemento in home['in_evidenza']] == [prodotto.pk]
+    assert [elemento['id'] for elemento in home['in_sconto']] == [prodotto.pk]
+    assert [categoria['nome'] for categoria in home['categorie']] == ['Esche']
+    # Le letture successive arrivano dalla cache
+    with django_assert_num_queries(0):
+        assert json.loads(leggi_home()) == home
+
+
+def test_modifiche_accodano_una_sola_ricostruzione(crea_prodotto):
+    prodotto = crea_prodotto()
+    prodotto.nome = 'Rinominato'
+    prodotto.save()
+
+    [compito] = Compito.objects.filter(chiave_deduplica=CHIAVE_COMPITO)
+    assert compito.nome == ricostruisci_snapshot_home.nome
+    assert compito.stato == Compito.STATO_IN_ATTESA
+
+
+def test_il_compito_aggiorna_lo_snapshot(crea_prodotto):
+    leggi_home()
+    nuovo = crea_prodotto()
+    assert nuovo.pk not in [elemento['id'] for elemento in json.loads(cache.get(CHIAVE_CACHE))['nuovi_arrivi']]
+
+    ricostruisci_snapshot_home()
+
+    assert nuovo.pk in [elemento['id'] for elemento in json.loads(cache.get(CHIAVE_CACHE))['nuovi_arrivi']]
+
+
+@pytest.mark.django_db
+def test_home_solo_in_lettura(client):
+    risposta = client.get('/api/home/')
+    assert risposta.status_code == 200
+    assert risposta['Content-Type'] == 'application/json'
+    assert 'public' in risposta['Cache-Control']
+    assert client.post('/api/home/').status_code == 405
+
+
+@pytest.mark.django_db
+def test_home_limitata_per_client(client, settings):
+    settings.THROTTLE_BUCKET = {
+        'anonimi': {'capacita': 2, 'ricarica_al_secondo': 0.001},
+        'utenti': {'capacita': 2, 'ricarica_al_secondo': 0.001},
+    }
+    assert [client.get('/api/home/').status_code for _ in range(3)] == [200, 200, 429]
@@ -0,0 +1,78 @@
+from datetime import timedelta
+
+import pytest
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+from baitboost.storage import storage_contenuti
+from prodotti.media import aggiorna_riferimenti, raccogli_blob
+from prodotti.models import BlobMedia, Brand
+
+LOGO = b'logo di prova'
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
+
+
+def _brand(nome, contenuto=LOGO):
+    brand = Brand(nome=nome)
+    brand.logo.save('logo.PNG', ContentFile(contenuto), save=False)
+    brand.save()
+    return brand
+
+
+@pytest.mark.django_db
+def test_contenuto_identico_salvato_una_volta(media_root):
+    primo, secondo = _brand('Rapala'), _brand('Daiwa')
+
+    assert primo.logo.name == secondo.logo.name
+    assert primo.logo.name.startswith('contenuti/') and primo.logo.name.endswith('.png')
+    blob = BlobMedia.objects.get()
+    assert (blob.nome, blob.dimensione, blob.riferimenti) == (primo.logo.name, len(LOGO), 2)
+    assert len([file for file in media_root.rglob('*') if file.is_file()]) == 1
+
+
+@pytest.mark.django_db
+def test_sostituzione_ed_eliminazione_decrementano():
+    brand = _brand('Rapala')
+    vecchio = brand.logo.name
+
+    brand.logo.save('nuovo.png', ContentFile(b'altro logo'))
+    assert BlobMedia.objects.get(nome=vecchio).riferimenti == 0
+    assert BlobMedia.objects.get(nome=brand.logo.name).riferimenti == 1
+
+    brand.delete()
+    assert set(BlobMedia.objects.values_list('riferimenti', flat=True)) == {0}
+
+
+@pytest.mark.django_db
+def test_blob_registrato_sul_database_del_modello():
+    brand = _brand('Rapala')
+    BlobMedia.objects.all().delete()
+
+    aggiorna_riferimenti([brand.logo.name], [], using='default')
+
+    blob = BlobMedia.objects.using('default').get()
+    assert (blob.riferimenti, blob.dimensione) == (1, len(LOGO))
+
+
+@pytest.mark.django_db
+def test_raccolta_rispetta_il_periodo_di_grazia():
+    usato = _brand('Rapala').logo.name
+    orfano = _brand('Daiwa', b'logo orfano')
+    nome_orfano = orfano.logo.name
+    orfano.delete()
+    storage = storage_contenuti()
+
+    # Appena salvato: resta anche senza riferimenti
+    assert raccogli_blob(storage) == (0, 0)
+    assert storage.exists(nome_orfano)
+
+    BlobMedia.objects.update(data_aggiornamento=timezone.now() - timedelta(hours=2))
+    assert raccogli_blob(storage) == (1, len(b'logo orfano'))
+    assert not storage.exists(nome_orfano)
+    assert list(BlobMedia.objects.values_list('nome', flat=True)) == [usato]
+    assert storage.exists(usato)
@@ -0,0 +1,13 @@
+from decimal import Decimal
+
+
+def test_in_sconto_paginato_solo_su_richiesta(client, crea_prodotto):
+    crea_prodotto(prezzo=Decimal('12.00'))
+    scontato = crea_prodotto(prezzo=Decimal('8.00'), prezzo_scontato=Decimal('6.00'))
+
+    elenco = client.get('/api/prodotti/in_sconto/').json()
+    assert [prodotto['id'] for prodotto in elenco] == [scontato.pk]
+
+    pagina = client.get('/api/prodotti/in_sconto/', {'page': 1}).json()
+    assert pagina['count'] == 1
+    assert client.get('/api/prodotti/in_sconto/', {'page': 2}).status_code == 404
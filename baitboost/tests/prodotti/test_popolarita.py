@@ -0,0 +1,118 @@
+from datetime import date, timedelta
+
+import pytest
+from django.db import DatabaseError
+from django.utils import timezone
+
+from coda.models import Compito
+from prodotti import popolarita
+from prodotti.models import Product, SchedaProdotto, VisiteProdotto
+from prodotti.popolarita import CLIC, BufferVisite, calcola_punteggi, ricalcola_popolarita, scrivi_visite
+
+OGGI = date(2026, 6, 30)
+
+
+@pytest.fixture(autouse=True)
+def parametri(settings):
+    settings.VISITE_INTERVALLO_SECONDI = 3600
+    settings.VISITE_MASSIMO_BUFFER = 1000
+    settings.POPOLARITA_FINESTRA_GIORNI = 60
+    settings.POPOLARITA_EMIVITA_GIORNI = 7
+    settings.POPOLARITA_PESO_CLIC = 3
+
+
+def test_scrivi_visite_somma_alle_righe_esistenti(crea_prodotto):
+    primo, secondo = crea_prodotto(), crea_prodotto()
+    scrivi_visite({(primo.pk, OGGI): [2, 1], (secondo.pk, OGGI): [2, 1], (999999, OGGI): [5, 0]})
+    scrivi_visite({(primo.pk, OGGI): [3, 0], (primo.pk, OGGI - timedelta(days=1)): [1, 0]})
+
+    righe = set(VisiteProdotto.objects.values_list('prodotto_id', 'giorno', 'visualizzazioni', 'clic'))
+    assert righe == {
+        (primo.pk, OGGI, 5, 1), (primo.pk, OGGI - timedelta(days=1), 1, 0), (secondo.pk, OGGI, 2, 1)
+    }
+    assert Compito.objects.filter(chiave_deduplica='ricalcola-popolarita').count() == 1
+
+
+def test_svuota_scrive_e_azzera_il_buffer(crea_prodotto):
+    prodotto = crea_prodotto()
+    buffer = BufferVisite()
+    buffer.registra(prodotto.pk)
+    buffer.registra(prodotto.pk)
+    buffer.registra(prodotto.pk, CLIC)
+
+    assert buffer.svuota() == 1
+    assert buffer.in_attesa() == 0
+    assert VisiteProdotto.objects.values_list('visualizzazioni', 'clic').get() == (2, 1)
+    assert buffer.svuota() == 0
+
+
+def test_svuota_rimette_i_conteggi_dopo_un_errore(crea_prodotto, monkeypatch):
+    prodotto = crea_prodotto()
+    buffer = BufferVisite()
+    buffer.registra(prodotto.pk)
+
+    def fallisce(conteggi):
+        # Una visita arrivata durante la scrittura non va persa
+        buffer.registra(prodotto.pk, CLIC)
+        raise DatabaseError('database bloccato')
+
+    monkeypatch.setattr(popolarita, 'scrivi_visite', fallisce)
+    assert buffer.svuota() == 0
+    assert buffer.in_attesa() == 1
+
+    monkeypatch.undo()
+    assert buffer.svuota() == 1
+    assert VisiteProdotto.objects.values_list('visualizzazioni', 'clic').get() == (1, 1)
+
+
+def test_registra_svuota_in_background_oltre_il_massimo(settings, monkeypatch):
+    settings.VISITE_MASSIMO_BUFFER = 2
+    avviati = []
+
+    class ThreadFinto:
+        def __init__(self, target, daemon):
+            self.target = target
+
+        def start(self):
+            avviati.append(self.target)
+
+    monkeypatch.setattr(popolarita.threading, 'Thread', ThreadFinto)
+    buffer = BufferVisite()
+    buffer.registra(1)
+    assert avviati == []
+    buffer.registra(2)
+    buffer.registra(3)
+    # Un solo svuotamento alla volta
+    assert len(avviati) == 1
+
+
+def test_calcola_punteggi_con_decadimento(crea_prodotto):
+    prodotto = crea_prodotto()
+    VisiteProdotto.objects.bulk_create([
+        VisiteProdotto(prodotto=prodotto, giorno=OGGI, visualizzazioni=10, clic=2),
+        VisiteProdotto(prodotto=prodotto, giorno=OGGI - timedelta(days=7), visualizzazioni=8, clic=0),
+        VisiteProdotto(prodotto=prodotto, giorno=OGGI - timedelta(days=60), visualizzazioni=1000, clic=0),
+    ])
+    # 10 + 2 * 3 oggi, 8 dimezzato dopo un'emivita, l'ultima riga fuori dalla finestra
+    assert calcola_punteggi(OGGI) == {prodotto.pk: 20.0}
+
+
+def test_ricalcola_aggiorna_prodotti_e_schede(crea_prodotto, settings):
+    settings.VISITE_CONSERVAZIONE_GIORNI = 90
+    visitato, dimenticato = crea_prodotto(), crea_prodotto()
+    Product.objects.filter(pk=dimenticato.pk).update(popolarita=5)
+    VisiteProdotto.objects.bulk_create([
+        VisiteProdotto(prodotto=visitato, giorno=OGGI, visualizzazioni=4),
+        VisiteProdotto(prodotto=visitato, giorno=OGGI - timedelta(days=91), visualizzazioni=4),
+    ])
+
+    assert ricalcola_popolarita(OGGI) == {'aggiornati': 2, 'visite_eliminate': 1}
+    assert dict(Product.objects.values_list('pk', 'popolarita')) == {visitato.pk: 4, dimenticato.pk: 0}
+    assert SchedaProdotto.objects.get(pk=visitato.pk).popolarita == 4
+    assert ricalcola_popolarita(OGGI)['aggiornati'] == 0
+
+
+def test_oggi_predefinito(crea_prodotto):
+    prodotto = crea_prodotto()
+    VisiteProdotto.objects.create(prodotto=prodotto, giorno=timezone.localdate(), visualizzazioni=1)
+    assert calcola_punteggi() == {prodotto.pk: 1.0}
@@ -0,0 +1,80 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+
+from prodotti.models import Product, SchedaProdotto, StoricoPrezzo
+from prodotti.prezzi import calcola_prezzo_effettivo, registra_storico
+
+
+@pytest.fixture
+def prodotto(crea_prodotto):
+    prodotto = crea_prodotto(prezzo=Decimal('30.00'))
+    # Storico pulito: ogni test costruisce il proprio
+    StoricoPrezzo.objects.filter(prodotto=prodotto).delete()
+    return prodotto
+
+
+def _storico(prodotto, giorni_fa, prezzo, prezzo_scontato=None):
+    StoricoPrezzo.objects.create(
+        prodotto=prodotto, prezzo=Decimal(prezzo),
+        prezzo_scontato=Decimal(prezzo_scontato) if prezzo_scontato else None,
+        prezzo_effettivo=calcola_prezzo_effettivo(
+            Decimal(prezzo), Decimal(prezzo_scontato) if prezzo_scontato else None
+        ),
+        data_inizio=timezone.now() - timedelta(days=giorni_fa),
+    )
+
+
+def test_prezzo_effettivo():
+    assert calcola_prezzo_effettivo(Decimal('10'), Decimal('8')) == Decimal('8')
+    assert calcola_prezzo_effettivo(Decimal('10'), Decimal('12')) == Decimal('10')
+    assert calcola_prezzo_effettivo(Decimal('10'), None) == Decimal('10')
+
+
+def test_minimo_dei_prezzi_nella_finestra(prodotto):
+    _storico(prodotto, 20, '30.00', '22.00')
+    _storico(prodotto, 10, '30.00')
+
+    minimi = registra_storico([(prodotto.pk, Decimal('30.00'), Decimal('25.00'))])
+
+    assert minimi == {prodotto.pk: Decimal('22.00')}
+    prodotto.refresh_from_db()
+    assert prodotto.prezzo_minimo_30gg == Decimal('22.00')
+    assert SchedaProdotto.objects.get(pk=prodotto.pk).prezzo_minimo_30gg == Decimal('22.00')
+    assert StoricoPrezzo.objects.filter(prodotto=prodotto).count() == 3
+
+
+def test_conta_il_prezzo_in_vigore_all_inizio_della_finestra(prodotto):
+    _storico(prodotto, 60, '30.00', '15.00')  # sostituito prima della finestra: escluso
+    _storico(prodotto, 40, '30.00', '20.00')  # ancora in vigore all'inizio della finestra
+    _storico(prodotto, 5, '30.00')
+
+    minimi = registra_storico([(prodotto.pk, Decimal('30.00'), Decimal('27.00'))])
+
+    assert minimi[prodotto.pk] == Decimal('20.00')
+
+
+def test_primo_prezzo_senza_minimo(prodotto):
+    assert registra_storico([(prodotto.pk, Decimal('30.00'), None)]) == {prodotto.pk: None}
+    prodotto.refresh_from_db()
+    assert prodotto.prezzo_minimo_30gg is None
+
+
+def test_prezzo_invariato_ignorato(prodotto):
+    _storico(prodotto, 3, '30.00')
+    assert registra_storico([(prodotto.pk, Decimal('30.00'), None)]) == {}
+    assert StoricoPrezzo.objects.filter(prodotto=prodotto).count() == 1
+
+
+def test_variazione_dal_salvataggio(crea_prodotto):
+    prodotto = crea_prodotto(prezzo=Decimal('40.00'))
+    prodotto.prezzo_scontato = Decimal('35.00')
+    prodotto.save()
+    prodotto.refresh_from_db()
+    assert prodotto.prezzo_minimo_30gg == Decimal('40.00')
+
+    Product.objects.filter(pk=prodotto.pk).update(prezzo_scontato=Decimal('30.00'))
+    prodotto.refresh_from_db()
+    assert prodotto.prezzo_minimo_30gg == Decimal('35.00')
@@ -0,0 +1,71 @@
+import pytest
+from django.core.cache import cache
+from rest_framework.exceptions import ValidationError
+
+from baitboost.generazioni import GenerazioneCondivisa
+from prodotti.filters import ProductFilter, SchedaProdottoFilter
+from prodotti.models import Categoria, Product, SchedaProdotto
+from prodotti.riferimenti import CHIAVE_GENERAZIONE, riferimenti
+from prodotti.serializers import ProductSerializer
+
+
+@pytest.fixture
+def caricati(categoria, brand):
+    riferimenti.carica()
+    return categoria, brand
+
+
+@pytest.mark.parametrize('classe, modello', [(ProductFilter, Product), (SchedaProdottoFilter, SchedaProdotto)])
+def test_filtri_validati_senza_query(caricati, classe, modello, django_assert_num_queries):
+    categoria, brand = caricati
+    with django_assert_num_queries(0):
+        valido = classe({'categoria': str(categoria.pk), 'brands': [str(brand.pk)]}, queryset=modello.objects.all())
+        assert valido.is_valid()
+        non_valido = classe({'categorie': ['999999']}, queryset=modello.objects.all())
+        assert not non_valido.is_valid()
+    assert 'categorie' in non_valido.errors
+
+
+def test_serializer_validato_senza_query(caricati, django_assert_num_queries):
+    categoria, brand = caricati
+    campi = ProductSerializer().fields
+    with django_assert_num_queries(0):
+        assert campi['categoria_id'].run_validation(str(categoria.pk)) == categoria
+        assert campi['brand_id'].run_validation(brand.pk) == brand
+        for valore in (999999, 'abc', True):
+            with pytest.raises(ValidationError):
+                campi['brand_id'].run_validation(valore)
+
+
+def test_modifica_incrementa_la_generazione(caricati, django_capture_on_commit_callbacks):
+    prima = cache.get(CHIAVE_GENERAZIONE)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        nuova = Categoria.objects.create(nome='Canne')
+    assert cache.get(CHIAVE_GENERAZIONE) == prima + 1
+    assert nuova.pk in riferimenti.dati().categorie
+
+    id_brand = caricati[1].pk
+    with django_capture_on_commit_callbacks(execute=True):
+        caricati[1].delete()
+    assert cache.get(CHIAVE_GENERAZIONE) == prima + 2
+    assert id_brand not in riferimenti.dati().brand
+
+
+def test_generazione_controllata_solo_dopo_l_intervallo():
+    generazione = GenerazioneCondivisa('test:generazione', intervallo=lambda: 3600, eta_massima=lambda: 3600)
+    assert generazione.da_ricaricare()
+    generazione.caricato(generazione.leggi())
+    assert not generazione.da_ricaricare()
+
+    # Incremento da un altro processo: non visto fino al prossimo controllo
+    cache.incr('test:generazione')
+    assert not generazione.da_ricaricare()
+    generazione.invalida()
+    assert generazione.da_ricaricare()
+
+
+def test_generazione_ricaricata_oltre_l_eta_massima():
+    generazione = GenerazioneCondivisa('test:generazione', intervallo=lambda: 3600, eta_massima=lambda: 0)
+    generazione.caricato(generazione.leggi())
+    assert generazione.da_ricaricare()
@@ -0,0 +1,62 @@
+from decimal import Decimal
+
+import pytest
+
+from prodotti.models import Esca, Product, SchedaProdotto, StoricoPrezzo
+
+SCHEDA = {'formato': 'scheda'}
+
+
+@pytest.fixture
+def esche(crea_prodotto):
+    return [
+        crea_prodotto(Esca, nome='Minnow Spigola', tipo_esca='ARTIFICIALE', specie_target='Spigola', prezzo=Decimal('12.00')),
+        crea_prodotto(Esca, nome='Cucchiaino Trota', tipo_esca='ARTIFICIALE', specie_target='Trota', prezzo=Decimal('8.00'),
+                      prezzo_scontato=Decimal('6.00')),
+    ]
+
+
+def test_lista_classica_senza_parametro(client, esche):
+    [prima, _] = client.get('/api/esche/').json()['results']
+    dettaglio = client.get(f'/api/esche/{esche[1].slug}/').json()
+    # Stessi campi del serializer del viewset, sottotipo compreso
+    assert set(prima) == set(dettaglio)
+    assert {'descrizione_completa', 'immagini', 'tipo_esca', 'specie_target'} <= set(prima)
+
+
+def test_ricerca_sul_percorso_classico(client, esche):
+    risultati = client.get('/api/prodotti/', {'search': esche[0].nome}).json()['results']
+    assert [prodotto['id'] for prodotto in risultati] == [esche[0].pk]
+    assert 'descrizione_completa' in risultati[0]
+
+
+def test_formato_scheda_uguale_sulle_schede_e_sui_modelli(client, esche):
+    dalle_schede = client.get('/api/esche/', SCHEDA).json()
+    dai_modelli = client.get('/api/esche/', {**SCHEDA, 'specie_target': 'trota'}).json()
+
+    assert dalle_schede['count'] == 2
+    assert dai_modelli['count'] == 1
+    assert dai_modelli['results'][0]['id'] == esche[1].pk
+    assert set(dai_modelli['results'][0]) == set(dalle_schede['results'][0])
+    assert 'descrizione_completa' not in dalle_schede['results'][0]
+
+
+def test_formato_scheda_con_ricerca(client, esche):
+    risposta = client.get('/api/prodotti/', {**SCHEDA, 'search': esche[0].nome})
+    assert [prodotto['id'] for prodotto in risposta.json()['results']] == [esche[0].pk]
+
+
+def test_bulk_create_crea_schede_e_storico(client, categoria, brand):
+    prodotti = Product.objects.bulk_create(
+        Product(
+            nome=f'Massivo {numero}', slug=f'massivo-{numero}', codice_sku=f'MAS-{numero}', categoria=categoria, brand=brand,
+            descrizione_breve='Inserito in blocco', immagine_principale='prodotti/massivo.jpg',
+            prezzo=Decimal('15.00'), quantita_disponibile=1,
+        )
+        for numero in range(3)
+    )
+    id_prodotti = {prodotto.pk for prodotto in prodotti}
+
+    assert set(SchedaProdotto.objects.values_list('pk', flat=True)) == id_prodotti
+    assert set(StoricoPrezzo.objects.values_list('prodotto_id', flat=True)) == id_prodotti
+    assert client.get('/api/prodotti/', SCHEDA).json()['count'] == 3
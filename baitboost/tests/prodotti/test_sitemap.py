@@ -0,0 +1,66 @@
+import pytest
+
+from prodotti import sitemap
+from prodotti.sitemap import INDICE, aggiorna_sitemap, nome_file
+
+
+@pytest.fixture(autouse=True)
+def cartella(settings, tmp_path):
+    settings.SITEMAP_ROOT = tmp_path
+    settings.SITEMAP_URL_BASE = 'https://negozio.example/'
+    return tmp_path
+
+
+@pytest.fixture
+def prodotti(crea_prodotto, monkeypatch):
+    # Uno shard per prodotto, per vedere quali vengono rigenerati
+    monkeypatch.setattr(sitemap, 'URL_PER_SHARD', 1)
+    return [crea_prodotto(), crea_prodotto()]
+
+
+def test_url_delle_pagine_del_negozio(cartella, prodotti, categoria):
+    aggiorna_sitemap()
+
+    shard = (cartella / nome_file(f'prodotti-{prodotti[0].pk}')).read_text()
+    assert f'<loc>https://negozio.example/prodotti/{prodotti[0].slug}/</loc>' in shard
+    assert '/api/' not in shard
+    categorie = (cartella / nome_file('categorie')).read_text()
+    assert f'<loc>https://negozio.example/categorie/{categoria.slug}/</loc>' in categorie
+    indice = (cartella / INDICE).read_text()
+    assert '<loc>https://negozio.example/sitemap-categorie.xml</loc>' in indice
+
+
+def test_rigenera_solo_gli_shard_cambiati(cartella, prodotti):
+    primo, secondo = prodotti
+    assert set(aggiorna_sitemap()) == {f'prodotti-{primo.pk}', f'prodotti-{secondo.pk}', 'categorie'}
+    assert aggiorna_sitemap() == []
+
+    secondo.nome = 'Nome cambiato'
+    secondo.save()
+    assert aggiorna_sitemap() == [f'prodotti-{secondo.pk}']
+
+    (cartella / nome_file(f'prodotti-{primo.pk}')).unlink()
+    assert aggiorna_sitemap() == [f'prodotti-{primo.pk}']
+    assert set(aggiorna_sitemap(completa=True)) == {f'prodotti-{primo.pk}', f'prodotti-{secondo.pk}', 'categorie'}
+
+
+def test_shard_rimasto_vuoto_eliminato(cartella, prodotti):
+    primo, secondo = prodotti
+    aggiorna_sitemap()
+
+    secondo.in_vendita = False
+    secondo.save()
+
+    assert aggiorna_sitemap() == []
+    assert not (cartella / nome_file(f'prodotti-{secondo.pk}')).exists()
+    assert nome_file(f'prodotti-{secondo.pk}') not in (cartella / INDICE).read_text()
+    assert nome_file(f'prodotti-{primo.pk}') in (cartella / INDICE).read_text()
+
+
+def test_viste_servono_i_file_generati(client, prodotti):
+    risposta = client.get('/sitemap.xml')
+    assert risposta.status_code == 200
+    assert b'<sitemapindex' in b''.join(risposta.streaming_content)
+
+    assert client.get(f'/sitemap-prodotti-{prodotti[0].pk}.xml').status_code == 200
+    assert client.get('/sitemap-inesistente.xml').status_code == 404
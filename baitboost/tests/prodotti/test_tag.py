@@ -0,0 +1,56 @@
+import pytest
+
+from prodotti.models import Esca
+from prodotti.tag import dividi_nomi, fasce_profondita
+
+
+@pytest.mark.parametrize('testo, fasce', [
+    ('0-1m', ['0-1 m']),
+    ('1,5 - 4 m', ['1-3 m', '3-6 m']),
+    ('80cm', ['0-1 m']),
+    ('8 m', ['Oltre 6 m']),
+    ('Superficie', ['Superficie']),
+    ('Superficie - 1m', ['Superficie', '0-1 m']),
+])
+def test_fasce_profondita(testo, fasce):
+    assert fasce_profondita(testo) == fasce
+
+
+@pytest.mark.parametrize('testo', ['50-80 cm', '10-30cm'])
+def test_fasce_profondita_unita_una_volta_per_intervallo(testo):
+    # L'unità scritta solo sull'ultimo numero vale anche per il primo
+    assert fasce_profondita(testo) == ['0-1 m']
+
+
+def test_fasce_profondita_fino_a():
+    assert fasce_profondita('Fino a 2 m') == ['0-1 m', '1-3 m']
+    assert fasce_profondita('fino a 50 cm') == ['0-1 m']
+
+
+def test_fasce_profondita_senza_misure():
+    assert fasce_profondita('Fondo') == ['Fondo']
+    assert fasce_profondita('') == []
+    assert fasce_profondita(None) == []
+
+
+def test_dividi_nomi():
+    assert dividi_nomi('spigola, Trota / black bass e luccio') == ['Spigola', 'Trota', 'Black bass', 'Luccio']
+
+
+def test_dividi_nomi_duplicati_e_vuoti():
+    assert dividi_nomi('Trota, trota;; TROTA ,') == ['Trota']
+    assert dividi_nomi(None) == []
+
+
+def test_tag_sincronizzati_al_salvataggio(crea_prodotto):
+    esca = crea_prodotto(
+        Esca, tipo_esca='ARTIFICIALE', specie_target='Spigola, Trota', colore='Rosso/Bianco',
+        profondita_lavoro='50-80 cm',
+    )
+    assert set(esca.specie.values_list('slug', flat=True)) == {'spigola', 'trota'}
+    assert set(esca.colori.values_list('slug', flat=True)) == {'rosso', 'bianco'}
+    assert list(esca.fasce_profondita.values_list('nome', flat=True)) == ['0-1 m']
+
+    esca.specie_target = 'Trota'
+    esca.save()
+    assert list(esca.specie.values_list('slug', flat=True)) == ['trota']
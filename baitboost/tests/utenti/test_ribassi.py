@@ -0,0 +1,86 @@
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+
+from prodotti.models import Product, VariazionePrezzo
+from utenti.models import NotificaPrezzo, WishlistItem
+from utenti.ribassi import rileva_ribassi
+
+
+@pytest.fixture
+def utenti(db):
+    return [User.objects.create_user(f'pescatore{numero}', password='x') for numero in range(2)]
+
+
+@pytest.fixture
+def prodotto(crea_prodotto):
+    return crea_prodotto(prezzo=Decimal('50.00'))
+
+
+def _in_wishlist(utente, prodotto, riferimento):
+    return WishlistItem.objects.create(utente=utente, prodotto=prodotto, prezzo_riferimento=Decimal(riferimento))
+
+
+def test_chiave_composta_della_wishlist(utenti, prodotto):
+    elemento = _in_wishlist(utenti[0], prodotto, '50.00')
+    assert elemento.pk == (utenti[0].pk, prodotto.pk)
+    assert WishlistItem.objects.get(pk=(utenti[0].pk, prodotto.pk)) == elemento
+    _in_wishlist(utenti[1], prodotto, '50.00')
+    with pytest.raises(IntegrityError), transaction.atomic():
+        _in_wishlist(utenti[0], prodotto, '40.00')
+
+
+def test_notifica_solo_sotto_il_riferimento(utenti, prodotto):
+    _in_wishlist(utenti[0], prodotto, '50.00')
+    _in_wishlist(utenti[1], prodotto, '35.00')
+
+    Product.objects.filter(pk=prodotto.pk).update(prezzo_scontato=Decimal('40.00'))
+
+    assert rileva_ribassi() == (1, 1)
+    [notifica] = NotificaPrezzo.objects.all()
+    assert (notifica.utente, notifica.prezzo_precedente, notifica.prezzo_nuovo) == (
+        utenti[0], Decimal('50.00'), Decimal('40.00')
+    )
+    # Il nuovo prezzo diventa il riferimento, quello più basso resta
+    riferimenti = dict(WishlistItem.objects.values_list('utente_id', 'prezzo_riferimento'))
+    assert riferimenti == {utenti[0].pk: Decimal('40.00'), utenti[1].pk: Decimal('35.00')}
+    assert not VariazionePrezzo.objects.exists()
+
+
+def test_stesso_ribasso_non_notificato_due_volte(utenti, prodotto):
+    _in_wishlist(utenti[0], prodotto, '50.00')
+    Product.objects.filter(pk=prodotto.pk).update(prezzo_scontato=Decimal('40.00'))
+    rileva_ribassi()
+    Product.objects.filter(pk=prodotto.pk).update(prezzo_scontato=Decimal('45.00'))
+    assert rileva_ribassi() == (1, 0)
+    assert NotificaPrezzo.objects.count() == 1
+
+
+def test_conta_solo_l_ultima_variazione_del_lotto(utenti, prodotto):
+    _in_wishlist(utenti[0], prodotto, '50.00')
+    Product.objects.filter(pk=prodotto.pk).update(prezzo_scontato=Decimal('30.00'))
+    Product.objects.filter(pk=prodotto.pk).update(prezzo_scontato=Decimal('45.00'))
+
+    assert rileva_ribassi() == (2, 1)
+    assert NotificaPrezzo.objects.get().prezzo_nuovo == Decimal('45.00')
+
+
+def test_lotti_in_transazioni_separate(utenti, crea_prodotto):
+    prodotti = [crea_prodotto(prezzo=Decimal('50.00')) for _ in range(3)]
+    for prodotto in prodotti:
+        _in_wishlist(utenti[0], prodotto, '50.00')
+    Product.objects.filter(pk__in=[prodotto.pk for prodotto in prodotti]).update(prezzo=Decimal('20.00'))
+
+    assert rileva_ribassi(limite=2) == (3, 3)
+
+
+def test_api_wishlist(client, utenti, prodotto):
+    client.force_authenticate(utenti[0])
+    assert client.post('/api/wishlist/', {'prodotto_id': prodotto.pk}).status_code == 201
+    assert client.post('/api/wishlist/', {'prodotto_id': prodotto.pk}).status_code == 200
+    [elemento] = client.get('/api/wishlist/').json()['results']
+    assert elemento['prezzo_riferimento'] == '50.00'
+    assert client.delete(f'/api/wishlist/{prodotto.pk}/').status_code == 204
+    assert not WishlistItem.objects.exists()
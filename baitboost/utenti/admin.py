@@ -1,3 +1,11 @@
 from django.contrib import admin
+from .models import NotificaPrezzo
 
-# Register your models here.
+
+# WishlistItem ha una chiave primaria composta, non supportata dall'admin di Django
+@admin.register(NotificaPrezzo)
+class NotificaPrezzoAdmin(admin.ModelAdmin):
+    list_display = ['utente', 'prodotto', 'prezzo_precedente', 'prezzo_nuovo', 'letta', 'data_creazione']
+    list_filter = ['letta']
+    list_select_related = ['utente', 'prodotto']
+    raw_id_fields = ['utente', 'prodotto']
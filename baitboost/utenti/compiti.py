@@ -0,0 +1,10 @@
+from coda.models import Compito
+from coda.registro import compito
+
+from .ribassi import rileva_ribassi
+
+
+@compito(priorita=Compito.PRIORITA_BASSA)
+def rileva_ribassi_prezzo():
+    """Consuma le variazioni di prezzo accodate e crea le notifiche di ribasso"""
+    rileva_ribassi()
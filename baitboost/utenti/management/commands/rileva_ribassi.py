@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from utenti.ribassi import DIMENSIONE_LOTTO, rileva_ribassi
+
+
+class Command(BaseCommand):
+    """
+    Elabora le variazioni di prezzo accodate e crea le notifiche di ribasso per le wishlist.
+    Pensato per essere lanciato periodicamente (es. da cron ogni pochi minuti).
+    """
+    help = 'Crea le notifiche di ribasso per i prodotti in wishlist'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lotto', type=int, default=DIMENSIONE_LOTTO,
+                            help='Variazioni di prezzo elaborate per transazione')
+
+    def handle(self, *args, **options):
+        variazioni, notifiche = rileva_ribassi(options['lotto'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{variazioni} variazioni elaborate, {notifiche} notifiche create'
+        ))
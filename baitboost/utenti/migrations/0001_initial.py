@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('prodotti', '0002_variazioneprezzo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificaPrezzo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prezzo_precedente', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('prezzo_nuovo', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('letta', models.BooleanField(default=False)),
+                ('data_creazione', models.DateTimeField(auto_now_add=True)),
+                ('prodotto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifiche_prezzo', to='prodotti.product')),
+                ('utente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifiche_prezzo', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Notifica prezzo',
+                'verbose_name_plural': 'Notifiche prezzo',
+                'ordering': ['-data_creazione'],
+                'indexes': [models.Index(fields=['utente', 'letta', '-data_creazione'], name='notifica_utente_letta_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='WishlistItem',
+            fields=[
+                ('pk', models.CompositePrimaryKey('utente', 'prodotto', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('prezzo_riferimento', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('data_aggiunta', models.DateTimeField(auto_now_add=True)),
+                ('prodotto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='in_wishlist', to='prodotti.product')),
+                ('utente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='wishlist', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Prodotto in wishlist',
+                'verbose_name_plural': 'Wishlist',
+                'ordering': ['-data_aggiunta'],
+                'indexes': [models.Index(fields=['prodotto', 'prezzo_riferimento'], name='wishlist_prodotto_prezzo_idx')],
+            },
+        ),
+    ]
@@ -1,3 +1,51 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+from prodotti.models import Product
+
+
+class WishlistItem(models.Model):
+    """
+    Prodotto salvato nella wishlist di un utente.
+    La chiave primaria composta (utente, prodotto) tiene vicine su disco le righe
+    dello stesso utente e non serve un id aggiuntivo: ogni riga resta minima.
+    """
+    pk = models.CompositePrimaryKey('utente', 'prodotto')
+    utente = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='wishlist')
+    prodotto = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='in_wishlist')
+    # Prezzo visto dall'utente: si notifica solo quando il prezzo scende sotto questo valore
+    prezzo_riferimento = models.DecimalField(max_digits=10, decimal_places=2)
+    data_aggiunta = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Prodotto in wishlist'
+        verbose_name_plural = 'Wishlist'
+        ordering = ['-data_aggiunta']
+        indexes = [
+            # Per il join con le variazioni di prezzo
+            models.Index(fields=['prodotto', 'prezzo_riferimento'], name='wishlist_prodotto_prezzo_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.utente} - {self.prodotto}"
+
+
+class NotificaPrezzo(models.Model):
+    """Notifica di ribasso di prezzo per un prodotto in wishlist"""
+    utente = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notifiche_prezzo')
+    prodotto = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='notifiche_prezzo')
+    prezzo_precedente = models.DecimalField(max_digits=10, decimal_places=2)
+    prezzo_nuovo = models.DecimalField(max_digits=10, decimal_places=2)
+    letta = models.BooleanField(default=False)
+    data_creazione = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Notifica prezzo'
+        verbose_name_plural = 'Notifiche prezzo'
+        ordering = ['-data_creazione']
+        indexes = [
+            models.Index(fields=['utente', 'letta', '-data_creazione'], name='notifica_utente_letta_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.prodotto}: {self.prezzo_precedente} -> {self.prezzo_nuovo}"
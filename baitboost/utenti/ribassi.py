@@ -0,0 +1,89 @@
+"""
+Rilevamento dei ribassi di prezzo dei prodotti in wishlist.
+
+Le variazioni di prezzo vengono accodate in ``VariazionePrezzo`` al salvataggio dei
+prodotti; questo job le consuma a lotti e, per ogni lotto, fa un unico
+INSERT ... SELECT di join con le wishlist. Il costo dipende quindi dal numero di
+variazioni e di righe effettivamente notificate, non dalla dimensione delle wishlist.
+"""
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from prodotti.models import VariazionePrezzo
+from .models import NotificaPrezzo, WishlistItem
+
+# Variazioni elaborate per lotto (sotto il limite di variabili di SQLite)
+DIMENSIONE_LOTTO = 500
+
+
+def _inserisci_notifiche(id_variazioni, adesso, using=DEFAULT_DB_ALIAS):
+    """Crea con un unico INSERT ... SELECT le notifiche per le wishlist coinvolte"""
+    segnaposto = ', '.join(['%s'] * len(id_variazioni))
+    sql = (
+        f'INSERT INTO {NotificaPrezzo._meta.db_table} '
+        '(utente_id, prodotto_id, prezzo_precedente, prezzo_nuovo, letta, data_creazione) '
+        'SELECT w.utente_id, w.prodotto_id, w.prezzo_riferimento, v.prezzo_effettivo, %s, %s '
+        f'FROM {WishlistItem._meta.db_table} w '
+        f'JOIN {VariazionePrezzo._meta.db_table} v ON v.prodotto_id = w.prodotto_id '
+        f'WHERE v.id IN ({segnaposto}) AND v.prezzo_effettivo < w.prezzo_riferimento'
+    )
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, [False, adesso, *id_variazioni])
+        return cursor.rowcount
+
+
+def elabora_lotto(limite=DIMENSIONE_LOTTO, using=DEFAULT_DB_ALIAS):
+    """
+    Elabora il prossimo lotto di variazioni di prezzo.
+
+    Args:
+        limite (int): variazioni per lotto.
+        using (str): alias del database.
+
+    Returns:
+        tuple: (variazioni elaborate, notifiche create).
+    """
+    with transaction.atomic(using=using):
+        lotto = list(
+            VariazionePrezzo.objects.using(using).order_by('id').values_list('id', 'prodotto_id')[:limite]
+        )
+        if not lotto:
+            return 0, 0
+
+        # Per ogni prodotto conta solo l'ultima variazione del lotto
+        ultime = {}
+        for id_variazione, id_prodotto in lotto:
+            ultime[id_prodotto] = id_variazione
+        id_ultime = list(ultime.values())
+
+        notifiche = _inserisci_notifiche(id_ultime, timezone.now(), using=using)
+
+        # Il nuovo prezzo diventa il riferimento, così lo stesso ribasso non si notifica due volte
+        nuovo_prezzo = Subquery(
+            VariazionePrezzo.objects.using(using).filter(
+                id__in=id_ultime, prodotto_id=OuterRef('prodotto_id')
+            ).values('prezzo_effettivo')[:1]
+        )
+        WishlistItem.objects.using(using).filter(
+            prodotto_id__in=ultime.keys(), prezzo_riferimento__gt=nuovo_prezzo
+        ).update(prezzo_riferimento=nuovo_prezzo)
+
+        VariazionePrezzo.objects.using(using).filter(id__in=[id_variazione for id_variazione, _ in lotto]).delete()
+    return len(lotto), notifiche
+
+
+def rileva_ribassi(limite=DIMENSIONE_LOTTO, using=DEFAULT_DB_ALIAS):
+    """
+    Svuota la coda delle variazioni di prezzo, un lotto per transazione.
+
+    Returns:
+        tuple: (variazioni elaborate, notifiche create) in totale.
+    """
+    totale_variazioni = totale_notifiche = 0
+    while True:
+        variazioni, notifiche = elabora_lotto(limite, using=using)
+        if not variazioni:
+            return totale_variazioni, totale_notifiche
+        totale_variazioni += variazioni
+        totale_notifiche += notifiche
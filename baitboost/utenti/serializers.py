@@ -0,0 +1,31 @@
+from rest_framework import serializers
+
+from prodotti.models import Product
+from prodotti.serializers import ProductSerializer
+from .models import NotificaPrezzo
+
+
+class WishlistItemSerializer(serializers.Serializer):
+    """Serializer per i prodotti in wishlist"""
+    prodotto = ProductSerializer(read_only=True)
+    prodotto_id = serializers.PrimaryKeyRelatedField(
+        queryset=Product.objects.all(),
+        source='prodotto',
+        write_only=True
+    )
+    prezzo_riferimento = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    data_aggiunta = serializers.DateTimeField(read_only=True)
+
+
+class NotificaPrezzoSerializer(serializers.ModelSerializer):
+    """Serializer per le notifiche di ribasso"""
+    prodotto_slug = serializers.SlugRelatedField(source='prodotto', slug_field='slug', read_only=True)
+    prodotto_nome = serializers.CharField(source='prodotto.nome', read_only=True)
+    
+    class Meta:
+        model = NotificaPrezzo
+        fields = [
+            'id', 'prodotto', 'prodotto_slug', 'prodotto_nome',
+            'prezzo_precedente', 'prezzo_nuovo', 'letta', 'data_creazione'
+        ]
+        read_only_fields = fields
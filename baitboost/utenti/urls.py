@@ -0,0 +1,14 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+
+from .views import WishlistViewSet, NotificaPrezzoViewSet
+
+# Configurazione del router DRF per le API degli utenti
+router = DefaultRouter()
+router.register('wishlist', WishlistViewSet, basename='wishlist')
+router.register('notifiche-prezzo', NotificaPrezzoViewSet, basename='notifica-prezzo')
+
+# Pattern URL per l'app utenti
+urlpatterns = [
+    path('api/', include(router.urls)),
+]
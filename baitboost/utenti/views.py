@@ -1,3 +1,72 @@
-from django.shortcuts import render
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 
-# Create your views here.
+from .models import NotificaPrezzo, WishlistItem
+from .serializers import NotificaPrezzoSerializer, WishlistItemSerializer
+
+
+class WishlistViewSet(viewsets.GenericViewSet):
+    """
+    API endpoint per la wishlist dell'utente autenticato
+    Il prodotto si identifica con il suo id sia in aggiunta che in rimozione
+    """
+    serializer_class = WishlistItemSerializer
+    permission_classes = [IsAuthenticated]
+    lookup_field = 'prodotto_id'
+    
+    def get_queryset(self):
+        return WishlistItem.objects.filter(utente=self.request.user).select_related(
+            'prodotto__categoria', 'prodotto__brand'
+        ).prefetch_related('prodotto__immagini')
+    
+    def list(self, request):
+        """Restituisce i prodotti in wishlist"""
+        queryset = self.get_queryset()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+    
+    def create(self, request):
+        """Aggiunge un prodotto alla wishlist, con il prezzo attuale come riferimento"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        prodotto = serializer.validated_data['prodotto']
+        elemento, creato = WishlistItem.objects.get_or_create(
+            utente=request.user,
+            prodotto=prodotto,
+            defaults={'prezzo_riferimento': prodotto.prezzo_effettivo}
+        )
+        return Response(
+            self.get_serializer(elemento).data,
+            status=status.HTTP_201_CREATED if creato else status.HTTP_200_OK
+        )
+    
+    def destroy(self, request, prodotto_id=None):
+        """Rimuove un prodotto dalla wishlist"""
+        self.get_queryset().filter(prodotto_id=prodotto_id).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class NotificaPrezzoViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    API endpoint per le notifiche di ribasso dell'utente autenticato
+    """
+    serializer_class = NotificaPrezzoSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        queryset = NotificaPrezzo.objects.filter(utente=self.request.user).select_related('prodotto')
+        if self.request.query_params.get('non_lette'):
+            queryset = queryset.filter(letta=False)
+        return queryset
+    
+    @action(detail=False, methods=['post'])
+    def segna_lette(self, request):
+        """Segna come lette tutte le notifiche dell'utente"""
+        aggiornate = NotificaPrezzo.objects.filter(utente=request.user, letta=False).update(letta=True)
+        return Response({'aggiornate': aggiornate})